@@ -0,0 +1,35 @@
+import argparse
+import resource
+from time import time
+
+from mnms.generation.mlgraph import generate_manhattan_multimodal
+
+
+def benchmark(n, zones, bus_line_spacing, length_noise, seed):
+    start = time()
+    mlgraph = generate_manhattan_multimodal(n, 100,
+                                            length_noise=length_noise,
+                                            zones=zones,
+                                            bus_line_spacing=bus_line_spacing,
+                                            seed=seed)
+    elapsed = time() - start
+
+    print(f"Grid of {n} x {n} nodes, {len(mlgraph.roads.zones)} reservoirs, "
+          f"{len(mlgraph.layers['BUS'].lines) if 'BUS' in mlgraph.layers else 0} bus lines")
+    print(f"Number of nodes: {len(mlgraph.graph.nodes)}")
+    print(f"Number of links: {len(mlgraph.graph.links)}")
+    print(f"Generation time: {elapsed:.1f} s")
+    print(f"Peak memory: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the generation of a synthetic multimodal Manhattan network")
+    parser.add_argument("--size", default=200, type=int, help="Number of nodes per side of the grid")
+    parser.add_argument("--zones", nargs=2, default=[4, 4], type=int, help="Number of reservoirs along x and y")
+    parser.add_argument("--bus-line-spacing", default=10, type=int, help="Number of streets between two bus corridors")
+    parser.add_argument("--length-noise", default=0.2, type=float, help="Relative amplitude of the random link lengths")
+    parser.add_argument("--seed", default=0, type=int, help="Seed of the random link lengths")
+
+    args = parser.parse_args()
+
+    benchmark(args.size, tuple(args.zones), args.bus_line_spacing, args.length_noise, args.seed)
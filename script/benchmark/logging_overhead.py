@@ -0,0 +1,39 @@
+import argparse
+import timeit
+
+from mnms.demand.user import User, Path
+from mnms.log import create_logger, is_enabled, LOGLEVEL
+from mnms.time import Time
+
+log = create_logger('mnms.benchmark.logging')
+
+
+def benchmark(nb_calls):
+    user = User('U0', 'ORIGIN', 'DESTINATION', Time('07:00:00'))
+    path = Path(1000., ['ORIGIN', 'N1', 'N2', 'DESTINATION'])
+    nodes = ['N1', 'N2']
+
+    def fstring():
+        log.info(f"User {user.id} chose path {path} at {user.departure_time} through {list(nodes)[0]}")
+
+    def lazy():
+        log.info("User %s chose path %s at %s through %s", user.id, path, user.departure_time, list(nodes)[0])
+
+    def guarded():
+        if is_enabled(log, LOGLEVEL.INFO):
+            log.info("User %s chose path %s at %s through %s", user.id, path, user.departure_time, list(nodes)[0])
+
+    log.setLevel(LOGLEVEL.WARNING)
+    print(f"Number of calls: {nb_calls}, INFO level disabled")
+    for name, f in [('f-string', fstring), ('%-style arguments', lazy), ('is_enabled guard', guarded)]:
+        elapsed = timeit.timeit(f, number=nb_calls)
+        print(f"{name:>20}: {elapsed / nb_calls * 1e9:8.0f} ns per call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cost of the disabled logging calls")
+    parser.add_argument("--calls", default=200000, type=int, help="Number of logging calls")
+
+    args = parser.parse_args()
+
+    benchmark(args.calls)
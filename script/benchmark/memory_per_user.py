@@ -0,0 +1,58 @@
+import argparse
+import gc
+import tracemalloc
+
+from mnms.demand.user import User, Path
+from mnms.mobility_service.abstract import Request
+from mnms.time import Time
+
+
+def create_users(nb_users, with_path):
+    departure_time = Time('07:00:00')
+    users = list()
+    for i in range(nb_users):
+        user = User(str(i), 'ORIGIN', 'DESTINATION', departure_time)
+        if with_path:
+            user.path = Path(1000., ['ORIGIN', 'N1', 'N2', 'DESTINATION'])
+            user.current_node = 'ORIGIN'
+        users.append(user)
+    return users
+
+
+def create_requests(users):
+    request_time = Time('07:00:00')
+    return [Request(user, 'DESTINATION', request_time) for user in users]
+
+
+def measure(f, *args):
+    """Returns the result of f and the memory in bytes allocated by f and still alive
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    result = f(*args)
+    memory = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return result, memory
+
+
+def benchmark(nb_users):
+    users, memory_users = measure(create_users, nb_users, False)
+    del users
+    users, memory_users_path = measure(create_users, nb_users, True)
+    _, memory_requests = measure(create_requests, users)
+
+    print(f"Number of users: {nb_users}")
+    print(f"Memory per user: {memory_users / nb_users:.0f} B")
+    print(f"Memory per user with a path: {memory_users_path / nb_users:.0f} B")
+    print(f"Memory per request: {memory_requests / nb_users:.0f} B")
+    print(f"Estimated memory for 1 million users with a path: {memory_users_path / nb_users * 1e6 / 2**20:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the memory used by the MnMS User objects")
+    parser.add_argument("--users", default=100000, type=int, help="Number of users to create")
+
+    args = parser.parse_args()
+
+    benchmark(args.users)
@@ -0,0 +1,43 @@
+import argparse
+import sys
+
+from mnms.benchmark import DEFAULT_CASES, run_benchmark, save_baseline, load_baseline, compare_to_baseline
+
+
+def print_results(results):
+    phases = list(next(iter(results.values())).keys())
+    print(f"{'CASE':>10}" + "".join(f"{p.upper():>12}" for p in phases))
+    for name, times in results.items():
+        print(f"{name:>10}" + "".join(f"{times[p]:>12.3f}" for p in phases))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the phases of MnMS simulations on generated Manhattan "
+                                                 "scenarios of increasing size and compare them with a baseline")
+    parser.add_argument("--cases", nargs="+", default=[c.name for c in DEFAULT_CASES],
+                        choices=[c.name for c in DEFAULT_CASES], help="Benchmark cases to run")
+    parser.add_argument("--repeat", default=3, type=int, help="Number of runs of each case, the fastest is kept")
+    parser.add_argument("--seed", default=0, type=int, help="Seed of the generated scenarios")
+    parser.add_argument("--save-baseline", default=None, help="Write the results in this JSON baseline file")
+    parser.add_argument("--baseline", default=None, help="Compare the results with this JSON baseline file")
+    parser.add_argument("--threshold", default=0.2, type=float,
+                        help="Relative slowdown of a phase above which the comparison fails")
+
+    args = parser.parse_args()
+
+    cases = [c for c in DEFAULT_CASES if c.name in args.cases]
+    results = run_benchmark(cases, seed=args.seed, repeat=args.repeat)
+    print_results(results)
+
+    if args.save_baseline is not None:
+        save_baseline(results, args.save_baseline)
+        print(f"Baseline written in {args.save_baseline}")
+
+    if args.baseline is not None:
+        regressions = compare_to_baseline(results, load_baseline(args.baseline), args.threshold)
+        if regressions:
+            print("Regressions compared with the baseline:")
+            for r in regressions:
+                print(f"  {r}")
+            sys.exit(1)
+        print("No regression compared with the baseline")
@@ -0,0 +1,198 @@
+import json
+import random
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from time import time
+from typing import Dict, List, Union
+
+import numpy as np
+
+from mnms.flow.MFD import MFDFlowMotor, Reservoir
+from mnms.generation.demand import generate_random_demand
+from mnms.generation.layers import generate_layer_from_roads, generate_matching_origin_destination_layer
+from mnms.generation.roads import generate_manhattan_road
+from mnms.graph.layers import MultiLayerGraph
+from mnms.log import create_logger
+from mnms.mobility_service.on_demand import OnDemandMobilityService
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.simulation import Supervisor
+from mnms.time import Time, Dt
+from mnms.travel_decision.dummy import DummyDecisionModel
+
+log = create_logger(__name__)
+
+# Phases of the simulation timed by the benchmark, 'run' is the whole Supervisor.run
+PHASES = ['run', 'planning', 'flow_motor', 'matching', 'user_flow']
+
+
+@dataclass
+class BenchmarkCase:
+    """A generated scenario of the benchmark.
+
+    Args:
+        -name: name of the case, used as key in the results
+        -grid_size: number of nodes per side of the Manhattan network
+        -nb_users: number of users of the random demand
+        -fleet_size: number of on-demand vehicles
+        -link_length: length of the links of the network
+        -duration: simulated duration in seconds, users depart during the first half
+    """
+    name: str
+    grid_size: int
+    nb_users: int
+    fleet_size: int
+    link_length: float = 100
+    duration: int = 3600
+
+
+DEFAULT_CASES = [BenchmarkCase('small', 10, 100, 10),
+                 BenchmarkCase('medium', 20, 500, 50),
+                 BenchmarkCase('large', 40, 2000, 200)]
+
+
+def mfdspeed(dacc):
+    return {'CAR': max(11.5 * (1 - (dacc['CAR'] / 5000)), 1)}
+
+
+def build_benchmark_supervisor(case: BenchmarkCase, seed: int = 0) -> Supervisor:
+    """Generates the network, the fleet and the demand of a benchmark case.
+
+    Args:
+        -case: the benchmark case
+        -seed: seed of the demand and fleet generation
+
+    Returns:
+        -supervisor: the Supervisor of the case, ready to run
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+
+    roads = generate_manhattan_road(case.grid_size, case.link_length)
+    car_layer = generate_layer_from_roads(roads, 'CAR', mobility_services=[PersonalMobilityService()])
+    ridehailing = OnDemandMobilityService('RIDEHAILING', 1)
+    ridehailing_layer = generate_layer_from_roads(roads, 'RIDEHAILING', mobility_services=[ridehailing])
+
+    mlgraph = MultiLayerGraph([car_layer, ridehailing_layer],
+                              generate_matching_origin_destination_layer(roads),
+                              1e-3)
+
+    nodes = list(ridehailing_layer.graph.nodes.keys())
+    for i in np.random.randint(0, len(nodes), case.fleet_size):
+        ridehailing.create_waiting_vehicle(nodes[i])
+
+    tstart = Time('07:00:00')
+    demand = generate_random_demand(mlgraph,
+                                    case.nb_users,
+                                    tstart=str(tstart),
+                                    tend=str(tstart.add_time(Dt(seconds=case.duration // 2))),
+                                    min_cost=2 * case.link_length,
+                                    seed=seed)
+
+    flow_motor = MFDFlowMotor()
+    flow_motor.add_reservoir(Reservoir(roads.zones['RES'], ['CAR'], mfdspeed))
+
+    return Supervisor(mlgraph, demand, flow_motor, DummyDecisionModel(mlgraph))
+
+
+def run_benchmark_case(case: BenchmarkCase, seed: int = 0, flow_dt: Dt = Dt(seconds=30),
+                       affectation_factor: int = 10) -> Dict[str, float]:
+    """Runs a benchmark case and returns the execution time of each phase.
+
+    Args:
+        -case: the benchmark case
+        -seed: seed of the generation and of the simulation
+        -flow_dt: flow time step of the simulation
+        -affectation_factor: number of flow steps between two plannings
+
+    Returns:
+        -times: dict with the phases as keys and their execution time in seconds as
+         values, the time of the generation is under the 'build' key
+    """
+    start = time()
+    supervisor = build_benchmark_supervisor(case, seed)
+    times = {'build': time() - start}
+
+    tstart = Time('07:00:00')
+    start = time()
+    supervisor.run(tstart, tstart.add_time(Dt(seconds=case.duration)), flow_dt, affectation_factor, seed=seed)
+    times['run'] = time() - start
+    for phase in PHASES[1:]:
+        times[phase] = supervisor.phase_times[phase]
+
+    return times
+
+
+def run_benchmark(cases: List[BenchmarkCase] = None, seed: int = 0, repeat: int = 1) -> Dict[str, Dict[str, float]]:
+    """Runs the benchmark cases, each case is run repeat times and the fastest time
+    of each phase is kept to reduce the noise of the measures.
+
+    Args:
+        -cases: the benchmark cases, DEFAULT_CASES if None
+        -seed: seed of the generation and of the simulations
+        -repeat: number of runs of each case
+
+    Returns:
+        -results: dict with the names of the cases as keys and the times of their
+         phases as values
+    """
+    cases = DEFAULT_CASES if cases is None else cases
+    results = dict()
+    for case in cases:
+        log.info(f'Run benchmark case {case.name} ({asdict(case)})')
+        runs = [run_benchmark_case(case, seed) for _ in range(repeat)]
+        results[case.name] = {phase: min(r[phase] for r in runs) for phase in runs[0]}
+    return results
+
+
+def save_baseline(results: Dict[str, Dict[str, float]], filename: Union[str, Path]):
+    """Writes the results of a benchmark as a JSON baseline.
+
+    Args:
+        -results: the results returned by run_benchmark
+        -filename: the JSON file
+    """
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def load_baseline(filename: Union[str, Path]) -> Dict[str, Dict[str, float]]:
+    """Reads a JSON baseline written by save_baseline.
+
+    Args:
+        -filename: the JSON file
+
+    Returns:
+        -baseline: the results of the baseline
+    """
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]],
+                        baseline: Dict[str, Dict[str, float]],
+                        threshold: float = 0.2,
+                        min_time: float = 0.05) -> List[str]:
+    """Compares the results of a benchmark with a baseline.
+
+    Args:
+        -results: the results returned by run_benchmark
+        -baseline: the baseline results
+        -threshold: relative slowdown above which a phase regresses
+        -min_time: phases faster than this number of seconds in the baseline are not
+         compared, their measure is too noisy
+
+    Returns:
+        -regressions: the description of the phases that regressed, empty if none
+    """
+    regressions = []
+    for name, times in results.items():
+        if name not in baseline:
+            log.warning(f'Benchmark case {name} is not in the baseline')
+            continue
+        for phase, t in times.items():
+            tref = baseline[name].get(phase)
+            if tref is None or tref < min_time:
+                continue
+            if t > tref * (1 + threshold):
+                regressions.append(f'{name}/{phase}: {t:.3f} s instead of {tref:.3f} s (+{100 * (t / tref - 1):.0f}%)')
+    return regressions
@@ -2,6 +2,7 @@ import csv
 import re
 import sys
 from abc import ABC, abstractmethod
+from collections import deque
 from pathlib import Path as Pathl
 from typing import List, Literal, Union, Dict, Callable
 from datetime import datetime
@@ -64,15 +65,31 @@ class BaseDemandManager(AbstractDemandManager):
     ----------
     users: List[User]
         list of User to manage
+    keep_users: bool
+        If False, the manager releases the Users as they depart so that it does not
+        keep the whole demand in memory, the departed Users are then no more
+        available for copy, show_users and to_csv
     """
 
-    def __init__(self, users, user_parameters: Callable[[User], Dict] = lambda x: {}):
+    def __init__(self, users, user_parameters: Callable[[User], Dict] = lambda x: {}, keep_users: bool = True):
         super(BaseDemandManager, self).__init__(user_parameters)
-        self._users = users
-        self._iter_demand = iter(self._users)
-        self._current_user = next(self._iter_demand)
-
-        self.nb_users = len(self._users)
+        self._keep_users = keep_users
+        self.nb_users = len(users)
+        if keep_users:
+            self._users = users
+            self._iter_demand = iter(self._users)
+        else:
+            self._users = deque(users)
+            self._iter_demand = None
+        self._exhausted = False
+        self._current_user = self._next_user()
+
+    def _next_user(self) -> User:
+        if self._iter_demand is not None:
+            return next(self._iter_demand)
+        if not self._users:
+            raise StopIteration
+        return self._users.popleft()
 
     def get_next_departures(self, tstart: Time, tend: Time) -> List[User]:
         departure = list()
@@ -84,18 +101,27 @@ class BaseDemandManager(AbstractDemandManager):
 
             departure.append(self._current_user)
             try:
-                self._current_user = next(self._iter_demand)
+                self._current_user = self._next_user()
             except StopIteration:
+                self._exhausted = True
                 return departure
         return departure
 
+    def _remaining_users(self) -> List[User]:
+        """Returns the managed Users, when they are released as they depart the
+        pending current User is not in the deque anymore and is put back in front.
+        """
+        if self._keep_users or self._exhausted:
+            return list(self._users)
+        return [self._current_user] + list(self._users)
+
     def copy(self):
         cls = self.__class__
-        copy = cls(self._users)
+        copy = cls(self._remaining_users(), keep_users=self._keep_users)
         return copy
 
     def show_users(self):
-        for u in self._users:
+        for u in self._remaining_users():
             print(u)
 
     def to_csv(self, file: Union[Pathl, str], delimiter=";"):
@@ -103,7 +129,7 @@ class BaseDemandManager(AbstractDemandManager):
             writer = csv.writer(f, delimiter=delimiter)
             writer.writerow(["ID", "DEPARTURE", "ORIGIN", "DESTINATION"])
 
-            for u in self._users:
+            for u in self._remaining_users():
                 writer.writerow([u.id, u.departure_time, u.origin, u.destination])
 
 
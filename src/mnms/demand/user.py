@@ -35,6 +35,17 @@ class User(TimeDependentSubject):
     default_response_dt = Dt(minutes=2)
     default_pickup_dt = Dt(minutes=5)
 
+    # Users are created by millions, slots avoid a __dict__ per user
+    __slots__ = ('id', 'origin', 'destination', 'departure_time', 'arrival_time',
+                 'available_mobility_services', 'mobility_services_graph', 'response_dt',
+                 'path', 'forced_path_chosen_mobility_services', '_pickup_dt',
+                 '_pickup_dt_value', '_parameters', '_current_node', '_current_link',
+                 '_remaining_link_length', '_position', '_position_vehicle',
+                 '_achieved_path', '_achieved_path_ms', '_vehicle', '_waited_vehicle',
+                 '_requested_service', '_parked_personal_vehicles', '_personal_vehicles',
+                 '_distance', '_interrupted_path', '_state', '_deadend_at_next_node',
+                 '_snapped_origin', '_snapped_destination')
+
     def __init__(self,
                  id: str,
                  origin: Union[str, Union[np.ndarray, List]],
@@ -73,25 +84,30 @@ class User(TimeDependentSubject):
         self.available_mobility_services = available_mobility_services if available_mobility_services is None else set(available_mobility_services)
         self.mobility_services_graph = mobility_services_graph
         self.response_dt = User.default_response_dt.copy() if response_dt is None else response_dt
-        self.pickup_dt = defaultdict(lambda: User.default_pickup_dt.copy()) if pickup_dt is None else defaultdict(lambda: pickup_dt)
-
-        self.parameters: Dict = dict()
+        # The containers below are rarely filled for most users, they are allocated
+        # on first access
+        self._pickup_dt = None
+        self._pickup_dt_value = pickup_dt
+        self._parameters = None
 
         self._current_node = None
         self._current_link = None
         self._remaining_link_length = None
         self._position = None
-        self._achieved_path = list()
-        self._achieved_path_ms = list()
+        self._position_vehicle = None  # vehicle whose position is the one of the user
+        self._achieved_path = None
+        self._achieved_path_ms = None
         self._vehicle = None
         self._waited_vehicle = None
         self._requested_service = None
-        self._parked_personal_vehicles = dict()
-        self._personal_vehicles = dict()
+        self._parked_personal_vehicles = None
+        self._personal_vehicles = None
         self._distance = 0
         self._interrupted_path = None
         self._state = UserState.STOP
         self._deadend_at_next_node = False
+        self._snapped_origin = None
+        self._snapped_destination = None
 
         if path is None:
             self.path: Optional[Path] = None
@@ -129,14 +145,40 @@ class User(TimeDependentSubject):
 
     @property
     def position(self):
+        if self._position_vehicle is not None:
+            return self._position_vehicle.position
         return self._position
 
     @position.setter
     def position(self, pos):
+        self._position_vehicle = None
         self._position = pos
 
+    @property
+    def pickup_dt(self):
+        if self._pickup_dt is None:
+            pickup_dt = self._pickup_dt_value
+            self._pickup_dt = defaultdict(lambda: User.default_pickup_dt.copy()) if pickup_dt is None else defaultdict(lambda: pickup_dt)
+        return self._pickup_dt
+
+    @pickup_dt.setter
+    def pickup_dt(self, pickup_dt: Dict[str, Dt]):
+        self._pickup_dt = pickup_dt
+
+    @property
+    def parameters(self):
+        if self._parameters is None:
+            self._parameters = dict()
+        return self._parameters
+
+    @parameters.setter
+    def parameters(self, params: Dict):
+        self._parameters = params
+
     @property
     def achieved_path(self):
+        if self._achieved_path is None:
+            self._achieved_path = list()
         return self._achieved_path
 
     @achieved_path.setter
@@ -145,6 +187,8 @@ class User(TimeDependentSubject):
 
     @property
     def achieved_path_ms(self):
+        if self._achieved_path_ms is None:
+            self._achieved_path_ms = list()
         return self._achieved_path_ms
 
     @achieved_path_ms.setter
@@ -157,6 +201,10 @@ class User(TimeDependentSubject):
 
     @vehicle.setter
     def vehicle(self, veh: "Vehicle"):
+        if self._position_vehicle is not None:
+            # The user leaves the vehicle, its position does not follow the vehicle anymore
+            self._position = self._position_vehicle.position
+            self._position_vehicle = None
         self._vehicle = veh
 
     @property
@@ -177,10 +225,14 @@ class User(TimeDependentSubject):
 
     @property
     def parked_personal_vehicles(self):
+        if self._parked_personal_vehicles is None:
+            self._parked_personal_vehicles = dict()
         return self._parked_personal_vehicles
 
     @property
     def personal_vehicles(self):
+        if self._personal_vehicles is None:
+            self._personal_vehicles = dict()
         return self._personal_vehicles
 
     @property
@@ -211,6 +263,22 @@ class User(TimeDependentSubject):
     def deadend_at_next_node(self, b):
         self._deadend_at_next_node = b
 
+    @property
+    def snapped_origin(self):
+        return self._snapped_origin
+
+    @snapped_origin.setter
+    def snapped_origin(self, nid: str):
+        self._snapped_origin = nid
+
+    @property
+    def snapped_destination(self):
+        return self._snapped_destination
+
+    @snapped_destination.setter
+    def snapped_destination(self, nid: str):
+        self._snapped_destination = nid
+
     @property
     def is_in_vehicle(self):
         return self.vehicle is not None
@@ -304,7 +372,7 @@ class User(TimeDependentSubject):
         """
         self.arrival_time = arrival_time
         self.set_state_arrived()
-        log.info(f"User {self.id} arrived at destination at {arrival_time}")
+        log.info("User %s arrived at destination at %s", self.id, arrival_time)
         self.notify(arrival_time)
 
     def set_pickup_dt(self, ms, dt):
@@ -312,11 +380,11 @@ class User(TimeDependentSubject):
 
     def set_available_mobility_services(self, ams):
         self.available_mobility_services = ams
-        log.info(f'User {self.id} updated list of available mobility services to {self.available_mobility_services}')
+        log.info('User %s updated list of available mobility services to %s', self.id, self.available_mobility_services)
 
     def remove_available_mobility_service(self, ms):
         self.available_mobility_services.remove(ms)
-        log.info(f'User {self.id} updated list of available mobility services to {self.available_mobility_services}')
+        log.info('User %s updated list of available mobility services to %s', self.id, self.available_mobility_services)
 
     def cancel_match(self, mlgraph, cost):
         """Method that cancels user's current match by removing user's pickup and
@@ -684,7 +752,8 @@ class User(TimeDependentSubject):
             self.achieved_path_ms = []
         return teleported
 
-    def set_position(self, current_link:Tuple[str, str], current_node:str, remaining_length:float, position:np.ndarray, tcurrent: Time):
+    def set_position(self, current_link:Tuple[str, str], current_node:str, remaining_length:float, position:np.ndarray, tcurrent: Time,
+                     vehicle: Optional['Vehicle'] = None):
         """Method that updates user's position (including current node, link,
         remaining link length, position and achieved path).
 
@@ -694,11 +763,17 @@ class User(TimeDependentSubject):
             -remaining_length: remaining length to travel on current link
             -position: coordinates of user's new position
             -tcurrent: current time
+            -vehicle: if not None, the vehicle carrying the user, the coordinates of
+             the user are the ones of this vehicle and are read on demand
         """
         self.current_node = current_node
         self.current_link = current_link
         self.remaining_link_length = remaining_length
-        self.position = position
+        if vehicle is None:
+            self.position = position
+        else:
+            self._position = None
+            self._position_vehicle = vehicle
         self.update_achieved_path(current_node)
         if self.deadend_at_next_node:
             self.set_state_deadend(tcurrent)
@@ -794,7 +869,7 @@ class User(TimeDependentSubject):
         """
         assert mid not in self.personal_vehicles, f'Try to add a personal vehicle '\
             f'for user {self.id} and service {mid} but one already exists...'
-        self._personal_vehicles[mid] = veh
+        self.personal_vehicles[mid] = veh
 
     def park_personal_vehicle(self, ms, node):
         """Method that registers the mobility service and the parking location of user's
@@ -804,10 +879,12 @@ class User(TimeDependentSubject):
             -ms: name of the mobility service with which is associated the parked vehicle
             -node: location where the personal vehicle is parked
         """
-        self._parked_personal_vehicles[ms] = node
+        self.parked_personal_vehicles[ms] = node
 
 
 class Path(object):
+    __slots__ = ('path_cost', 'nodes', 'layers', 'mobility_services', 'service_costs')
+
     def __init__(self, cost: float=None, nodes: Union[List[str], Tuple[str]] = None):
         """
         Path object describing a User path in the simulation
@@ -868,14 +945,15 @@ class Path(object):
         cls = self.__class__
         result = cls.__new__(cls)
         memo[id(self)] = result
-        for k, v in self.__dict__.items():
-            setattr(result, k, deepcopy(v, memo))
+        for k in Path.__slots__:
+            setattr(result, k, deepcopy(getattr(self, k), memo))
         return result
 
     def __copy__(self):
         cls = self.__class__
         result = cls.__new__(cls)
-        result.__dict__.update(self.__dict__)
+        for k in Path.__slots__:
+            setattr(result, k, getattr(self, k))
         return result
 
     def update_path_cost(self, mlgraph, cost):
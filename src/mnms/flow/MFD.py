@@ -11,8 +11,11 @@ from hipop.graph import Link
 
 from mnms.demand import User
 from mnms.flow.abstract import AbstractMFDFlowMotor, AbstractReservoir
+from mnms.flow.parallel import ParallelMoves, can_fork_workers, path_ahead, path_unchanged
+from mnms.flow.speed_functions import VectorizedSpeedFunction
 from mnms.graph.zone import Zone
 from mnms.log import create_logger
+from mnms.io.utils import freeze_outfile, thaw_outfile
 from mnms.time import Dt, Time
 from mnms.vehicles.manager import VehicleManager
 from mnms.vehicles.veh_type import Vehicle, ActivityType
@@ -41,7 +44,10 @@ class Reservoir(AbstractReservoir):
         Args:
             zone: The zone corresponding to the Reservoir
             modes: The modes in the Reservoir
-            f_speed: The MFD speed function
+            f_speed: The MFD speed function, it can be a VectorizedSpeedFunction
+                     to compute the speeds of all the reservoirs sharing it at once.
+                     A per reservoir function having a trip_lengths argument
+                     receives the statistics of the trip lengths of the reservoir
         """
         super(Reservoir, self).__init__(zone, modes)
         self.f_speed = f_speed
@@ -57,35 +63,69 @@ class Reservoir(AbstractReservoir):
     def update_speeds(self):
         """Method that updates the dict of speeds based on the dict of accumulations.
         """
-        self.dict_speeds.update(self.f_speed(self.dict_accumulations))
+        self.dict_speeds.update(self.f_speed(self.dict_accumulations, **self.function_kwargs(self.f_speed)))
         return self.dict_speeds
 
 
 class MFDFlowMotor(AbstractMFDFlowMotor):
-    def __init__(self, outfile: str = None, writeheader: bool = True):
+    def __init__(self, outfile: str = None, writeheader: bool = True, nworkers: int = 1):
+        """
+        Implementation of an MFD flow motor
+
+        Args:
+            outfile: If not None, write the state of the reservoirs in that file
+            writeheader: If True, write the header of the output file
+            nworkers: Number of worker processes computing the moves of the vehicles,
+                      with 1 the vehicles are moved in the main process. The moves
+                      are applied in the same order and give the same results
+        """
         super(MFDFlowMotor, self).__init__(outfile=outfile)
         if outfile is not None and writeheader:
             self._csvhandler.writerow(['AFFECTATION_STEP', 'FLOW_STEP', 'TIME', 'RESERVOIR', 'VEHICLE_TYPE', 'SPEED', 'ACCUMULATION', 'TRIP_LENGTHS'])
 
+        self._parallel: Optional[ParallelMoves] = None
+        if nworkers > 1 and can_fork_workers():
+            self._parallel = ParallelMoves(nworkers)
+
         self.reservoirs: Dict[str, Reservoir] = dict()
 
         self.dict_accumulations: Optional[Dict] = None
         self.dict_speeds: Optional[Dict] = None
 
+        # State of the reservoirs as arrays, with one row per reservoir plus a last
+        # row for the vehicles outside all reservoirs, and one column per vehicle type
+        self.veh_types: List[str] = list()
+        self.accumulations: Optional[np.ndarray] = None
+        self.speeds: Optional[np.ndarray] = None
+        self._reservoir_rows: Dict[Optional[str], int] = dict()
+        self._veh_type_columns: Dict[str, int] = dict()
+        self._moving_rows: List[int] = list()
+        self._moving_columns: List[int] = list()
+
+        # Sections of the links of the graph, to locate vehicles in reservoirs in batch
+        self._zone_link_first: Optional[np.ndarray] = None
+        self._zone_link_nb: Optional[np.ndarray] = None
+        self._zone_suffix_lengths: Optional[np.ndarray] = None
+        self._zone_section_rows: Optional[np.ndarray] = None
+
         self.veh_manager: Optional[VehicleManager] = None
         self.graph_nodes: Optional[Dict] = None
 
         self._layer_link_length_mapping: Dict[str, LinkInfo] = dict()
         self._section_to_reservoir: Dict[str, Union[str, None]] = dict()
+        self._mfd_links: Optional[np.ndarray] = None
 
     def __getstate__(self):
 
         state = self.__dict__.copy()
 
+        freeze_outfile(state, '_outfile')
         if '_csvhandler' in state:
             del state['_csvhandler']
         if '_layer_link_length_mapping' in state:
             del state['_layer_link_length_mapping']
+        state['_mfd_links'] = None
+        state['_zone_link_first'] = None
         if 'graph_nodes' in state:
             del state['graph_nodes']
 
@@ -93,10 +133,11 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
 
     def __setstate__(self, state):
 
+        thaw_outfile(state, '_outfile')
         self.__dict__.update(state)
 
-        self._csvhandler = csv.writer(self._outfile, delimiter=';', quotechar='|')
-        self._csvhandler.writerow(['AFFECTATION_STEP', 'FLOW_STEP', 'TIME', 'RESERVOIR', 'VEHICLE_TYPE', 'SPEED', 'ACCUMULATION', 'TRIP_LENGTHS'])
+        if self._write:
+            self._csvhandler = csv.writer(self._outfile, delimiter=';', quotechar='|')
 
         self._layer_link_length_mapping: Dict[str, LinkInfo] = dict()
 
@@ -140,6 +181,8 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
                 if section in res.zone.sections:
                     self._section_to_reservoir[section] = res.id
                     break
+        self._mfd_links = None
+        self._zone_link_first = None
 
     def initialize(self):
 
@@ -152,7 +195,21 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
         self.dict_accumulations[None] = {m: 0 for r in self.reservoirs.values() for m in r.modes} | {None: 0}
         self.dict_speeds[None] = {m: 0 for r in self.reservoirs.values() for m in r.modes} | {None: 0}
 
-        self.veh_manager = VehicleManager()
+        self._reservoir_rows = {res.id: i for i, res in enumerate(self.reservoirs.values())}
+        self._reservoir_rows[None] = len(self.reservoirs)
+        self.veh_types = list()
+        self._veh_type_columns = dict()
+        self.accumulations = np.zeros((len(self._reservoir_rows), 0))
+        self.speeds = np.zeros((len(self._reservoir_rows), 0))
+        for res in self.reservoirs.values():
+            for mode in res.modes:
+                self._veh_type_column(mode)
+            self._read_reservoir_speeds(res)
+            # Raw trip lengths are only needed for the output file
+            res.keep_trip_lengths = self._write
+
+        if self.veh_manager is None:
+            self.veh_manager = self._graph.veh_manager
         self.graph_nodes = self._graph.graph.nodes
         self.roads_sections = self._graph.roads.sections
 
@@ -161,19 +218,61 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
     def add_reservoir(self, res: Reservoir):
         self.reservoirs[res.id] = res
 
+    def _veh_type_column(self, veh_type: str) -> int:
+        col = self._veh_type_columns.get(veh_type)
+        if col is None:
+            col = len(self.veh_types)
+            self.veh_types.append(veh_type)
+            self._veh_type_columns[veh_type] = col
+            self.accumulations = np.hstack([self.accumulations, np.zeros((len(self._reservoir_rows), 1))])
+            self.speeds = np.hstack([self.speeds, np.zeros((len(self._reservoir_rows), 1))])
+        return col
+
+    def _read_reservoir_speeds(self, res: AbstractReservoir):
+        row = self._reservoir_rows[res.id]
+        for mode, speed in res.dict_speeds.items():
+            col = self._veh_type_column(mode)
+            self.speeds[row, col] = np.nan if speed is None else speed
+
+    def reservoir_speed(self, res_id: Optional[str], veh_type: str) -> float:
+        """Method that returns the current speed of a vehicle type in a reservoir.
+
+        Args:
+            -res_id: the id of the reservoir, None outside all reservoirs
+            -veh_type: the vehicle type
+
+        Returns:
+            -the speed
+        """
+        col = self._veh_type_column(veh_type)
+        return float(self.speeds[self._reservoir_rows[res_id], col])
+
     def set_vehicle_position(self, veh: Vehicle):
         """
-                Estimates vehicle position from current link and remaining link length
+                Sets vehicle position from current link and remaining link length, the
+                coordinates are only computed when the position of the vehicle is read
 
                 Args:
                     veh: The vehicle
+        """
+        veh.set_lazy_position(self.link_position, veh.current_link, veh.remaining_link_length)
+
+    def link_position(self, link: Tuple[str, str], remaining_length: float) -> np.ndarray:
+        """
+                Estimates the coordinates of a point on a link from the remaining link length
+
+                Args:
+                    link: The upstream and downstream nodes of the link
+                    remaining_length: The remaining length to travel on the link
+
+                Returns:
+                    The coordinates
 
                 Note:
                     This estimate can be improved if the length is taken into account and the specific case of the
                     vehicle on the upstream or downstream node is considered separately
         """
-        unode, dnode = veh.current_link
-        remaining_length = veh.remaining_link_length
+        unode, dnode = link
 
         unode_pos = np.array(self.graph_nodes[unode].position)
         dnode_pos = np.array(self.graph_nodes[dnode].position)
@@ -186,7 +285,7 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
         else:
             normalized_direction = direction
             travelled = 0
-        veh.set_position(unode_pos+normalized_direction*travelled)
+        return unode_pos+normalized_direction*travelled
 
     def move_veh(self, veh: Vehicle, tcurrent: Time, dt: float, speed: float) -> float:
         """Move a vehicle
@@ -216,22 +315,25 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
                 if not veh.is_moving:
                     elapsed_time = dt
             for passenger_id, passenger in veh.passengers.items():
-                passenger.set_position(veh._current_link, veh._current_node, veh.remaining_link_length, veh.position, tcurrent)
+                passenger.set_position(veh._current_link, veh._current_node, veh.remaining_link_length, None, tcurrent, vehicle=veh)
             return elapsed_time
         else:
             veh._remaining_link_length -= dist_travelled
             veh.update_distance(dist_travelled)
             self.set_vehicle_position(veh)
             for passenger_id, passenger in veh.passengers.items():
-                passenger.set_position(veh._current_link, veh._current_node, veh.remaining_link_length, veh.position, tcurrent)
+                passenger.set_position(veh._current_link, veh._current_node, veh.remaining_link_length, None, tcurrent, vehicle=veh)
             return dt
 
     def get_vehicle_zone(self, veh):
         try:
             # Find the section where vehicle is currently
             unode, dnode = veh.current_link
-            curr_link = self.graph_nodes[unode].adj[dnode]
-            sids = self._graph.map_reference_links[curr_link.id]
+            index = self._graph.index
+            curr_link_ind = index.link_between(unode, dnode)
+            if curr_link_ind < 0:
+                raise KeyError(f'No link between {unode} and {dnode}')
+            sids = self._graph.map_reference_links[index.link_ids[curr_link_ind]]
             if len(sids) == 1:
                 sid = sids[0]
             else:
@@ -255,9 +357,84 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
 
         return res_id
 
+    def _build_zone_arrays(self):
+        """Method that flattens the sections of the links of the graph into arrays,
+        with the lengths of the sections summed from the end of the links in the
+        same order as get_vehicle_zone, so that vehicles can be located in the
+        reservoirs in batch.
+        """
+        index = self._graph.index
+        roads_sections = self.roads_sections
+        map_reference_links = self._graph.map_reference_links
+        unknown_row = -2
+        link_first = np.full(index.nb_links, -1, dtype=np.int64)
+        link_nb = np.zeros(index.nb_links, dtype=np.int64)
+        suffix_lengths = list()
+        section_rows = list()
+        for l, lid in enumerate(index.link_ids):
+            sids = map_reference_links.get(lid)
+            if not sids:
+                continue
+            link_first[l] = len(section_rows)
+            link_nb[l] = len(sids)
+            lengths = list()
+            acc = 0
+            for sid in reversed(sids):
+                acc += roads_sections[sid].length
+                lengths.append(acc)
+            suffix_lengths.extend(reversed(lengths))
+            # Zones that are not reservoirs are located with get_vehicle_zone
+            section_rows.extend(self._reservoir_rows.get(roads_sections[sid].zone, unknown_row) for sid in sids)
+
+        self._zone_link_first = link_first
+        self._zone_link_nb = link_nb
+        self._zone_suffix_lengths = np.array(suffix_lengths, dtype=float)
+        self._zone_section_rows = np.array(section_rows, dtype=np.int64)
+
+    def locate_vehicles(self, vehicles: List[Vehicle]) -> List[Optional[str]]:
+        """Method that finds the reservoirs where vehicles are currently, with the
+        same result as get_vehicle_zone called on each vehicle.
+
+        Args:
+            -vehicles: the vehicles
+
+        Returns:
+            -the ids of the reservoirs of the vehicles
+        """
+        if len(vehicles) == 0:
+            return list()
+        if self._zone_link_first is None:
+            self._build_zone_arrays()
+
+        link_between = self._graph.index.link_between
+        links = np.fromiter((link_between(*veh.current_link) for veh in vehicles), dtype=np.int64, count=len(vehicles))
+        remaining = np.fromiter((veh.remaining_link_length for veh in vehicles), dtype=float, count=len(vehicles))
+
+        # Links created after the arrays are treated vehicle per vehicle
+        known = (links >= 0) & (links < len(self._zone_link_first))
+        first = np.where(known, self._zone_link_first[np.where(known, links, 0)], -1)
+        known &= first >= 0
+        nb = np.where(known, self._zone_link_nb[np.where(known, links, 0)], 0)
+
+        # The section is the last one whose length summed to the end of the link
+        # covers the remaining length of the vehicle
+        veh_pos = np.repeat(np.arange(len(vehicles)), nb)
+        offsets = np.arange(len(veh_pos)) - np.repeat(np.cumsum(nb) - nb, nb)
+        covering = self._zone_suffix_lengths[np.repeat(first, nb) + offsets] >= remaining[veh_pos]
+        nb_covering = np.bincount(veh_pos, weights=covering, minlength=len(vehicles)).astype(np.int64)
+        # With a single section, the vehicle is on it whatever its remaining length
+        nb_covering[nb == 1] = 1
+
+        rows = np.full(len(vehicles), -2, dtype=np.int64)
+        found = known & (nb_covering > 0)
+        rows[found] = self._zone_section_rows[first[found] + nb_covering[found] - 1]
+
+        res_ids = list(self._reservoir_rows.keys())
+        return [res_ids[row] if row >= 0 else self.get_vehicle_zone(veh) for veh, row in zip(vehicles, rows.tolist())]
+
     def step(self, dt: Dt):
 
-        log.info(f'MFD step {self._tcurrent}')
+        log.info('MFD step %s', self._tcurrent)
 
         for res in self.reservoirs.values():
             ghost_acc = res.ghost_accumulation(self._tcurrent)
@@ -271,6 +448,8 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
             new_veh.notify(self._tcurrent)
 
         # Calculate accumulations
+        self._moving_rows = list()
+        self._moving_columns = list()
         current_vehicles = dict()
         for veh_id, veh in self.veh_manager._vehicles.items():
             if veh.activity is None:
@@ -280,43 +459,224 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
             if veh.is_moving:
                 self.count_moving_vehicle(veh, current_vehicles)
 
-        log.info(f"Moving {len(current_vehicles)} vehicles")
+        # Locate the moving vehicles in the reservoirs
+        moving_vehicles = list(current_vehicles.values())
+        located = list()
+        for veh, res_id in zip(moving_vehicles, self.locate_vehicles(moving_vehicles)):
+            self._moving_rows.append(self._reservoir_rows[res_id])
+            self._moving_columns.append(self._veh_type_column(veh.type.upper()))
+            located.append((veh.current_link, veh.remaining_link_length, res_id))
+
+        log.info("Moving %s vehicles", len(current_vehicles))
+
+        self.update_accumulations()
 
         # Update the traffic conditions
-        for res in self.reservoirs.values():
-            self.update_reservoir_speed(res, self.dict_accumulations[res.id])
+        self.update_reservoirs_speeds()
 
         # Move the vehicles
-        for veh_id, veh in current_vehicles.items():
+        if self._parallel is not None and not self._parallel.started and not can_fork_workers():
+            self._parallel = None
+        if self._parallel is not None and len(moving_vehicles) > 0:
+            advances, checks = self._compute_advances(moving_vehicles, located, dt)
+        else:
+            advances, checks = None, None
+        tcurrent = self._tcurrent.to_seconds()
+        for i, (veh, (link, remaining_length, res_id)) in enumerate(zip(moving_vehicles, located)):
             veh_dt = veh.dt_move.to_seconds() if veh.dt_move is not None else dt.to_seconds()
             veh.dt_move = None
             veh_type = veh.type.upper()
-            while veh_dt > 0:
+            if veh.current_link != link or veh.remaining_link_length != remaining_length:
                 res_id = self.get_vehicle_zone(veh)
-                speed = self.dict_speeds[res_id][veh_type]
+            elif advances is not None and checks[i][0] == veh_dt and path_unchanged(veh, checks[i][1]):
+                veh_dt, res_id = self._apply_advance(veh, veh_dt, res_id, veh_type, advances[i], tcurrent)
+            while veh_dt > 0:
+                speed = self.reservoir_speed(res_id, veh_type)
                 veh.speed = speed
                 elapsed_time = self.move_veh(veh, self._tcurrent, veh_dt, speed)
                 next_res_id = self.get_vehicle_zone(veh)
                 if next_res_id != res_id:
                     # Vehicle exited the reservoir, register a new trip length in the left reservoir
-                    self.reservoirs[res_id].add_trip_length(veh.distance - veh.distance_at_last_res_change, veh_type)
+                    self.reservoirs[res_id].add_trip_length(veh.distance - veh.distance_at_last_res_change, veh_type, tcurrent)
                     veh.distance_at_last_res_change = veh.distance
+                res_id = next_res_id
                 veh_dt -= elapsed_time
             new_time = self._tcurrent.add_time(dt)
             veh.notify(new_time)
             veh.notify_passengers(new_time)
 
+    def _stops_on_zone_change(self, veh: Vehicle) -> bool:
+        """Method that tells if the move of a vehicle to another reservoir has side
+        effects in move_veh, such moves are then not computed by the workers.
+        """
+        return False
+
+    def _compute_advances(self, moving_vehicles: List[Vehicle], located: list, dt: Dt) -> Tuple[List[list], list]:
+        """Method that computes the moves of the vehicles in the worker processes, from
+        the state of the vehicles before they are moved.
+
+        Args:
+            -moving_vehicles: the moving vehicles
+            -located: the link, remaining link length and reservoir of the vehicles
+            -dt: the flow time step
+
+        Returns:
+            -advances: the moves of the vehicles
+            -checks: the time to move and the path state of the vehicles, the moves of a
+             vehicle are applied only if they did not change before it is moved
+        """
+        # Vehicles cannot go further than at the highest speed of their type
+        max_speeds = np.fmax.reduce(self.speeds, axis=0).tolist()
+        vehicles = list()
+        checks = list()
+        for veh, (_, _, res_id) in zip(moving_vehicles, located):
+            veh_dt = veh.dt_move.to_seconds() if veh.dt_move is not None else dt.to_seconds()
+            col = self._veh_type_columns[veh.type.upper()]
+            links, lengths, check = path_ahead(veh, veh_dt * max_speeds[col])
+            vehicles.append((self._reservoir_rows[res_id], col, veh_dt, self._stops_on_zone_change(veh), links, lengths))
+            checks.append((veh_dt, check))
+
+        if self._zone_link_first is None:
+            self._build_zone_arrays()
+        zone_arrays = (self._zone_link_first, self._zone_link_nb, self._zone_suffix_lengths, self._zone_section_rows)
+        advances = self._parallel.advance(self._graph.index, zone_arrays, self.speeds, vehicles)
+
+        return advances, checks
+
+    def _apply_advance(self, veh: Vehicle, veh_dt: float, res_id: Optional[str], veh_type: str, moves: list,
+                       tcurrent: float) -> Tuple[float, Optional[str]]:
+        """Method that applies to a vehicle the moves computed by a worker, with the
+        same side effects as move_veh.
+
+        Args:
+            -veh: the vehicle
+            -veh_dt: the time to move
+            -res_id: the reservoir of the vehicle
+            -veh_type: the vehicle type
+            -moves: the moves computed by the worker
+            -tcurrent: the current time in seconds
+
+        Returns:
+            -veh_dt: the remaining time to move
+            -res_id: the reservoir of the vehicle
+        """
+        res_ids = list(self._reservoir_rows.keys())
+        for speed, dist_travelled, elapsed_time, changed_link, remaining_length, row in moves:
+            veh.speed = speed
+            if changed_link:
+                veh.update_distance(dist_travelled)
+                veh._remaining_link_length = 0
+                veh.update_achieved_path()
+                self.set_vehicle_position(veh)
+                current_link, remaining_link_length = next(veh.activity.iter_path)
+                veh._current_link = current_link
+                veh._current_node = current_link[0]
+                veh._remaining_link_length = remaining_link_length
+            else:
+                veh._remaining_link_length = remaining_length
+                veh.update_distance(dist_travelled)
+                self.set_vehicle_position(veh)
+            for passenger_id, passenger in veh.passengers.items():
+                passenger.set_position(veh._current_link, veh._current_node, veh.remaining_link_length, None, self._tcurrent, vehicle=veh)
+            next_res_id = res_ids[row]
+            if next_res_id != res_id:
+                # Vehicle exited the reservoir, register a new trip length in the left reservoir
+                self.reservoirs[res_id].add_trip_length(veh.distance - veh.distance_at_last_res_change, veh_type, tcurrent)
+                veh.distance_at_last_res_change = veh.distance
+            res_id = next_res_id
+            veh_dt -= elapsed_time
+        return veh_dt, res_id
+
     def update_reservoir_speed(self, res, dict_accumulations):
         res.update_accumulations(dict_accumulations)
         self.dict_speeds[res.id] = res.update_speeds()
+        self._read_reservoir_speeds(res)
+
+    def update_accumulations(self):
+        """Method that adds the moving vehicles counted during this step to the
+        accumulations of the reservoirs, and fills the array of accumulations.
+        """
+        nb_types = len(self.veh_types)
+        nb_cells = len(self._reservoir_rows) * nb_types
+        cells = np.array(self._moving_rows, dtype=np.int64) * nb_types + np.array(self._moving_columns, dtype=np.int64)
+        counts = np.bincount(cells, minlength=nb_cells)
+        res_ids = list(self._reservoir_rows.keys())
+        for cell in np.flatnonzero(counts).tolist():
+            row, col = divmod(cell, nb_types)
+            self.dict_accumulations[res_ids[row]][self.veh_types[col]] += int(counts[cell])
+
+        self.accumulations[:] = 0
+        for res_id, row in self._reservoir_rows.items():
+            for mode, acc in self.dict_accumulations[res_id].items():
+                if mode is not None:
+                    col = self._veh_type_column(mode)
+                    self.accumulations[row, col] = acc
+
+    def update_reservoirs_speeds(self):
+        """Method that updates the speeds of the reservoirs. The reservoirs sharing the
+        same vectorized speed function are evaluated in one call.
+        """
+        groups = dict()
+        for res in self.reservoirs.values():
+            f_speed = getattr(res, 'f_speed', None)
+            if isinstance(f_speed, VectorizedSpeedFunction):
+                groups.setdefault((type(res), id(f_speed)), (f_speed, list()))[1].append(res)
+            else:
+                self.update_reservoir_speed(res, self.dict_accumulations[res.id])
+
+        for (res_class, _), (f_speed, group) in groups.items():
+            rows = np.array([self._reservoir_rows[res.id] for res in group], dtype=np.int64)
+            dict_accumulations = defaultdict(lambda: np.zeros(len(rows)))
+            dict_accumulations.update({mode: self.accumulations[rows, col] for mode, col in self._veh_type_columns.items()})
+            dict_accumulations, params = res_class.vectorized_speeds_inputs(group, dict_accumulations)
+            for mode, speeds in f_speed.evaluate(dict_accumulations, *params).items():
+                col = self._veh_type_column(mode)
+                self.speeds[rows, col] = speeds
+                for res, speed in zip(group, speeds.tolist()):
+                    res.dict_speeds[mode] = speed
 
     def count_moving_vehicle(self, veh: Vehicle, current_vehicles):
         # log.info(f"{veh} -> {veh.current_link}")
-        res_id = self.get_vehicle_zone(veh)
-        veh_type = veh.type.upper()
-        self.dict_accumulations[res_id][veh_type] += 1
+        # The vehicle is located in its reservoir with the other moving vehicles
         current_vehicles[veh.id] = veh
 
+    def _build_sections_arrays(self):
+        """Method that flattens the sections of the links of the graph into arrays,
+        so that the speeds of all the links can be computed at once from the speeds
+        of the reservoirs.
+        """
+        index = self._graph.index
+        index.ensure_arrays()
+        pairs = dict()
+        links = list()
+        section_links = list()
+        section_lengths = list()
+        section_pairs = list()
+        for lid, link_info in self._layer_link_length_mapping.items():
+            pos = len(links)
+            links.append(index.link_index[lid])
+            for section, length in link_info.sections:
+                res_id = self._section_to_reservoir[section]
+                pair = (self.reservoirs[res_id].id, link_info.veh)
+                section_links.append(pos)
+                section_lengths.append(length)
+                section_pairs.append(pairs.setdefault(pair, len(pairs)))
+
+        self._speed_pairs: List[Tuple[str, str]] = list(pairs.keys())
+        self._mfd_links = np.array(links, dtype=np.int64)
+        self._section_links = np.array(section_links, dtype=np.int64)
+        self._section_lengths = np.array(section_lengths, dtype=float)
+        self._section_pairs = np.array(section_pairs, dtype=np.int64)
+        self._link_total_lengths = np.bincount(self._section_links, weights=self._section_lengths, minlength=len(links))
+
+        # Links grouped by layer, with the mobility service whose speed is the current one
+        labels = index.link_labels[self._mfd_links] if len(links) > 0 else np.empty(0, dtype=object)
+        self._mfd_layers = list()
+        for lid, layer in self._graph.layers.items():
+            positions = np.flatnonzero(labels == lid)
+            if len(positions) > 0:
+                self._mfd_layers.append((layer, positions, list(layer.mobility_services.keys())[0]))
+
     def update_graph(self, threshold):
         """Method that updates the costs on links of the transportation graph.
 
@@ -324,66 +684,75 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
             -threshold: threshold on the speed variation below which costs are not
              updated on a certain link
         """
+        if self._mfd_links is None:
+            self._build_sections_arrays()
+        if len(self._mfd_links) == 0:
+            return
 
-        graph = self._graph.graph
         banned_links = self._graph.dynamic_space_sharing.banned_links
         banned_cost = self._graph.dynamic_space_sharing.cost
+        table = self._graph.cost_table
+        link_ids = self._graph.index.link_ids
+
+        old_speeds = np.empty(len(self._mfd_links))
+        for layer, positions, mservice in self._mfd_layers:
+            old_speeds[positions] = table.get(mservice, 'speed', self._mfd_links[positions])
+
+        # Speed of each section, the current speed of the link is kept if its reservoir has no speed
+        pair_speeds = [self.reservoirs[res_id].dict_speeds[veh] for res_id, veh in self._speed_pairs]
+        pair_speeds = np.array([np.nan if speed is None else speed for speed in pair_speeds], dtype=float)
+        section_speeds = pair_speeds[self._section_pairs]
+        no_speed = np.isnan(section_speeds)
+        section_speeds[no_speed] = old_speeds[self._section_links[no_speed]]
+
+        total_lengths = self._link_total_lengths
+        new_speeds = np.bincount(self._section_links, weights=self._section_lengths * section_speeds,
+                                 minlength=len(self._mfd_links))
+        np.divide(new_speeds, total_lengths, out=new_speeds, where=total_lengths != 0)
+        updated = (new_speeds != 0) & (np.abs(new_speeds - old_speeds) > threshold)
+
+        links_costs = dict()
+        for layer, positions, _ in self._mfd_layers:
+            positions = positions[updated[positions]]
+            if len(positions) == 0:
+                continue
+            links = self._mfd_links[positions]
 
-        link_layers = list()
-        for _, layer in self._graph.layers.items():
-            link_layers.append(layer.graph.links)
-
-        linkcosts = {}
+            # Links of the layer are grouped by the mobility services having costs on them
+            groups = defaultdict(list)
+            for i, l in enumerate(links):
+                groups[table.link_services[l]].append(i)
 
-        for lid, link in graph.links.items():
-            if link.label == 'TRANSIT':
-                continue
-            link_info = self._layer_link_length_mapping[lid]
-            total_len = 0
-            new_speed = 0
-            layer = self._graph.layers[link.label]
-            old_speed = link.costs[list(layer.mobility_services.keys())[0]]["speed"]
-            for section, length in link_info.sections:
-                res_id = self._section_to_reservoir[section]
-                res = self.reservoirs[res_id]
-                speed = res.dict_speeds[link_info.veh]
-                total_len += length
-                if speed is not None:
-                    new_speed += length * speed
-                else:
-                    new_speed += length * old_speed
-            new_speed = new_speed / total_len if total_len != 0 else new_speed
-            if new_speed != 0 and abs(new_speed - old_speed) > threshold:
-                costs = defaultdict(dict)
+            layer_costs = dict()
+            for services, group in groups.items():
+                group_links = links[group]
+                group_positions = positions[group]
+                speeds = new_speeds[group_positions]
+                lengths = total_lengths[group_positions]
 
                 # Update critical costs first
-                for mservice in link.costs.keys():
-                    costs[mservice] = {'travel_time': total_len / new_speed,
-                                       'speed': new_speed,
-                                       'length': total_len}
+                for mservice in services:
+                    table.set(mservice, 'travel_time', group_links, lengths / speeds)
+                    table.set(mservice, 'speed', group_links, speeds)
+                    table.set(mservice, 'length', group_links, lengths)
 
                 # The update the generalized one
-                costs_functions = layer._costs_functions
-                for mservice, cost_funcs in costs_functions.items():
-                    for cost_name, cost_f in cost_funcs.items():
-                        costs[mservice][cost_name] = cost_f(self.graph_nodes, layer, link, costs)
-
-                # Test if link is banned, if yes do not update the travel time and dynamic
-                # space sharing cost for the banned mobility service, but only the speed
-                if lid in banned_links:
-                    mservice = banned_links[lid].mobility_service
+                costs = self._graph.compute_costs(layer, group_links, list(services), self.graph_nodes)
+                layer_costs.update(zip([link_ids[l] for l in group_links], costs))
+
+            # Test if link is banned, if yes do not update the travel time and dynamic
+            # space sharing cost for the banned mobility service, but only the speed
+            for lid, banned_link in banned_links.items():
+                costs = layer_costs.get(lid)
+                if costs is not None:
+                    mservice = banned_link.mobility_service
                     costs[mservice].pop(banned_cost, None)
                     if banned_cost != 'travel_time':
                         costs[mservice].pop('travel_time', None)
-                linkcosts[lid]=costs
+            links_costs[layer.id] = layer_costs
 
-                # Update of the cost in the corresponding graph layer
-                for links in link_layers:
-                    if lid in links:
-                        links[lid].update_costs(costs)
-                        break
-        if len(linkcosts) > 0:
-            graph.update_costs(linkcosts)
+        # Update of the costs in the graph and in the corresponding graph layers
+        self._graph.push_costs(links_costs)
 
     def write_result(self, step_affectation: int, step_flow:int, flow_dt: Dt):
         tcurrent = self._tcurrent.copy().remove_time(flow_dt).time
@@ -401,3 +770,8 @@ class MFDFlowMotor(AbstractMFDFlowMotor):
                     res.dict_accumulations[mode],
                     trip_lengths])
             res.flush_trip_lengths()
+
+    def finalize(self):
+        super(MFDFlowMotor, self).finalize()
+        if self._parallel is not None:
+            self._parallel.close()
@@ -1,11 +1,15 @@
+import inspect
 from abc import ABC, abstractmethod
 from collections import defaultdict
-from typing import List, Dict, Optional, Callable
+from typing import List, Dict, Optional, Callable, Tuple
 import csv
 
+from mnms.flow.statistics import TripLengthStatistics
 from mnms.graph.zone import Zone
 from mnms.time import Time, Dt
 from mnms.graph.layers import MultiLayerGraph
+from mnms.vehicles.manager import VehicleManager
+from mnms.io.utils import freeze_outfile, thaw_outfile
 
 class AbstractReservoir(ABC):
 
@@ -25,7 +29,13 @@ class AbstractReservoir(ABC):
 
         self.ghost_accumulation: Callable[[Time], Dict[str, float]] = lambda x: {}
 
+        # Raw trip lengths since the last flush, only kept if keep_trip_lengths is True
         self.trip_lengths = {}
+        self.keep_trip_lengths = True
+        # Running statistics of the trip lengths per vehicle type
+        self.trip_length_stats: Dict[str, TripLengthStatistics] = dict()
+        self._trip_length_stats_params = {'window': 0, 'nb_window_buckets': 10, 'bins': None}
+        self._accepts_trip_lengths: Dict[Callable, bool] = dict()
 
     @abstractmethod
     def update_accumulations(self, dict_accumulations: Dict[str, int]):
@@ -52,21 +62,78 @@ class AbstractReservoir(ABC):
         """
         pass
 
+    @staticmethod
+    def vectorized_speeds_inputs(reservoirs: List['AbstractReservoir'], dict_accumulations: Dict) -> Tuple[Dict, tuple]:
+        """
+        Method preparing the inputs of a vectorized speed function shared by several
+        reservoirs of this class
+
+        Args:
+            reservoirs: The reservoirs
+            dict_accumulations: The arrays of the accumulations in these reservoirs per vehicle type
+
+        Returns:
+            The arrays of the accumulations and the arrays of the parameters of the reservoirs
+            given to the speed function
+        """
+        return dict_accumulations, ()
+
     def set_ghost_accumulation(self, f_acc: Callable[[Time], Dict[str, float]]):
 
         self.ghost_accumulation = f_acc
 
-    def add_trip_length(self, l, mode):
+    def set_trip_length_statistics(self, window: float = 0, nb_window_buckets: int = 10, bins: Optional[List[float]] = None):
+        """Method that sets the parameters of the running statistics of the trip
+        lengths of this reservoir, the statistics are reset.
+
+        Args:
+            -window: duration in seconds of the sliding time window, no window if 0
+            -nb_window_buckets: number of time buckets of the window
+            -bins: increasing edges of the bins of the histogram of the trip lengths,
+             no histogram if None
+        """
+        self._trip_length_stats_params = {'window': window, 'nb_window_buckets': nb_window_buckets, 'bins': bins}
+        self.trip_length_stats = dict()
+
+    def add_trip_length(self, l, mode, time: Optional[float] = None):
         """Method that registers a new trip length in this reservoir.
 
         Args:
             -l: the trip length
             -mode: the vehicle type that achieved this trip
+            -time: the time in seconds at which the trip ends
         """
-        if mode in self.trip_lengths:
-            self.trip_lengths[mode].append(l)
-        else:
-            self.trip_lengths[mode] = [l]
+        stats = self.trip_length_stats.get(mode)
+        if stats is None:
+            stats = TripLengthStatistics(**self._trip_length_stats_params)
+            self.trip_length_stats[mode] = stats
+        stats.add(l, time)
+
+        if self.keep_trip_lengths:
+            if mode in self.trip_lengths:
+                self.trip_lengths[mode].append(l)
+            else:
+                self.trip_lengths[mode] = [l]
+
+    def function_kwargs(self, f: Callable) -> Dict:
+        """Method that returns the keyword arguments given to a speed or entry function
+        of this reservoir: the statistics of the trip lengths are given to the
+        functions having a trip_lengths argument.
+
+        Args:
+            -f: the function
+
+        Returns:
+            -the keyword arguments
+        """
+        accepts = self._accepts_trip_lengths.get(f)
+        if accepts is None:
+            try:
+                accepts = 'trip_lengths' in inspect.signature(f).parameters
+            except (TypeError, ValueError):
+                accepts = False
+            self._accepts_trip_lengths[f] = accepts
+        return {'trip_lengths': self.trip_length_stats} if accepts else {}
 
     def flush_trip_lengths(self):
         """Method that clean all trip lengths registered in this reservoir.
@@ -82,6 +149,7 @@ class AbstractMFDFlowMotor(ABC):
             outfile: If not `None` store the `User` position at each `step`
         """
         self._graph: MultiLayerGraph = None
+        self.veh_manager: Optional[VehicleManager] = None
 
         self._tcurrent: Time = Time()
 
@@ -96,11 +164,13 @@ class AbstractMFDFlowMotor(ABC):
         state = self.__dict__.copy()
 
         if self._write == True:
+            freeze_outfile(state, '_outfile')
             if '_csvhandler' in state:
                 del state['_csvhandler']
         return state
 
     def __setstate__(self, state):
+        thaw_outfile(state, '_outfile')
         self.__dict__.update(state)
 
         if self._write == True:
@@ -109,6 +179,15 @@ class AbstractMFDFlowMotor(ABC):
     def set_graph(self, mlgraph: MultiLayerGraph):
         self._graph = mlgraph
 
+    def set_vehicle_manager(self, veh_manager: VehicleManager):
+        """Method that sets the vehicle registry whose vehicles are moved by this
+        flow motor. By default, the registry of the multi layer graph is used.
+
+        Args:
+            -veh_manager: the vehicle registry
+        """
+        self.veh_manager = veh_manager
+
     def set_time(self, time:Time):
         self._tcurrent = time.copy()
 
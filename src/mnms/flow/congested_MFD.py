@@ -1,20 +1,28 @@
-from collections import deque, defaultdict
+import csv
+from collections import deque
 from typing import List, Callable, Dict, Optional, Deque
 from dataclasses import dataclass, field
 
+import numpy as np
+
 from mnms.flow.MFD import MFDFlowMotor
 from mnms.flow.abstract import AbstractReservoir
 from mnms.graph.zone import Zone
 from mnms.time import Time, Dt
 from mnms.vehicles.veh_type import Vehicle, Car
 from mnms.log import create_logger
+from mnms.io.utils import freeze_outfile, thaw_outfile
 
 log = create_logger(__name__)
 
+# Times are handled in seconds, Time arithmetic does not allow more than 24 hours
+_MAX_ENTRY_TIME = 25 * 3600
+_LAST_ENTRY_TIME = Time('23:59:59').to_seconds()
+
 @dataclass
 class QueuedVehicle:
     veh: Vehicle
-    entrance_time: Time
+    entrance_time: float
     previous_reservoir: str
     id: str = field(init=False)
 
@@ -37,6 +45,8 @@ class CongestedReservoir(AbstractReservoir):
             -modes: The modes inside the Reservoir
             -f_speed: The MFD speed function
             -f_entry: The entry function
+            Speed and entry functions having a trip_lengths argument receive the
+            statistics of the trip lengths of the reservoir
             -n_car_max: The max number of car in this reservoir
         """
         super(CongestedReservoir, self).__init__(zone, modes)
@@ -45,24 +55,58 @@ class CongestedReservoir(AbstractReservoir):
         self.n_car_max: int = n_car_max
         self.car_queue: Deque[QueuedVehicle] = deque()
         self.last_car_entrance = None
-        self.time_interval = Time("00:00:00")
+        self.next_entry_time: float = 0.
         self.car_in_outgoing_queues = 0
+        self._queue_counters: Dict[str, int] = dict()
 
         self.update_speeds()
 
-    def compute_time_interval(self, entrance_time: Time):
+    @property
+    def time_interval(self) -> Time:
+        """Time at which the next vehicle entry can occur."""
+        return Time.from_seconds(self.next_entry_time)
+
+    def compute_time_interval(self, entrance_time: float):
         """Method that update the time at which the next vehicle entry can occur.
+
+        Args:
+            -entrance_time: the time in seconds at which a vehicle reaches the reservoir
         """
-        try:
-            if entrance_time <= self.time_interval:
-                self.time_interval = self.time_interval.add_time(
-                    Dt(seconds=1/self.f_entry(self.dict_accumulations["CAR"], self.n_car_max)))
-            else:
-                self.time_interval = entrance_time.add_time(
-                    Dt(seconds=1/self.f_entry(self.dict_accumulations["CAR"], self.n_car_max)))
-        except AssertionError:
+        entry_dt = 1/self.f_entry(self.dict_accumulations["CAR"], self.n_car_max, **self.function_kwargs(self.f_entry))
+        next_entry_time = max(entrance_time, self.next_entry_time) + entry_dt
+        if entry_dt < 0 or next_entry_time >= _MAX_ENTRY_TIME:
             log.warning(f'No more car vehicle entry is possible in reservoir {self.id}, set time_interval to 23:59:59...')
-            self.time_interval = Time('23:59:59')
+            next_entry_time = _LAST_ENTRY_TIME
+        self.next_entry_time = next_entry_time
+
+    def enqueue(self, veh: Vehicle, previous_reservoir: str) -> QueuedVehicle:
+        """Method that adds a car at the end of the queue for entering this reservoir,
+        it will enter at the time of the next entry.
+
+        Args:
+            -veh: the car
+            -previous_reservoir: the id of the reservoir the car comes from
+
+        Returns:
+            -the queued vehicle
+        """
+        queued_car = QueuedVehicle(veh, self.next_entry_time, previous_reservoir)
+        self.car_queue.append(queued_car)
+        self._queue_counters[previous_reservoir] = self._queue_counters.get(previous_reservoir, 0) + 1
+        return queued_car
+
+    def admit(self) -> QueuedVehicle:
+        """Method that removes the first car of the queue, it enters the reservoir.
+
+        Returns:
+            -the admitted vehicle
+        """
+        queued_car = self.car_queue.popleft()
+        previous_reservoir = queued_car.previous_reservoir
+        self._queue_counters[previous_reservoir] -= 1
+        if self._queue_counters[previous_reservoir] == 0:
+            del self._queue_counters[previous_reservoir]
+        return queued_car
 
     def update_speeds(self):
         """Method that updates the dict of speeds based on the dict of accumulations
@@ -71,9 +115,23 @@ class CongestedReservoir(AbstractReservoir):
         """
         updated_acc = {k: v for k, v in self.dict_accumulations.items()}
         updated_acc["CAR"] = updated_acc.get("CAR", 0) * (self.n_car_max/(self.n_car_max-self.car_in_outgoing_queues))
-        self.dict_speeds.update(self.f_speed(updated_acc, self.n_car_max))
+        self.dict_speeds.update(self.f_speed(updated_acc, self.n_car_max, **self.function_kwargs(self.f_speed)))
         return self.dict_speeds
 
+    @staticmethod
+    def vectorized_speeds_inputs(reservoirs, dict_accumulations):
+        """Method that prepares the inputs of a vectorized speed function shared by
+        several congested reservoirs: the car accumulations take into account the
+        capacity drop due to spillover, and the max numbers of cars are given as
+        parameter.
+        """
+        n_car_max = np.array([res.n_car_max for res in reservoirs])
+        in_outgoing_queues = np.array([res.car_in_outgoing_queues for res in reservoirs])
+        updated_acc = dict_accumulations.copy()
+        car_acc = updated_acc.get("CAR", np.zeros(len(reservoirs)))
+        updated_acc["CAR"] = car_acc * (n_car_max / (n_car_max - in_outgoing_queues))
+        return updated_acc, (n_car_max,)
+
     def update_accumulations(self, dict_accumulations):
         """Method that updates the dict of accumulation of this reservoir.
         """
@@ -88,29 +146,24 @@ class CongestedReservoir(AbstractReservoir):
             -qc: a dict with reservoirs ids as keys and the number of car vehicles
              currently in the queue coming from these reservoirs as values
         """
-        qc = {}
-        for qv in self.car_queue:
-            if qv.previous_reservoir in qc.keys():
-                qc[qv.previous_reservoir] += 1
-            else:
-                qc[qv.previous_reservoir] = 1
-        return qc
+        return dict(self._queue_counters)
 
 
 class CongestedMFDFlowMotor(MFDFlowMotor):
-    def __init__(self, outfile: Optional[str] = None):
+    def __init__(self, outfile: Optional[str] = None, nworkers: int = 1):
         """
         Congested flow motor with waiting queues between the reservoirs.
         NB: The inter reservoir congestion only concern the Car vehicle type.
 
         Args:
             -outfile: If not None, write ouptut in that file
+            -nworkers: Number of worker processes computing the moves of the vehicles,
+             the cars entering another reservoir are always moved in the main process
         """
-        super(CongestedMFDFlowMotor, self).__init__(outfile, writeheader=False)
+        super(CongestedMFDFlowMotor, self).__init__(outfile, writeheader=False, nworkers=nworkers)
 
         self.reservoirs: Dict[str, CongestedReservoir] = dict()
         self.car_in_queues = set()
-        self.car_previous_zone = defaultdict(set)
 
         if outfile is not None:
             self._csvhandler.writerow(['AFFECTATION_STEP', 'FLOW_STEP', 'TIME', 'RESERVOIR', 'VEHICLE_TYPE', 'SPEED', 'ACCUMULATION', 'TRIP_LENGTHS', 'IN_QUEUE'])
@@ -119,47 +172,35 @@ class CongestedMFDFlowMotor(MFDFlowMotor):
 
         state = self.__dict__.copy()
 
+        freeze_outfile(state, '_outfile')
         if '_csvhandler' in state:
             del state['_csvhandler']
         return state
 
     def __setstate__(self, state):
 
+        thaw_outfile(state, '_outfile')
         self.__dict__.update(state)
 
-        self._csvhandler.writerow(['AFFECTATION_STEP', 'FLOW_STEP', 'TIME', 'RESERVOIR', 'VEHICLE_TYPE', 'SPEED', 'ACCUMULATION', 'TRIP_LENGTHS', 'IN_QUEUE'])
+        if self._write:
+            self._csvhandler = csv.writer(self._outfile, delimiter=';', quotechar='|')
 
     def step(self, dt: Dt):
 
-        log.info(f'CongestedMFD step {self._tcurrent}')
+        log.info('CongestedMFD step %s', self._tcurrent)
 
-        # Treat inter reservoirs queues
+        # Treat inter reservoirs queues, the cars whose entrance time is reached
+        # enter the reservoir
+        tcurrent = self._tcurrent.to_seconds()
+        dt_seconds = dt.to_seconds()
         for res_id, res in self.reservoirs.items():
             car_queue = res.car_queue
-            to_pop = 0
-            for queued_car in car_queue:
-                if queued_car.entrance_time <= self._tcurrent:
-                    speed = self.dict_speeds[res_id]["CAR"]
-                    queued_car.veh.speed = speed
-                    self.move_veh(queued_car.veh, self._tcurrent, dt.to_seconds(), speed)
-                    to_pop += 1
-                else:
-                    break
-
-            for _ in range(to_pop):
-                car_queue.popleft()
-
-        # Update the set of cars currently in a queue, and the number of cars in an
-        # outgoing queue for each reservoir
-        self.car_previous_zone = defaultdict(set)
-        self.car_in_queues = set()
-        for res in self.reservoirs.values():
-            for queued_car in res.car_queue:
-                queued_car_id = queued_car.id
-                self.car_in_queues.add(queued_car_id)
-                self.car_previous_zone[queued_car.previous_reservoir].add(queued_car_id)
-        for resid, res in self.reservoirs.items():
-            res.car_in_outgoing_queues = len(self.car_previous_zone[resid])
+            while car_queue and car_queue[0].entrance_time <= tcurrent:
+                queued_car = res.admit()
+                self._unregister_queued_car(queued_car)
+                speed = self.reservoir_speed(res_id, "CAR")
+                queued_car.veh.speed = speed
+                self.move_veh(queued_car.veh, self._tcurrent, dt_seconds, speed)
 
         # Treat intra reservoir movements
         super(CongestedMFDFlowMotor, self).step(dt)
@@ -172,12 +213,12 @@ class CongestedMFDFlowMotor(MFDFlowMotor):
 
             if previous_veh_zone != next_veh_zone:
                 new_res = self.reservoirs[next_veh_zone]
-                entrance_time = self._tcurrent.add_time(Dt(seconds=elapsed_time))
-                res_time_interval = new_res.time_interval.copy()
+                entrance_time = self._tcurrent.to_seconds() + elapsed_time
+                res_next_entry_time = new_res.next_entry_time
                 new_res.compute_time_interval(entrance_time)
-                if entrance_time <= res_time_interval:
+                if entrance_time <= res_next_entry_time:
                     # Add vehicle in the queue for entering this reservoir
-                    new_res.car_queue.append(QueuedVehicle(veh, new_res.time_interval.copy(), previous_veh_zone))
+                    self._register_queued_car(new_res.enqueue(veh, previous_veh_zone))
                     upnode, downode = veh.current_link
                     link = self.graph_nodes[upnode].adj[downode]
 
@@ -189,13 +230,29 @@ class CongestedMFDFlowMotor(MFDFlowMotor):
                     veh.speed = 0
                     self.set_vehicle_position(veh)
                     for passenger_id, passenger in veh.passengers.items():
-                        passenger.set_position(veh._current_link, veh._current_node, veh.remaining_link_length, veh.position, tcurrent)
+                        passenger.set_position(veh._current_link, veh._current_node, veh.remaining_link_length, None, tcurrent, vehicle=veh)
                     return dt
         else:
             elapsed_time = super(CongestedMFDFlowMotor, self).move_veh(veh, tcurrent, dt, speed)
 
         return elapsed_time
 
+    def _stops_on_zone_change(self, veh: Vehicle) -> bool:
+        # Cars entering a reservoir may be queued
+        return isinstance(veh, Car)
+
+    def _register_queued_car(self, queued_car: QueuedVehicle):
+        self.car_in_queues.add(queued_car.id)
+        previous_res = self.reservoirs.get(queued_car.previous_reservoir)
+        if previous_res is not None:
+            previous_res.car_in_outgoing_queues += 1
+
+    def _unregister_queued_car(self, queued_car: QueuedVehicle):
+        self.car_in_queues.discard(queued_car.id)
+        previous_res = self.reservoirs.get(queued_car.previous_reservoir)
+        if previous_res is not None:
+            previous_res.car_in_outgoing_queues -= 1
+
     def count_moving_vehicle(self, veh: Vehicle, current_vehicles):
         if veh.id not in self.car_in_queues:
             super(CongestedMFDFlowMotor, self).count_moving_vehicle(veh, current_vehicles)
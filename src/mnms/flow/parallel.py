@@ -0,0 +1,238 @@
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from mnms.log import create_logger
+
+log = create_logger(__name__)
+
+# Row of the sections whose zone is not a reservoir
+UNKNOWN_ROW = -2
+
+# State of the flow motor inherited by the forked workers: index of the graph, arrays locating the vehicles in the reservoirs and shared speeds
+_WORKER_STATE = None
+
+_LIST_ITERATOR = type(iter([]))
+
+
+def can_fork_workers() -> bool:
+    """Function that tells if worker processes can be forked from the current process,
+    a warning is logged when they cannot and vehicles are then moved in the main process.
+
+    Returns:
+        -True if worker processes can be forked
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        log.warning('Fork is not available on this platform, vehicles are moved in the main process')
+        return False
+    if multiprocessing.current_process().daemon:
+        log.warning('Daemonic processes cannot have children, vehicles are moved in the main process')
+        return False
+    return True
+
+
+def path_ahead(veh, reach: float) -> Tuple[list, list, tuple]:
+    """Function that returns the links a vehicle travels next, from its current link,
+    until at least the reach length is covered or the path of its activity ends.
+
+    Args:
+        -veh: the vehicle
+        -reach: the length to cover
+
+    Returns:
+        -links: the links, starting with the current one
+        -lengths: the remaining length on the current link, then the lengths of the next links
+        -check: the state of the path iterator of the vehicle, used to check that the
+         vehicle did not change of path before its advance is applied
+    """
+    iter_path = veh.activity.iter_path
+    links = [veh.current_link]
+    lengths = [veh.remaining_link_length]
+    reduced = iter_path.__reduce__() if type(iter_path) is _LIST_ITERATOR else ()
+    if len(reduced) == 3:
+        path, pos = reduced[1][0], reduced[2]
+        total = lengths[0]
+        for item in path[pos:]:
+            if not total < reach:
+                break
+            links.append(item[0])
+            lengths.append(item[1])
+            total += item[1]
+        check = (veh.activity, iter_path, path, pos, len(path))
+    else:
+        check = (veh.activity, iter_path, None, None, None)
+    return links, lengths, check
+
+
+def path_unchanged(veh, check: tuple) -> bool:
+    """Function that checks that the path iterator of a vehicle is in the state
+    recorded by path_ahead.
+    """
+    activity, iter_path, path, pos, nb = check
+    if veh.activity is not activity or activity.iter_path is not iter_path:
+        return False
+    if path is None:
+        return True
+    reduced = iter_path.__reduce__()
+    return len(reduced) == 3 and reduced[1][0] is path and reduced[2] == pos and len(path) == nb
+
+
+def _zone_row(link: int, remaining: float) -> int:
+    """Function that finds the reservoir row of a vehicle on a link, as
+    MFDFlowMotor.get_vehicle_zone does.
+    """
+    _, link_first, link_nb, suffix_lengths, section_rows, _ = _WORKER_STATE
+    if link < 0 or link >= len(link_first):
+        return UNKNOWN_ROW
+    first = link_first[link]
+    if first < 0:
+        return UNKNOWN_ROW
+    nb = link_nb[link]
+    if nb == 1:
+        return section_rows[first]
+    nb_covering = 0
+    while nb_covering < nb and suffix_lengths[first + nb_covering] >= remaining:
+        nb_covering += 1
+    if nb_covering == 0:
+        return UNKNOWN_ROW
+    return section_rows[first + nb_covering - 1]
+
+
+def _advance_vehicles(vehicles: list) -> list:
+    """Function run by the workers, it computes the moves of vehicles during a flow
+    step with the same operations as MFDFlowMotor.move_veh, without any side effect.
+    The advance of a vehicle stops before a move reaching the end of the known path,
+    entering a link that is not in a reservoir, or changing of reservoir when this
+    change has side effects.
+
+    Args:
+        -vehicles: the row of the reservoir, the vehicle type column, the time to move,
+         whether a reservoir change stops the advance, the links and lengths ahead
+
+    Returns:
+        -the moves of the vehicles as tuples (speed, distance, elapsed time, link
+         change, remaining link length, reservoir row)
+    """
+    index, _, _, _, _, speeds = _WORKER_STATE
+    link_between = index.link_between
+    advances = list()
+    for row, col, veh_dt, stop_on_zone_change, links, lengths in vehicles:
+        moves = list()
+        link_rows = dict()
+        pos = 0
+        remaining = lengths[0]
+        while veh_dt > 0:
+            speed = float(speeds[row, col])
+            dist_travelled = veh_dt * speed
+            if dist_travelled > remaining:
+                if pos + 1 == len(links):
+                    break
+                dist_travelled = remaining
+                elapsed_time = dist_travelled / speed
+                pos += 1
+                next_remaining = lengths[pos]
+                changed_link = True
+            else:
+                next_remaining = remaining - dist_travelled
+                elapsed_time = veh_dt
+                changed_link = False
+            link = link_rows.get(pos)
+            if link is None:
+                link = link_rows[pos] = link_between(*links[pos])
+            next_row = _zone_row(link, next_remaining)
+            if next_row == UNKNOWN_ROW or (stop_on_zone_change and next_row != row):
+                break
+            moves.append((speed, dist_travelled, elapsed_time, changed_link, next_remaining, next_row))
+            remaining = next_remaining
+            row = next_row
+            veh_dt -= elapsed_time
+        advances.append(moves)
+    return advances
+
+
+class ParallelMoves(object):
+    def __init__(self, nworkers: int):
+        """Computes the moves of the vehicles of an MFD flow motor in worker processes.
+        Reservoirs are partitioned across the workers, which read the speeds of the
+        reservoirs from shared memory.
+
+        Args:
+            -nworkers: the number of worker processes
+        """
+        self.nworkers = nworkers
+        self._pool = None
+        self._index = None
+        self._speeds: Optional[np.ndarray] = None
+        self._zone_arrays = None
+
+    @property
+    def started(self) -> bool:
+        return self._pool is not None
+
+    def __getstate__(self):
+        return {'nworkers': self.nworkers}
+
+    def __setstate__(self, state):
+        self.__init__(state['nworkers'])
+
+    def _start(self, index, zone_arrays: tuple, speeds: np.ndarray):
+        global _WORKER_STATE
+
+        self.close()
+        shared = RawArray('d', max(speeds.size, 1))
+        self._speeds = np.frombuffer(shared, dtype=float, count=speeds.size).reshape(speeds.shape)
+        self._index = index
+        self._zone_arrays = zone_arrays
+        _WORKER_STATE = (index, *(a.tolist() for a in zone_arrays), self._speeds)
+        try:
+            self._pool = multiprocessing.get_context('fork').Pool(self.nworkers)
+        finally:
+            _WORKER_STATE = None
+
+    def advance(self, index, zone_arrays: tuple, speeds: np.ndarray, vehicles: list) -> List[list]:
+        """Method that computes the moves of vehicles in the workers.
+
+        Args:
+            -index: the index of the graph
+            -zone_arrays: the arrays locating the vehicles in the reservoirs
+            -speeds: the speeds of the reservoirs per vehicle type
+            -vehicles: the vehicles as expected by _advance_vehicles
+
+        Returns:
+            -the moves of the vehicles, in the order of vehicles
+        """
+        # Workers are forked again when the state they inherited is outdated
+        if (self._pool is None or self._index is not index or self._speeds.shape != speeds.shape
+                or any(a is not b for a, b in zip(self._zone_arrays, zone_arrays))):
+            self._start(index, zone_arrays, speeds)
+        self._speeds[:] = speeds
+
+        # Reservoirs are assigned to the least loaded worker, largest first
+        counts = np.bincount([v[0] for v in vehicles], minlength=speeds.shape[0])
+        loads = [0] * self.nworkers
+        worker_of_row = dict()
+        for row in np.argsort(-counts, kind='stable').tolist():
+            if counts[row] == 0:
+                break
+            worker = loads.index(min(loads))
+            worker_of_row[row] = worker
+            loads[worker] += counts[row]
+
+        positions = [list() for _ in range(self.nworkers)]
+        for i, veh in enumerate(vehicles):
+            positions[worker_of_row[veh[0]]].append(i)
+        tasks = [[vehicles[i] for i in worker_positions] for worker_positions in positions]
+
+        advances = [None] * len(vehicles)
+        for worker_positions, worker_advances in zip(positions, self._pool.map(_advance_vehicles, tasks, chunksize=1)):
+            for i, moves in zip(worker_positions, worker_advances):
+                advances[i] = moves
+        return advances
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
@@ -0,0 +1,109 @@
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from mnms.log import create_logger
+
+log = create_logger(__name__)
+
+
+class VectorizedSpeedFunction(object):
+    def __init__(self, function: Callable[..., Dict[str, np.ndarray]]):
+        """MFD speed function evaluated for several reservoirs at once. The function
+        receives a dict with the vehicle types as keys and the arrays of the
+        accumulations of these vehicle types in the reservoirs as values, followed
+        by the arrays of the parameters of the reservoirs if any (e.g. the max
+        number of cars of congested reservoirs). It returns a dict with the vehicle
+        types as keys and the arrays of the speeds in the reservoirs as values.
+
+        Args:
+            -function: the vectorized speed function
+        """
+        self.function = function
+
+    def evaluate(self, dict_accumulations: Dict[str, np.ndarray], *params: np.ndarray) -> Dict[str, np.ndarray]:
+        """Method that evaluates the speed function for several reservoirs.
+
+        Args:
+            -dict_accumulations: the arrays of the accumulations per vehicle type
+            -params: the arrays of the parameters of the reservoirs
+
+        Returns:
+            -dict of the arrays of the speeds per vehicle type
+        """
+        return {mode: np.asarray(speeds, dtype=float) for mode, speeds in self.function(dict_accumulations, *params).items()}
+
+    def __call__(self, dict_accumulations: Dict[str, float], *params) -> Dict[str, float]:
+        # Evaluation for a single reservoir, with the signature of the per reservoir speed functions
+        accumulations = defaultdict(lambda: np.zeros(1))
+        accumulations.update({mode: np.array([acc], dtype=float) for mode, acc in dict_accumulations.items()})
+        params = [np.array([p]) for p in params]
+        return {mode: float(speeds[0]) for mode, speeds in self.evaluate(accumulations, *params).items()}
+
+
+class TabulatedSpeedFunction(VectorizedSpeedFunction):
+    def __init__(self,
+                 f_speed: Callable[..., Dict[str, float]],
+                 modes: List[str],
+                 acc_max: float,
+                 nb_points: int = 1001,
+                 weights: Optional[Dict[str, float]] = None,
+                 args: tuple = ()):
+        """MFD speed function tabulated once and then evaluated by linear interpolation,
+        for expensive speed functions. The speeds are supposed to depend on the
+        accumulations only through their weighted sum, e.g. the total number of
+        vehicles in the reservoir. Accumulations above acc_max are evaluated
+        with the speed function itself.
+
+        Args:
+            -f_speed: the speed function, it takes a dict of accumulations and
+             returns a dict of speeds
+            -modes: the vehicle types whose accumulations are summed
+            -acc_max: the max accumulation of the table
+            -nb_points: the number of points of the table
+            -weights: the weight of each vehicle type in the sum, 1 by default
+            -args: additional arguments of the speed function (e.g. the max number of
+             cars of congested reservoirs), they are fixed for the whole table
+        """
+        super(TabulatedSpeedFunction, self).__init__(f_speed)
+        self.modes = modes
+        self.weights = {m: 1. for m in modes} if weights is None else weights
+        self.args = args
+        self.acc_max = acc_max
+
+        self.grid = np.linspace(0, acc_max, nb_points)
+        samples = [f_speed(self._sample_accumulations(acc), *args) for acc in self.grid.tolist()]
+        self.table = {mode: np.array([s[mode] for s in samples], dtype=float) for mode in samples[0].keys()}
+
+    def _sample_accumulations(self, acc: float) -> Dict[str, float]:
+        dict_accumulations = {m: 0 for m in self.modes}
+        first_mode = self.modes[0]
+        dict_accumulations[first_mode] = acc / self.weights[first_mode]
+        return dict_accumulations
+
+    def total_accumulation(self, dict_accumulations: Dict[str, np.ndarray]) -> np.ndarray:
+        """Method that computes the weighted sum of the accumulations of several reservoirs.
+
+        Args:
+            -dict_accumulations: the arrays of the accumulations per vehicle type
+
+        Returns:
+            -array of the weighted sums
+        """
+        total = 0.
+        for mode in self.modes:
+            if mode in dict_accumulations:
+                total = total + self.weights[mode] * np.asarray(dict_accumulations[mode], dtype=float)
+        return np.atleast_1d(total)
+
+    def evaluate(self, dict_accumulations: Dict[str, np.ndarray], *params: np.ndarray) -> Dict[str, np.ndarray]:
+        # Parameters of the reservoirs are ignored, the table has been built with args
+        total = self.total_accumulation(dict_accumulations)
+        speeds = {mode: np.interp(total, self.grid, values) for mode, values in self.table.items()}
+
+        for i in np.flatnonzero(total > self.acc_max).tolist():
+            exact = self.function(self._sample_accumulations(float(total[i])), *self.args)
+            for mode, s in speeds.items():
+                s[i] = exact[mode]
+        return speeds
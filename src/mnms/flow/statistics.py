@@ -0,0 +1,91 @@
+from bisect import bisect_right
+from typing import List, Optional
+
+from mnms.log import create_logger
+
+log = create_logger(__name__)
+
+
+class TripLengthStatistics(object):
+    def __init__(self, window: float = 0, nb_window_buckets: int = 10, bins: Optional[List[float]] = None):
+        """Running statistics of the trip lengths achieved in a reservoir by a vehicle
+        type. The memory used does not depend on the number of trips and each new
+        trip length is registered in constant time.
+
+        Args:
+            -window: duration in seconds of the sliding time window, no window if 0
+            -nb_window_buckets: number of time buckets of the window, trip lengths
+             leave the window bucket per bucket
+            -bins: increasing edges of the bins of the histogram of the trip lengths,
+             no histogram if None
+        """
+        self.count = 0
+        self.sum = 0.
+
+        self.window = window
+        self.nb_window_buckets = nb_window_buckets
+        self._bucket_duration = window / nb_window_buckets if window > 0 else 0
+        self._bucket_counts = [0] * nb_window_buckets
+        self._bucket_sums = [0.] * nb_window_buckets
+        self._last_bucket = 0
+
+        self.bins = None if bins is None else list(bins)
+        self.histogram = None if bins is None else [0] * (len(bins) + 1)
+
+    def _advance(self, time: float):
+        bucket = int(time // self._bucket_duration)
+        elapsed = bucket - self._last_bucket
+        if elapsed > 0:
+            # Buckets older than the window are emptied
+            for k in range(1, min(elapsed, self.nb_window_buckets) + 1):
+                ind = (self._last_bucket + k) % self.nb_window_buckets
+                self._bucket_counts[ind] = 0
+                self._bucket_sums[ind] = 0.
+            self._last_bucket = bucket
+
+    def add(self, length: float, time: Optional[float] = None):
+        """Method that registers a new trip length.
+
+        Args:
+            -length: the trip length
+            -time: the time in seconds at which the trip ends, needed for the window
+        """
+        self.count += 1
+        self.sum += length
+        if self._bucket_duration > 0 and time is not None:
+            self._advance(time)
+            ind = self._last_bucket % self.nb_window_buckets
+            self._bucket_counts[ind] += 1
+            self._bucket_sums[ind] += length
+        if self.histogram is not None:
+            self.histogram[bisect_right(self.bins, length)] += 1
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count > 0 else None
+
+    def window_count(self, time: float) -> int:
+        """Method that returns the number of trips ended in the time window.
+
+        Args:
+            -time: the current time in seconds
+
+        Returns:
+            -the number of trips
+        """
+        if self._bucket_duration <= 0:
+            return 0
+        self._advance(time)
+        return sum(self._bucket_counts)
+
+    def window_mean(self, time: float) -> Optional[float]:
+        """Method that returns the mean length of the trips ended in the time window.
+
+        Args:
+            -time: the current time in seconds
+
+        Returns:
+            -the mean trip length, None if no trip ended in the window
+        """
+        count = self.window_count(time)
+        return sum(self._bucket_sums) / count if count > 0 else None
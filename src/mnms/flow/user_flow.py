@@ -10,6 +10,7 @@ from mnms.demand.user import User, UserState
 # from mnms.graph.core import ConnectionLink, TransitLink
 from mnms.time import Dt, Time
 from mnms.log import create_logger
+from mnms.io.utils import freeze_outfile, thaw_outfile
 from mnms.mobility_service.abstract import AbstractMobilityService
 from mnms.travel_decision.abstract import Event
 
@@ -17,12 +18,19 @@ log = create_logger(__name__)
 
 
 class UserFlow(object):
-    def __init__(self, walk_speed: float=1.42, outfile: str=None):
+    def __init__(self, walk_speed: float=1.42, outfile: str=None, evict_deadend_users: bool=False,
+                 summary_outfile: str=None):
         """
         Manage the motion and state update of users.
 
         Args:
             -walk_speed: The speed of the User walk
+            -outfile: file where the achieved path of each user is written
+            -evict_deadend_users: if True, users who turned DEADEND are removed from
+             the user flow as soon as they are inactive instead of being kept until
+             the end of the simulation, like arrived users are
+            -summary_outfile: file where a one line summary of each user removed from
+             the user flow is written
         """
         self._graph: Optional[MultiLayerGraph] = None
         self.users:Dict[str, User] = dict()
@@ -42,24 +50,42 @@ class UserFlow(object):
             self._csvhandler = csv.writer(self._outfile, delimiter=';', quotechar='|')
             self._csvhandler.writerow(['ID', 'TRAVELED_NODES', 'TRAVELED_LINKS', 'TRAVELED_SERVICES'])
 
+        self._evict_deadend_users = evict_deadend_users
+        self.nb_evicted_users: int = 0
+
+        if summary_outfile is None:
+            self._write_summary = False
+        else:
+            self._write_summary = True
+            self._summary_outfile = open(summary_outfile, "w")
+            self._summary_csvhandler = csv.writer(self._summary_outfile, delimiter=';', quotechar='|')
+            self._summary_csvhandler.writerow(['ID', 'STATE', 'DEPARTURE', 'ARRIVAL', 'DISTANCE'])
+
     def __getstate__(self):
 
         state = self.__dict__.copy()
 
         if self._write == True:
+            freeze_outfile(state, '_outfile')
             if '_csvhandler' in state:
                 del state['_csvhandler']
+        freeze_outfile(state, '_summary_outfile')
+        if '_summary_csvhandler' in state:
+            del state['_summary_csvhandler']
         if '_gnodes' in state:
             del state['_gnodes']
         return state
 
     def __setstate__(self, state):
 
+        thaw_outfile(state, '_outfile')
+        thaw_outfile(state, '_summary_outfile')
         self.__dict__.update(state)
 
         if self._write == True:
             self._csvhandler = csv.writer(self._outfile, delimiter=';', quotechar='|')
-            self._csvhandler.writerow(['ID', 'TRAVELED_NODES', 'TRAVELED_LINKS', 'TRAVELED_SERVICES'])
+        if self._write_summary:
+            self._summary_csvhandler = csv.writer(self._summary_outfile, delimiter=';', quotechar='|')
 
     def set_graph(self, mlgraph:MultiLayerGraph):
         """Method to associate a multi layer graph to a UserFlow object and sets
@@ -152,7 +178,7 @@ class UserFlow(object):
                                 next_link = gnodes[user.current_node].adj[next_next_node]
                                 if next_link.label == 'TRANSIT':
                                     # User keeps walking
-                                    log.info(f"User {uid} enters connection on {next_link.id}")
+                                    log.info("User %s enters connection on %s", uid, next_link.id)
                                     dist_travelled = dist_travelled - remaining_length
                                     self._walking[uid] = next_link.length
                                     user.current_link = (user.current_node, next_next_node)
@@ -177,16 +203,13 @@ class UserFlow(object):
 
         for user, request_time in finish_walk_and_request:
             del self._walking[user.id]
-            log.info(f'User {user.id} is about to request a vehicle because he has finished walking')
+            log.info('User %s is about to request a vehicle because he has finished walking', user.id)
             user.set_state_waiting_answer()
             requested_mservice = self._request_user_vehicles(user, request_time)
             self._waiting_answer.setdefault(user.id, (user.response_dt.copy(),requested_mservice))
 
         for user in finish_trip:
-            if self._write:
-                self.write_result(user=user)
-            del self.users[user.id]
-            del self._walking[user.id]
+            self.evict_user(user)
 
     def _request_user_vehicles(self, user, request_time):
         """Method that formulates user's request to the proper mobility service.
@@ -212,7 +235,7 @@ class UserFlow(object):
                 if slice_nodes.start == ind_node_start:
                     mservice_id = user.path.mobility_services[ilayer]
                     mservice = self._graph.layers[layer].mobility_services[mservice_id]
-                    log.info(f"User {user.id} requests mobility service {mservice._id}")
+                    log.info("User %s requests mobility service %s", user.id, mservice._id)
                     mservice.add_request(user, upath[slice_nodes][-1], request_time)
                     user.requested_service = mservice
                     return mservice
@@ -234,7 +257,7 @@ class UserFlow(object):
             -refused_users: the list of users who can be considered as refused by the
                             mobility service they requested
         """
-        log.info(f"Step User Flow {self._tcurrent}")
+        log.info("Step User Flow %s", self._tcurrent)
         self._gnodes = self._graph.graph.nodes
 
         refused_user = self.check_user_waiting_answers(dt)
@@ -247,6 +270,9 @@ class UserFlow(object):
 
         self._user_walking(dt)
 
+        if self._evict_deadend_users:
+            self.evict_deadend_users()
+
         return refused_user
 
     def determine_user_states(self):
@@ -268,23 +294,48 @@ class UserFlow(object):
                     u.notify(self._tcurrent)
                 elif next_link.label == "TRANSIT":
                     # User is about to walk
-                    log.info(f"User {u.id} enters connection on {next_link.id}")
+                    log.info("User %s enters connection on %s", u.id, next_link.id)
                     u.set_state_walking()
                     self._walking[u.id] = next_link.length
                 else:
                     # User is about to request a service
                     self._walking.pop(u.id, None)
                     u.set_state_waiting_answer()
-                    log.info(f'User {u.id} is about to request a vehicle because he is stopped')
+                    log.info('User %s is about to request a vehicle because he is stopped', u.id)
                     requested_mservice = self._request_user_vehicles(u, self._tcurrent)
                     self._waiting_answer.setdefault(u.id, (u.response_dt.copy(),requested_mservice))
 
                 u.notify(self._tcurrent)
 
         for uid in to_del:
-            if self._write:
-                self.write_result(user=self.users[uid])
-            self.users.pop(uid)
+            self.evict_user(self.users[uid])
+
+    def evict_user(self, user: User):
+        """Method that removes a user from the user flow once she does not travel
+        anymore, after having written her results, so that the memory used does not
+        grow with the number of users who already left the simulation.
+
+        Args:
+            -user: the user to remove
+        """
+        if self._write:
+            self.write_result(user=user)
+        if self._write_summary:
+            self._summary_csvhandler.writerow([user.id, user.state.name, user.departure_time,
+                                               user.arrival_time, user.distance])
+        self.users.pop(user.id, None)
+        self._walking.pop(user.id, None)
+        self._waiting_answer.pop(user.id, None)
+        self.nb_evicted_users += 1
+
+    def evict_deadend_users(self):
+        """Method that removes from the user flow the users who turned DEADEND and
+        who are not walking anymore.
+        """
+        deadend_users = [u for u in self.users.values() if u.state is UserState.DEADEND and u.id not in self._walking]
+        for u in deadend_users:
+            log.info('User %s is DEADEND, remove her from the user flow', u.id)
+            self.evict_user(u)
 
     def check_user_waiting_answers(self, dt: Dt):
         """Method to manage users who are waiting an answer from a mobility service.
@@ -300,7 +351,7 @@ class UserFlow(object):
             if self.users[uid].state is UserState.WAITING_ANSWER:
                 new_time = time.to_seconds() - dt.to_seconds()
                 if new_time <= 0:
-                    log.info(f"User {uid} waited answer too long, cancels request for {requested_mservice._id}")
+                    log.info("User %s waited answer too long, cancels request for %s", uid, requested_mservice._id)
                     requested_mservice.cancel_request(uid)
                     refused_users.append(self.users[uid])
                     # Interrupt user's path but keep user in the list of user_flow
@@ -382,14 +433,15 @@ class UserFlow(object):
             -path_nodes: the list of nodes
         """
         links = []
-        for i in range(len(path_nodes)-1):
-            try:
-                link = self._gnodes[path_nodes[i]].adj[path_nodes[i+1]]
-                links.append(link.id)
-            except:
+        for i, lid in enumerate(self._graph.index.path_link_ids(path_nodes)):
+            if lid is None:
                 log.error(f'Cannot find link between {path_nodes[i]} and {path_nodes[i+1]}...')
+            else:
+                links.append(lid)
         return links
 
     def finalize(self):
         if self._write:
             self._outfile.close()
+        if self._write_summary:
+            self._summary_outfile.close()
@@ -2,12 +2,15 @@ from typing import Optional, Type, List, Annotated
 
 import numpy as np
 
+from mnms.generation.roads import paused_gc
 from mnms.graph.layers import AbstractLayer
-from mnms.graph.layers import OriginDestinationLayer, SimpleLayer
+from mnms.graph.layers import OriginDestinationLayer, SimpleLayer, PublicTransportLayer
 from mnms.graph.road import RoadDescriptor
 from mnms.mobility_service.abstract import AbstractMobilityService
-from mnms.tools.geometry import get_bounding_box, points_in_polygon
-from mnms.vehicles.veh_type import Vehicle, Car
+from mnms.mobility_service.public_transport import PublicTransportMobilityService
+from mnms.time import TimeTable
+from mnms.tools.geometry import get_bounding_box, points_in_polygon, PreparedPolygon
+from mnms.vehicles.veh_type import Vehicle, Car, Bus
 
 Point = Annotated[List[float], 2]
 PointList = List[Point]
@@ -39,25 +42,55 @@ def generate_layer_from_roads(roads: RoadDescriptor,
     """
 
     layer = class_layer(roads, layer_id, veh_type, default_speed, mobility_services)
+    banned_nodes = set(banned_nodes) if banned_nodes is not None else set()
+    banned_sections = set(banned_sections) if banned_sections is not None else set()
+    services = [mservice.id for mservice in mobility_services] if mobility_services is not None else ["_DEFAULT"]
+
+    with paused_gc():
+        for n in roads.nodes:
+            if n not in banned_nodes:
+                layer.create_node(f"{layer_id}_{n}", n, {})
+
+        for lid, data in roads.sections.items():
+            if lid not in banned_sections:
+                cost = {mservice: {'length': data.length} for mservice in services}
+
+                layer.create_link(f"{layer_id}_{lid}",
+                              f"{layer_id}_{data.upstream}",
+                              f"{layer_id}_{data.downstream}",
+                              cost,
+                              [lid])
+    return layer
+
+
+def generate_public_transport_layer(roads: RoadDescriptor,
+                                    layer_id: str,
+                                    lines: List[dict],
+                                    timetable: TimeTable,
+                                    veh_type: Type[Vehicle] = Bus,
+                                    default_speed: float = 13,
+                                    mobility_services: Optional[List[PublicTransportMobilityService]] = None) -> PublicTransportLayer:
+    """
+    Generate a public transport layer with the lines laid out on the RoadDescriptor,
+    for instance by generate_manhattan_pt_lines.
+
+    Args
+        roads: The roads object, where the stops of the lines are registered
+        layer_id: the id of the generated layer
+        lines: the lines, dicts with the 'id', 'stops' and 'sections' of each line
+        timetable: the departures of each line
+        veh_type: the type of vehicle
+        default_speed: the default speed
+        mobility_services: the mobility services on the generated layer
+
+    Returns:
+        The generated PublicTransportLayer
+    """
+    layer = PublicTransportLayer(roads, layer_id, veh_type, default_speed, mobility_services)
 
-    for n in roads.nodes:
-        if banned_nodes is None or (banned_nodes is not None and n not in banned_nodes):
-            layer.create_node(f"{layer_id}_{n}", n, {})
-
-    for lid, data in roads.sections.items():
-        if banned_sections is None or (banned_sections is not None and lid not in banned_sections):
-            cost = {}
-            if mobility_services is not None:
-                for mservice in mobility_services:
-                    cost[mservice.id] = {'length': data.length}
-            else:
-                cost["_DEFAULT"] = {'length': data.length}
-
-            layer.create_link(f"{layer_id}_{lid}",
-                          f"{layer_id}_{data.upstream}",
-                          f"{layer_id}_{data.downstream}",
-                          cost,
-                          [lid])
+    with paused_gc():
+        for line in lines:
+            layer.create_line(line['id'], line['stops'], line['sections'], TimeTable(list(timetable.table)))
     return layer
 
 
@@ -111,12 +144,13 @@ def generate_grid_origin_destination_layer(xmin: float,
     dy = y_dist / ny
 
     odlayer = OriginDestinationLayer()
+    prepared = PreparedPolygon(polygon) if polygon is not None else None
 
     for j in range(ny):
         for i in range(nx):
             pos = np.array([xmin + i * dx, ymin + j * dy])
-            if polygon is not None:
-                if not points_in_polygon(np.array(polygon), [pos])[0]:
+            if prepared is not None:
+                if not points_in_polygon(prepared, [pos])[0]:
                     continue
             odlayer.create_destination_node(f"DESTINATION_{str(i + j * nx)}", pos)
             odlayer.create_origin_node(f"ORIGIN_{str(i + j * nx)}", pos)
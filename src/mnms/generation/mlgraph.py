@@ -1,7 +1,14 @@
-from mnms.generation.roads import generate_manhattan_road
-from mnms.generation.layers import generate_layer_from_roads, generate_matching_origin_destination_layer
+from typing import Optional, Tuple
+
+from mnms.generation.roads import generate_manhattan_road, generate_manhattan_pt_lines, paused_gc
+from mnms.generation.layers import generate_layer_from_roads, generate_matching_origin_destination_layer, \
+    generate_public_transport_layer
+from mnms.generation.zones import generate_grid_zones
+from mnms.mobility_service.on_demand import OnDemandMobilityService
 from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.mobility_service.public_transport import PublicTransportMobilityService
 from mnms.graph.layers import MultiLayerGraph
+from mnms.time import TimeTable, Dt
 
 
 def generate_manhattan_passenger_car(n, link_length, resid="RES") -> MultiLayerGraph:
@@ -29,3 +36,65 @@ def generate_manhattan_passenger_car(n, link_length, resid="RES") -> MultiLayerG
                               1e-5)
 
     return mlgraph
+
+
+def generate_manhattan_multimodal(n: int,
+                                  link_length: float,
+                                  length_noise: float = 0.,
+                                  zones: Tuple[int, int] = (1, 1),
+                                  bus_line_spacing: Optional[int] = None,
+                                  bus_stop_spacing: int = 2,
+                                  bus_timetable: Optional[TimeTable] = None,
+                                  ridehailing: bool = True,
+                                  connection_distance: float = 1e-3,
+                                  seed: Optional[int] = None) -> MultiLayerGraph:
+    """
+    Generate a synthetic multimodal network on a square Manhattan grid, meant for
+    scale testing: a 500 x 500 grid with car, bus and ridehailing layers has
+    several million links.
+
+    Args:
+        n: Number of point in x and y direction
+        link_length: the mean length of the links
+        length_noise: relative amplitude of the random link lengths, see generate_manhattan_road
+        zones: number of reservoirs along the x and y axes, the reservoirs are
+               named RES if there is only one, RES<i>-<j> otherwise
+        bus_line_spacing: if not None, a bus line is laid out in each direction
+                          every bus_line_spacing rows and columns, see generate_manhattan_pt_lines
+        bus_stop_spacing: number of streets between two bus stops
+        bus_timetable: departures of each bus line, every 10 minutes from 07:00 to 10:00 if None
+        ridehailing: if True, a RIDEHAILING layer with an on-demand mobility service
+                     and no vehicle is added
+        connection_distance: distance under which the origins and destinations are
+                             connected to the nodes of the layers
+        seed: the seed of the random link lengths
+
+    Returns:
+        The generated MultiLayerGraph, its layers are CAR, BUS and RIDEHAILING, with
+        the mobility services of the same ids
+    """
+    nx, ny = zones
+    roads = generate_manhattan_road(n, link_length, one_zone=(nx, ny) == (1, 1),
+                                    length_noise=length_noise, seed=seed)
+    if (nx, ny) != (1, 1):
+        for zone in generate_grid_zones("RES", roads, nx, ny):
+            roads.add_zone(zone)
+
+    layers = [generate_layer_from_roads(roads, "CAR", mobility_services=[PersonalMobilityService("CAR")])]
+
+    if bus_line_spacing is not None:
+        lines = generate_manhattan_pt_lines(roads, n, bus_line_spacing, bus_stop_spacing)
+        if bus_timetable is None:
+            bus_timetable = TimeTable.create_table_freq('07:00:00', '10:00:00', Dt(minutes=10))
+        layers.append(generate_public_transport_layer(roads, "BUS", lines, bus_timetable,
+                                                      mobility_services=[PublicTransportMobilityService("BUS")]))
+
+    if ridehailing:
+        layers.append(generate_layer_from_roads(roads, "RIDEHAILING",
+                                                mobility_services=[OnDemandMobilityService("RIDEHAILING", 0)]))
+
+    with paused_gc():
+        odlayer = generate_matching_origin_destination_layer(roads)
+        mlgraph = MultiLayerGraph(layers, odlayer, connection_distance)
+
+    return mlgraph
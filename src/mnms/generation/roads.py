@@ -1,3 +1,5 @@
+import gc
+from contextlib import contextmanager
 from typing import List, Optional
 
 import numpy as np
@@ -6,6 +8,22 @@ from mnms.graph.road import RoadDescriptor
 from mnms.graph.zone import Zone
 
 
+@contextmanager
+def paused_gc():
+    """
+    Context manager disabling the garbage collector while large networks are generated,
+    the collections triggered by the creation of millions of nodes and links take
+    about half of the generation time and cannot free anything
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
 def generate_one_zone(roads: RoadDescriptor, zone_id: str) -> Zone:
     """
      Generate one Zone with all the sections inside the roads
@@ -107,9 +125,11 @@ def generate_square_road(link_length=None, zone_id='RES'):
     return roads
 
 
-def generate_manhattan_road(n, link_length, zone_id='RES', extended=True, one_zone=True, prefix=""):
+def generate_manhattan_road(n, link_length, zone_id='RES', extended=True, one_zone=True, prefix="",
+                            length_noise: float = 0., seed: Optional[int] = None):
     """
-    Generate a square Manhattan RoadDescriptor
+    Generate a square Manhattan RoadDescriptor, the nodes and sections are built
+    with arrays so that networks with millions of sections are generated in seconds
 
     Args:
         n: Number of point in x and y direction
@@ -119,70 +139,120 @@ def generate_manhattan_road(n, link_length, zone_id='RES', extended=True, one_zo
         one_zone: specifies if one reservoir should be created for the whole network
                   if False, no reservoir zone is created, it should be created manually
         prefix: the prefix of the nodes and links
+        length_noise: if positive, the length of each street is drawn uniformly in
+                      [link_length * (1 - length_noise), link_length * (1 + length_noise)],
+                      both directions of a street have the same length
+        seed: the seed of the random lengths
 
     Returns:
         the manhattan RoadDescriptor
 
     """
+    assert 0 <= length_noise < 1, "length_noise should be in [0, 1["
     roads = RoadDescriptor()
+    with paused_gc():
+        rng = np.random.default_rng(seed)
+
+        def street_lengths(nb_streets):
+            if length_noise == 0:
+                return np.full(nb_streets, link_length)
+            return link_length * rng.uniform(1 - length_noise, 1 + length_noise, nb_streets)
+
+        ind = np.arange(n * n)
+        i, j = np.divmod(ind, n)
+        node_ids = [prefix + str(k) for k in range(n * n)]
+        roads.register_nodes(node_ids, np.column_stack([i, j]) * link_length)
+
+        # Sections of each node in the order +1, -1, +n, -n, a street is identified by
+        # its node of lowest index and its direction
+        targets = np.column_stack([ind + 1, ind - 1, ind + n, ind - n])
+        valid = np.column_stack([j < n - 1, j > 0, i < n - 1, i > 0]).ravel()
+        ups = np.repeat(ind, 4)[valid]
+        downs = targets.ravel()[valid]
+        vertical = np.tile([False, False, True, True], n * n)[valid]
+        streets = np.minimum(ups, downs)
+        horizontal_lengths = street_lengths(n * n)
+        vertical_lengths = street_lengths(n * n)
+        lengths = np.where(vertical, vertical_lengths[streets], horizontal_lengths[streets])
+        up_ids = [node_ids[u] for u in ups.tolist()]
+        down_ids = [node_ids[d] for d in downs.tolist()]
+        roads.register_sections([f"{up}_{down}" for up, down in zip(up_ids, down_ids)], up_ids, down_ids, lengths)
+
+        if extended:
+            counter = np.arange(n)
+            borders = [('WEST', counter, np.column_stack([np.full(n, -1), counter])),
+                       ('EAST', n * (n - 1) + counter, np.column_stack([np.full(n, n), counter])),
+                       ('NORTH', counter * n + n - 1, np.column_stack([counter, np.full(n, n)])),
+                       ('SOUTH', counter * n, np.column_stack([counter, np.full(n, -1)]))]
+            for side, grid_nodes, positions in borders:
+                border_ids = [f"{side}_{prefix}{c}" for c in range(n)]
+                roads.register_nodes(border_ids, positions * link_length)
+                grid_ids = [node_ids[k] for k in grid_nodes]
+                ups = [nid for pair in zip(border_ids, grid_ids) for nid in pair]
+                downs = [nid for pair in zip(grid_ids, border_ids) for nid in pair]
+                roads.register_sections([f"{up}_{down}" for up, down in zip(ups, downs)],
+                                        ups,
+                                        downs,
+                                        np.repeat(street_lengths(n), 2))
 
-    for i in range(n):
-        for j in range(n):
-            roads.register_node(prefix + str(i * n + j), [i*link_length, j*link_length])
+    if one_zone:
+        roads.add_zone(generate_one_zone(roads, zone_id))
 
-    for i in range(n):
-        for j in range(n):
-            ind = i * n + j
-            if j < n - 1:
-                roads.register_section(f"{prefix}{ind}_{prefix}{ind + 1}",
-                    prefix + str(ind), prefix + str(ind + 1), link_length)
-            if j > 0:
-                roads.register_section(f"{prefix}{ind}_{prefix}{ind - 1}",
-                    prefix + str(ind), prefix + str(ind - 1), link_length)
-            if i < n - 1:
-                roads.register_section(f"{prefix}{ind}_{prefix}{ind + n}",
-                    prefix + str(ind), prefix + str(ind + n), link_length)
-            if i > 0:
-                roads.register_section(f"{prefix}{ind}_{prefix}{ind - n}",
-                    prefix + str(ind), prefix + str(ind - n), link_length)
+    return roads
 
-    if extended:
-        # WEST
-        for i in range(n):
-            roads.register_node(f"WEST_{prefix}{i}", [-link_length, i*link_length])
-            up = f"WEST_{prefix}{i}"
-            down = prefix + str(i)
-            roads.register_section(f"{up}_{down}", up, down, link_length)
-            roads.register_section(f"{down}_{up}", down, up, link_length)
 
-        # EAST
-        for counter, i in enumerate(range(n*(n-1), n*n)):
-            up = f"EAST_{prefix}{counter}"
-            down = prefix + str(i)
-            roads.register_node(up, [n*link_length, counter*link_length])
-            roads.register_section(f"{up}_{down}", up, down, link_length)
-            roads.register_section(f"{down}_{up}", down, up, link_length)
+def generate_manhattan_pt_lines(roads: RoadDescriptor, n: int, line_spacing: int, stop_spacing: int = 1,
+                                prefix: str = "", line_prefix: str = "BUS") -> List[dict]:
+    """
+    Lay out public transport lines along the corridors of a Manhattan RoadDescriptor
+    generated by generate_manhattan_road, one line per direction every line_spacing
+    rows and columns of the grid. The stops are registered on the roads.
 
-        # NORTH
-        for counter, i in enumerate(range(n-1, n*n, n)):
-            up = f"NORTH_{prefix}{counter}"
-            down = prefix + str(i)
-            roads.register_node(up, [counter*link_length, n*link_length])
-            roads.register_section(f"{up}_{down}", up, down, link_length)
-            roads.register_section(f"{down}_{up}", down, up, link_length)
+    Args:
+        roads: the Manhattan RoadDescriptor
+        n: Number of point in x and y direction of the Manhattan grid
+        line_spacing: number of streets between two parallel corridors
+        stop_spacing: number of streets between two stops of a line, the last node
+                      of a corridor is always a stop
+        prefix: the prefix of the nodes and links of the Manhattan grid
+        line_prefix: the prefix of the ids of the lines and of their stops
 
-        # SOUTH
-        for counter, i in enumerate(range(0, n*n, n)):
-            up = f"SOUTH_{prefix}{counter}"
-            down = prefix + str(i)
-            roads.register_node(up, [counter*link_length, -link_length])
-            roads.register_section(f"{up}_{down}", up, down, link_length)
-            roads.register_section(f"{down}_{up}", down, up, link_length)
+    Returns:
+        The list of the lines, each line is a dict with the 'id', 'stops' and 'sections'
+        to pass to PublicTransportLayer.create_line
 
-    if one_zone:
-        roads.add_zone(generate_one_zone(roads, zone_id))
+    """
+    assert n >= 2, "A corridor should contain at least two nodes"
+    assert line_spacing >= 1 and stop_spacing >= 1, "line_spacing and stop_spacing should be positive"
+
+    stop_positions = list(range(0, n - 1, stop_spacing)) + [n - 1]
+    corridors = []
+    for c in range(0, n, line_spacing):
+        corridors.append((f"{line_prefix}_X{c}", c * n + np.arange(n)))
+        corridors.append((f"{line_prefix}_Y{c}", np.arange(n) * n + c))
+
+    lines = []
+    for corridor_id, corridor_nodes in corridors:
+        for line_id, nodes in [(corridor_id + "_FWD", corridor_nodes), (corridor_id + "_BWD", corridor_nodes[::-1])]:
+            node_ids = [prefix + str(k) for k in nodes]
+            sections = [f"{up}_{down}" for up, down in zip(node_ids[:-1], node_ids[1:])]
+
+            stops = []
+            for k in stop_positions:
+                sid = f"{line_id}_S{k}"
+                if k < n - 1:
+                    roads.register_stop(sid, sections[k], 0.)
+                else:
+                    roads.register_stop(sid, sections[-1], 1.)
+                stops.append(sid)
 
-    return roads
+            # The sections between two stops include the section of the downstream stop,
+            # whose contribution to the length is its relative position
+            stops_sections = [sections[k_up:k_down + 1] for k_up, k_down in zip(stop_positions[:-1], stop_positions[1:])]
+
+            lines.append({'id': line_id, 'stops': stops, 'sections': stops_sections})
+
+    return lines
 
 
 def generate_manhattan_road_rectangle(n, m, link_length_n, link_length_m, zone_id='RES', extended=True, prefix=""):
@@ -1,6 +1,6 @@
 from mnms.graph.road import RoadDescriptor
 from mnms.tools.geometry import get_bounding_box
-from mnms.graph.zone import construct_zone_from_contour
+from mnms.graph.zone import construct_zone_from_contour, construct_zones_from_contours
 
 
 def generate_one_zone(zid: str, roads: RoadDescriptor):
@@ -47,7 +47,8 @@ def generate_grid_zones(zid_prefix: str, roads: RoadDescriptor, Nx: int, Ny: int
     bbox = get_bounding_box(roads) if mlgraph is None else get_bounding_box(mlgraph.roads)
     dx = (bbox.xmax - bbox.xmin) / Nx
     dy = (bbox.ymax - bbox.ymin) / Ny
-    zones = []
+    ids = []
+    contours = []
     startx = bbox.xmin - 1
     starty = bbox.ymin - 1
     for nx in range(Nx):
@@ -72,7 +73,8 @@ def generate_grid_zones(zid_prefix: str, roads: RoadDescriptor, Nx: int, Ny: int
                              [startx + (nx+1) * dx, starty + ny * dy],
                              [startx + (nx+1) * dx, starty + (ny+1) * dy],
                              [startx + nx * dx, starty + (ny+1) * dy]]
-            graph = None if mlgraph is None else mlgraph.graph
-            zone_type = 'Zone' if mlgraph is None else 'MLZone'
-            zones.append(construct_zone_from_contour(roads, zid_prefix+str(nx)+'-'+str(ny), c, graph=graph, zone_type=zone_type))
-    return zones
+            ids.append(zid_prefix+str(nx)+'-'+str(ny))
+            contours.append(c)
+    graph = None if mlgraph is None else mlgraph.graph
+    zone_type = 'Zone' if mlgraph is None else 'MLZone'
+    return construct_zones_from_contours(roads, ids, contours, graph=graph, zone_type=zone_type)
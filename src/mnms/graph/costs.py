@@ -0,0 +1,180 @@
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from mnms.graph.index import GraphIndex
+from mnms.log import create_logger
+
+log = create_logger(__name__)
+
+
+class VectorizedCostFunction(object):
+    def __init__(self, mobility_service: str, function: Callable[[object, Dict[str, np.ndarray]], np.ndarray]):
+        """Cost function evaluated on all the links of a layer at once. The function
+        receives the layer and a dict with the names of the costs already computed
+        for the mobility service as keys (at least speed, travel_time and length)
+        and the arrays of their values on the links as values, it returns the array
+        of the new cost on these links.
+
+        Args:
+            -mobility_service: the mobility service the cost is computed for
+            -function: the vectorized cost function
+        """
+        self.mobility_service = mobility_service
+        self.function = function
+
+    def evaluate(self, layer, costs: Dict[str, np.ndarray]) -> np.ndarray:
+        """Method that evaluates the cost function on several links.
+
+        Args:
+            -layer: the layer of the links
+            -costs: the arrays of the costs of the mobility service on the links
+
+        Returns:
+            -array of the values of the cost on the links
+        """
+        return np.asarray(self.function(layer, costs), dtype=float)
+
+    def __call__(self, gnodes, layer, link, costs) -> float:
+        # Evaluation on a single link, with the signature of the per link cost functions
+        service_costs = {name: np.array([value], dtype=float) for name, value in costs[self.mobility_service].items()}
+        return float(self.evaluate(layer, service_costs)[0])
+
+
+class LinkCostTable(object):
+    base_costs = ('speed', 'travel_time', 'length')
+
+    def __init__(self, index: GraphIndex):
+        """Table of the costs of the links of a graph, stored as one array per
+        mobility service and cost name indexed by the link indexes of the GraphIndex
+        of the graph. Costs are computed in this table and pushed to the HiPOP graph
+        in bulk.
+
+        Args:
+            -index: the index of the graph
+        """
+        self.index = index
+        self._costs: Dict[str, Dict[str, np.ndarray]] = defaultdict(dict)
+        self.link_services: List[Tuple[str, ...]] = list()
+
+    @property
+    def size(self) -> int:
+        return len(self.link_services)
+
+    def _resize(self):
+        nb_links = self.index.nb_links
+        missing = nb_links - self.size
+        if missing > 0:
+            for service_costs in self._costs.values():
+                for name, values in service_costs.items():
+                    service_costs[name] = np.concatenate([values, np.full(missing, np.nan)])
+            self.link_services.extend([tuple()] * missing)
+
+    def _array(self, service: str, cost: str) -> np.ndarray:
+        values = self._costs[service].get(cost)
+        if values is None:
+            values = np.full(self.size, np.nan)
+            self._costs[service][cost] = values
+        return values
+
+    def get(self, service: str, cost: str, links: Optional[np.ndarray] = None) -> np.ndarray:
+        """Method that returns the values of a cost on links.
+
+        Args:
+            -service: the mobility service
+            -cost: the name of the cost
+            -links: indexes of the links, all links if None
+
+        Returns:
+            -array of the costs, nan for links without this cost
+        """
+        values = self._costs[service].get(cost) if service in self._costs else None
+        if values is None:
+            return np.full(self.size if links is None else len(links), np.nan)
+        return values.copy() if links is None else values[links]
+
+    def set(self, service: str, cost: str, links: np.ndarray, values):
+        """Method that sets the values of a cost on links.
+
+        Args:
+            -service: the mobility service
+            -cost: the name of the cost
+            -links: indexes of the links
+            -values: the values of the cost, an array or a scalar
+        """
+        self._resize()
+        self._array(service, cost)[links] = values
+
+    def service_costs(self, service: str, links: np.ndarray, names: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Method that returns the arrays of several costs of a mobility service on links.
+
+        Args:
+            -service: the mobility service
+            -links: indexes of the links
+            -names: the names of the costs
+
+        Returns:
+            -dict with the names of the costs as keys and the arrays of their values as values
+        """
+        return {name: self.get(service, name, links) for name in names}
+
+    def link_costs(self, links: np.ndarray, names: Dict[str, List[str]]) -> List[Dict[str, Dict[str, float]]]:
+        """Method that returns the costs of links in the format of the HiPOP graph.
+
+        Args:
+            -links: indexes of the links
+            -names: dict with the mobility services as keys and the names of the
+             costs to return for this service as values
+
+        Returns:
+            -list of the costs of each link, as dicts with the mobility services as
+             keys and dicts of costs as values
+        """
+        columns = [(service, name, self.get(service, name, links).tolist())
+                   for service, service_names in names.items() for name in service_names]
+        costs = [defaultdict(dict) for _ in range(len(links))]
+        for service, name, values in columns:
+            for link_costs, value in zip(costs, values):
+                if value == value:
+                    link_costs[service][name] = value
+        return costs
+
+    def read_graph(self, links: Optional[np.ndarray] = None):
+        """Method that reads the costs of links from the HiPOP graph into the table.
+
+        Args:
+            -links: indexes of the links, all links if None
+        """
+        self._resize()
+        if links is None:
+            links = np.arange(self.size)
+        if len(links) == 0:
+            return
+        glinks = self.index.graph.links
+        link_ids = self.index.link_ids
+        for l in links:
+            link = glinks.get(link_ids[l])
+            if link is None:
+                self.link_services[l] = tuple()
+                continue
+            costs = link.costs
+            self.link_services[l] = tuple(costs.keys())
+            for service, service_costs in costs.items():
+                for name, value in service_costs.items():
+                    self._array(service, name)[l] = value
+
+    def add_services(self, links: np.ndarray, services: List[str]):
+        """Method that registers mobility services on links.
+
+        Args:
+            -links: indexes of the links
+            -services: the mobility services
+        """
+        self._resize()
+        link_services = self.link_services
+        for l in links:
+            current = link_services[l]
+            missing = tuple(s for s in services if s not in current)
+            if missing:
+                link_services[l] = current + missing
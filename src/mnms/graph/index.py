@@ -0,0 +1,279 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from hipop.graph import OrientedGraph, Node, Link
+
+from mnms.log import create_logger
+
+log = create_logger(__name__)
+
+
+class GraphIndex(object):
+    def __init__(self, graph: OrientedGraph):
+        """Interning table of the nodes and links of a graph. Each node and link
+        gets a dense integer index, and the topology and lengths of the graph are
+        stored in arrays so that paths can be treated with integer indexing.
+        Indexes are stable: a new node or link is appended, and a deleted link
+        keeps its index but is no longer alive.
+
+        Args:
+            -graph: the HiPOP graph to index
+        """
+        self.graph = graph
+
+        self.node_ids: List[str] = list()
+        self.node_index: Dict[str, int] = dict()
+        self._node_x: List[float] = list()
+        self._node_y: List[float] = list()
+
+        self.link_ids: List[str] = list()
+        self.link_index: Dict[str, int] = dict()
+        self._link_upstream: List[int] = list()
+        self._link_downstream: List[int] = list()
+        self._link_length: List[float] = list()
+        self._link_label: List[str] = list()
+        self._link_alive: List[bool] = list()
+        self.nb_alive_links: int = 0
+        self._pair_link: Dict[Tuple[str, str], int] = dict()
+
+        self._arrays_dirty = True
+        self.refresh()
+
+    @property
+    def nb_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def nb_links(self) -> int:
+        return len(self.link_ids)
+
+    def intern_node(self, nid: str, node: Optional[Node] = None) -> int:
+        """Method that returns the index of a node, the node is added to the index
+        if it is not known yet.
+
+        Args:
+            -nid: id of the node
+            -node: the node object, read from the graph if None
+
+        Returns:
+            -index of the node
+        """
+        ind = self.node_index.get(nid)
+        if ind is None:
+            if node is None:
+                node = self.graph.nodes[nid]
+            ind = len(self.node_ids)
+            self.node_ids.append(nid)
+            self.node_index[nid] = ind
+            self._node_x.append(node.position[0])
+            self._node_y.append(node.position[1])
+            self._arrays_dirty = True
+        return ind
+
+    def intern_link(self, lid: str, link: Optional[Link] = None, gnodes: Optional[Dict[str, Node]] = None) -> int:
+        """Method that returns the index of a link of the graph, the link is added
+        to the index if it is not known yet.
+
+        Args:
+            -lid: id of the link
+            -link: the link object, read from the graph if None
+            -gnodes: the nodes of the graph, passed for performance reasons when
+             many links are interned
+
+        Returns:
+            -index of the link
+        """
+        if link is None:
+            link = self.graph.links[lid]
+        up = self.node_index.get(link.upstream)
+        if up is None:
+            up = self.intern_node(link.upstream, gnodes[link.upstream] if gnodes is not None else None)
+        down = self.node_index.get(link.downstream)
+        if down is None:
+            down = self.intern_node(link.downstream, gnodes[link.downstream] if gnodes is not None else None)
+        ind = self.link_index.get(lid)
+        if ind is None:
+            ind = len(self.link_ids)
+            self.link_ids.append(lid)
+            self.link_index[lid] = ind
+            self._link_upstream.append(up)
+            self._link_downstream.append(down)
+            self._link_length.append(link.length)
+            self._link_label.append(link.label)
+            self._link_alive.append(True)
+            self.nb_alive_links += 1
+            self._pair_link[(link.upstream, link.downstream)] = ind
+        elif not self._link_alive[ind] or self._link_upstream[ind] != up or self._link_downstream[ind] != down:
+            # Link deleted and created again
+            if self._link_alive[ind]:
+                self._unlink(ind)
+            self.nb_alive_links += 1
+            self._pair_link[(link.upstream, link.downstream)] = ind
+            self._link_upstream[ind] = up
+            self._link_downstream[ind] = down
+            self._link_length[ind] = link.length
+            self._link_label[ind] = link.label
+            self._link_alive[ind] = True
+        else:
+            return ind
+        self._arrays_dirty = True
+        return ind
+
+    def remove_link(self, lid: str):
+        """Method that marks a link deleted from the graph.
+
+        Args:
+            -lid: id of the link
+        """
+        ind = self.link_index.get(lid)
+        if ind is not None and self._link_alive[ind]:
+            self._unlink(ind)
+
+    def refresh(self):
+        """Method that synchronizes the index with the whole graph.
+        """
+        gnodes = self.graph.nodes
+        for nid, node in gnodes.items():
+            self.intern_node(nid, node)
+        alive = set()
+        for lid, link in self.graph.links.items():
+            alive.add(self.intern_link(lid, link, gnodes))
+        for ind in range(len(self.link_ids)):
+            if ind not in alive and self._link_alive[ind]:
+                self._unlink(ind)
+
+    def _unlink(self, ind: int):
+        self._link_alive[ind] = False
+        self.nb_alive_links -= 1
+        pair = (self.node_ids[self._link_upstream[ind]], self.node_ids[self._link_downstream[ind]])
+        if self._pair_link.get(pair) == ind:
+            del self._pair_link[pair]
+        self._arrays_dirty = True
+
+    def _build_arrays(self):
+        self.node_positions = np.column_stack([np.array(self._node_x, dtype=float),
+                                               np.array(self._node_y, dtype=float)]).reshape(-1, 2)
+        self.link_upstream = np.array(self._link_upstream, dtype=np.int64)
+        self.link_downstream = np.array(self._link_downstream, dtype=np.int64)
+        self.link_lengths = np.array(self._link_length, dtype=float)
+        self.link_labels = np.array(self._link_label, dtype=object)
+        self.link_alive = np.array(self._link_alive, dtype=bool)
+        self._link_ids_array = np.array(self.link_ids, dtype=object)
+
+        # Adjacency in compressed sparse row format, restricted to alive links:
+        # the links leaving node i are adjacency_links[adjacency_indptr[i]:adjacency_indptr[i+1]]
+        # sorted by downstream node
+        alive_links = np.flatnonzero(self.link_alive)
+        keys = self.link_upstream[alive_links] * self.nb_nodes + self.link_downstream[alive_links]
+        order = np.argsort(keys, kind='stable')
+        self._adjacency_keys = keys[order]
+        self.adjacency_links = alive_links[order]
+        self.adjacency_nodes = self.link_downstream[self.adjacency_links]
+        self.adjacency_indptr = np.searchsorted(self._adjacency_keys // max(1, self.nb_nodes),
+                                                np.arange(self.nb_nodes + 1), side='left')
+        self._arrays_dirty = False
+
+    def ensure_arrays(self):
+        """Method that (re)builds the arrays of the index if the index changed.
+        """
+        if self._arrays_dirty:
+            self._build_arrays()
+
+    def node_indices(self, nodes: List[str]) -> np.ndarray:
+        """Method that translates node ids into node indexes.
+
+        Args:
+            -nodes: list of node ids
+
+        Returns:
+            -array of node indexes
+        """
+        intern = self.intern_node
+        return np.fromiter((intern(n) for n in nodes), dtype=np.int64, count=len(nodes))
+
+    def link_between(self, upstream: str, downstream: str) -> int:
+        """Method that finds the link between two nodes.
+
+        Args:
+            -upstream: id of the upstream node
+            -downstream: id of the downstream node
+
+        Returns:
+            -index of the link, -1 if there is no link between the nodes
+        """
+        return self._pair_link.get((upstream, downstream), -1)
+
+    def links_between(self, upstream: np.ndarray, downstream: np.ndarray) -> np.ndarray:
+        """Method that finds the links between pairs of node indexes.
+
+        Args:
+            -upstream: array of upstream node indexes
+            -downstream: array of downstream node indexes
+
+        Returns:
+            -array of link indexes, -1 where there is no link between the nodes
+        """
+        self.ensure_arrays()
+        keys = np.asarray(upstream, dtype=np.int64) * self.nb_nodes + np.asarray(downstream, dtype=np.int64)
+        if len(self._adjacency_keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.searchsorted(self._adjacency_keys, keys)
+        pos = np.minimum(pos, len(self._adjacency_keys) - 1)
+        found = self._adjacency_keys[pos] == keys
+        return np.where(found, self.adjacency_links[pos], -1)
+
+    def path_links(self, path_nodes: List[str]) -> np.ndarray:
+        """Method that converts a path given as a list of node ids into the array of
+        the indexes of its links.
+
+        Args:
+            -path_nodes: list of node ids
+
+        Returns:
+            -array of link indexes, -1 where two consecutive nodes are not linked
+        """
+        if len(path_nodes) < 2:
+            return np.empty(0, dtype=np.int64)
+        nodes = self.node_indices(path_nodes)
+        return self.links_between(nodes[:-1], nodes[1:])
+
+    def path_link_ids(self, path_nodes: List[str]) -> List[Optional[str]]:
+        """Method that converts a path given as a list of node ids into the list
+        of the ids of its links.
+
+        Args:
+            -path_nodes: list of node ids
+
+        Returns:
+            -list of link ids, None where two consecutive nodes are not linked
+        """
+        pair_link = self._pair_link
+        link_ids = self.link_ids
+        links = [pair_link.get(pair, -1) for pair in zip(path_nodes[:-1], path_nodes[1:])]
+        return [link_ids[l] if l >= 0 else None for l in links]
+
+    def cost_array(self, cost: str, label_to_service: Dict[str, str], links: Optional[np.ndarray] = None) -> np.ndarray:
+        """Method that reads the current value of a cost on links of the graph.
+
+        Args:
+            -cost: name of the cost
+            -label_to_service: dict with layers ids as keys and the mobility service
+             whose cost should be read on the links of this layer as values
+            -links: indexes of the links, all links if None
+
+        Returns:
+            -array of costs, nan for deleted links or links without this cost
+        """
+        self.ensure_arrays()
+        links = np.arange(self.nb_links) if links is None else np.asarray(links, dtype=np.int64)
+        glinks = self.graph.links
+        values = np.full(len(links), np.nan)
+        for i, l in enumerate(links):
+            if l < 0 or not self.link_alive[l]:
+                continue
+            service = label_to_service.get(self.link_labels[l])
+            costs = glinks[self.link_ids[l]].costs
+            if service in costs and cost in costs[service]:
+                values[i] = costs[service][cost]
+        return values
@@ -2,25 +2,48 @@ from abc import abstractmethod
 from collections import defaultdict
 from typing import Optional, Dict, List, Type, Callable, Set
 from collections import ChainMap
+import json
+
 import numpy as np
 
 from mnms.graph.road import RoadDescriptor
 from mnms.mobility_service.abstract import AbstractMobilityService
 from mnms.tools.observer import CSVVehicleObserver
 from mnms.vehicles.fleet import FleetManager
-from mnms.graph.specific_layers import OriginDestinationLayer
+from mnms.vehicles.manager import VehicleManager
+from mnms.graph.specific_layers import OriginDestinationLayer, NodesIndex
 from mnms.graph.dynamic_space_sharing import DynamicSpaceSharing
 from mnms.io.utils import load_class_by_module_name
 from mnms.log import create_logger
 from mnms.mobility_service.public_transport import PublicTransportMobilityService
 from mnms.time import TimeTable
+from mnms.tools.preprocessing import ShortestPathsStore
 from mnms.vehicles.veh_type import Vehicle, Car, Bus
 from mnms.graph.zone import MLZone
+from mnms.graph.index import GraphIndex
+from mnms.graph.costs import LinkCostTable, VectorizedCostFunction
 
-from hipop.graph import OrientedGraph, merge_oriented_graph, graph_to_dict, node_to_dict, link_to_dict
+from hipop.graph import OrientedGraph, graph_to_dict, node_to_dict, link_to_dict
 
 log = create_logger(__name__)
 
+
+def _merge_graphs(graphs: List[OrientedGraph]) -> OrientedGraph:
+    """Copies the nodes and links of the graphs into a new graph, like hipop
+    merge_oriented_graph whose cost grows quadratically with the size of the graphs.
+    """
+    merged = OrientedGraph()
+    for graph in graphs:
+        merged.add_all_nodes_and_links(graph)
+    return merged
+
+
+def _transit_link(od_nid: str, layer_nid: str, dist: float, from_od: bool):
+    if from_od:
+        return {'id': f"{od_nid}_{layer_nid}", 'upstream_node': od_nid, 'downstream_node': layer_nid, 'dist': dist}
+    return {'id': f"{layer_nid}_{od_nid}", 'upstream_node': layer_nid, 'downstream_node': od_nid, 'dist': dist}
+
+
 class CostFunctionLayer(object):
     def __init__(self):
         self._costs_functions: Dict[str, Dict[str, Callable]] = defaultdict(dict)
@@ -28,6 +51,18 @@ class CostFunctionLayer(object):
     def add_cost_function(self, mobility_service: str, cost_name: str, cost_function: Callable[[Dict[str, float]], float]):
         self._costs_functions[mobility_service][cost_name] = cost_function
 
+    def add_vectorized_cost_function(self, mobility_service: str, cost_name: str, cost_function: Callable[..., np.ndarray]):
+        """Method that adds a cost function evaluated on all the links of the layer
+        at once, see VectorizedCostFunction.
+
+        Args:
+            -mobility_service: the mobility service the cost is computed for
+            -cost_name: the name of the cost
+            -cost_function: function taking the layer and the dict of the arrays of
+             the costs already computed, and returning the array of the new cost
+        """
+        self._costs_functions[mobility_service][cost_name] = VectorizedCostFunction(mobility_service, cost_function)
+
 
 class AbstractLayer(CostFunctionLayer):
     def __init__(self,
@@ -91,19 +126,25 @@ class AbstractLayer(CostFunctionLayer):
 
     def add_mobility_service(self, service: AbstractMobilityService):
         service.layer = self
-        service.fleet = FleetManager(self._veh_type, service.id, service.is_personal())
+        veh_manager = self._multi_graph.veh_manager if self._multi_graph is not None else None
+        service.fleet = FleetManager(self._veh_type, service.id, service.is_personal(), veh_manager)
         self.mobility_services[service.id] = service
 
-    def load_shortest_paths(self, file):
+    def load_shortest_paths(self, file, mmap: bool = True):
         """Method to load pre computed shortest paths between all pairs of nodes
         of the layer's graph. The shortest paths should be on the form of precedence
-        trees.
+        trees, either in a JSON file or in a ShortestPathsStore .npy file.
 
         Args:
             -file: the file where shortest paths trees are saved
+            -mmap: if True the .npy matrix of predecessors is memory mapped instead
+             of being read in memory
         """
-        with open(file, 'r') as f:
-            self.shortest_paths = json.load(f)
+        if str(file).endswith('.npy'):
+            self.shortest_paths = ShortestPathsStore.load(file, mmap)
+        else:
+            with open(file, 'r') as f:
+                self.shortest_paths = json.load(f)
 
     # def add_cost_function(self, mobility_service: str, cost_name: str, cost_function: Callable[[Dict[str, float]], float]):
     #     self._costs_functions[mobility_service][cost_name] = cost_function
@@ -125,49 +166,31 @@ class AbstractLayer(CostFunctionLayer):
 
         assert odlayer is not None
 
-        _norm = np.linalg.norm
-
         odlayer_nodes = set()
         odlayer_nodes.update(odlayer.origins.keys())
         odlayer_nodes.update(odlayer.destinations.keys())
 
-        graph_nodes = self.graph.nodes
-        graph_node_ids = np.array([nid for nid in graph_nodes])
-        graph_node_pos = np.array([n.position for n in graph_nodes.values()])
+        nodes_index = NodesIndex({nid: n.position for nid, n in self.graph.nodes.items()})
+        graph_node_ids = nodes_index.ids
 
-        for nid in odlayer.origins:
-            connected = False
-            npos = np.array(odlayer.origins[nid])
-            dist_nodes = _norm(graph_node_pos - npos, axis=1)
-            mask = dist_nodes < connection_distance
-            for layer_nid, dist in zip(graph_node_ids[mask], dist_nodes[mask]):
-                if layer_nid not in odlayer_nodes:
-                    lid = f"{nid}_{layer_nid}"
-                    transit_links.append({'id': lid,'upstream_node': nid,'downstream_node': layer_nid,'dist': dist})
-                    connected = True
-            if not connected and secure_connection_distance is not None:
-                secure_mask = dist_nodes < secure_connection_distance
-                for layer_nid, dist in zip(graph_node_ids[secure_mask], dist_nodes[secure_mask]):
-                    if layer_nid not in odlayer_nodes:
-                        lid = f"{nid}_{layer_nid}"
-                        transit_links.append({'id': lid,'upstream_node': nid,'downstream_node': layer_nid,'dist': dist})
-
-        for nid in odlayer.destinations:
-            connected = False
-            npos = np.array(odlayer.destinations[nid])
-            dist_nodes = _norm(graph_node_pos - npos, axis=1)
-            mask = dist_nodes < connection_distance
-            for layer_nid, dist in zip(graph_node_ids[mask], dist_nodes[mask]):
-                if layer_nid not in odlayer_nodes:
-                    lid = f"{layer_nid}_{nid}"
-                    transit_links.append({'id': lid, 'upstream_node': layer_nid, 'downstream_node': nid, 'dist': dist})
-                    connected = True
-            if not connected and secure_connection_distance is not None:
-                secure_mask = dist_nodes < secure_connection_distance
-                for layer_nid, dist in zip(graph_node_ids[secure_mask], dist_nodes[secure_mask]):
+        for od_nodes, from_od in [(odlayer.origins, True), (odlayer.destinations, False)]:
+            od_ids = list(od_nodes.keys())
+            neighbors = nodes_index.within([od_nodes[nid] for nid in od_ids], connection_distance)
+            isolated = []
+            for nid, (ind, dists) in zip(od_ids, neighbors):
+                connected = False
+                for layer_nid, dist in zip([graph_node_ids[i] for i in ind], dists):
                     if layer_nid not in odlayer_nodes:
-                        lid = f"{nid}_{layer_nid}"
-                        transit_links.append({'id': lid,'upstream_node': layer_nid,'downstream_node': nid,'dist': dist})
+                        transit_links.append(_transit_link(nid, layer_nid, dist, from_od))
+                        connected = True
+                if not connected:
+                    isolated.append(nid)
+            if isolated and secure_connection_distance is not None:
+                neighbors = nodes_index.within([od_nodes[nid] for nid in isolated], secure_connection_distance)
+                for nid, (ind, dists) in zip(isolated, neighbors):
+                    for layer_nid, dist in zip([graph_node_ids[i] for i in ind], dists):
+                        if layer_nid not in odlayer_nodes:
+                            transit_links.append(_transit_link(nid, layer_nid, dist, from_od))
 
         return transit_links
 
@@ -236,10 +259,14 @@ class MultiLayerGraph(object):
             odlayer: Origin destination layer
             connection_distance: Distance to be considered for connecting an origin destination layer node to mobility service layer nodes
         """
-        self.graph: OrientedGraph = merge_oriented_graph([l.graph for l in layers])
+        self.graph: OrientedGraph = _merge_graphs([l.graph for l in layers])
+
+        self.veh_manager: VehicleManager = VehicleManager()
 
         for l in layers:
             l.multi_graph = self
+            for service in l.mobility_services.values():
+                service.fleet.set_vehicle_manager(self.veh_manager)
 
         self.layers = dict()
 
@@ -252,6 +279,10 @@ class MultiLayerGraph(object):
 
         self.dynamic_space_sharing = DynamicSpaceSharing(self)
 
+        self._index: Optional[GraphIndex] = None
+        self._index_stale: bool = False
+        self._cost_table: Optional[LinkCostTable] = None
+
         for l in layers:
             self.map_reference_links.maps.append(l.map_reference_links)
             for lid in l.map_reference_links.keys():
@@ -274,6 +305,8 @@ class MultiLayerGraph(object):
         state = self.__dict__.copy()
         if 'graph' in state:
             del state['graph']
+        state['_index'] = None
+        state['_cost_table'] = None
         return state
 
     def __setstate__(self, state):
@@ -282,13 +315,63 @@ class MultiLayerGraph(object):
         # On pourrait éventuellement recréer ou initier 'b' ici
         self.graph = OrientedGraph()
 
+    @property
+    def index(self) -> GraphIndex:
+        """Interning table of the nodes and links of the graph, it is built on first
+        access and kept up to date with the changes of topology notified by
+        notify_topology_change.
+        """
+        if self._index is None or self._index.graph is not self.graph:
+            self._index = GraphIndex(self.graph)
+            self._index_stale = False
+        elif self._index_stale:
+            self._index.refresh()
+            self._index_stale = False
+        return self._index
+
+    @property
+    def cost_table(self) -> LinkCostTable:
+        """Table of the costs of the links, indexed as the index of the graph. It is
+        filled by initialize_costs, or read from the graph on first access otherwise.
+        """
+        index = self.index
+        if self._cost_table is None or self._cost_table.index is not index:
+            self._cost_table = LinkCostTable(index)
+            self._cost_table.read_graph()
+        elif self._cost_table.size < index.nb_links:
+            self._cost_table.read_graph(np.arange(self._cost_table.size, index.nb_links))
+        return self._cost_table
+
+    def notify_topology_change(self, added_links: Optional[List[str]] = None, deleted_links: Optional[List[str]] = None):
+        """Method to call when nodes or links are added to or deleted from the graph,
+        so that the index of the graph is updated.
+
+        Args:
+            -added_links: ids of the links added, if both lists are None the whole
+             index is refreshed at its next access
+            -deleted_links: ids of the links deleted
+        """
+        if self._index is None:
+            return
+        if added_links is None and deleted_links is None:
+            self._index_stale = True
+            return
+        for lid in deleted_links or []:
+            self._index.remove_link(lid)
+        if added_links:
+            glinks = self.graph.links
+            gnodes = self.graph.nodes
+            for lid in added_links:
+                self._index.intern_link(lid, glinks[lid], gnodes)
+
     def add_transit_links(self, transit_links):
         gnodes = self.graph.nodes
+        added_links = []
 
         for tl in transit_links:
             # Check that this transit link does not already exist
-            if tl['upstream_node'] in self.graph.nodes and tl['downstream_node'] in self.graph.nodes[tl['upstream_node']].adj:
-                link = self.graph.nodes[tl['upstream_node']].adj[tl['downstream_node']]
+            if tl['upstream_node'] in gnodes and tl['downstream_node'] in gnodes[tl['upstream_node']].adj:
+                link = gnodes[tl['upstream_node']].adj[tl['downstream_node']]
                 log.warning(f"A transit link from {tl['upstream_node']} to {tl['downstream_node']} already exists (link id = {link.id})")
                 continue
 
@@ -304,10 +387,11 @@ class MultiLayerGraph(object):
                                   'travel_time': tl['dist']/self.transitlayer.walk_speed}}
             self.graph.add_link(tl['id'], tl['upstream_node'], tl['downstream_node'],
                 tl['dist'], costs, "TRANSIT")
+            added_links.append(tl['id'])
 
             # Update the other costs within simulation
             if self.transitlayer.walk_speed is not None:
-                link = self.graph.nodes[tl['upstream_node']].adj[tl['downstream_node']]
+                link = gnodes[tl['upstream_node']].adj[tl['downstream_node']]
                 for mservice, cost_functions in self.transitlayer._costs_functions.items():
                     for cost_name, cost_func in cost_functions.items():
                         costs[mservice][cost_name] = cost_func(gnodes, self.transitlayer, link, costs)
@@ -315,15 +399,19 @@ class MultiLayerGraph(object):
 
             # Add the transit link into the map_linkid_layerid and the transit layer
             self.map_linkid_layerid[tl['id']] = "TRANSIT"
-            up_layer = self.graph.nodes[tl['upstream_node']].label
-            down_layer = self.graph.nodes[tl['downstream_node']].label
+            up_layer = gnodes[tl['upstream_node']].label
+            down_layer = gnodes[tl['downstream_node']].label
             self.transitlayer.add_link(tl['id'], up_layer, down_layer)
 
+        self.notify_topology_change(added_links=added_links)
+
     def add_origin_destination_layer(self, odlayer: OriginDestinationLayer):
         self.odlayer = odlayer
 
         [self.graph.add_node(nid, pos[0], pos[1], odlayer.id) for nid, pos in odlayer.origins.items()]
         [self.graph.add_node(nid, pos[0], pos[1], odlayer.id) for nid, pos  in odlayer.destinations.items()]
+        odlayer.build_spatial_index()
+        self.notify_topology_change()
 
     def connect_origindestination_layers(self, connection_distance: float, secure_connection_distance: float = None):
         """
@@ -352,23 +440,18 @@ class MultiLayerGraph(object):
              connection_distance (m)
         """
         assert self.odlayer is not None #TODO: why this condition?
-        _norm = np.linalg.norm
         gnodes = self.graph.nodes
 
-        graph_node_ids = np.array([nid for nid in self.layers[layer_id].graph.nodes])
-        graph_node_pos = np.array([n.position for n in self.layers[layer_id].graph.nodes.values()])
+        nodes_index = NodesIndex({nid: n.position for nid, n in self.layers[layer_id].graph.nodes.items()})
+        graph_node_ids = nodes_index.ids
 
-        graph_nodes = self.layers[layer_id].graph.nodes
-        for nid in graph_nodes:
-            node = graph_nodes[nid]
-            npos = np.array(node.position)
-            dist_nodes = _norm(graph_node_pos - npos, axis=1)
-            mask = dist_nodes < connection_distance
-            for layer_nid, dist in zip(graph_node_ids[mask], dist_nodes[mask]):
+        neighbors = nodes_index.within(nodes_index.positions, connection_distance)
+        for nid, (ind, dists) in zip(graph_node_ids, neighbors):
+            for layer_nid, dist in zip([graph_node_ids[i] for i in ind], dists):
                 bool_connect = (layer_nid != nid)
                 if bool_connect:
                     # Check if a link does not already exist between these two nodes
-                    if nid in gnodes and layer_nid in self.graph.nodes[nid].adj:
+                    if nid in gnodes and layer_nid in gnodes[nid].adj:
                         link = gnodes[nid].adj[layer_nid]
                         if link.label == 'TRANSIT':
                             log.warning(f'A transit link already exist from {nid} to {layer_nid} (link id = {link.id})')
@@ -378,6 +461,7 @@ class MultiLayerGraph(object):
                     self.map_linkid_layerid[lid] = "TRANSIT"
                     # Add the transit link into the transit layer
                     self.transitlayer.add_link(lid, layer_id, layer_id)
+        self.notify_topology_change()
 
     def connect_inter_layers(self, layer_id_list, connection_distance: float, extend_connect=False, max_connect_dist=100):
         """
@@ -393,6 +477,7 @@ class MultiLayerGraph(object):
         """
         assert self.odlayer is not None #TODO: why this condition?
         _norm = np.linalg.norm
+        gnodes = self.graph.nodes
 
         for olayer_id in layer_id_list:
             onodes = self.layers[olayer_id].get_connection_nodes()
@@ -415,8 +500,8 @@ class MultiLayerGraph(object):
                                     mask[np.argmin(dist_nodes)] = True
                             for layer_nid, dist in zip(graph_dnode_ids[mask], dist_nodes[mask]):
                                 # Check if this transit link already exist
-                                if onid in self.graph.nodes and layer_nid in self.graph.nodes[onid].adj:
-                                    link = self.graph.nodes[onid].adj[layer_nid]
+                                if onid in gnodes and layer_nid in gnodes[onid].adj:
+                                    link = gnodes[onid].adj[layer_nid]
                                     log.warning(f'A transit link from {onid} to {layer_nid} already exists (link id = {link.id})')
                                     continue
                                 lid = f"{onid}_{layer_nid}"
@@ -424,6 +509,19 @@ class MultiLayerGraph(object):
                                 self.map_linkid_layerid[lid] = "TRANSIT"
                                 # Add the transit link into the transit layer
                                 self.transitlayer.add_link(lid, olayer_id, dlayer_id)
+        self.notify_topology_change()
+
+    def set_vehicle_manager(self, veh_manager: VehicleManager):
+        """Method that sets the vehicle registry shared by the fleets of all the
+        mobility services of this graph.
+
+        Args:
+            -veh_manager: the vehicle registry
+        """
+        self.veh_manager = veh_manager
+        for layer in self.layers.values():
+            for service in layer.mobility_services.values():
+                service.fleet.set_vehicle_manager(veh_manager)
 
     def construct_layer_service_mapping(self):
         for layer in self.layers.values():
@@ -440,6 +538,7 @@ class MultiLayerGraph(object):
                 costs = {"WALK": costs}
             self.graph.add_link(lid, upstream, downstream, length, costs, "TRANSIT")
             self.map_linkid_layerid[lid]="TRANSIT"
+            self.notify_topology_change(added_links=[lid])
             # Add the transit link into the transit layer
             link_olayer_id = self.graph.nodes[upstream].label
             link_dlayer_id = self.graph.nodes[downstream].label
@@ -447,45 +546,123 @@ class MultiLayerGraph(object):
 
     def initialize_costs(self,walk_speed):
         gnodes = self.graph.nodes
-
-        # Initialize costs on links
-        link_layers = list()
-
-        for lid, layer in self.layers.items():
-            link_layers.append(layer.graph.links)  # only non transit links concerned
-
-        for link in self.graph.links.values():
-            costs = {}
-            if link.label == "TRANSIT":
-                layer = self.transitlayer
+        index = self.index
+        index.ensure_arrays()
+
+        # The costs are computed layer per layer in the cost table, then pushed to
+        # the graphs in bulk
+        self._cost_table = LinkCostTable(index)
+        self._cost_table.read_graph()
+        table = self._cost_table
+
+        alive = index.link_alive
+        links_costs = dict()
+        for label, layer in [("TRANSIT", self.transitlayer)] + list(self.layers.items()):
+            links = np.flatnonzero(alive & (index.link_labels == label))
+            if len(links) == 0:
+                continue
+            if label == "TRANSIT":
                 speed = walk_speed
-                costs["WALK"] = {"speed": speed,
-                                 "travel_time": link.length / speed,
-                                 "length": link.length}
-                # NB: travel_time could be defined as a cost_function
-                for mservice, cost_functions in layer._costs_functions.items():
-                    for cost_name, cost_func in cost_functions.items():
-                        costs[mservice][cost_name] = cost_func(gnodes, layer, link, costs)
+                services = ["WALK"]
             else:
-                layer = self.layers[link.label]
                 speed = layer.default_speed
-                for mservice in layer.mobility_services.keys():
-                    costs[mservice] = {"speed": speed,
-                                       "travel_time": link.length / speed,
-                                       "length": link.length}
-                # NB: travel_time could be defined as a cost_function
-                for mservice, cost_functions in layer._costs_functions.items():
-                    for cost_name, cost_func in cost_functions.items():
-                        costs[mservice][cost_name] = cost_func(gnodes, layer, link, costs)
+                services = list(layer.mobility_services.keys())
+            lengths = index.link_lengths[links]
+            for mservice in services:
+                table.set(mservice, "speed", links, speed)
+                table.set(mservice, "travel_time", links, lengths / speed)
+                table.set(mservice, "length", links, lengths)
+            table.add_services(links, services)
+            # NB: travel_time could be defined as a cost_function
+            costs = self.compute_costs(layer, links, services, gnodes)
+            links_costs[label] = dict(zip([index.link_ids[l] for l in links], costs))
+
+        self.push_costs(links_costs)
+
+    def compute_costs(self, layer: CostFunctionLayer, links: np.ndarray, services: List[str], gnodes=None) -> List[Dict[str, Dict[str, float]]]:
+        """Method that applies the cost functions of a layer on links whose speed,
+        travel time and length are up to date in the cost table. Vectorized cost
+        functions are evaluated on all the links at once, the other ones link per link.
+
+        Args:
+            -layer: the layer of the links
+            -links: indexes of the links in the index of the graph
+            -services: the mobility services whose costs are updated
+            -gnodes: the nodes of the graph, passed for performance reasons
 
-            link.update_costs(costs)
+        Returns:
+            -the updated costs of each link, in the format of the HiPOP graph
+        """
+        table = self.cost_table
+        names = defaultdict(list)
+        for mservice in services:
+            names[mservice].extend(LinkCostTable.base_costs)
+
+        links_costs = None
+        glinks = None
+        for mservice, cost_functions in layer._costs_functions.items():
+            for cost_name, cost_func in cost_functions.items():
+                if isinstance(cost_func, VectorizedCostFunction):
+                    values = cost_func.evaluate(layer, table.service_costs(mservice, links, names[mservice]))
+                    if links_costs is not None:
+                        for link_costs, value in zip(links_costs, values.tolist()):
+                            link_costs[mservice][cost_name] = value
+                else:
+                    if links_costs is None:
+                        links_costs = table.link_costs(links, names)
+                        glinks = self.graph.links
+                        gnodes = self.graph.nodes if gnodes is None else gnodes
+                    link_ids = self.index.link_ids
+                    values = list()
+                    for l, link_costs in zip(links, links_costs):
+                        value = cost_func(gnodes, layer, glinks[link_ids[l]], link_costs)
+                        link_costs[mservice][cost_name] = value
+                        values.append(value)
+                table.set(mservice, cost_name, links, values)
+                if cost_name not in names[mservice]:
+                    names[mservice].append(cost_name)
+
+        extra_services = [mservice for mservice in names if mservice not in services]
+        if extra_services:
+            table.add_services(links, extra_services)
+
+        if links_costs is None:
+            links_costs = table.link_costs(links, names)
+        return links_costs
+
+    def push_costs(self, links_costs: Dict[str, Dict[str, Dict[str, Dict[str, float]]]]):
+        """Method that updates the costs of links in the multi layer graph and in the
+        graphs of the layers, with one bulk update per graph.
+
+        Args:
+            -links_costs: dict with the layers ids as keys and dicts of the costs of
+             the links of the layer (in the format of the HiPOP graph) as values
+        """
+        all_costs = dict()
+        for label, costs in links_costs.items():
+            if not costs:
+                continue
+            all_costs.update(costs)
+            layer = self.layers.get(label)
+            if layer is not None:
+                layer.graph.update_costs(costs)
+        if all_costs:
+            self.graph.update_costs(all_costs)
 
-            for links in link_layers: # only non transit links concerned
-                layer_link = links.get(link.id, None)
-                if layer_link is not None:
-                    layer_link.update_costs(costs)
+    def add_cost_function(self, layer_id: str, cost_name: str, cost_function: Callable, mobility_service: Optional[str] = None,
+                          vectorized: bool = False):
+        """Method that adds a cost function on a layer.
 
-    def add_cost_function(self, layer_id: str, cost_name: str, cost_function: Callable, mobility_service: Optional[str] = None):
+        Args:
+            -layer_id: id of the layer, TRANSIT for the transit layer
+            -cost_name: name of the cost
+            -cost_function: the cost function, with the signature (gnodes, layer, link, costs)
+             or, if vectorized is True, (layer, costs) where costs are arrays of the
+             costs of all the links of the layer
+            -mobility_service: mobility service the cost is computed for, all the
+             services of the layer if None
+            -vectorized: if True the cost function is evaluated on all the links at once
+        """
         # Retrieve layer
         if layer_id == 'TRANSIT':
             layer = self.transitlayer
@@ -495,11 +672,12 @@ class MultiLayerGraph(object):
             mservices = list(layer.mobility_services.keys())
 
         # Add cost function on layer
+        add_cost_function = layer.add_vectorized_cost_function if vectorized else layer.add_cost_function
         if mobility_service is not None:
-            layer.add_cost_function(mobility_service, cost_name, cost_function)
+            add_cost_function(mobility_service, cost_name, cost_function)
         else:
             for mservice in mservices:
-                layer.add_cost_function(mservice, cost_name, cost_function)
+                add_cost_function(mservice, cost_name, cost_function)
 
     def add_zone(self, zone: MLZone):
         if zone.id in self.zones.keys():
@@ -594,7 +772,11 @@ class SimpleLayer(AbstractLayer):
         # for mservice in costs:
         #     assert mservice == "WALK" or mservice in self.mobility_services.keys(), f"Mobility service {mservice} defined in costs is not in {self.id} mobility services"
 
-        length = sum(self.roads.sections[l].length for l in road_links)
+        sections = self.roads.sections
+        if len(road_links) == 1:
+            length = sections[road_links[0]].length
+        else:
+            length = sum(sections[l].length for l in road_links)
         self.graph.add_link(lid, upstream, downstream, length, costs, self.id)
 
         self.map_reference_links[lid] = road_links
@@ -994,6 +1176,7 @@ class SharedVehicleLayer(AbstractLayer):
                     self.multi_graph.graph.delete_link(link_id)
                     self.multi_graph.transitlayer.links[layer_id][self._id].remove(link_id)
                     del self.multi_graph.map_linkid_layerid[link_id]
+                self.multi_graph.notify_topology_change(deleted_links=[link_id for _,link_id,_,_ in to_delete])
                 # Remove the station
                 self.stations.remove(s)
                 # Return the list of links that have been deleted
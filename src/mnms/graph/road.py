@@ -4,6 +4,7 @@ from typing import List, Optional, Dict
 import numpy as np
 
 from mnms.graph.zone import Zone, construct_zone_from_contour
+from mnms.tools.geometry import ZonesIndex
 
 
 def _compute_dist(pos1: np.ndarray, pos2: np.ndarray):
@@ -34,7 +35,7 @@ class RoadStop:
 
 
 class RoadDescriptor(object):
-    __slots__ = ('nodes', 'sections', 'zones', 'stops')
+    __slots__ = ('nodes', 'sections', 'zones', 'stops', '_zones_index', '_zones_key')
 
     def __init__(self):
         """
@@ -45,6 +46,42 @@ class RoadDescriptor(object):
         self.sections: Dict[str, RoadSection] = dict()
 
         self.zones = dict()
+        self._zones_index: Optional[ZonesIndex] = None
+        self._zones_key: Optional[tuple] = None
+
+    def __getstate__(self):
+        return {attr: getattr(self, attr) for attr in ('nodes', 'sections', 'zones', 'stops')}
+
+    def __setstate__(self, state):
+        for attr, value in state.items():
+            setattr(self, attr, value)
+        self._zones_index = None
+        self._zones_key = None
+
+    @property
+    def zones_index(self) -> ZonesIndex:
+        """Spatial index of the zones, in the order of the zones dict. It is rebuilt
+        when a zone or a zone contour is replaced.
+        """
+        key = tuple((zid, id(zone.contour)) for zid, zone in self.zones.items())
+        if self._zones_index is None or key != self._zones_key:
+            self._zones_index = ZonesIndex([zone.prepared for zone in self.zones.values()])
+            self._zones_key = key
+        return self._zones_index
+
+    def locate_zones(self, points) -> np.ndarray:
+        """Method that finds the zone containing each point, in one call. A point in
+        several zones is located in the first one.
+
+        Args:
+            -points: the points
+
+        Returns:
+            -array of the ids of the zones of the points, empty string for the points
+             outside of all zones
+        """
+        zone_ids = np.array(list(self.zones.keys()) + [''], dtype=object)
+        return zone_ids[self.zones_index.assign(points)]
 
     def register_node(self, nid: str, pos: List[float]):
         self.nodes[nid] = RoadNode(nid, np.array(pos))
@@ -76,6 +113,42 @@ class RoadDescriptor(object):
                                          downstream,
                                          section_length)
 
+    def register_nodes(self, nids: List[str], positions: np.ndarray):
+        """Method that registers many nodes at once, faster than calling register_node
+        for each node on large networks.
+
+        Args:
+            -nids: the ids of the nodes
+            -positions: array of shape (len(nids), 2) of the positions of the nodes
+        """
+        positions = np.asarray(positions)
+        assert positions.shape == (len(nids), 2), "positions should be of shape (number of nodes, 2)"
+        self.nodes.update(zip(nids, map(RoadNode, nids, positions)))
+
+    def register_sections(self, lids: List[str], upstreams: List[str], downstreams: List[str],
+                          lengths: Optional[np.ndarray] = None):
+        """Method that registers many sections at once, faster than calling register_section
+        for each section on large networks.
+
+        Args:
+            -lids: the ids of the sections
+            -upstreams: the ids of the upstream nodes of the sections
+            -downstreams: the ids of the downstream nodes of the sections
+            -lengths: the lengths of the sections, computed from the positions of
+             the nodes if None
+        """
+        assert len(lids) == len(upstreams) == len(downstreams), "lids, upstreams and downstreams should have the same length"
+        unknown = set(upstreams).union(downstreams).difference(self.nodes)
+        assert not unknown, f"{sorted(unknown)[:10]} nodes are not registered"
+
+        if lengths is None:
+            up_pos = np.array([self.nodes[nid].position for nid in upstreams], dtype=float).reshape(-1, 2)
+            down_pos = np.array([self.nodes[nid].position for nid in downstreams], dtype=float).reshape(-1, 2)
+            lengths = np.linalg.norm(down_pos - up_pos, axis=1)
+        assert len(lengths) == len(lids), "lengths should have the same length as lids"
+
+        self.sections.update(zip(lids, map(RoadSection, lids, upstreams, downstreams, np.asarray(lengths).tolist())))
+
     def add_zone(self, zone: Zone):
         self.zones[zone.id] = zone
         zid = zone.id
@@ -106,7 +179,7 @@ class RoadDescriptor(object):
         return {'NODES': {key: asdict(val) for key, val in self.nodes.items()},
                 'STOPS': {key: asdict(val) for key, val in self.stops.items()},
                 'SECTIONS': {key: asdict(val) for key, val in self.sections.items()},
-                'ZONES': {key: asdict(val) for key, val in self.zones.items()}}
+                'ZONES': {key: {k: v for k, v in asdict(val).items() if not k.startswith('_')} for key, val in self.zones.items()}}
 
     @classmethod
     def __load__(cls, data):
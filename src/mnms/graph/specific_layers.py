@@ -1,23 +1,171 @@
+import sys
+from itertools import chain
+from typing import List, Optional
+
 from mnms.log import create_logger
 import numpy as np
 
 log = create_logger(__name__)
 
+# Under this number of (point, node) pairs, the distances are computed all at once
+# instead of building a KD-tree
+_BRUTE_FORCE_SIZE = 2 ** 20
+
+
+class NodesIndex(object):
+    def __init__(self, nodes: dict):
+        """KD-tree over the positions of a set of nodes, built on first use.
+
+        Args:
+            -nodes: dict with nodes ids as keys and positions as values
+        """
+        self.ids = list(nodes.keys())
+        self.positions = np.array([np.asarray(pos, dtype=float)[:2] for pos in nodes.values()], dtype=float).reshape(-1, 2)
+        self._tree = None
+
+    @property
+    def tree(self):
+        """The KD-tree is built on first use, so that scipy is only imported when
+        positions are actually snapped.
+        """
+        if self._tree is None and self.ids:
+            from scipy.spatial import cKDTree
+            self._tree = cKDTree(self.positions)
+        return self._tree
+
+    def snap(self, positions) -> List[str]:
+        """Returns the id of the closest node of each position, ties are broken
+        by the order of insertion of the nodes.
+
+        Args:
+            -positions: array of shape (n, 2)
+
+        Returns:
+            -nodes: list of the ids of the closest nodes
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        if len(positions) == 0:
+            return []
+        if self.tree is None:
+            log.error('Cannot snap positions on an empty set of OD nodes')
+            sys.exit(-1)
+
+        k = min(2, len(self.ids))
+        dist, ind = self.tree.query(positions, k=k)
+        if k == 1:
+            return [self.ids[i] for i in ind]
+
+        nearest = ind[:, 0]
+        # With several nodes at the same distance, the KD-tree does not guarantee
+        # which one is returned, look for the first inserted one
+        ties = np.flatnonzero(np.isclose(dist[:, 1], dist[:, 0], rtol=1e-9, atol=1e-9))
+        for i in ties:
+            candidates = np.sort(self.tree.query_ball_point(positions[i], dist[i, 0] * (1 + 1e-9) + 1e-9))
+            norms = np.linalg.norm(self.positions[candidates] - positions[i], axis=1)
+            nearest[i] = candidates[np.argmin(norms)]
+
+        return [self.ids[i] for i in nearest]
+
+    def within(self, points, radius: float):
+        """Returns the nodes strictly closer than radius to each point, the KD-tree
+        is only built for large sets of nodes and points.
+
+        Args:
+            -points: array of shape (n, 2)
+            -radius: the radius around each point
+
+        Returns:
+            -neighbors: list with for each point the list of the indices of the nodes
+             in their order of insertion, and the list of their distances to the point
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if not self.ids:
+            return [([], []) for _ in range(len(points))]
+
+        if len(points) * len(self.ids) <= _BRUTE_FORCE_SIZE:
+            dists = np.linalg.norm(points[:, None, :] - self.positions[None, :, :], axis=2)
+            point_ind, ind = np.nonzero(dists < radius)
+            dists = dists[point_ind, ind]
+        else:
+            neighbors = self.tree.query_ball_point(points, radius, return_sorted=True)
+            counts = np.fromiter(map(len, neighbors), dtype=int, count=len(neighbors))
+            ind = np.fromiter(chain.from_iterable(neighbors), dtype=int, count=counts.sum())
+            point_ind = np.repeat(np.arange(len(points)), counts)
+            dists = np.linalg.norm(points[point_ind] - self.positions[ind], axis=1)
+            mask = dists < radius
+            point_ind, ind, dists = point_ind[mask], ind[mask], dists[mask]
+
+        bounds = [0] + np.cumsum(np.bincount(point_ind, minlength=len(points))).tolist()
+        ind = ind.tolist()
+        dists = dists.tolist()
+        return [(ind[start:end], dists[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
 class OriginDestinationLayer(object):
     def __init__(self):
         self.origins = dict()
         self.destinations = dict()
         self.id = "ODLAYER"
 
+        self._origins_index: Optional[NodesIndex] = None
+        self._destinations_index: Optional[NodesIndex] = None
+
     def create_origin_node(self, nid, pos: np.ndarray):
         # new_node = Node(nid, pos[0], pos[1], self.id)
 
         self.origins[nid] = pos
+        self._origins_index = None
 
     def create_destination_node(self, nid, pos: np.ndarray):
         # new_node = Node(nid, pos[0], pos[1], self.id)
 
         self.destinations[nid] = pos
+        self._destinations_index = None
+
+    def build_spatial_index(self):
+        """Method that builds the KD-trees used to snap positions on the origins and
+        destinations. It is called when the layer is added to a MultiLayerGraph, and
+        the indexes are rebuilt lazily if nodes are created afterwards.
+        """
+        self._origins_index = NodesIndex(self.origins)
+        self._destinations_index = NodesIndex(self.destinations)
+
+    def snap_origins(self, positions) -> List[str]:
+        """Method that returns the closest origin of each position.
+
+        Args:
+            -positions: array of shape (n, 2)
+
+        Returns:
+            -origins: list of the ids of the closest origins
+        """
+        if self._origins_index is None:
+            self._origins_index = NodesIndex(self.origins)
+        return self._origins_index.snap(positions)
+
+    def snap_destinations(self, positions) -> List[str]:
+        """Method that returns the closest destination of each position.
+
+        Args:
+            -positions: array of shape (n, 2)
+
+        Returns:
+            -destinations: list of the ids of the closest destinations
+        """
+        if self._destinations_index is None:
+            self._destinations_index = NodesIndex(self.destinations)
+        return self._destinations_index.snap(positions)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_origins_index'] = None
+        state['_destinations_index'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._origins_index = None
+        self._destinations_index = None
 
     def __dump__(self):
         return {'ORIGINS': {node: self.origins[node] for node in self.origins},
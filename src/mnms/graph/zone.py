@@ -1,9 +1,9 @@
-from typing import Set, List, Annotated
-from dataclasses import dataclass
+from typing import Set, List, Annotated, Optional
+from dataclasses import dataclass, field
 
 import numpy as np
 
-from mnms.tools.geometry import points_in_polygon
+from mnms.tools.geometry import points_in_polygon, PreparedPolygon
 
 Point = Annotated[List[float], 2]
 PointList = List[Point]
@@ -14,9 +14,19 @@ class Zone(object):
     id: str
     sections: Set[str]
     contour: PointList
+    _prepared: Optional[PreparedPolygon] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def prepared(self) -> PreparedPolygon:
+        """Contour of the zone prepared for point in polygon tests, it is rebuilt
+        when the contour is replaced.
+        """
+        if self._prepared is None or self._prepared.source is not self.contour:
+            self._prepared = PreparedPolygon(self.contour)
+        return self._prepared
 
     def is_inside(self, points: List[Point]):
-        return points_in_polygon(self.contour, points)
+        return points_in_polygon(self.prepared, points)
 
     def centroid(self):
         arr = np.array(self.contour)
@@ -40,35 +50,68 @@ class LayerZone(object):
     links: Set[str]
     contour : PointList
     detour_ratio : float = 1.343
+    _prepared: Optional[PreparedPolygon] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def prepared(self) -> PreparedPolygon:
+        """Contour of the zone prepared for point in polygon tests, it is rebuilt
+        when the contour is replaced.
+        """
+        if self._prepared is None or self._prepared.source is not self.contour:
+            self._prepared = PreparedPolygon(self.contour)
+        return self._prepared
 
     def is_inside(self, points: List[Point]):
-        return points_in_polygon(self.contour, points)
+        return points_in_polygon(self.prepared, points)
 
-def construct_zone_from_contour(roads: "RoadDescriptor", id: str, contour: PointList, graph=None, zone_type='Zone'):
-    sections = roads.sections if graph is None else graph.links
-    nodes = roads.nodes if graph is None else graph.nodes
-    section_centers = [0 for _ in range(len(sections))]
+def _sections_centers(sections, nodes):
     section_ids = np.array([s for s in sections])
+    positions = np.array([[nodes[data.upstream].position, nodes[data.downstream].position]
+                          for data in sections.values()], dtype=float).reshape(-1, 2, 2)
+    section_centers = (positions[:, 0] + positions[:, 1]) / 2.
+    return section_ids, section_centers
+
 
-    for i, data in enumerate(sections.values()):
-        up_pos = nodes[data.upstream].position
-        down_pos = nodes[data.downstream].position
-        section_centers[i] = np.array([(up_pos[0] + down_pos[0]) / 2., (up_pos[1] + down_pos[1]) / 2.])
+def construct_zone_from_contour(roads: "RoadDescriptor", id: str, contour: PointList, graph=None, zone_type='Zone'):
+    return construct_zones_from_contours(roads, [id], [contour], graph=graph, zone_type=zone_type)[0]
+
+
+def construct_zones_from_contours(roads: "RoadDescriptor", ids: List[str], contours: List[PointList], graph=None, zone_type='Zone'):
+    """Function that builds several zones from their contours, the centers of the
+    sections (or links) are computed once for all the zones.
 
-    section_centers = np.array(section_centers)
+    Args:
+        -roads: the roads the zones are built on, used if graph is None
+        -ids: the ids of the zones
+        -contours: the contours of the zones
+        -graph: the graph the zones are built on
+        -zone_type: type of the zones, Zone if built on the roads, MLZone or LayerZone if built on a graph
 
-    contour_array = np.array(contour)
-    mask = points_in_polygon(contour_array, section_centers)
-    zone_links = section_ids[mask].tolist()
+    Returns:
+        -the list of the zones
+    """
     if graph is None:
         assert zone_type == 'Zone', 'Inconsistent arguments in construct_zone_from_contour function...'
-        return Zone(id, zone_links, contour)
     else:
         assert zone_type in ['MLZone', 'LayerZone'], 'Unknown zone type argument in construct_zone_from_contour function...'
-        if zone_type == 'MLZone':
-            return MLZone(id, zone_links, contour)
+    sections = roads.sections if graph is None else graph.links
+    nodes = roads.nodes if graph is None else graph.nodes
+    section_ids, section_centers = _sections_centers(sections, nodes)
+
+    zones = []
+    for id, contour in zip(ids, contours):
+        prepared = PreparedPolygon(contour)
+        zone_links = section_ids[prepared.contains(section_centers)].tolist()
+        if graph is None:
+            zone = Zone(id, zone_links, contour)
+        elif zone_type == 'MLZone':
+            zone = MLZone(id, zone_links, contour)
         else:
-            return LayerZone(id, zone_links, contour)
+            zone = LayerZone(id, zone_links, contour)
+        if zone_type != 'MLZone':
+            zone._prepared = prepared
+        zones.append(zone)
+    return zones
 
 
 def construct_zone_from_sections(roads: "RoadDescriptor", _id: str, sections: List[str]):
@@ -3,6 +3,10 @@ from importlib import import_module
 
 import numpy as np
 
+from mnms.log import create_logger
+
+log = create_logger(__name__)
+
 
 def load_class_by_module_name(cls):
     cls_name = cls.split('.')[-1]
@@ -23,3 +27,39 @@ class MNMSEncoder(JSONEncoder):
             return int(obj)
 
         return super().default(obj)
+
+
+def freeze_outfile(state: dict, key: str):
+    """Replaces an open output file of a state to pickle by its name and by the
+    position reached in it. The file is flushed so that the rows written so far
+    are on disk.
+
+    Args:
+        -state: state of the object to pickle
+        -key: key of the output file in the state
+    """
+    outfile = state.get(key)
+    if outfile is not None and not isinstance(outfile, tuple) and not outfile.closed:
+        outfile.flush()
+        state[key] = (outfile.name, outfile.tell())
+
+
+def thaw_outfile(state: dict, key: str):
+    """Reopens an output file frozen by freeze_outfile to write after the rows
+    written before the state was pickled. Rows written after that point, by a run
+    which went on after the snapshot, are discarded. No header is written again.
+
+    Args:
+        -state: unpickled state of the object
+        -key: key of the output file in the state
+    """
+    frozen = state.get(key)
+    if not isinstance(frozen, tuple):
+        return
+    filename, position = frozen
+    outfile = open(filename, 'a')
+    if outfile.tell() > position:
+        outfile.truncate(position)
+    elif outfile.tell() < position:
+        log.warning(f'Output file {filename} is shorter than when the snapshot was taken, rows are missing')
+    state[key] = outfile
@@ -26,6 +26,24 @@ def create_logger(logname,
     return logger
 
 
+def is_enabled(logger: logging.Logger, level: int) -> bool:
+    """Returns True if the messages of this level are handled by the logger.
+
+    Messages logged with %-style arguments, e.g. log.info('User %s arrived', uid),
+    are only formatted when they are handled. When computing the arguments
+    themselves is costly, test is_enabled before the logging call so that nothing
+    is done when the level is off.
+
+    Args:
+        -logger: the logger
+        -level: the level of the messages
+
+    Returns:
+        -True if the messages are handled
+    """
+    return logger.isEnabledFor(level)
+
+
 def get_all_mnms_logger():
     return [logging.getLogger(name) for name in logging.root.manager.loggerDict if name.startswith('mnms')]
 
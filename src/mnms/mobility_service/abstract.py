@@ -12,8 +12,8 @@ from mnms.vehicles.veh_type import Vehicle, VehicleActivity, VehicleActivityStop
 from hipop.shortest_path import dijkstra
 from mnms.graph.zone import LayerZone
 from mnms.mobility_service.interfaces import Depot
-from mnms.tools.geometry import polygon_area, get_bounding_box, voronoi_zones
-from mnms.graph.zone import LayerZone, construct_zone_from_contour
+from mnms.tools.geometry import polygon_area, get_bounding_box, voronoi_zones, ZonesIndex
+from mnms.graph.zone import LayerZone, construct_zones_from_contours
 
 log = create_logger(__name__)
 
@@ -61,6 +61,7 @@ def compute_path_nodes_travel_time(path_nodes, gnodes, ms_id):
 
 
 class Request(object):
+    __slots__ = ('user', 'drop_node', 'request_time', 'pickup_node')
 
     def __init__(self, user, drop_node, request_time):
         """Constructor of a Request object.
@@ -125,10 +126,22 @@ class AbstractMobilityService(ABC):
 
         self._observer: Optional = None
 
+        self._estimates_version: int = 0                   # Incremented each time estimates for planning change
+
     @property
     def id(self):
         return self._id
 
+    @property
+    def estimates_version(self):
+        return self._estimates_version
+
+    def notify_estimates_update(self):
+        """Method to call when the pickup time estimates or service level costs broadcasted
+        to the users for planning change, it invalidates their memoized values.
+        """
+        self._estimates_version += 1
+
     @property
     def user_buffer(self):
         return self._user_buffer
@@ -291,7 +304,7 @@ class AbstractMobilityService(ABC):
                         # Remove user from list of users waiting to be matched
                         self.cancel_request(uid)
                     else:
-                        log.info(f"{uid} refused {self.id} offer (predicted pickup time ({service_dt}) is too long, wait for better proposition...")
+                        log.info("%s refused %s offer (predicted pickup time (%s) is too long, wait for better proposition...", uid, self.id, service_dt)
                     self._cache_request_vehicles = dict()
             for uid in users_canceling:
                 self.cancel_request(uid)
@@ -667,6 +680,8 @@ class AbstractOnDemandMobilityService(AbstractMobilityService, metaclass=ABCMeta
         """
         super(AbstractOnDemandMobilityService, self).__init__(id, veh_capacity, dt_matching, dt_periodic_maintenance)
         self._zones = {}
+        self._zones_index: Optional[ZonesIndex] = None
+        self._zones_key: Optional[tuple] = None
         self.default_waiting_time = default_waiting_time
         self._estimated_pickup_times = {'default': default_waiting_time}
 
@@ -674,6 +689,17 @@ class AbstractOnDemandMobilityService(AbstractMobilityService, metaclass=ABCMeta
     def zones(self):
         return self._zones
 
+    @property
+    def zones_index(self) -> ZonesIndex:
+        """Spatial index of the zones of this service, in the order of the zones
+        dict. It is rebuilt when the zoning changes.
+        """
+        key = tuple((zid, id(zone.contour)) for zid, zone in self._zones.items())
+        if self._zones_index is None or key != self._zones_key:
+            self._zones_index = ZonesIndex([zone.prepared for zone in self._zones.values()])
+            self._zones_key = key
+        return self._zones_index
+
     @property
     def estimated_pickup_times(self):
         return self._estimated_pickup_times
@@ -715,6 +741,7 @@ class AbstractOnDemandMobilityService(AbstractMobilityService, metaclass=ABCMeta
         # Add the zone and initialize the estimated pickup time in it to the default value
         self._zones[zone.id] = zone
         self._estimated_pickup_times[zone.id] = self.default_waiting_time
+        self.notify_estimates_update()
 
     def add_zoning(self, zones: List[LayerZone]):
         """Method to add a zoning to the service.
@@ -739,11 +766,9 @@ class AbstractOnDemandMobilityService(AbstractMobilityService, metaclass=ABCMeta
             -estimated pickup time in seconds
         """
         # Find the zone(s) the pickup node belongs to
-        wts = []
-        for zid, z in self.zones.items():
-            punode_in_z = z.is_inside([self.graph.nodes[pu_node].position])[0]
-            if punode_in_z:
-                wts.append(self.estimated_pickup_times[zid])
+        zone_ids = list(self.zones.keys())
+        _, pu_zones = self.zones_index.memberships([self.graph.nodes[pu_node].position])
+        wts = [self.estimated_pickup_times[zone_ids[zi]] for zi in pu_zones]
         if wts:
             return np.mean(wts)
         else:
@@ -830,9 +855,9 @@ class AbstractOnDemandDepotMobilityService(AbstractOnDemandMobilityService):
             depots_pos = np.array([self.graph.nodes[n].position for n in depots_nodes])
             bbox = get_bounding_box(None, self.layer.graph)
             vor_contours = voronoi_zones(depots_pos, bbox)
-            for i, vor_contour in enumerate(vor_contours):
-                vor_zone = construct_zone_from_contour(None, f'Zone_{self.id}_{depots_nodes[i]}',
-                    vor_contour, graph=self.layer.graph, zone_type='LayerZone')
+            vor_ids = [f'Zone_{self.id}_{depots_nodes[i]}' for i in range(len(vor_contours))]
+            for vor_zone in construct_zones_from_contours(None, vor_ids, vor_contours,
+                    graph=self.layer.graph, zone_type='LayerZone'):
                 self.add_zone(vor_zone)
 
     def get_all_depots(self):
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from collections import defaultdict
 from typing import List, Union, Protocol, runtime_checkable, Iterable
 
 import numpy as np
@@ -20,14 +21,108 @@ class FilterProtocol(Protocol):
 
 
 def get_zone(roads: RoadDescriptor, position: List[float]) -> str:
-    for zid, zone in roads.zones.items():
-        if zone.is_inside(position):
-            return zid
-    else:
-        return ""
+    return roads.locate_zones([position])[0]
+
+
+def get_vehicles_zones(layer: AbstractLayer, vehicles: Iterable[Vehicle]) -> np.ndarray:
+    """Function that returns the zones of the roads in which vehicles are. The
+    assignment of the vehicles of a fleet to the zones is computed in one batched
+    call for the whole fleet and reused until the vehicles move.
+
+    Args:
+        -layer: the layer of the vehicles
+        -vehicles: the vehicles
+
+    Returns:
+        -array of the ids of the zones of the vehicles, empty string for the vehicles
+         outside of all zones
+    """
+    roads = layer.roads
+    zones_index = roads.zones_index
+    zone_ids = np.array(list(roads.zones.keys()) + [''], dtype=object)
+    vehicles = list(vehicles)
+    zones = np.full(len(vehicles), -1, dtype=np.int64)
+
+    services_vehicles = defaultdict(list)
+    for i, veh in enumerate(vehicles):
+        services_vehicles[veh.mobility_service].append(i)
+    for mservice, ind in services_vehicles.items():
+        service = layer.mobility_services.get(mservice)
+        if service is not None:
+            zones[ind] = service.fleet.zones(zones_index).first_zones([vehicles[i] for i in ind])
+        else:
+            ind = [i for i in ind if vehicles[i].position is not None]
+            zones[ind] = zones_index.assign([vehicles[i].position for i in ind])
+
+    return zone_ids[zones]
+
+
+def get_depots_zones(layer: AbstractLayer, depots: Iterable[Depot]) -> np.ndarray:
+    """Function that returns the zones of the roads in which depots are, in one call.
+
+    Args:
+        -layer: the layer of the depots
+        -depots: the depots
+
+    Returns:
+        -array of the ids of the zones of the depots, empty string for the depots
+         outside of all zones
+    """
+    nodes = layer.graph.nodes
+    return layer.roads.locate_zones([nodes[d.node].position for d in depots])
+
+
+# Cost hint of the filters which do not define one
+DEFAULT_FILTER_COST = 10.
+
+
+def filter_cost(f: FilterProtocol) -> float:
+    return getattr(f, 'cost', DEFAULT_FILTER_COST)
+
+
+def filter_is_pointwise(f: FilterProtocol) -> bool:
+    return getattr(f, 'pointwise', False)
+
+
+def combined_indices(filters: List[FilterProtocol], layer: AbstractLayer, items, position, other) -> NDArray[np.int64]:
+    """Function that evaluates a conjunction of filters lazily. Filters are evaluated
+    by increasing cost hint, each pointwise filter only on the items kept by the
+    previous ones, and the evaluation stops as soon as no item is left. Filters
+    which are not pointwise (their result for an item depends on the other items,
+    like IsNearestFilter) are evaluated on all the items, so that the result is the
+    same as the one of the evaluation of all filters on all items.
+
+    Args:
+        -filters: the filters
+        -layer: the layer
+        -items: the vehicles or the depots to filter
+        -position: the position given to the filters
+        -other: the depots or the vehicles given to the filters
+
+    Returns:
+        -the sorted indexes of the items kept by all filters
+    """
+    kept = np.arange(len(items))
+    for f in sorted(filters, key=filter_cost):
+        if len(kept) == 0:
+            break
+        if filter_is_pointwise(f):
+            subset = items if len(kept) == len(items) else [items[i] for i in kept]
+            mask = np.asarray(f.get_mask(layer, subset, position, other), dtype=bool)
+            kept = kept[mask]
+        else:
+            mask = np.asarray(f.get_mask(layer, items, position, other), dtype=bool)
+            kept = kept[mask[kept]]
+    return kept
 
 
 class VehicleFilter(ABC):
+    # Relative cost of the filter, cheaper filters are evaluated first in combined filters
+    cost: float = DEFAULT_FILTER_COST
+    # True if the result of the filter for a vehicle does not depend on the other
+    # vehicles, the filter can then be evaluated on a subset of the vehicles
+    pointwise: bool = False
+
     @abstractmethod
     def get_mask(self,
                  layer: AbstractLayer,
@@ -36,6 +131,16 @@ class VehicleFilter(ABC):
                  deposits: List[Depot] = None) -> Mask:
         pass
 
+    def get_indices(self,
+                    layer: AbstractLayer,
+                    vehicles: Iterable[Vehicle],
+                    position: List[float] = None,
+                    deposits: List[Depot] = None) -> NDArray[np.int64]:
+        """
+        Return the sorted indexes of the vehicles kept by the filter
+        """
+        return np.flatnonzero(np.asarray(self.get_mask(layer, vehicles, position, deposits), dtype=bool))
+
     def __and__(self, other):
         return CombinedVehicleFilter([self, other])
 
@@ -47,6 +152,14 @@ class InvertedVehicleFilter:
     def __init__(self, veh_filter: FilterProtocol):
         self.veh_filter: FilterProtocol = veh_filter
 
+    @property
+    def cost(self) -> float:
+        return filter_cost(self.veh_filter)
+
+    @property
+    def pointwise(self) -> bool:
+        return filter_is_pointwise(self.veh_filter)
+
     def get_mask(self,
                  layer: AbstractLayer,
                  vehicles: Iterable[Vehicle],
@@ -74,16 +187,32 @@ class CombinedVehicleFilter(object):
     def __init__(self, filters: List[FilterProtocol]):
         self.filters = filters
 
+    @property
+    def cost(self) -> float:
+        return sum(filter_cost(f) for f in self.filters)
+
+    @property
+    def pointwise(self) -> bool:
+        return all(filter_is_pointwise(f) for f in self.filters)
+
+    def get_indices(self,
+                    layer: AbstractLayer,
+                    vehicles: Iterable[Vehicle],
+                    position: List[float] = None,
+                    deposits: List[Depot] = None) -> NDArray[np.int64]:
+        """
+        Return the sorted indexes of the vehicles kept by all filters, see combined_indices
+        """
+        return combined_indices(self.filters, layer, vehicles, position, deposits)
+
     def get_mask(self,
                  layer: AbstractLayer,
                  vehicles: Iterable[Vehicle],
                  position: List[float] = None,
                  deposits: List[Depot] = None) -> Mask:
-        all_masks = []
-        for f in self.filters:
-            all_masks.append(f.get_mask(layer, vehicles, position, deposits))
-
-        return np.all(all_masks, axis=0)
+        mask = np.zeros(len(vehicles), dtype=bool)
+        mask[self.get_indices(layer, vehicles, position, deposits)] = True
+        return mask
 
     def __and__(self, other):
         if isinstance(other, CombinedVehicleFilter):
@@ -93,6 +222,9 @@ class CombinedVehicleFilter(object):
 
 
 class InRadiusFilter(VehicleFilter):
+    cost = 2
+    pointwise = True
+
     def __init__(self, radius: float):
         self.radius = radius
 
@@ -112,6 +244,9 @@ class InRadiusFilter(VehicleFilter):
             return []
 
 class PlanEndsInRadiusFilter(VehicleFilter):
+    cost = 4
+    pointwise = True
+
     def __init__(self, radius: float):
         self.radius = radius
 
@@ -132,6 +267,9 @@ class PlanEndsInRadiusFilter(VehicleFilter):
 
 
 class IsNearestFilter(VehicleFilter):
+    cost = 2
+    pointwise = False
+
     def get_mask(self,
                  layer: AbstractLayer,
                  vehicles: Iterable[Vehicle],
@@ -151,6 +289,9 @@ class IsNearestFilter(VehicleFilter):
 
 
 class IsWaiting(VehicleFilter):
+    cost = 1
+    pointwise = True
+
     def get_mask(self,
                  layer: AbstractLayer,
                  vehicles: Iterable[Vehicle],
@@ -163,6 +304,9 @@ class IsWaiting(VehicleFilter):
         return [True if veh.activity_type is ActivityType.STOP else False for veh in vehicles]
 
 class IsIdle(VehicleFilter):
+    cost = 1
+    pointwise = True
+
     def get_mask(self,
                  layer: AbstractLayer,
                  vehicles: Iterable[Vehicle],
@@ -177,6 +321,9 @@ class IsIdle(VehicleFilter):
 
 
 class InZoneFilter(VehicleFilter):
+    cost = 3
+    pointwise = True
+
     def get_mask(self,
                  layer: AbstractLayer,
                  vehicles: Iterable[Vehicle],
@@ -188,16 +335,14 @@ class InZoneFilter(VehicleFilter):
         # TODO - garde-fou -> throw / catch error when the simulation does not include zoning.
         # Then just return True for all (as if single zone) or a radius-based filter?
 
-        roads = layer.roads
-        mask = []
-        position_zone = get_zone(roads, position)
-        for veh in vehicles:
-            veh_pos = get_zone(roads, veh.position)
-            mask.append(position_zone == veh_pos)
-        return mask
+        position_zone = get_zone(layer.roads, position)
+        return get_vehicles_zones(layer, vehicles) == position_zone
 
 
 class InZonalDepot(VehicleFilter):
+    cost = 5
+    pointwise = False
+
     def __init__(self, multiple: bool):
         self.multiple = multiple
 
@@ -211,23 +356,28 @@ class InZonalDepot(VehicleFilter):
         If self.multiple is False, only return True for the first vehicle that entered the depot, else True for
         """
         position_zone = get_zone(layer.roads, position)
-        depots_in_zone = [d for d in deposits if d.zone == position_zone]
-        veh_ids = [veh.id for veh in vehicles]
-        mask = [False for _ in range(len(vehicles))]
+        depots_zones = get_depots_zones(layer, deposits)
+        depots_in_zone = [d for d, zone in zip(deposits, depots_zones) if zone == position_zone]
+        veh_index = {veh.id: i for i, veh in enumerate(vehicles)}
+        mask = np.zeros(len(vehicles), dtype=bool)
         if self.multiple:
             for depot in depots_in_zone:
-                for vid in depot.vehicles:
-                    mask[veh_ids.index(vid)] = True
+                for veh, _ in depot.vehicles:
+                    mask[veh_index[veh.id]] = True
 
         else:
             for depot in depots_in_zone:
-                first_veh = depot.vehicles[-1]
-                mask[veh_ids.index(first_veh)] = True
+                if depot.vehicles:
+                    first_veh, _ = depot.vehicles[-1]
+                    mask[veh_index[first_veh.id]] = True
 
         return mask
 
 
 class InNearestDepot(VehicleFilter):
+    cost = 5
+    pointwise = False
+
     def __init__(self, multiple: bool):
         self.multiple = multiple
 
@@ -263,6 +413,9 @@ class InNearestDepot(VehicleFilter):
 
 
 class InNearestZonalDepot(VehicleFilter):
+    cost = 5
+    pointwise = False
+
     def __init__(self, multiple: bool):
         self.multiple = multiple
 
@@ -279,28 +432,32 @@ class InNearestZonalDepot(VehicleFilter):
 
         nodes = layer.graph.nodes
         position_zone = get_zone(layer.roads, position)
-        depots_in_zone = [d for d in deposits if d.zone == position_zone]
+        depots_zones = get_depots_zones(layer, deposits)
+        depots_in_zone = [d for d, zone in zip(deposits, depots_zones) if zone == position_zone]
 
         depots_pos = np.array([nodes[d.node].position for d in depots_in_zone])
         dist_vector = np.linalg.norm(depots_pos - np.array(position), axis=1)
         nearest_depot_ind = np.argmin(dist_vector)
         nearest_depot = depots_in_zone[nearest_depot_ind]
 
-        veh_ids = [veh.id for veh in vehicles]
-        mask = [False for _ in range(len(vehicles))]
+        veh_index = {veh.id: i for i, veh in enumerate(vehicles)}
+        mask = np.zeros(len(vehicles), dtype=bool)
 
         if self.multiple:
-            for vid in nearest_depot.vehicles:
-                mask[veh_ids.index(vid)] = True
+            for veh, _ in nearest_depot.vehicles:
+                mask[veh_index[veh.id]] = True
 
-        else:
-            first_veh = nearest_depot.vehicles[-1]
-            mask[veh_ids.index(first_veh)] = True
+        elif nearest_depot.vehicles:
+            first_veh, _ = nearest_depot.vehicles[-1]
+            mask[veh_index[first_veh.id]] = True
 
         return mask
 
 
 class ToNearestDepot(VehicleFilter):
+    cost = 3
+    pointwise = True
+
     def get_mask(self,
                  layer: AbstractLayer,
                  vehicles: Iterable[Vehicle],
@@ -326,6 +483,9 @@ class ToNearestDepot(VehicleFilter):
 
 
 class ToZonalDepot(VehicleFilter):
+    cost = 3
+    pointwise = True
+
     def get_mask(self,
                  layer: AbstractLayer,
                  vehicles: Iterable[Vehicle],
@@ -335,7 +495,8 @@ class ToZonalDepot(VehicleFilter):
         Return a mask (boolean array), if vehicle is heading to a depot that is the zone of position True, else False
         """
         position_zone = get_zone(layer.roads, position)
-        depots_in_zone = {d.node for d in deposits if d.zone == position_zone}
+        depots_zones = get_depots_zones(layer, deposits)
+        depots_in_zone = {d.node for d, zone in zip(deposits, depots_zones) if zone == position_zone}
 
         mask = []
         for veh in vehicles:
@@ -348,6 +509,9 @@ class ToZonalDepot(VehicleFilter):
 
 
 class ToNearestZonalDepot(VehicleFilter):
+    cost = 3
+    pointwise = True
+
     def get_mask(self,
                  layer: AbstractLayer,
                  vehicles: Iterable[Vehicle],
@@ -359,7 +523,8 @@ class ToNearestZonalDepot(VehicleFilter):
 
         nodes = layer.graph.nodes
         position_zone = get_zone(layer.roads, position)
-        depots_in_zone = [d for d in deposits if d.zone == position_zone]
+        depots_zones = get_depots_zones(layer, deposits)
+        depots_in_zone = [d for d, zone in zip(deposits, depots_zones) if zone == position_zone]
 
         depots_pos = np.array([nodes[d.node].position for d in depots_in_zone])
         dist_vector = np.linalg.norm(depots_pos - np.array(position), axis=1)
@@ -375,6 +540,11 @@ class ToNearestZonalDepot(VehicleFilter):
         return mask
 
 class DepotFilter(ABC):
+    # Relative cost of the filter, cheaper filters are evaluated first in combined filters
+    cost: float = DEFAULT_FILTER_COST
+    # True if the result of the filter for a depot does not depend on the other depots
+    pointwise: bool = False
+
     @abstractmethod
     def get_mask(self,
                  layer: AbstractLayer,
@@ -393,16 +563,32 @@ class CombinedDepotFilter(object):
     def __init__(self, filters: List[FilterProtocol]):
         self.filters = filters
 
+    @property
+    def cost(self) -> float:
+        return sum(filter_cost(f) for f in self.filters)
+
+    @property
+    def pointwise(self) -> bool:
+        return all(filter_is_pointwise(f) for f in self.filters)
+
+    def get_indices(self,
+                    layer: AbstractLayer,
+                    depots: Iterable[Depot],
+                    position: List[float] = None,
+                    vehicles: List[Vehicle] = None) -> NDArray[np.int64]:
+        """
+        Return the sorted indexes of the depots kept by all filters, see combined_indices
+        """
+        return combined_indices(self.filters, layer, depots, position, vehicles)
+
     def get_mask(self,
                  layer: AbstractLayer,
                  depots: Iterable[Depot],
                  position: List[float] = None,
                  vehicles: List[Vehicle] = None) -> Mask:
-        all_masks = []
-        for f in self.filters:
-            all_masks.append(f.get_mask(layer, depots, position, vehicles))
-
-        return np.all(all_masks, axis=0)
+        mask = np.zeros(len(depots), dtype=bool)
+        mask[self.get_indices(layer, depots, position, vehicles)] = True
+        return mask
 
     def __and__(self, other):
         if isinstance(other, CombinedDepotFilter):
@@ -414,6 +600,14 @@ class InvertedDepotFilter:
     def __init__(self, depot_filter: FilterProtocol):
         self.depot_filter: FilterProtocol = depot_filter
 
+    @property
+    def cost(self) -> float:
+        return filter_cost(self.depot_filter)
+
+    @property
+    def pointwise(self) -> bool:
+        return filter_is_pointwise(self.depot_filter)
+
     def get_mask(self,
                  layer: AbstractLayer,
                  depots: Iterable[Depot],
@@ -424,6 +618,9 @@ class InvertedDepotFilter:
         return ~mask
 
 class DepotIsNotFull(DepotFilter):
+    cost = 1
+    pointwise = True
+
     def get_mask(self,
                  layer: AbstractLayer,
                  depots: Iterable[Depot],
@@ -435,6 +632,9 @@ class DepotIsNotFull(DepotFilter):
         return [not d.is_full() for d in depots]
 
 class IsNearestDepotFilter(DepotFilter):
+    cost = 2
+    pointwise = False
+
     def get_mask(self,
                  layer: AbstractLayer,
                  depots: Iterable[Depot],
@@ -1,7 +1,6 @@
 from typing import Tuple, Dict, List
 
 import numpy as np
-from scipy.optimize import linear_sum_assignment
 import multiprocessing
 import sys
 import math
@@ -18,7 +17,7 @@ from mnms.vehicles.veh_type import ActivityType, VehicleActivityServing, Vehicle
     VehicleActivityPickup, VehicleActivityRepositioning, Vehicle, VehicleActivity
 from mnms.tools.cost import create_service_costs
 from mnms.tools.geometry import polygon_area, get_bounding_box
-from mnms.tools.preprocessing import decode_shortest_path_tree
+from mnms.tools.preprocessing import decode_shortest_paths
 
 log = create_logger(__name__)
 
@@ -104,38 +103,42 @@ class OnDemandMobilityService(AbstractOnDemandMobilityService):
         Args:
             -dt: time elapsed since the previous maintenance phase
         """
+        self.notify_estimates_update()
         # Treat zone per zone when they are defined
         glinks = self.graph.links
         count_links_treated = 0
-        for zid, z in self._zones.items():
-            count_links_treated += len(z.links)
-            # Count the nb of idle vehicles in this zone
+        if self._zones:
+            # Idle vehicles and open requests are assigned to the zones in one batched call
+            zones_index = self.zones_index
             idle_vehs = self.get_idle_vehicles()
-            idle_vehs_pos = [veh.position for veh in idle_vehs]
-            mask = z.is_inside(idle_vehs_pos)
-            idle_vehs_in_z = np.array(idle_vehs)[mask]
-
-            # Count the nb of open requests in this zone
+            nb_idle_vehs = self.fleet.zones(zones_index).count(idle_vehs)
             open_reqs = list(self.user_buffer.values())
-            reqs_pos = [req.user.position for req in open_reqs]
-            mask = z.is_inside(reqs_pos)
-            open_reqs_in_z = np.array(open_reqs)[mask]
+            _, reqs_zones = zones_index.memberships([req.user.position for req in open_reqs])
+            nb_open_reqs = np.bincount(reqs_zones, minlength=len(self._zones))
+            reqs_hist_zones = None
+        for zi, (zid, z) in enumerate(self._zones.items()):
+            count_links_treated += len(z.links)
+            # Count the nb of idle vehicles and open requests in this zone
+            nb_idle_vehs_in_z = int(nb_idle_vehs[zi])
+            nb_open_reqs_in_z = int(nb_open_reqs[zi])
 
             area = polygon_area(z.contour)
             mean_speed = np.mean([glinks[lid].costs[self.id]['speed'] for lid in z.links])
             tau = (self.dt_matching+1) * dt.to_seconds()
 
             # Oversupply mode
-            if (len(idle_vehs_in_z) > len(open_reqs_in_z)) or (len(idle_vehs_in_z) == len(open_reqs_in_z) and len(idle_vehs_in_z) > 0):
-                    idle_vehs_density_in_z = len(idle_vehs_in_z) / area
+            if (nb_idle_vehs_in_z > nb_open_reqs_in_z) or (nb_idle_vehs_in_z == nb_open_reqs_in_z and nb_idle_vehs_in_z > 0):
+                    idle_vehs_density_in_z = nb_idle_vehs_in_z / area
                     w = tau / 2 + z.detour_ratio / (2 * mean_speed * math.sqrt(idle_vehs_density_in_z))
             # Undersupply mode
-            elif (len(idle_vehs_in_z) < len(open_reqs_in_z)) or (len(idle_vehs_in_z) == len(open_reqs_in_z) and len(open_reqs_in_z) > 0):
-                open_reqs_density_in_z = len(open_reqs_in_z) / area
+            elif (nb_idle_vehs_in_z < nb_open_reqs_in_z) or (nb_idle_vehs_in_z == nb_open_reqs_in_z and nb_open_reqs_in_z > 0):
+                open_reqs_density_in_z = nb_open_reqs_in_z / area
                 # Compute mean requests arrival rate in this zone
-                reqs_hist_pos = [self.gnodes[req.pickup_node].position for req in self.requests_history]
-                mask = z.is_inside(reqs_hist_pos)
-                reqs_hist_in_z = np.array(self.requests_history)[mask]
+                if reqs_hist_zones is None:
+                    reqs_hist_pos = [self.gnodes[req.pickup_node].position for req in self.requests_history]
+                    reqs_hist_zones = zones_index.memberships(reqs_hist_pos)
+                hist_ind, hist_zones = reqs_hist_zones
+                reqs_hist_in_z = [self.requests_history[i] for i in hist_ind[hist_zones == zi]]
                 if len(reqs_hist_in_z) == 0:
                     log.warning(f'There is no request history in zone {zid}, impossible to estimate pickup time there...')
                     continue
@@ -144,7 +147,7 @@ class OnDemandMobilityService(AbstractOnDemandMobilityService):
                     delta_t = dt.to_seconds() # dt is the smallest time step
                 reqs_arrival_rate_in_z = len(reqs_hist_in_z) / delta_t
                 # Deduce estimates waiting time
-                w = len(open_reqs_in_z) / reqs_arrival_rate_in_z - tau / 2 + z.detour_ratio / (mean_speed * math.sqrt(math.pi * open_reqs_density_in_z))
+                w = nb_open_reqs_in_z / reqs_arrival_rate_in_z - tau / 2 + z.detour_ratio / (mean_speed * math.sqrt(math.pi * open_reqs_density_in_z))
             # No idle vehicle nor open request : apply default waiting time
             else:
                 w = self.default_waiting_time
@@ -242,7 +245,7 @@ class OnDemandMobilityService(AbstractOnDemandMobilityService):
                 # Remove user from list of users waiting to be matched
                 self.cancel_request(user.id)
             else:
-                log.info(f"{user.id} refused {self.id} offer (predicted pickup time ({service_dt}) is too long, wait for better proposition...")
+                log.info("%s refused %s offer (predicted pickup time (%s) is too long, wait for better proposition...", user.id, self.id, service_dt)
             self._cache_request_vehicles = dict()
 
     def launch_matching_batch(self, dt):
@@ -326,6 +329,7 @@ class OnDemandMobilityService(AbstractOnDemandMobilityService):
                 veh_paths_matrix[ridx][vidx] = veh_path
 
         ### Solve the minimum total pickup time matching problem
+        from scipy.optimize import linear_sum_assignment
         row_ind, col_ind = linear_sum_assignment(pickup_times_matrix)
 
         ### Parse outputs and proceed to the matches when relevant
@@ -356,8 +360,7 @@ class OnDemandMobilityService(AbstractOnDemandMobilityService):
         # Get all idle vehicles of the fleet within radius around user
         filter = IsIdle() & InRadiusFilter(self.radius)
         all_vehs = self.get_all_vehicles()
-        mask = filter.get_mask(self.layer, all_vehs, position=user.position)
-        idle_vehs_in_radius = all_vehs[mask]
+        idle_vehs_in_radius = all_vehs[filter.get_indices(self.layer, all_vehs, position=user.position)]
         if len(idle_vehs_in_radius) == 0:
             # There is no idle vehicle in radius, match is not possible
             return Dt(hours=24)
@@ -368,8 +371,8 @@ class OnDemandMobilityService(AbstractOnDemandMobilityService):
         if self.layer.shortest_paths is not None:
             # Let's read the shortest paths
             paths = []
-            for o,d in zip(origins, destinations):
-                veh_path = decode_shortest_path_tree(self.layer.shortest_paths, o, d)
+            veh_paths = decode_shortest_paths(self.layer.shortest_paths, origins, destinations)
+            for o,d,veh_path in zip(origins, destinations, veh_paths):
                 if o != d and len(veh_path) > 1:
                     # Compute the travel time
                     tt = compute_path_nodes_travel_time(veh_path, self.gnodes, self.id)
@@ -532,7 +535,7 @@ class OnDemandMobilityService(AbstractOnDemandMobilityService):
         user = request.user
         drop_node = request.drop_node
         veh, veh_path = self._cache_request_vehicles[user.id]
-        log.info(f'User {user.id} matched with vehicle {veh.id} of mobility service {self._id}')
+        log.info('User %s matched with vehicle %s of mobility service %s', user.id, veh.id, self._id)
         upath = list(user.path.nodes)
         upath = upath[user.get_current_node_index():user.get_node_index_in_path(drop_node) + 1]
         user_path = self.construct_veh_path(upath)
@@ -616,8 +619,7 @@ class OnDemandDepotMobilityService(OnDemandMobilityService, AbstractOnDemandDepo
                 if veh._current_node not in self.depots:
                     # Find the nearest non full depot
                     filter = DepotIsNotFull() & IsNearestDepotFilter()
-                    mask = filter.get_mask(self.layer, depots, position=veh.position)
-                    nearest_depot = depots[mask]
+                    nearest_depot = depots[filter.get_indices(self.layer, depots, position=veh.position)]
                     if len(nearest_depot) > 0:
                         # Get the shortest path till the nearest depot
                         nearest_depot = nearest_depot[0]
@@ -656,7 +658,7 @@ class OnDemandDepotMobilityService(OnDemandMobilityService, AbstractOnDemandDepo
         user = request.user
         drop_node = request.drop_node
         veh, veh_path = self._cache_request_vehicles[user.id]
-        log.info(f'User {user.id} matched with vehicle {veh.id} of mobility service {self._id}')
+        log.info('User %s matched with vehicle %s of mobility service %s', user.id, veh.id, self._id)
         upath = list(user.path.nodes)
         upath = upath[user.get_current_node_index():user.get_node_index_in_path(drop_node) + 1]
 
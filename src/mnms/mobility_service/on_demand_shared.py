@@ -485,7 +485,7 @@ class OnDemandSharedMobilityService(AbstractOnDemandMobilityService):
                 initial_path_dist = compute_path_length(self.graph, nodes)
                 self.users[user.id] = UserInfo(request, user.distance, initial_path_dist) # NB: support only one simultaneous req per user
 
-        log.info(f'User {user.id} matched with vehicle {veh.id} of mobility service {self.id} (new plan = {new_plan})')
+        log.info('User %s matched with vehicle %s of mobility service %s (new plan = %s)', user.id, veh.id, self.id, new_plan)
 
     def launch_matching(self, new_users, user_flow, decision_model, dt):
         """Method that launches the matching phase.
@@ -637,38 +637,42 @@ class OnDemandSharedMobilityService(AbstractOnDemandMobilityService):
         Args:
             -dt: time elapsed since the previous maintenance phase
         """
+        self.notify_estimates_update()
         glinks = self.graph.links
         # Treat zone per zone when they are defined
         count_links_treated = 0
-        for zid, z in self._zones.items():
-            count_links_treated += len(z.links)
-            # Count the nb of idle vehicles in this zone
+        if self._zones:
+            # Idle vehicles and open requests are assigned to the zones in one batched call
+            zones_index = self.zones_index
             idle_vehs = self.get_idle_vehicles()
-            idle_vehs_pos = [veh.position for veh in idle_vehs]
-            mask = z.is_inside(idle_vehs_pos)
-            idle_vehs_in_z = np.array(idle_vehs)[mask]
-
-            # Count the nb of open requests in this zone
+            nb_idle_vehs = self.fleet.zones(zones_index).count(idle_vehs)
             open_reqs = list(self.user_buffer.values())
-            reqs_pos = [req.user.position for req in open_reqs]
-            mask = z.is_inside(reqs_pos)
-            open_reqs_in_z = np.array(open_reqs)[mask]
+            _, reqs_zones = zones_index.memberships([req.user.position for req in open_reqs])
+            nb_open_reqs = np.bincount(reqs_zones, minlength=len(self._zones))
+            reqs_hist_zones = None
+        for zi, (zid, z) in enumerate(self._zones.items()):
+            count_links_treated += len(z.links)
+            # Count the nb of idle vehicles and open requests in this zone
+            nb_idle_vehs_in_z = int(nb_idle_vehs[zi])
+            nb_open_reqs_in_z = int(nb_open_reqs[zi])
 
             area = polygon_area(z.contour)
             mean_speed = np.mean([glinks[lid].costs[self.id]['speed'] for lid in z.links])
             tau = (self.dt_matching+1) * dt.to_seconds()
 
             # Oversupply mode
-            if (len(idle_vehs_in_z) > len(open_reqs_in_z)) or (len(idle_vehs_in_z) == len(open_reqs_in_z) and len(idle_vehs_in_z) > 0):
-                    idle_vehs_density_in_z = len(idle_vehs_in_z) / area
+            if (nb_idle_vehs_in_z > nb_open_reqs_in_z) or (nb_idle_vehs_in_z == nb_open_reqs_in_z and nb_idle_vehs_in_z > 0):
+                    idle_vehs_density_in_z = nb_idle_vehs_in_z / area
                     w = tau / 2 + z.detour_ratio / (2 * mean_speed * math.sqrt(idle_vehs_density_in_z))
             # Undersupply mode
-            elif (len(idle_vehs_in_z) < len(open_reqs_in_z)) or (len(idle_vehs_in_z) == len(open_reqs_in_z) and len(open_reqs_in_z) > 0):
-                open_reqs_density_in_z = len(open_reqs_in_z) / area
+            elif (nb_idle_vehs_in_z < nb_open_reqs_in_z) or (nb_idle_vehs_in_z == nb_open_reqs_in_z and nb_open_reqs_in_z > 0):
+                open_reqs_density_in_z = nb_open_reqs_in_z / area
                 # Compute mean requests arrival rate in this zone
-                reqs_hist_pos = [self.graph.nodes[req.pickup_node].position for req in self.requests_history]
-                mask = z.is_inside(reqs_hist_pos)
-                reqs_hist_in_z = np.array(self.requests_history)[mask]
+                if reqs_hist_zones is None:
+                    reqs_hist_pos = [self.graph.nodes[req.pickup_node].position for req in self.requests_history]
+                    reqs_hist_zones = zones_index.memberships(reqs_hist_pos)
+                hist_ind, hist_zones = reqs_hist_zones
+                reqs_hist_in_z = [self.requests_history[i] for i in hist_ind[hist_zones == zi]]
                 if len(reqs_hist_in_z) == 0:
                     log.warning(f'There is no request history in zone {zid}, impossible to estimate pickup time there...')
                     continue
@@ -677,7 +681,7 @@ class OnDemandSharedMobilityService(AbstractOnDemandMobilityService):
                     delta_t = dt.to_seconds() # dt is the smallest time step
                 reqs_arrival_rate_in_z = len(reqs_hist_in_z) / delta_t
                 # Deduce estimates waiting time
-                w = len(open_reqs_in_z) / reqs_arrival_rate_in_z - tau / 2 + z.detour_ratio / (mean_speed * math.sqrt(math.pi * open_reqs_density_in_z))
+                w = nb_open_reqs_in_z / reqs_arrival_rate_in_z - tau / 2 + z.detour_ratio / (mean_speed * math.sqrt(math.pi * open_reqs_density_in_z))
             # No idle vehicle nor open request : apply default waiting time
             else:
                 w = self.default_waiting_time
@@ -1,13 +1,14 @@
 from math import ceil
 from time import time
+import os
+import gzip
 import csv
 import traceback
 import random
-import jsonpickle
-import dill as pickle
+from bisect import bisect_left
 import json
-import dill.detect
-from typing import List, Optional
+from collections import defaultdict
+from typing import Dict, List, Optional
 
 import numpy as np
 
@@ -21,9 +22,10 @@ from mnms.travel_decision.abstract import AbstractDecisionModel, Event
 from mnms.mobility_service.public_transport import PublicTransportMobilityService
 from mnms.time import Time, Dt
 from mnms.log import create_logger, attach_log_file, LOGLEVEL
+from mnms.io.utils import freeze_outfile, thaw_outfile
 from mnms.tools.progress import ProgressBar
+from mnms.tools.exceptions import SnapshotMismatchError
 from mnms.vehicles.manager import VehicleManager
-from mnms.vehicles.veh_type import Vehicle
 from hipop.graph import OrientedGraph, graph_to_dict, dict_to_graph, dict_to_node, dict_to_link
 
 log = create_logger(__name__)
@@ -38,7 +40,8 @@ class Supervisor(object):
                  user_flow: UserFlow = None,
                  outfile: Optional[str] = None,
                  logfile: Optional[str] = None,
-                 loglevel: LOGLEVEL = LOGLEVEL.WARNING):
+                 loglevel: LOGLEVEL = LOGLEVEL.WARNING,
+                 veh_manager: Optional[VehicleManager] = None):
         """
         Main class to launch a simulation.
 
@@ -52,8 +55,11 @@ class Supervisor(object):
                       of each link in the multi layer graph
             -logfile: file where simulation log should be printed
             -loglevel: level of log to print
+            -veh_manager: The registry of the vehicles of this simulation, a new one
+                          is created if None
         """
 
+        self.veh_manager: VehicleManager = veh_manager if veh_manager is not None else VehicleManager()
         self._mlgraph: MultiLayerGraph = None
         self._demand: AbstractDemandManager = demand
         self._flow_motor: AbstractMFDFlowMotor = flow_motor
@@ -66,6 +72,7 @@ class Supervisor(object):
             
         self.add_graph(graph)
         self._flow_motor.set_graph(graph)
+        self._flow_motor.set_vehicle_manager(self.veh_manager)
         self._user_flow.set_graph(graph)
 
         self._outfilename = outfile
@@ -73,6 +80,12 @@ class Supervisor(object):
         self.tcurrent: Optional[Time] = None
 
         self.from_snapshot = False
+        self._affectation_step = 0
+        self._flow_step = 0
+
+        # Cumulated execution time in seconds of each phase of the last run, a resumed
+        # run goes on from the times of its snapshot
+        self.phase_times: Dict[str, float] = defaultdict(float)
 
         if outfile is None:
             self._write = False
@@ -90,8 +103,7 @@ class Supervisor(object):
         state = self.__dict__.copy()
 
         if self._write == True:
-            if '_outfile' in state:
-                del state['_outfile']
+            freeze_outfile(state, '_outfile')
             if '_csvhandler' in state:
                 del state['_csvhandler']
 
@@ -99,12 +111,11 @@ class Supervisor(object):
 
     def __setstate__(self, state):
 
+        thaw_outfile(state, '_outfile')
         self.__dict__.update(state)
 
         if self._write == True:
-            self._outfile = open(self._outfilename, "w")
             self._csvhandler = csv.writer(self._outfile, delimiter=';', quotechar='|')
-            self._csvhandler.writerow(['AFFECTATION_STEP', 'TIME', 'ID', 'MOBILITY_SERVICE', 'COSTS'])
 
     def set_random_seed(self, seed: int):
         """Method that sets the seed for all modules that can be stochastic.
@@ -126,6 +137,7 @@ class Supervisor(object):
             -mlgraph: the MultiLayerGraph object to add
         """
         self._mlgraph = mlgraph
+        self._mlgraph.set_vehicle_manager(self.veh_manager)
         self._mlgraph.construct_layer_service_mapping()
         for layer in mlgraph.layers.values():
             layer.initialize()
@@ -138,6 +150,7 @@ class Supervisor(object):
         """
         self._flow_motor = flow
         flow.set_graph(self._mlgraph)
+        flow.set_vehicle_manager(self.veh_manager)
 
     def add_demand(self, demand: AbstractDemandManager):
         """Method to add a demand manager to the supervisor.
@@ -177,8 +190,7 @@ class Supervisor(object):
         self._mlgraph.dynamic_space_sharing.set_cost(self._decision_model._cost)
 
     def finalize(self):
-        """Method that finalizes the simulation by closing open files, and cleaning
-        class attributes.
+        """Method that finalizes the simulation by closing open files.
         """
         self._flow_motor.finalize()
 
@@ -199,10 +211,6 @@ class Supervisor(object):
                 if mservice._observer is not None:
                     mservice._observer.finish()
 
-        # Clean the class attributes
-        VehicleManager.empty()
-        Vehicle.reset_counter()
-
     def call_planning(self):
         """Calls the (re)planning module and measures execution time.
         """
@@ -210,6 +218,7 @@ class Supervisor(object):
         start = time()
         self._decision_model(self.tcurrent)
         end = time()
+        self.phase_times['planning'] += end - start
         log.info(f'(Re)planning done in [{end - start:.5} s]')
 
     def call_update_graph(self, threshold):
@@ -219,6 +228,7 @@ class Supervisor(object):
         start = time()
         self._flow_motor.update_graph(threshold)
         end = time()
+        self.phase_times['update_graph'] += end - start
         log.info(f' Update graph done in [{end-start:.5} s]')
 
     def call_update_mobility_services(self, flow_dt:Dt):
@@ -235,6 +245,7 @@ class Supervisor(object):
                 mservice.update(flow_dt)
                 mservice.update_time(flow_dt)
                 end = time()
+                self.phase_times['update_mobility_services'] += end - start
                 log.info(f' Update mobility service {mservice.id} done in [{end-start:.5} s]')
 
     def call_user_flow_step(self, flow_dt: Dt, users_step: List[User]):
@@ -252,6 +263,7 @@ class Supervisor(object):
         users_reach_dt_answer = self._user_flow.step(flow_dt, users_step)
         self._user_flow.update_time(flow_dt)
         end = time()
+        self.phase_times['user_flow'] += end - start
         log.info(f' User flow step done [{end - start:.5} s]')
         return users_reach_dt_answer
 
@@ -269,6 +281,7 @@ class Supervisor(object):
                 start = time()
                 ms.launch_matching(new_users, self._user_flow, self._decision_model, flow_dt)
                 end = time()
+                self.phase_times['matching'] += end - start
                 log.info(f' Matching for mobility service {ms.id} done in [{end - start:.5} s]')
 
     def call_flow_motor_step(self, flow_dt: Dt):
@@ -282,6 +295,7 @@ class Supervisor(object):
         self._flow_motor.step(flow_dt)
         self._flow_motor.update_time(flow_dt)
         end = time()
+        self.phase_times['flow_motor'] += end - start
         log.info(f' Flow motor step done in [{end - start:.5} s]')
 
     def step_dynamic_space_sharing(self):
@@ -290,7 +304,7 @@ class Supervisor(object):
         """
         # Call the dynamic space sharing update to unban and ban links when relevant, and reroute
         # vehicles consequently
-        self._mlgraph.dynamic_space_sharing.update(self.tcurrent, list(VehicleManager._vehicles.values()))
+        self._mlgraph.dynamic_space_sharing.update(self.tcurrent, list(self.veh_manager.vehicles.values()))
 
     def get_new_users(self, principal_dt):
         """Gathers/Creates the users who depart during the coming affectation step.
@@ -310,36 +324,31 @@ class Supervisor(object):
 
         return new_users
 
-    def get_users_step(self, new_users: List[User], flow_dt: Dt):
+    def get_users_step(self, new_users: List[User], flow_dt: Dt, departure_times: Optional[List[float]] = None):
         """Gathers the users who depart during the coming simulation flow step.
 
         Args:
-            -new_users: list of users who depart during the coming affectation step
+            -new_users: list of users who depart during the coming affectation step,
+                        sorted by departure time
             -flow_dt: the simulation flow time step
+            -departure_times: departure times of new_users in seconds, computed if None
 
         Returns:
             -users_step: list of users who depart during the coming simulation flow step
             -remaining_new_users: list of users who depart during the coming affectation step without
                         users who depart during the coming simulation flow step
         """
-        if new_users == []:
+        if not new_users:
             return [], []
-        next_time = self.tcurrent.add_time(flow_dt)
-        iter_new_users = iter(new_users)
-        u = next(iter_new_users)
-        users_step = list()
-        remaining_new_users = new_users.copy()
-        try:
-            while self.tcurrent <= u.departure_time < next_time:
-                users_step.append(u)
-                remaining_new_users.remove(u)
-                u = next(iter_new_users)
-        except StopIteration:
-            pass
-        return users_step, remaining_new_users
+        if departure_times is None:
+            departure_times = [u.departure_time.to_seconds() for u in new_users]
+        if departure_times[0] < self.tcurrent.to_seconds():
+            return [], list(new_users)
+        end = bisect_left(departure_times, self.tcurrent.add_time(flow_dt).to_seconds())
+        return new_users[:end], new_users[end:]
 
     def run(self, tstart: Time, tend: Time, flow_dt: Dt, affectation_factor: int, update_graph_threshold: float = 0., seed: int=None,
-            snapshot: bool=False, snapshot_folder: str = ''):
+            snapshot: bool=False, snapshot_folder: str = '', checkpoint_every: int = 0, resume_from: Optional[str] = None):
         """Launch a full simulation.
 
         Args:
@@ -350,16 +359,37 @@ class Supervisor(object):
             -update_graph_threshold: threshold on the speed variation below which costs on the graph links are not updated
             -seed: seed of the simulation
             -snapshot: indicates whether a snapshot is taken at the end of the simulation
+            -snapshot_folder: folder where snapshots and checkpoints are written
+            -checkpoint_every: if strictly positive, a snapshot is taken in snapshot_folder
+             every checkpoint_every affectation steps, the previous one is replaced
+            -resume_from: prefix of a snapshot (e.g. 'folder/snapshot') to resume the
+             simulation from, tstart is then ignored and the simulation restarts
+             at the time stamp of the snapshot. Output files of the snapshot are
+             continued from the rows written when it was taken, the output files of
+             this supervisor should then have other names as they are truncated at
+             its creation
         """
+        if resume_from is not None:
+            restored = load_snaphshot(resume_from)
+            # The restored objects keep on writing in the output files of the snapshot,
+            # the files opened by this supervisor are closed before being replaced
+            self.finalize()
+            self.__dict__.update(restored.__dict__)
+            tstart = self.tcurrent
+            log.info(f'Resume run from snapshot {resume_from} at affectation step {self._affectation_step}')
+
         log.info(f'Start run from {tstart} to {tend}')
 
         ### Initializations
 
-        self.set_random_seed(seed)
+        if resume_from is None:
+            self.set_random_seed(seed)
         self.initialize(tstart)
 
-        affectation_step = 0
-        flow_step = 0
+        if resume_from is None:
+            self._affectation_step = 0
+            self._flow_step = 0
+            self.phase_times = defaultdict(float)
         principal_dt = flow_dt * affectation_factor
 
         if self.from_snapshot and self.tcurrent != tstart:
@@ -367,40 +397,45 @@ class Supervisor(object):
             return
 
         self.tcurrent = tstart
+        pt_pickup_dt = {pt_ms: Dt(hours=24) for pt_ms in self._mlgraph.get_all_mobility_services_of_type(PublicTransportMobilityService)}
         progress = ProgressBar(ceil((tend-tstart).to_seconds()/(flow_dt.to_seconds()*affectation_factor)))
 
         ### Main loop
         while self.tcurrent < tend:
             progress.update()
             progress.show()
-            log.info(f'Current time: {self.tcurrent}, affectation step: {affectation_step}')
+            log.info(f'Current time: {self.tcurrent}, affectation step: {self._affectation_step}')
 
-            ## Get all departures during the next principal_dt and add the ones
-            ## with no forced path in the list of users about to plan their journey
+            ## Get all departures during the next principal_dt, sorted by departure
+            ## time so that each flow step takes a contiguous slice of them
             new_users = self.get_new_users(principal_dt)
+            new_users.sort(key=lambda u: u.departure_time.to_seconds())
+            departure_times = [u.departure_time.to_seconds() for u in new_users]
+
+            ## Add the users with no forced path in the list of users about to plan
+            ## their journey, and set pickup_dt to infinite for all PT mobility services
             new_users_for_planning = []
             for u in new_users:
+                u.pickup_dt.update(pt_pickup_dt)
                 if u.path is None:
                     new_users_for_planning.append(u)
                 else:
                     self._decision_model.manage_forced_initial_path(u)
             self._decision_model.add_users_for_planning(new_users_for_planning, [Event.DEPARTURE]*len(new_users_for_planning))
 
-            ## Set pickup_dt to infinite for all PT mobility services
-            pt_mob_services_names = self._mlgraph.get_all_mobility_services_of_type(PublicTransportMobilityService)
-            for user in new_users:
-                for pt_ms in pt_mob_services_names:
-                    user.set_pickup_dt(pt_ms, Dt(hours=24))
-
             ## Call affectation_factor simulation flow steps
+            next_departure = 0
             for _ in range(affectation_factor):
 
                 # Call the planning module
                 self.call_planning()
 
                 # Gather users who depart during this flow step
-                users_step, new_users = self.get_users_step(new_users, flow_dt)
-                log.info(f'Users step:{users_step}')
+                step_end = bisect_left(departure_times, self.tcurrent.add_time(flow_dt).to_seconds(), lo=next_departure)
+                users_step = new_users[next_departure:step_end]
+                next_departure = step_end
+                remaining_new_users = new_users[next_departure:]
+                log.info('Users step: %s', users_step)
 
                 # Call update of all mobility services, update means maintenance
                 self.call_update_mobility_services(flow_dt)
@@ -413,16 +448,16 @@ class Supervisor(object):
                 self.step_dynamic_space_sharing()
 
                 # Call matching for all mobility services
-                self.call_matching_mobility_services(new_users, flow_dt)
+                self.call_matching_mobility_services(remaining_new_users, flow_dt)
 
                 # Call flow motor step
                 self.call_flow_motor_step(flow_dt)
                 if self._flow_motor._write:
-                    self._flow_motor.write_result(affectation_step, flow_step, flow_dt)
+                    self._flow_motor.write_result(self._affectation_step, self._flow_step, flow_dt)
 
                 # Update current time and current flow step number
                 self.tcurrent = self.tcurrent.add_time(flow_dt)
-                flow_step += 1
+                self._flow_step += 1
 
             ## Call the update graph
             self.call_update_graph(update_graph_threshold)
@@ -433,13 +468,21 @@ class Supervisor(object):
                 t_str = self._flow_motor.time
                 for link in self._mlgraph.graph.links.values():
                     for mservice, costs in link.costs.items():
-                        self._csvhandler.writerow([str(affectation_step), t_str, link.id, mservice, costs])
+                        self._csvhandler.writerow([str(self._affectation_step), t_str, link.id, mservice, costs])
                 end = time()
                 log.info(f'Done [{end - start:.5} s]')
 
             ## Update affectation step number
             log.info('-'*50)
-            affectation_step += 1
+            self._affectation_step += 1
+
+            ## Periodic checkpoint
+            if checkpoint_every > 0 and self._affectation_step % checkpoint_every == 0 and self.tcurrent < tend:
+                log.info(f'Taking checkpoint at affectation step {self._affectation_step}...')
+                start = time()
+                self.take_snapshot(snapshot_folder)
+                end = time()
+                log.info(f'Checkpoint done in [{end - start:.5} s]')
 
         if snapshot:
             self.take_snapshot(snapshot_folder)
@@ -461,32 +504,87 @@ class Supervisor(object):
         return data
 
     def take_snapshot(self, snapshot_folder:str):
+        """Method that saves the state of the simulation in snapshot_folder. The HiPOP
+        graph is written as a compressed binary file (snapshot_<step>.graph) and the
+        rest of the supervisor is pickled (snapshot_<step>.mnms), where step is the
+        current affectation step. The manifest snapshot.json pointing to this pair
+        of files is then atomically replaced, so that an interrupted snapshot never
+        breaks the last complete one. The files of the previous snapshot are removed.
+
+        Args:
+            -snapshot_folder: folder where the snapshot files are written
+        """
+        # dill is only needed for snapshots, it is imported here to keep mnms import fast
+        import dill as pickle
 
-        class SetEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if isinstance(obj, set):
-                    return list(obj)
-                return json.JSONEncoder.default(self, obj)
+        frozen = dict()
+        frozen['hipop_graph'] = graph_to_dict(self._mlgraph.graph)
+        frozen['affectation_step'] = self._affectation_step
 
-        graph_dic = graph_to_dict(self._mlgraph.graph)
+        manifest_file = os.path.join(snapshot_folder, "snapshot.json")
+        previous = _read_snapshot_manifest(manifest_file)
+        manifest = {'affectation_step': self._affectation_step,
+                    'graph': f"snapshot_{self._affectation_step}.graph",
+                    'supervisor': f"snapshot_{self._affectation_step}.mnms"}
 
-        frozen=dict()
-        frozen['hipop_graph'] = json.dumps(graph_dic, cls=SetEncoder)
-        #frozen['supervisor'] = jsonpickle.encode(self)
+        graph_file = os.path.join(snapshot_folder, manifest['graph'])
+        with gzip.open(graph_file + '.tmp', 'wb', compresslevel=3) as outfile:
+            pickle.dump(frozen, outfile, protocol=pickle.HIGHEST_PROTOCOL)
 
-        if len(snapshot_folder): snapshot_folder = snapshot_folder + '/'
+        supervisor_file = os.path.join(snapshot_folder, manifest['supervisor'])
+        with open(supervisor_file + '.tmp', 'wb') as outfile:
+            pickle.dump(self, outfile)
 
-        with open(snapshot_folder + "snapshot.graph", "w") as outfile:
-            outfile.write(json.dumps(frozen))
+        os.replace(graph_file + '.tmp', graph_file)
+        os.replace(supervisor_file + '.tmp', supervisor_file)
 
-        file = open(snapshot_folder + "snapshot.mnms", 'wb')
-    #pickle.dump(self, file)
-        #marshal.dump(self,file)
+        with open(manifest_file + '.tmp', 'w') as outfile:
+            json.dump(manifest, outfile)
+        os.replace(manifest_file + '.tmp', manifest_file)
 
-        #with dill.detect.trace():
-        pickle.dump(self, file)
+        if previous is not None:
+            for key in ('graph', 'supervisor'):
+                if previous[key] != manifest[key]:
+                    try:
+                        os.remove(os.path.join(snapshot_folder, previous[key]))
+                    except FileNotFoundError:
+                        pass
+
+
+def _read_snapshot_manifest(manifest_file: str) -> Optional[dict]:
+    """Reads the manifest of a snapshot, None is returned if there is no manifest.
+
+    Args:
+        -manifest_file: path to the manifest file
+
+    Returns:
+        -manifest: dict with the names of the graph and supervisor files of the snapshot
+    """
+    try:
+        with open(manifest_file, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _load_snapshot_graph(graph_file: str) -> dict:
+    """Reads the graph file of a snapshot, both the compressed binary format and the
+    former JSON format are supported.
+
+    Args:
+        -graph_file: path to the graph file of the snapshot
+
+    Returns:
+        -frozen: dict with the HiPOP graph dict under the 'hipop_graph' key
+    """
+    with open(graph_file, 'rb') as file:
+        magic = file.read(2)
+
+    if magic == b'\x1f\x8b':
+        import dill as pickle
+        with gzip.open(graph_file, 'rb') as file:
+            return pickle.load(file)
 
-def load_snaphshot(snapshot_prefix: str ):
     class JSONDCoder(json.JSONDecoder):
         def __init__(self):
             json.JSONDecoder.__init__(self, object_hook=JSONDCoder.from_dict)
@@ -498,31 +596,61 @@ def load_snaphshot(snapshot_prefix: str ):
                         d["EXCLUDE_MOVEMENTS"][v] = set(d["EXCLUDE_MOVEMENTS"][v])
             return d
 
-    supervisor_file = open(snapshot_prefix + '.mnms', 'rb')
-    supervisor = pickle.load(supervisor_file)
+    with open(graph_file, 'r') as file:
+        frozen = json.loads(file.read())
+    frozen['hipop_graph'] = json.loads(frozen['hipop_graph'], cls=JSONDCoder)
 
-    with open(snapshot_prefix + '.graph', 'r') as file:
-        frozen = file.read()
+    return frozen
 
-    frozen_dict = json.loads(frozen)
 
-    graph_dict = json.loads(frozen_dict['hipop_graph'],cls=JSONDCoder)
+def load_snaphshot(snapshot_prefix: str ):
+    """Loads a snapshot written by Supervisor.take_snapshot. When there is no
+    manifest, the files snapshot_prefix.graph and snapshot_prefix.mnms written
+    by former versions are loaded.
 
-    supervisor._mlgraph.graph = dict_to_graph(graph_dict)
+    Args:
+        -snapshot_prefix: path to the snapshot manifest without extension
+
+    Returns:
+        -supervisor: the restored Supervisor object
+    """
+    import dill as pickle
+
+    manifest = _read_snapshot_manifest(snapshot_prefix + '.json')
+    if manifest is None:
+        graph_file = snapshot_prefix + '.graph'
+        supervisor_file = snapshot_prefix + '.mnms'
+    else:
+        snapshot_folder = os.path.dirname(snapshot_prefix)
+        graph_file = os.path.join(snapshot_folder, manifest['graph'])
+        supervisor_file = os.path.join(snapshot_folder, manifest['supervisor'])
+
+    with open(supervisor_file, 'rb') as file:
+        supervisor = pickle.load(file)
 
-    for layer in supervisor._mlgraph.layers:
+    frozen = _load_snapshot_graph(graph_file)
+    if 'affectation_step' in frozen and frozen['affectation_step'] != supervisor._affectation_step:
+        raise SnapshotMismatchError(snapshot_prefix)
+
+    graph_dict = frozen['hipop_graph']
+
+    supervisor._mlgraph.graph = dict_to_graph(graph_dict)
 
-        layer_graph = OrientedGraph()
-        nodes = [n for n in graph_dict['NODES'] if n['LABEL'] == layer]
-        for node in nodes:
+    # Rebuild all layer graphs with a single pass over nodes and links
+    layer_graphs = {lid: OrientedGraph() for lid in supervisor._mlgraph.layers}
+    for node in graph_dict['NODES']:
+        layer_graph = layer_graphs.get(node['LABEL'])
+        if layer_graph is not None:
             dict_to_node(layer_graph, node)
 
-        links = [l for l in graph_dict['LINKS'] if l['LABEL'] == layer]
-        for link in links:
+    for link in graph_dict['LINKS']:
+        layer_graph = layer_graphs.get(link['LABEL'])
+        if layer_graph is not None:
             dict_to_link(layer_graph, link)
 
-        supervisor._mlgraph.layers[layer].graph = layer_graph
+    for lid, layer_graph in layer_graphs.items():
+        supervisor._mlgraph.layers[lid].graph = layer_graph
 
     supervisor.from_snapshot = True
 
-    return supervisor
\ No newline at end of file
+    return supervisor
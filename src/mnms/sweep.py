@@ -0,0 +1,187 @@
+import csv
+import multiprocessing
+import os
+import traceback
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from mnms.graph.layers import MultiLayerGraph
+from mnms.log import create_logger
+from mnms.simulation import Supervisor
+from mnms.time import Time, Dt
+
+log = create_logger(__name__)
+
+
+@dataclass
+class Scenario:
+    """A variant of a simulation run by a ScenarioSweep.
+
+    Args:
+        -name: name of the scenario, used as the name of its output folder
+        -params: overrides of the scenario (fleet size, MFD parameters, ...), given
+         as is to the function that builds the Supervisor of the scenario
+        -seed: seed of the simulation
+    """
+    name: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    seed: Optional[int] = None
+
+
+# Sweep being run, it is set in the parent process before forking the workers
+# so that they inherit the preloaded graph copy-on-write
+_CURRENT_SWEEP: Optional["ScenarioSweep"] = None
+
+
+def _run_scenario_in_worker(index: int) -> Dict[str, Any]:
+    return _CURRENT_SWEEP.run_scenario(_CURRENT_SWEEP.scenarios[index])
+
+
+class ScenarioSweep(object):
+    def __init__(self,
+                 build_graph: Callable[[], MultiLayerGraph],
+                 build_supervisor: Callable[[MultiLayerGraph, Scenario, Path], Supervisor],
+                 scenarios: List[Scenario],
+                 outdir: Union[str, Path],
+                 metrics: Optional[Callable[[Supervisor, Scenario, Path], Dict[str, Any]]] = None):
+        """Runs several variants of a simulation on the same network. The graph is
+        built once in the main process, then each scenario runs in a forked worker
+        process which shares the graph memory copy-on-write with the main process.
+
+        Args:
+            -build_graph: function returning the MultiLayerGraph (with its roads, OD
+             layer and connections), called once
+            -build_supervisor: function building the Supervisor of a scenario from
+             the graph, the scenario and its output folder, observers and output
+             files should be created here in the output folder
+            -scenarios: the scenarios to run, their names should be unique
+            -outdir: folder where the scenario folders and the summary are written
+            -metrics: optional function returning a dict of metrics of a scenario
+             once it has run, it is added to the summary table
+        """
+        names = [s.name for s in scenarios]
+        assert len(names) == len(set(names)), 'Scenario names should be unique'
+
+        self.build_graph = build_graph
+        self.build_supervisor = build_supervisor
+        self.scenarios = scenarios
+        self.outdir = Path(outdir)
+        self.metrics = metrics
+
+        self.mlgraph: Optional[MultiLayerGraph] = None
+
+        self._tstart: Optional[Time] = None
+        self._tend: Optional[Time] = None
+        self._flow_dt: Optional[Dt] = None
+        self._affectation_factor: Optional[int] = None
+        self._run_kwargs: Dict[str, Any] = dict()
+
+    def run_scenario(self, scenario: Scenario) -> Dict[str, Any]:
+        """Method that builds and runs one scenario. Errors are caught and reported
+        in the returned metrics so that one failing scenario does not stop the sweep.
+
+        Args:
+            -scenario: the scenario to run
+
+        Returns:
+            -metrics: the metrics of the scenario
+        """
+        folder = self.outdir / scenario.name
+        folder.mkdir(parents=True, exist_ok=True)
+
+        mlgraph = self.mlgraph if self.mlgraph is not None else self.build_graph()
+
+        result = {'SCENARIO': scenario.name, 'STATUS': 'OK', 'ELAPSED': None, 'REMAINING_USERS': None, 'ERROR': None}
+        supervisor = None
+        start = time()
+        try:
+            supervisor = self.build_supervisor(mlgraph, scenario, folder)
+            supervisor.run(self._tstart,
+                           self._tend,
+                           self._flow_dt,
+                           self._affectation_factor,
+                           seed=scenario.seed,
+                           **self._run_kwargs)
+            result['REMAINING_USERS'] = len(supervisor._user_flow.users)
+            if self.metrics is not None:
+                result.update(self.metrics(supervisor, scenario, folder))
+        except (Exception, SystemExit):
+            log.error(f'Scenario {scenario.name} failed')
+            result['STATUS'] = 'FAILED'
+            result['ERROR'] = traceback.format_exc()
+            if supervisor is not None and supervisor.tcurrent is not None:
+                result['ERROR'] = f'{supervisor.tcurrent}: {result["ERROR"]}'
+        result['ELAPSED'] = time() - start
+
+        return result
+
+    def run(self, tstart: Time, tend: Time, flow_dt: Dt, affectation_factor: int,
+            nworkers: Optional[int] = None, **run_kwargs) -> List[Dict[str, Any]]:
+        """Launch all the scenarios and write the summary table in outdir/summary.csv.
+
+        Args:
+            -tstart: simulation start time
+            -tend: simulation end time
+            -flow_dt: the simulation flow time step
+            -affectation_factor: the number of simulation flow time step representing one affectation time step
+            -nworkers: number of worker processes, the number of CPUs if None
+            -run_kwargs: other arguments given to Supervisor.run
+
+        Returns:
+            -summary: the metrics of all scenarios, in the order of the scenarios
+        """
+        global _CURRENT_SWEEP
+
+        self._tstart = tstart
+        self._tend = tend
+        self._flow_dt = flow_dt
+        self._affectation_factor = affectation_factor
+        self._run_kwargs = run_kwargs
+        self.outdir.mkdir(parents=True, exist_ok=True)
+
+        if nworkers is None:
+            nworkers = os.cpu_count()
+        nworkers = max(1, min(nworkers, len(self.scenarios)))
+
+        if 'fork' in multiprocessing.get_all_start_methods():
+            log.info(f'Build graph for {len(self.scenarios)} scenarios...')
+            start = time()
+            self.mlgraph = self.build_graph()
+            log.info(f'Build graph done in [{time() - start:.5} s]')
+
+            _CURRENT_SWEEP = self
+            try:
+                # Each worker runs only one scenario so that it starts from a fresh
+                # copy of the graph
+                ctx = multiprocessing.get_context('fork')
+                with ctx.Pool(nworkers, maxtasksperchild=1) as pool:
+                    summary = pool.map(_run_scenario_in_worker, range(len(self.scenarios)), chunksize=1)
+            finally:
+                _CURRENT_SWEEP = None
+                self.mlgraph = None
+        else:
+            log.warning('Fork is not available on this platform, scenarios are run sequentially')
+            summary = [self.run_scenario(s) for s in self.scenarios]
+
+        self.write_summary(summary)
+
+        return summary
+
+    def write_summary(self, summary: List[Dict[str, Any]]):
+        """Method that writes the summary table of the sweep in outdir/summary.csv.
+
+        Args:
+            -summary: the metrics of all scenarios
+        """
+        columns = []
+        for result in summary:
+            for key in result:
+                if key not in columns:
+                    columns.append(key)
+
+        with open(self.outdir / 'summary.csv', 'w', newline='') as f:
+            csvhandler = csv.DictWriter(f, columns, delimiter=';', quotechar='|')
+            csvhandler.writeheader()
+            csvhandler.writerows(summary)
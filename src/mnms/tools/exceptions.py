@@ -25,4 +25,9 @@ class VehicleNotFoundError(Exception):
 class CSVDemandParseError(Exception):
     def __init__(self, file):
         msg = f"Cannot parse the origin or destination for demand_type for the file {file}"
-        super(CSVDemandParseError, self).__init__(msg)
\ No newline at end of file
+        super(CSVDemandParseError, self).__init__(msg)
+
+class SnapshotMismatchError(Exception):
+    def __init__(self, snapshot):
+        msg = f"Graph and supervisor files of snapshot {snapshot} do not correspond to the same affectation step"
+        super(SnapshotMismatchError, self).__init__(msg)
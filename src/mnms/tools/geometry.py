@@ -1,9 +1,7 @@
 from dataclasses import dataclass
 from collections import defaultdict
-from shapely.geometry import Polygon, mapping
-from scipy.spatial import Voronoi
 import numpy as np
-from typing import List, Annotated
+from typing import List, Annotated, Tuple
 
 Point = Annotated[List[float], 2]
 PointList = List[Point]
@@ -34,25 +32,154 @@ def get_bounding_box(roads: "RoadDescriptor", graph = None):
                        np.max(positions[:, 1]))
 
 
+# Maximal number of point-edge pairs evaluated at once by the point in polygon
+# test, it bounds the size of the temporary arrays
+POLYGON_CHUNK_SIZE = 1 << 20
+
+
+class PreparedPolygon(object):
+    def __init__(self, polygon):
+        """Polygon prepared for repeated point in polygon tests: its edges and its
+        bounding box are computed once.
+
+        Args:
+            -polygon: the list of the vertices of the polygon
+        """
+        self.source = polygon
+        self.vertices = np.asarray(polygon, dtype='float32')
+        self._next_vertices = np.vstack((self.vertices[1:], self.vertices[:1]))
+        self._edges = self._next_vertices - self.vertices
+        xmin, ymin = self.vertices.min(axis=0)
+        xmax, ymax = self.vertices.max(axis=0)
+        self.bbox = BoundingBox(xmin, ymin, xmax, ymax)
+
+    def in_bbox(self, pts: np.ndarray) -> np.ndarray:
+        """Method that tests if points are in the bounding box of the polygon.
+
+        Args:
+            -pts: array of points, with float32 coordinates
+
+        Returns:
+            -the mask of the points in the bounding box
+        """
+        bbox = self.bbox
+        return (pts[:, 0] >= bbox.xmin) & (pts[:, 0] <= bbox.xmax) & (pts[:, 1] >= bbox.ymin) & (pts[:, 1] <= bbox.ymax)
+
+    def contains(self, pts, chunk_size: int = POLYGON_CHUNK_SIZE) -> np.ndarray:
+        """Method that tests if points are inside the polygon or on its contour.
+        Points outside of the bounding box of the polygon are rejected before the
+        test on the edges, which is evaluated by chunks of points.
+
+        Args:
+            -pts: the points to test
+            -chunk_size: maximal number of point-edge pairs evaluated at once
+
+        Returns:
+            -the mask of the points inside the polygon
+        """
+        pts = np.asarray(pts, dtype='float32').reshape(-1, 2)
+        mask = np.zeros(len(pts), dtype=bool)
+        candidates = np.flatnonzero(self.in_bbox(pts))
+        step = max(1, chunk_size // len(self.vertices))
+        for i in range(0, len(candidates), step):
+            chunk = candidates[i:i+step]
+            mask[chunk] = self._contains(pts[chunk])
+        return mask
+
+    def _contains(self, pts: np.ndarray) -> np.ndarray:
+        polygon = self.vertices
+        contour2 = self._next_vertices
+        test_diff = self._edges
+        mask1 = (pts[:, None] == polygon).all(-1).any(-1)
+        m1 = (polygon[:, 1] > pts[:, None, 1]) != (contour2[:, 1] > pts[:, None, 1])
+        slope = ((pts[:, None, 0] - polygon[:, 0]) * test_diff[:, 1]) - (
+                    test_diff[:, 0] * (pts[:, None, 1] - polygon[:, 1]))
+        m2 = slope == 0
+        mask2 = (m1 & m2).any(-1)
+        m3 = (slope < 0) != (contour2[:, 1] < polygon[:, 1])
+        m4 = m1 & m3
+        count = np.count_nonzero(m4, axis=-1)
+        mask3 = ~(count % 2 == 0)
+        mask = mask1 | mask2 | mask3
+        return mask
+
+
 def points_in_polygon(polygon, pts):
     if len(pts) == 0:
         return []
-    pts = np.asarray(pts, dtype='float32')
-    polygon = np.asarray(polygon, dtype='float32')
-    contour2 = np.vstack((polygon[1:], polygon[:1]))
-    test_diff = contour2 - polygon
-    mask1 = (pts[:, None] == polygon).all(-1).any(-1)
-    m1 = (polygon[:, 1] > pts[:, None, 1]) != (contour2[:, 1] > pts[:, None, 1])
-    slope = ((pts[:, None, 0] - polygon[:, 0]) * test_diff[:, 1]) - (
-                test_diff[:, 0] * (pts[:, None, 1] - polygon[:, 1]))
-    m2 = slope == 0
-    mask2 = (m1 & m2).any(-1)
-    m3 = (slope < 0) != (contour2[:, 1] < polygon[:, 1])
-    m4 = m1 & m3
-    count = np.count_nonzero(m4, axis=-1)
-    mask3 = ~(count % 2 == 0)
-    mask = mask1 | mask2 | mask3
-    return mask
+    if not isinstance(polygon, PreparedPolygon):
+        polygon = PreparedPolygon(polygon)
+    return polygon.contains(pts)
+
+
+class ZonesIndex(object):
+    def __init__(self, polygons: List):
+        """Spatial index of several polygons, to find the polygon containing each
+        point of a set of points in one call. The bounding boxes of the polygons are
+        stored in a STRtree.
+
+        Args:
+            -polygons: list of polygons, given as lists of vertices or PreparedPolygon
+        """
+        # shapely is imported on first use to keep mnms import fast
+        from shapely import STRtree, box
+
+        self.polygons = [p if isinstance(p, PreparedPolygon) else PreparedPolygon(p) for p in polygons]
+        boxes = [box(p.bbox.xmin, p.bbox.ymin, p.bbox.xmax, p.bbox.ymax) for p in self.polygons]
+        self._tree = STRtree(boxes)
+
+    def memberships(self, pts) -> Tuple[np.ndarray, np.ndarray]:
+        """Method that finds all the polygons containing each point.
+
+        Args:
+            -pts: the points
+
+        Returns:
+            -the array of the indexes of the points and the array of the indexes of
+             the polygons containing them, sorted by point and then by polygon
+        """
+        pts = np.asarray(pts, dtype='float32').reshape(-1, 2)
+        empty = np.empty(0, dtype=np.int64)
+        if len(pts) == 0 or len(self.polygons) == 0:
+            return empty, empty
+
+        from shapely import points
+        pts_ind, polygons_ind = self._tree.query(points(pts.astype(float)), predicate='intersects')
+        if len(pts_ind) == 0:
+            return empty, empty
+        order = np.lexsort((pts_ind, polygons_ind))
+        pts_ind = pts_ind[order]
+        polygons_ind = polygons_ind[order]
+        inside = np.zeros(len(pts_ind), dtype=bool)
+        bounds = np.flatnonzero(np.diff(polygons_ind)) + 1
+        starts = np.r_[0, bounds]
+        ends = np.r_[bounds, len(pts_ind)]
+        for start, end in zip(starts, ends):
+            inside[start:end] = self.polygons[polygons_ind[start]].contains(pts[pts_ind[start:end]])
+        pts_ind = pts_ind[inside]
+        polygons_ind = polygons_ind[inside]
+        order = np.lexsort((polygons_ind, pts_ind))
+        return pts_ind[order].astype(np.int64), polygons_ind[order].astype(np.int64)
+
+    def assign(self, pts) -> np.ndarray:
+        """Method that finds the polygon containing each point. When polygons
+        overlap, a point is assigned to the first polygon containing it.
+
+        Args:
+            -pts: the points
+
+        Returns:
+            -array of the index of the polygon containing each point, -1 for the
+             points outside of all polygons
+        """
+        pts = np.asarray(pts, dtype='float32').reshape(-1, 2)
+        result = np.full(len(pts), -1, dtype=np.int64)
+        pts_ind, polygons_ind = self.memberships(pts)
+        # Memberships are sorted by polygon for each point, keep the first one
+        first = np.r_[True, pts_ind[1:] != pts_ind[:-1]] if len(pts_ind) > 0 else np.empty(0, dtype=bool)
+        result[pts_ind[first]] = polygons_ind[first]
+        return result
+
 
 def polygon_area(polygon):
     """Method that computes the area of a polygon based on Schoelace formula.
@@ -76,6 +203,10 @@ def voronoi_zones(points: PointList, bbox: BoundingBox):
     Returns:
         -polygons: the list of Voronoi zones contours
     """
+    # scipy and shapely are imported on first use to keep mnms import fast
+    from scipy.spatial import Voronoi
+    from shapely.geometry import Polygon, mapping
+
     # Compute the Voronoi diagram of the points
     voronoi = Voronoi(points)
 
@@ -4,6 +4,7 @@ from typing import List
 
 from mnms.time import Time
 from mnms.log import create_logger
+from mnms.io.utils import freeze_outfile, thaw_outfile
 
 log = create_logger(__name__)
 
@@ -63,6 +64,7 @@ class TimeDependentSubject(ABC):
     """
         Represents time-dependent observations
     """
+    __slots__ = ('_observers',)
 
     def __init__(self):
         """Create an empty observer list"""
@@ -103,16 +105,17 @@ class CSVUserObserver(TimeDependentObserver):
     def __getstate__(self):
 
         state = self.__dict__.copy()
+        freeze_outfile(state, '_file')
         if '_csvhandler' in state:
             del state['_csvhandler']
         return state
 
     def __setstate__(self, state):
 
+        thaw_outfile(state, '_file')
         self.__dict__.update(state)
 
         self._csvhandler = csv.writer(self._file, delimiter=';', quotechar='|')
-        self._csvhandler.writerow(self._header)
 
     def finish(self):
         self._file.close()
@@ -149,16 +152,17 @@ class CSVVehicleObserver(TimeDependentObserver):
     def __getstate__(self):
 
         state = self.__dict__.copy()
+        freeze_outfile(state, '_file')
         if '_csvhandler' in state:
             del state['_csvhandler']
         return state
 
     def __setstate__(self, state):
 
+        thaw_outfile(state, '_file')
         self.__dict__.update(state)
 
         self._csvhandler = csv.writer(self._file, delimiter=';', quotechar='|')
-        self._csvhandler.writerow(self._header)
 
 
     def finish(self):
@@ -1,9 +1,170 @@
 import multiprocessing
 import json
 import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
 
 from hipop.shortest_path import parallel_dijkstra, parallel_dijkstra_single_source, floyd_warshall
 
+
+class ShortestPathsStore(object):
+    def __init__(self, node_ids: List[str], predecessors: np.ndarray, file: Optional[str] = None):
+        """All pairs shortest paths stored as a matrix of predecessors indexed by
+        integers. The row i of the matrix is the shortest path tree rooted at the
+        node i, predecessors[i, j] is the index of the node before j on the shortest
+        path from i to j, -1 if j cannot be reached from i.
+
+        Args:
+            -node_ids: the ids of the nodes, in the order of their index
+            -predecessors: the matrix of predecessors
+            -file: the .npy file the matrix is read from if any
+        """
+        self.node_ids = list(node_ids)
+        self.index: Dict[str, int] = {nid: i for i, nid in enumerate(self.node_ids)}
+        self.predecessors = predecessors
+        self._file = file
+        self._node_ids_array = np.array(self.node_ids, dtype=object)
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._file is not None:
+            # Do not pickle the (memory mapped) matrix, it is read back from its file
+            state['predecessors'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.predecessors is None:
+            self.predecessors = np.load(self._file, mmap_mode='r')
+
+    @staticmethod
+    def nodes_file(file) -> Path:
+        """Returns the file where the node ids of a store saved in file are written.
+        """
+        file = Path(file)
+        return file.with_name(file.stem + '_nodes.json')
+
+    @staticmethod
+    def dtype(nb_nodes: int):
+        """Returns the smallest integer type able to store the indexes of nb_nodes nodes.
+        """
+        return np.int16 if nb_nodes < np.iinfo(np.int16).max else np.int32
+
+    @classmethod
+    def from_trees(cls, spts: Dict[str, Dict[str, str]], node_ids: Optional[List[str]] = None) -> "ShortestPathsStore":
+        """Builds the store from shortest paths trees given as dict of dict of node
+        ids, as they were written in the JSON files.
+
+        Args:
+            -spts: dict with origins as keys and shortest path trees as values,
+             a tree is a dict with nodes as keys and their predecessor as values
+            -node_ids: the ids of the nodes, if None all nodes of the trees are used
+        """
+        if node_ids is None:
+            node_ids = list(spts.keys())
+            known = set(node_ids)
+            for spt in spts.values():
+                for n in spt:
+                    if n not in known:
+                        known.add(n)
+                        node_ids.append(n)
+        index = {nid: i for i, nid in enumerate(node_ids)}
+        predecessors = np.full((len(node_ids), len(node_ids)), -1, dtype=cls.dtype(len(node_ids)))
+        for o, spt in spts.items():
+            row = predecessors[index[o]]
+            for n, prev in spt.items():
+                if prev != '':
+                    row[index[n]] = index[prev]
+        return cls(node_ids, predecessors)
+
+    def save(self, outfile):
+        """Writes the matrix of predecessors in outfile (.npy) and the node ids
+        in the file given by nodes_file.
+
+        Args:
+            -outfile: the .npy file where the matrix is saved
+        """
+        np.save(outfile, np.ascontiguousarray(self.predecessors))
+        with open(self.nodes_file(outfile), 'w') as f:
+            json.dump(self.node_ids, f)
+
+    @classmethod
+    def load(cls, file, mmap: bool = True) -> "ShortestPathsStore":
+        """Reads a store written by save.
+
+        Args:
+            -file: the .npy file where the matrix is saved
+            -mmap: if True the matrix is memory mapped instead of being read in memory
+        """
+        with open(cls.nodes_file(file), 'r') as f:
+            node_ids = json.load(f)
+        predecessors = np.load(file, mmap_mode='r' if mmap else None)
+        return cls(node_ids, predecessors, str(file) if mmap else None)
+
+    def decode(self, origin: str, destination: str) -> List[str]:
+        """Method that builds one shortest path.
+
+        Args:
+            -origin: origin of the shortest path
+            -destination: destination of the shortest path
+
+        Returns:
+            -sp: the shortest path (list of nodes), empty if there is no path
+        """
+        return self.decode_many([origin], [destination])[0]
+
+    def decode_many(self, origins: List[str], destinations: List[str]) -> List[List[str]]:
+        """Method that builds several shortest paths at once, all paths go back one
+        node up their shortest path tree at each iteration.
+
+        Args:
+            -origins: origins of the shortest paths
+            -destinations: destinations of the shortest paths
+
+        Returns:
+            -sps: the shortest paths (lists of nodes), empty if there is no path
+        """
+        if len(origins) == 0:
+            return []
+        o = np.array([self.index[n] for n in origins], dtype=np.int64)
+        cur = np.array([self.index[n] for n in destinations], dtype=np.int64)
+        valid = np.ones(len(o), dtype=bool)
+        steps = [cur.copy()]
+        active = np.flatnonzero(cur != o)
+        for _ in range(len(self.node_ids)):
+            if len(active) == 0:
+                break
+            prev = np.asarray(self.predecessors[o[active], cur[active]], dtype=np.int64)
+            dead = prev < 0
+            valid[active[dead]] = False
+            active = active[~dead]
+            prev = prev[~dead]
+            cur[active] = prev
+            step = np.full(len(o), -1, dtype=np.int64)
+            step[active] = prev
+            steps.append(step)
+            active = active[prev != o[active]]
+        else:
+            # Paths going back in a loop, the trees are inconsistent
+            valid[active] = False
+
+        steps = np.vstack(steps)
+        sps = []
+        for i in range(len(o)):
+            if not valid[i]:
+                sps.append([])
+                continue
+            column = steps[:, i]
+            column = column[column >= 0]
+            sps.append(list(self._node_ids_array[column[::-1]]))
+        return sps
+
+
 def compute_all_shortest_paths_naive(graph, chosen_mservice, layer_name, outfile):
     """Fonction that pre-computes the shortest paths for each pair of nodes of the
     graph of a layer and write them to a file. By shortest we mean in distance.
@@ -13,7 +174,8 @@ def compute_all_shortest_paths_naive(graph, chosen_mservice, layer_name, outfile
         -graph: graph of the layer
         -chosen_mservice: dict with a unique element {'layer_name': 'mob_service_name'}
         -layer_name: name of the layer
-        -outfile: file where the shortest paths will be saved
+        -outfile: file where the shortest paths will be saved, as a ShortestPathsStore
+         if it is a .npy file, in JSON otherwise
     """
     # Launch parallel dijkstra on all od pairs
     all_ods = [(n1,n2) for n1 in graph.nodes for n2 in graph.nodes if n1 != n2]
@@ -29,6 +191,16 @@ def compute_all_shortest_paths_naive(graph, chosen_mservice, layer_name, outfile
         multiprocessing.cpu_count(),
         [{layer_name}]*len(origins))
 
+    if _is_binary_store(outfile):
+        # Build the shortest paths trees from the paths
+        spts = {n: {} for n in graph.nodes}
+        for i,(o,d) in enumerate(all_ods):
+            path = paths[i][0]
+            for up, down in zip(path[:-1], path[1:]):
+                spts[o][down] = up
+        ShortestPathsStore.from_trees(spts, list(graph.nodes.keys())).save(outfile)
+        return
+
     # Build a dict of shortest paths
     sps = {}
     for i,(o,d) in enumerate(all_ods):
@@ -50,7 +222,8 @@ def compute_all_shortest_paths_floyd_warshall(graph, chosen_mservice, layer_name
         -graph: graph of the layer
         -chosen_mservice: dict with a unique element {'layer_name': 'mob_service_name'}
         -layer_name: name of the layer
-        -outfile: file where the shortest paths will be saved
+        -outfile: file where the shortest paths will be saved, as a ShortestPathsStore
+         if it is a .npy file, in JSON otherwise
     """
     # Call Floyd Warshall
     st = time.time()
@@ -60,12 +233,23 @@ def compute_all_shortest_paths_floyd_warshall(graph, chosen_mservice, layer_name
                      {layer_name})
     print(f'Flyod-Warshall done in {time.time()-st}')
 
-    # Create the shortest paths trees
-    st = time.time()
     prev_table = pair[0]
     vnodemap = pair[1]
-    spts = {}
     null = max(list(vnodemap.keys())) + 1
+
+    if _is_binary_store(outfile):
+        # The table of predecessors is already indexed by integers
+        st = time.time()
+        node_ids = [vnodemap[v] for v in range(len(vnodemap))]
+        predecessors = np.array(prev_table, dtype=ShortestPathsStore.dtype(len(node_ids)))
+        predecessors[predecessors == null] = -1
+        ShortestPathsStore(node_ids, predecessors).save(outfile)
+        print(f'Building of shortest paths matrix done in {time.time()-st}')
+        return
+
+    # Create the shortest paths trees
+    st = time.time()
+    spts = {}
     for v, node in vnodemap.items():
         spt = {}
         for v_, node_ in vnodemap.items():
@@ -90,7 +274,8 @@ def compute_all_shortest_paths(graph, chosen_mservice, layer_name, outfile):
         -graph: graph of the layer
         -chosen_mservice: dict with a unique element {'layer_name': 'mob_service_name'}
         -layer_name: name of the layer
-        -outfile: file where the shortest paths will be saved
+        -outfile: file where the shortest paths will be saved, as a ShortestPathsStore
+         if it is a .npy file, in JSON otherwise
     """
     origins = list(graph.nodes.keys())
     st = time.time()
@@ -105,6 +290,10 @@ def compute_all_shortest_paths(graph, chosen_mservice, layer_name, outfile):
     for i,o in enumerate(origins):
         spts_dict[o] = spts[i]
 
+    if _is_binary_store(outfile):
+        ShortestPathsStore.from_trees(spts_dict, origins).save(outfile)
+        return
+
     # Dump dict into json the shortest path tree, not the paths as it is smaller
     # in memory size
     with open(outfile, 'w') as f:
@@ -114,13 +303,15 @@ def decode_shortest_path_tree(spts, origin, destination):
     """Function to build the shortest path from the shortest path tree.
 
     Args:
-        -spt: the shortest path tree
+        -spt: the shortest path trees, or a ShortestPathsStore
         -origin: origin of the shortest path
         -destination: destination of the shortest path
 
     Returns:
         -sp: the shortest path (list of nodes)
     """
+    if isinstance(spts, ShortestPathsStore):
+        return spts.decode(origin, destination)
     spt = spts[origin]
     d = destination
     path = [d]
@@ -133,3 +324,37 @@ def decode_shortest_path_tree(spts, origin, destination):
     path = list(reversed(path))
 
     return path
+
+
+def decode_shortest_paths(spts, origins, destinations):
+    """Function to build several shortest paths from the shortest path trees.
+
+    Args:
+        -spt: the shortest path trees, or a ShortestPathsStore
+        -origins: origins of the shortest paths
+        -destinations: destinations of the shortest paths
+
+    Returns:
+        -sps: the shortest paths (lists of nodes)
+    """
+    if isinstance(spts, ShortestPathsStore):
+        return spts.decode_many(origins, destinations)
+    return [decode_shortest_path_tree(spts, o, d) for o, d in zip(origins, destinations)]
+
+
+def convert_shortest_paths_file(json_file, outfile):
+    """Function that converts shortest paths trees saved in a JSON file by
+    compute_all_shortest_paths or compute_all_shortest_paths_floyd_warshall
+    into a ShortestPathsStore saved in outfile (.npy).
+
+    Args:
+        -json_file: the JSON file where the shortest paths trees are saved
+        -outfile: the .npy file where the store is saved
+    """
+    with open(json_file, 'r') as f:
+        spts = json.load(f)
+    ShortestPathsStore.from_trees(spts).save(outfile)
+
+
+def _is_binary_store(outfile):
+    return str(outfile).endswith('.npy')
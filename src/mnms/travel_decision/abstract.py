@@ -1,6 +1,6 @@
 import sys
 from abc import ABC, abstractmethod
-from typing import List, Set, Dict, Callable
+from typing import List, Set, Dict, Callable, Optional, Tuple
 from collections import defaultdict
 from enum import Enum
 import csv
@@ -14,7 +14,8 @@ from numpy.linalg import norm as _norm
 from mnms.demand.user import User, Path, UserState
 from mnms.graph.layers import MultiLayerGraph
 from mnms.mobility_service.personal_vehicle import PersonalMobilityService
-from mnms.log import create_logger
+from mnms.log import create_logger, is_enabled, LOGLEVEL
+from mnms.io.utils import freeze_outfile, thaw_outfile
 from mnms.time import Time
 from mnms.tools.dict_tools import sum_dict
 from mnms.tools.exceptions import PathNotFound
@@ -28,6 +29,151 @@ class Event(Enum):
     MATCH_FAILURE = 1
     INTERRUPTION = 2
 
+
+class PlanningQueue(object):
+    def __init__(self, event_priority: Optional[Dict[Event, int]] = None):
+        """Queue of the users who need to (re)plan, with at most one event per user.
+        Users are keyed by id so that insertion, dedupe and removal are O(1), and
+        they are iterated in the order they were queued.
+
+        Args:
+            -event_priority: dict with events as keys and priorities as values, when a
+             user already queued undergoes a new event, the new event replaces the queued
+             one only if its priority is strictly higher. If None, all events have the
+             same priority and the first event is kept
+        """
+        self.event_priority = dict() if event_priority is None else event_priority
+        self._queue: Dict[str, Tuple[User, Event]] = dict()
+        self.counters: Dict[str, int] = {e._name_: 0 for e in Event}
+        self.counters['DUPLICATE'] = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __iter__(self):
+        return iter(list(self._queue.values()))
+
+    def __contains__(self, user: User):
+        return user.id in self._queue
+
+    def add(self, user: User, event: Event) -> bool:
+        """Add a user in the queue.
+
+        Args:
+            -user: user to add
+            -event: event which triggered the need for (re)planning
+
+        Returns:
+            -added: True if the event of the user is the one queued
+        """
+        queued = self._queue.get(user.id)
+        if queued is not None:
+            self.counters['DUPLICATE'] += 1
+            queued_event = queued[1]
+            if self.event_priority.get(event, 0) <= self.event_priority.get(queued_event, 0):
+                log.warning(f'User {user.id} already undergone an event triggering a (re)planning, ignore new event {event}')
+                return False
+            log.warning(f'User {user.id} already undergone an event triggering a (re)planning, event {queued_event} replaced by {event}')
+        self._queue[user.id] = (user, event)
+        self.counters[event._name_] = self.counters.get(event._name_, 0) + 1
+        return True
+
+    def remove(self, user: User):
+        """Remove a user from the queue.
+
+        Args:
+            -user: user to remove
+        """
+        del self._queue[user.id]
+
+    def event(self, user: User) -> Event:
+        return self._queue[user.id][1]
+
+    def clear(self):
+        self._queue.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Method that returns the current size of the queue and the number of
+        events of each type queued since the beginning of the simulation.
+
+        Returns:
+            -stats: dict with the QUEUE_SIZE, the counter of each event type and the
+             number of DUPLICATE events received for users already queued
+        """
+        stats = {'QUEUE_SIZE': len(self._queue)}
+        stats.update(self.counters)
+        return stats
+
+class PlanningEstimatesMemo(object):
+    def __init__(self):
+        """Memo of the estimated pickup times and service level costs of the mobility
+        services during a planning round. The same pickup nodes come back for many
+        paths and users, the estimates are computed once per (service, node) and
+        recomputed when the service notifies an update of its estimates.
+        """
+        self._pickup_times: Dict[Tuple[str, str, str], Tuple[int, float]] = dict()
+        self._service_costs: Dict[Tuple[str, str, Tuple[str]], Tuple[int, Dict[str, float]]] = dict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def clear(self):
+        self._pickup_times.clear()
+        self._service_costs.clear()
+
+    def pickup_time(self, layer_id: str, service: "AbstractMobilityService", node: str) -> float:
+        """Method that returns the estimated pickup time of a service at a node.
+
+        Args:
+            -layer_id: id of the layer of the service
+            -service: the mobility service
+            -node: pickup node
+
+        Returns:
+            -estimated pickup time in seconds
+        """
+        key = (layer_id, service.id, node)
+        version = service.estimates_version
+        cached = self._pickup_times.get(key)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        value = service.estimate_pickup_time_for_planning(node)
+        self._pickup_times[key] = (version, value)
+        return value
+
+    def service_level_costs(self, layer_id: str, service: "AbstractMobilityService", nodes: List[str]) -> Dict[str, float]:
+        """Method that returns the service level costs of a leg of a path.
+
+        Args:
+            -layer_id: id of the layer of the service
+            -service: the mobility service
+            -nodes: nodes of the leg
+
+        Returns:
+            -service level costs of the leg, this dict should not be modified
+        """
+        key = (layer_id, service.id, tuple(nodes))
+        version = service.estimates_version
+        cached = self._service_costs.get(key)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        value = service.service_level_costs(nodes)
+        self._service_costs[key] = (version, value)
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        """Method that returns the number of hits and misses of the memo since the
+        beginning of the simulation, and its hit rate.
+        """
+        total = self.hits + self.misses
+        return {'HITS': self.hits,
+                'MISSES': self.misses,
+                'HIT_RATE': self.hits / total if total > 0 else 0.}
+
+
 class AbstractDecisionModel(ABC):
 
     def __init__(self,
@@ -44,7 +190,8 @@ class AbstractDecisionModel(ABC):
                  cost: str = 'travel_time',
                  thread_number: int = multiprocessing.cpu_count(),
                  mobility_services_graphs = None,
-                 save_routes_dynamically_and_reapply: bool = False):
+                 save_routes_dynamically_and_reapply: bool = False,
+                 event_priority: Dict[Event, int] = None):
 
         """
         Base class for a travel decision model.
@@ -84,6 +231,10 @@ class AbstractDecisionModel(ABC):
                                                   for an origin, destination, and mode should be saved
                                                   dynamically and reapply for next departing users with
                                                   the same origin, destination and mode
+            -event_priority: Dict with events as keys and priorities as values, an event
+                             undergone by a user already waiting for (re)planning replaces
+                             the queued event only if its priority is higher, by default
+                             the first event is kept
         """
         self._considered_modes = considered_modes
         self._n_shortest_path = n_shortest_path
@@ -103,7 +254,8 @@ class AbstractDecisionModel(ABC):
         self._verbose_file = verbose_file
 
         self._refused_user: List[User] = list()
-        self._users_for_planning: List[Tuple[User, Event]] = list()
+        self._users_for_planning = PlanningQueue(event_priority)
+        self._estimates_memo = PlanningEstimatesMemo()
         self._waiting_cost_functions = {'travel_time': lambda wt: wt}
         self._additional_cost_functions = defaultdict(lambda: lambda p,u: 0)
 
@@ -124,6 +276,7 @@ class AbstractDecisionModel(ABC):
         state = self.__dict__.copy()
 
         if self._write == True:
+            freeze_outfile(state, '_outfile')
             if '_csvhandler' in state:
                 del state['_csvhandler']
 
@@ -131,11 +284,19 @@ class AbstractDecisionModel(ABC):
 
     def __setstate__(self, state):
 
+        thaw_outfile(state, '_outfile')
         self.__dict__.update(state)
 
         if self._write == True:
             self._csvhandler = csv.writer(self._outfile, delimiter=';', quotechar='|')
-            self._csvhandler.writerow(['ID', 'EVENT', 'TIME', 'COST', 'PATH', 'LENGTH', 'SERVICES', 'CHOSEN'])
+
+    def set_event_priority(self, event_priority: Dict[Event, int]):
+        """Method that sets the priority of the events triggering a (re)planning.
+
+        Args:
+            -event_priority: Dict with events as keys and priorities as values
+        """
+        self._users_for_planning.event_priority = event_priority
 
     def update_k_shortest_paths_finding_parameters(self, max_diff_cost: float, max_dist_in_common: float, cost_multiplier_to_find_k_paths: float, max_retry_to_find_k_paths: int):
         self._max_diff_cost = max_diff_cost
@@ -166,6 +327,19 @@ class AbstractDecisionModel(ABC):
     def path_choice(self, paths: List[Path]) -> Path:
         pass
 
+    def paths_choice(self, users_paths: List[List[Path]]) -> List[Path]:
+        """Method that proceeds to the selection of the path of several users at once.
+        By default, path_choice is called for each user, decision models can override
+        it to make the choices of a planning round in a batch.
+
+        Args:
+            -users_paths: for each user, the list of paths to consider for the choice
+
+        Returns:
+            -selected_paths: path chosen by each user
+        """
+        return [self.path_choice(paths) for paths in users_paths]
+
     @property
     def waiting_cost_functions(self):
         return self._waiting_cost_functions
@@ -203,15 +377,22 @@ class AbstractDecisionModel(ABC):
         """
         if users and events:
             assert len(users) == len(events), f'The list of users and events should have the same length.'
-            users_already_in_list = list(zip(*self._users_for_planning))
-            users_already_in_list = users_already_in_list[0] if users_already_in_list else []
-            users_events = []
             for u,e in zip(users, events):
-                if u in users_already_in_list:
-                    log.warning(f'User {u.id} already undergone an event triggering a (re)planning, ignore new event {e}')
-                else:
-                    users_events.append((u,e))
-            self._users_for_planning.extend(users_events)
+                self._users_for_planning.add(u, e)
+
+    @property
+    def estimates_memo_stats(self) -> Dict[str, float]:
+        """Hits, misses and hit rate of the memo of pickup time estimates and
+        service level costs used to compute the cost of the paths.
+        """
+        return self._estimates_memo.stats()
+
+    @property
+    def planning_stats(self) -> Dict[str, int]:
+        """Size of the planning queue and number of events of each type which
+        triggered a (re)planning since the beginning of the simulation.
+        """
+        return self._users_for_planning.stats()
 
     def manage_forced_initial_path(self, user):
         """Method that build the forced initial path of a user.
@@ -225,9 +406,59 @@ class AbstractDecisionModel(ABC):
             if 'TRANSIT' not in user.forced_path_chosen_mobility_services.keys():
                 user.forced_path_chosen_mobility_services['TRANSIT'] = 'WALK'
             user.path.set_mobility_services([user.forced_path_chosen_mobility_services[l] for l,_ in user.path.layers])
-        log.info(f'User {user.id} do not plan at departure, use forced path {user.path}')
+        log.info('User %s do not plan at departure, use forced path %s', user.id, user.path)
+
+    def snap_users(self, users: List[User]):
+        """Method that snaps the coordinates origins and destinations of users on the
+        nodes of the origin destination layer, all users are snapped in one batch and
+        the snapped nodes are cached on the users.
 
-    def review_availability_of_personal_mob_services(self, u: User, e: Event, gnodes):
+        Args:
+            -users: list of users
+        """
+        odlayer = self._mlgraph.odlayer
+        to_snap = [u for u in users if u.snapped_origin is None and isinstance(u.origin, np.ndarray)]
+        if to_snap:
+            for u, nid in zip(to_snap, odlayer.snap_origins([u.origin for u in to_snap])):
+                u.snapped_origin = nid
+        to_snap = [u for u in users if u.snapped_destination is None and isinstance(u.destination, np.ndarray)]
+        if to_snap:
+            for u, nid in zip(to_snap, odlayer.snap_destinations([u.destination for u in to_snap])):
+                u.snapped_destination = nid
+
+    def get_origin_node(self, u: User) -> str:
+        """Method that returns the origin node of a user, snapped on the origin
+        destination layer if the origin is a position.
+
+        Args:
+            -u: user
+
+        Returns:
+            -origin: id of the origin node
+        """
+        if not isinstance(u.origin, np.ndarray):
+            return u.origin
+        if u.snapped_origin is None:
+            self.snap_users([u])
+        return u.snapped_origin
+
+    def get_destination_node(self, u: User) -> str:
+        """Method that returns the destination node of a user, snapped on the origin
+        destination layer if the destination is a position.
+
+        Args:
+            -u: user
+
+        Returns:
+            -destination: id of the destination node
+        """
+        if not isinstance(u.destination, np.ndarray):
+            return u.destination
+        if u.snapped_destination is None:
+            self.snap_users([u])
+        return u.snapped_destination
+
+    def review_availability_of_personal_mob_services(self, u: User, e: Event, gnodes, personal_mob_services=None):
         """Method that eventually remove the personal mobility services from user's available services and
         save the planning origin
 
@@ -235,11 +466,11 @@ class AbstractDecisionModel(ABC):
             -u: user
             -e: event
             -gnodes: list of mlgraph nodes, it is passed to the function for performances reason
+            -personal_mob_services: set of the ids of the personal mobility services, computed
+             from the graph if None, it is passed to the function for performances reason
         """
-        personal_mob_services = set(self._mlgraph.get_all_mobility_services_of_type(PersonalMobilityService))
-        odlayer = self._mlgraph.odlayer
-        origins_id = list(odlayer.origins.keys())
-        origins_pos = np.array([position for position in odlayer.origins.values()])
+        if personal_mob_services is None:
+            personal_mob_services = set(self._mlgraph.get_all_mobility_services_of_type(PersonalMobilityService))
 
         new_planning_origins = {}
 
@@ -255,7 +486,7 @@ class AbstractDecisionModel(ABC):
                         user_far_from_personal_veh = _norm(np.array(parking_pos) - np.array(planning_origin)) > self.personal_mob_service_park_radius
                     else:
                         # User has not used her personal vehicle yet, check user position compared to her origin
-                        parking_node = u.origin if isinstance(u.origin, str) else origins_id[np.argmin(_norm(origins_pos - u.origin, axis=1))]
+                        parking_node = self.get_origin_node(u)
                         origin_pos = u.origin if isinstance(u.origin, np.ndarray) else gnodes[u.origin].position
                         user_far_from_personal_veh = _norm(np.array(origin_pos) - np.array(planning_origin)) > self.personal_mob_service_park_radius
                     if user_far_from_personal_veh:
@@ -294,6 +525,7 @@ class AbstractDecisionModel(ABC):
         """
         all_mob_services = set(self._mlgraph.get_all_mobility_services())
         all_mob_services_ids = [ms.id for ms in all_mob_services]
+        personal_mob_services = set(self._mlgraph.get_all_mobility_services_of_type(PersonalMobilityService))
         gnodes = self._mlgraph.graph.nodes
         deadend_users = []
         personal_ms_planning_origins = {}
@@ -345,7 +577,7 @@ class AbstractDecisionModel(ABC):
 
             if e != Event.DEPARTURE:
                 ## Review availability of personal mobility services
-                personal_ms_planning_origins[u.id] = self.review_availability_of_personal_mob_services(u, e, gnodes)
+                personal_ms_planning_origins[u.id] = self.review_availability_of_personal_mob_services(u, e, gnodes, personal_mob_services)
 
             ## If user has no more available mob service, set state to deadend
             if len(u.available_mobility_services) == 0:
@@ -355,7 +587,7 @@ class AbstractDecisionModel(ABC):
 
         ### Remove deadend users from the list for (re)planning
         for u,e in deadend_users:
-            self._users_for_planning.remove((u,e))
+            self._users_for_planning.remove(u)
             del users_paths[u.id]
 
         ### Return the eventual planning origins to consider for available personal mobility services
@@ -385,13 +617,6 @@ class AbstractDecisionModel(ABC):
         - chosen_mservices: list of dict with the mob service to take on each layer
         - nb_paths: list of the number of different paths that should be computed per mobility services combination
         """
-        # Retrieve keys (id) and values (pos) of all origins and destinations of odlayer
-        odlayer = self._mlgraph.odlayer
-        origins_id = list(odlayer.origins.keys())
-        origins_pos = np.array([position for position in odlayer.origins.values()])
-        destinations_id = list(odlayer.destinations.keys())
-        destinations_pos = np.array([position for position in odlayer.destinations.values()])
-
         # Init lists
         uids = []
         origins = []
@@ -407,10 +632,7 @@ class AbstractDecisionModel(ABC):
             if u.state in [UserState.STOP, UserState.WAITING_ANSWER, UserState.WAITING_VEHICLE]:
                 if u.current_node is None:
                     # User has just departed from her origin, get the name of origin node
-                    if isinstance(u.origin, np.ndarray):
-                        u_origin = origins_id[np.argmin(_norm(origins_pos - u.origin, axis=1))]
-                    else:
-                        u_origin = u.origin
+                    u_origin = self.get_origin_node(u)
                 else:
                     # User (re)plan from current node
                     u_origin = u.current_node
@@ -431,10 +653,7 @@ class AbstractDecisionModel(ABC):
                 sys.exit(-1)
 
             ## Get destination
-            if isinstance(u.destination, np.ndarray):
-                u_destination = destinations_id[np.argmin(_norm(destinations_pos - u.destination, axis=1))]
-            else:
-                u_destination = u.destination
+            u_destination = self.get_destination_node(u)
 
             ## Get available layers depending on available mob services
             assert u.available_mobility_services is not None, f'User {u.id} should have a list as available_mobility_services attribute'
@@ -499,7 +718,8 @@ class AbstractDecisionModel(ABC):
                             f' check what to do, for now we take the first arbitrarily ! (user intersection = {intersection})')
                     if len(intersection) >= 1:
                         u_origin = personal_ms_planning_origins[u.id][list(intersection)[0]]
-                        log.info(f'User {u.id} consider planning origin {u_origin} to be able to access personal mob service {list(intersection)[0]}')
+                        if is_enabled(log, LOGLEVEL.INFO):
+                            log.info('User %s consider planning origin %s to be able to access personal mob service %s', u.id, u_origin, list(intersection)[0])
 
                 # Append all info to the proper lists
                 uids.append(u.id)
@@ -526,14 +746,18 @@ class AbstractDecisionModel(ABC):
         """
         gnodes = self._mlgraph.graph.nodes
 
+        # Choose the paths of all users who found some in one batch
+        chosen_paths = self.paths_choice([d['paths'] for d in users_paths.values() if d['paths']])
+        chosen_paths = iter(chosen_paths)
+
         for uid, d in users_paths.items():
             user = d['user']
             user_paths = d['paths']
             event = d['event']
             if user_paths:
                 ## Some paths have been found
-                chosen_path = self.path_choice(user_paths)
-                log.info(f"User {user.id} chose path {chosen_path} after {event} among {len(user_paths)} shortest paths for this round of (re)planning (state={user.state}).")
+                chosen_path = next(chosen_paths)
+                log.info("User %s chose path %s after %s among %s shortest paths for this round of (re)planning (state=%s).", user.id, chosen_path, event, len(user_paths), user.state)
 
                 if self._write:
                     # Write down the chosen path only
@@ -601,7 +825,7 @@ class AbstractDecisionModel(ABC):
                 self.manage_no_path_found(user, event, tcurrent)
 
             # Remove user from the list of users who need (re)planning
-            self._users_for_planning.remove((user,event))
+            self._users_for_planning.remove(user)
 
     def manage_no_path_found(self, user, event, tcurrent):
         """Method that manages the case when no path was found for a user during
@@ -731,21 +955,25 @@ class AbstractDecisionModel(ABC):
         path_mobservices = [chosen_mservice[layer_id] for layer_id,_ in p.layers]
         p.set_mobility_services(path_mobservices)
         # Second stage path cost computation = take into account waiting time
-        estim_waiting_time = sum([self._mlgraph.layers[layer].mobility_services[service].estimate_pickup_time_for_planning(p.nodes[node_inds][0]) for (layer, node_inds), service in zip(p.layers, p.mobility_services) if service != 'WALK'])
+        layers = self._mlgraph.layers
+        memo = self._estimates_memo
+        estim_waiting_time = sum([memo.pickup_time(layer, layers[layer].mobility_services[service], p.nodes[node_inds][0]) for (layer, node_inds), service in zip(p.layers, p.mobility_services) if service != 'WALK'])
         p.increment_path_cost(self.waiting_cost_functions[self._cost](estim_waiting_time))
         # Third stage path cost computation = eventually add additional cost
         p.increment_path_cost(self.additional_cost_functions[self._cost](p, user))
-        service_costs = sum_dict(*(self._mlgraph.layers[layer].mobility_services[service].service_level_costs(p.nodes[node_inds]) for (layer, node_inds), service in zip(p.layers, p.mobility_services) if service != 'WALK'))
+        service_costs = sum_dict(*(memo.service_level_costs(layer, layers[layer].mobility_services[service], p.nodes[node_inds]) for (layer, node_inds), service in zip(p.layers, p.mobility_services) if service != 'WALK'))
         p.service_costs = service_costs
 
     def __call__(self, tcurrent: Time):
         ### If no user require a (re)planning, do nothing
-        log.info(f'There are {len(self._users_for_planning)} users that are going to (re)plan their journey')
+        log.info('There are %s users that are going to (re)plan their journey', len(self._users_for_planning))
         if len(self._users_for_planning) == 0:
             return
 
         ### Some initializations
         users_paths = {u.id: {'user': u, 'event': e, 'paths': []} for u,e in self._users_for_planning}
+        self._estimates_memo.clear()
+        self.snap_users([u for u,_ in self._users_for_planning])
 
         ### Manage users after event
         personal_ms_planning_origins = self._manage_users_after_event(users_paths, tcurrent)
@@ -788,7 +1016,7 @@ class AbstractDecisionModel(ABC):
         else:
             ### Proceed iteratively in the order of considered modes list
             for considered_mode in self._considered_modes:
-                log.info(f'Path discovery for mode {considered_mode}')
+                log.info('Path discovery for mode %s', considered_mode)
                 ## Gather inputs for the HiPOP call while checking if the paths searched have already been found and saved
                 subgraph_layers = [l for l in self._mlgraph.layers.values() if l._id in considered_mode[0]]
                 k = considered_mode[2]
@@ -909,7 +1137,7 @@ class AbstractDecisionModel(ABC):
                 new_available_layers.append(available_layers[i])
                 new_chosen_mservices.append(mss)
                 new_nb_paths.append(k)
-        log.info(f'{len(uids)-len(new_uids)} / {len(uids)} are reapplied from saved routes')
+        log.info('%s / %s are reapplied from saved routes', len(uids)-len(new_uids), len(uids))
         return new_uids, new_origins, new_destinations, new_available_layers, new_chosen_mservices, new_nb_paths, users_paths
 
     def save_computed_route(self, path_nodes, chosen_mservices, intermodality):
@@ -1,5 +1,4 @@
 import logging
-from math import exp, fsum
 from typing import List, Tuple
 
 import numpy as np
@@ -13,6 +12,42 @@ from mnms.graph.layers import MultiLayerGraph
 log = create_logger(__name__)
 
 
+def logit_choice(costs: List[List[float]], theta: float, rng) -> np.ndarray:
+    """Draws one alternative per group of costs following a logit model, for all
+    groups at once. Probabilities are computed with a log-sum-exp per group, so that
+    they stay accurate whatever the magnitude of theta*cost.
+
+    Args:
+        -costs: for each group, the costs of its alternatives (at least one)
+        -theta: parameter of the logit
+        -rng: random generator (or np.random) used to draw one uniform number per group
+
+    Returns:
+        -selected_ind: for each group, the index of the chosen alternative in the group
+    """
+    counts = np.fromiter((len(c) for c in costs), dtype=np.int64, count=len(costs))
+    starts = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    utilities = -theta * np.fromiter((x for c in costs for x in c), dtype=np.float64, count=counts.sum())
+
+    # Stable softmax per group, groups with no finite utility get uniform weights
+    group_max = np.maximum.reduceat(utilities, starts)
+    finite = np.isfinite(group_max)
+    weights = np.exp(utilities - np.repeat(np.where(finite, group_max, 0.), counts))
+    weights[np.repeat(~finite, counts)] = 1.
+    weights[np.isnan(weights)] = 0.
+
+    # Inverse transform sampling on the cumulated weights of each group
+    cum_weights = np.cumsum(weights)
+    group_end = cum_weights[starts + counts - 1]
+    group_begin = group_end - np.add.reduceat(weights, starts)
+    targets = group_begin + rng.random(len(counts)) * (group_end - group_begin)
+    selected = np.searchsorted(cum_weights, targets, side='right')
+    selected = np.clip(selected, starts, starts + counts - 1)
+
+    return selected - starts
+
+
 class LogitDecisionModel(AbstractDecisionModel):
     def __init__(self, mmgraph: MultiLayerGraph, theta=0.01, considered_modes=None, n_shortest_path=3, cost='travel_time', outfile:str=None, verbose_file=False,
         personal_mob_service_park_radius:float=100, save_routes_dynamically_and_reapply:bool=False):
@@ -68,21 +103,24 @@ class LogitDecisionModel(AbstractDecisionModel):
         Returns:
             -selected_path: path chosen
         """
-        sum_cost_exp = 0
-        theta = self._theta
-        while sum_cost_exp == 0:
-            sum_cost_exp = fsum(exp(-theta*p.path_cost) for p in paths)
-            theta /= 10
-
-        costs=[p.path_cost for p in paths]
-        proba_path = [exp(-10*theta*c)/sum_cost_exp for c in costs]
-
-        if self._seed is not None:
-            selected_ind = self._rng.choice(range(len(proba_path)), 1,  p=proba_path)[0]
-        else:
-            selected_ind = np.random.choice(range(len(proba_path)), 1,  p=proba_path)[0]
-        path_selected = paths[selected_ind]
-        return path_selected
+        return self.paths_choice([paths])[0]
+
+    def paths_choice(self, users_paths: List[List[Path]]) -> List[Path]:
+        """Method that proceeds to the selection of the path of several users at once,
+        with one draw of the random generator for all of them.
+
+        Args:
+            -users_paths: for each user, the list of paths to consider for the choice
+
+        Returns:
+            -selected_paths: path chosen by each user
+        """
+        if not users_paths:
+            return []
+        rng = self._rng if self._seed is not None else np.random
+        costs = [[p.path_cost for p in paths] for paths in users_paths]
+        selected_ind = logit_choice(costs, self._theta, rng)
+        return [paths[i] for paths, i in zip(users_paths, selected_ind)]
 
 class ModeCentricLogitDecisionModel(AbstractDecisionModel):
     def __init__(self, mmgraph: MultiLayerGraph, considered_modes, theta=0.01, cost='travel_time', outfile:str=None, verbose_file=False,
@@ -127,7 +165,15 @@ class ModeCentricLogitDecisionModel(AbstractDecisionModel):
             rng = np.random.default_rng(self._seed)
             self._rng = rng
 
-    def path_choice(self, paths:List[Path]) -> Path:
+    def preselect_paths(self, paths:List[Path]) -> List[Path]:
+        """Method that selects the best route of each considered mode.
+
+        Args:
+            -paths: list of paths to consider for the choice
+
+        Returns:
+            -preselected_paths: the best path of each mode which has at least one path
+        """
         # Group paths per considered modes
         grouped_paths = {}
         for mi, m in enumerate(self._considered_modes):
@@ -152,18 +198,27 @@ class ModeCentricLogitDecisionModel(AbstractDecisionModel):
                 v.sort(key=lambda p: p.path_cost)
                 preselected_paths.append(v[0])
 
-        # Then select a mode
-        sum_cost_exp = 0
-        theta = self._theta
-        while sum_cost_exp == 0:
-            sum_cost_exp = fsum(exp(-theta*p.path_cost) for p in preselected_paths)
-            theta /= 10
-
-        costs=[p.path_cost for p in preselected_paths]
-        proba_path = [exp(-10*theta*c)/sum_cost_exp for c in costs]
-
-        if self._seed is not None:
-            selected_ind = self._rng.choice(range(len(proba_path)), 1,  p=proba_path)[0]
-        else:
-            selected_ind = np.random.choice(range(len(proba_path)), 1,  p=proba_path)[0]
-        return preselected_paths[selected_ind]
+        return preselected_paths
+
+    def path_choice(self, paths:List[Path]) -> Path:
+        return self.paths_choice([paths])[0]
+
+    def paths_choice(self, users_paths: List[List[Path]]) -> List[Path]:
+        """Method that proceeds to the selection of the path of several users at once:
+        the best route of each mode is preselected per user, then the modes are chosen
+        following a logit with one draw of the random generator for all users.
+
+        Args:
+            -users_paths: for each user, the list of paths to consider for the choice
+
+        Returns:
+            -selected_paths: path chosen by each user
+        """
+        if not users_paths:
+            return []
+        # NB: when no path matches a considered mode, the choice is made among all paths
+        preselected = [self.preselect_paths(paths) or paths for paths in users_paths]
+        rng = self._rng if self._seed is not None else np.random
+        costs = [[p.path_cost for p in paths] for paths in preselected]
+        selected_ind = logit_choice(costs, self._theta, rng)
+        return [paths[i] for paths, i in zip(preselected, selected_ind)]
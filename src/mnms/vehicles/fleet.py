@@ -1,14 +1,128 @@
-from typing import Type, Dict, Optional, List
+from typing import Type, Dict, Optional, List, Iterable, Tuple
 
+import numpy as np
+
+from mnms.tools.geometry import ZonesIndex
 from mnms.vehicles.manager import VehicleManager
 from mnms.vehicles.veh_type import Vehicle, VehicleActivity, VehicleActivityStop
 
 
+def _location(veh: Vehicle) -> tuple:
+    """Returns what identifies the location of a vehicle without computing its lazy
+    coordinates: its link and remaining length, or its position object when it is
+    on no link.
+    """
+    link = veh.current_link
+    if link is not None:
+        return link, veh.remaining_link_length, None
+    return None, None, veh.position
+
+
+class FleetZones(object):
+    def __init__(self, zones_index: ZonesIndex):
+        """Assignment of the vehicles of a fleet to the zones of a ZonesIndex. The
+        zones of all the vehicles which moved since the last update are computed in
+        one batched call. A vehicle on a link is considered to have moved when its link
+        or its remaining length on the link changed, so that the lazy coordinates of
+        the vehicles are only computed for the vehicles which moved. A vehicle on no
+        link is considered to have moved when its position object has been replaced.
+
+        Args:
+            -zones_index: the spatial index of the zones
+        """
+        self.zones_index = zones_index
+        self._locations: Dict[str, tuple] = dict()
+        self._zones: Dict[str, Tuple[int, ...]] = dict()
+        self.nb_batches: int = 0
+
+    def update(self, vehicles: Iterable[Vehicle], prune: bool = False):
+        """Method that computes the zones of the vehicles which moved.
+
+        Args:
+            -vehicles: the vehicles
+            -prune: if True, vehicles is the whole fleet and the deleted vehicles
+             are forgotten
+        """
+        vehicles = list(vehicles)
+        locations = self._locations
+        moved = []
+        for veh in vehicles:
+            location = _location(veh)
+            previous = locations.get(veh.id)
+            if previous is None or previous[0] != location[0] or previous[1] != location[1] \
+                    or previous[2] is not location[2]:
+                moved.append(veh)
+                locations[veh.id] = location
+        if prune and len(locations) > 2 * len(vehicles) + 16:
+            # Forget the deleted vehicles
+            alive = {veh.id for veh in vehicles}
+            self._locations = {vid: loc for vid, loc in locations.items() if vid in alive}
+            self._zones = {vid: z for vid, z in self._zones.items() if vid in alive}
+        if not moved:
+            return
+
+        located = [veh for veh in moved if veh.position is not None]
+        for veh in moved:
+            self._zones[veh.id] = tuple()
+        if located:
+            pts_ind, zones_ind = self.zones_index.memberships(np.array([veh.position for veh in located], dtype=float))
+            if len(pts_ind) > 0:
+                bounds = np.flatnonzero(np.diff(pts_ind)) + 1
+                for p, zones in zip(pts_ind[np.r_[0, bounds]].tolist(), np.split(zones_ind, bounds)):
+                    self._zones[located[p].id] = tuple(zones.tolist())
+            self.nb_batches += 1
+
+    def zones_of(self, vehicles: Iterable[Vehicle]) -> List[Tuple[int, ...]]:
+        """Method that returns the indexes of the zones containing vehicles.
+
+        Args:
+            -vehicles: the vehicles
+
+        Returns:
+            -list of the tuples of the indexes of the zones containing each vehicle
+        """
+        vehicles = list(vehicles)
+        self.update(vehicles)
+        zones = self._zones
+        return [zones[veh.id] for veh in vehicles]
+
+    def first_zones(self, vehicles: Iterable[Vehicle]) -> np.ndarray:
+        """Method that returns the index of the first zone containing each vehicle.
+
+        Args:
+            -vehicles: the vehicles
+
+        Returns:
+            -array of zone indexes, -1 for vehicles outside of all zones
+        """
+        vehicles = list(vehicles)
+        self.update(vehicles)
+        zones = self._zones
+        return np.array([zones[veh.id][0] if zones[veh.id] else -1 for veh in vehicles], dtype=np.int64)
+
+    def count(self, vehicles: Iterable[Vehicle]) -> np.ndarray:
+        """Method that counts vehicles per zone, a vehicle in several zones counts
+        in each of them.
+
+        Args:
+            -vehicles: the vehicles
+
+        Returns:
+            -array of the number of vehicles in each zone
+        """
+        vehicles = list(vehicles)
+        self.update(vehicles)
+        zones = self._zones
+        flat = [z for veh in vehicles for z in zones[veh.id]]
+        return np.bincount(np.array(flat, dtype=np.int64), minlength=len(self.zones_index.polygons))
+
+
 class FleetManager(object):
     def __init__(self,
                  veh_type: Type[Vehicle],
                  mobility_service: str,
-                 is_personal: bool):
+                 is_personal: bool,
+                 veh_manager: Optional[VehicleManager] = None):
         """
         Manage a fleet of Vehicles
 
@@ -16,15 +130,42 @@ class FleetManager(object):
             -veh_type: Type of vehicle
             -mobility_service: the associated mobility service
             -is_personal: bool specifying of the fleet manages personal vehicles or not
+            -veh_manager: the vehicle registry of the simulation, if None the fleet
+             uses its own registry until set_vehicle_manager is called
         """
-        self.__veh_manager = VehicleManager()
+        self.__veh_manager = veh_manager if veh_manager is not None else VehicleManager()
         self.vehicles: Dict[str, Vehicle] = dict()
         self._constructor: Type[Vehicle] = veh_type
         self._mobility_service = mobility_service
         self._is_personal = is_personal
+        self._zones: Dict[int, FleetZones] = dict()
+
+    @property
+    def veh_manager(self) -> VehicleManager:
+        return self.__veh_manager
+
+    def set_vehicle_manager(self, veh_manager: VehicleManager):
+        """Method that moves the fleet in another vehicle registry. Vehicles already
+        created are registered in the new registry, they are given a new id
+        only if theirs is already used there.
+
+        Args:
+            -veh_manager: the new vehicle registry
+        """
+        if veh_manager is self.__veh_manager:
+            return
+        vehicles = list(self.vehicles.values())
+        for veh in vehicles:
+            self.__veh_manager.remove_vehicle(veh)
+        self.__veh_manager = veh_manager
+        self.vehicles = dict()
+        for veh in vehicles:
+            veh_manager.add_vehicle(veh)
+            self.vehicles[veh.id] = veh
 
     def create_vehicle(self, node: str, capacity: int, activities: Optional[List[VehicleActivity]]):
-        new_veh = self._constructor(node, capacity, self._mobility_service, self._is_personal, activities=activities)
+        new_veh = self._constructor(node, capacity, self._mobility_service, self._is_personal, activities=activities,
+                                    global_id=self.__veh_manager.next_id())
         self.vehicles[new_veh.id] = new_veh
         self.__veh_manager.add_vehicle(new_veh)
         return new_veh
@@ -36,6 +177,27 @@ class FleetManager(object):
         self.__veh_manager.remove_vehicle(self.vehicles[vehid])
         del self.vehicles[vehid]
 
+    def zones(self, zones_index: ZonesIndex) -> FleetZones:
+        """Method that returns the assignment of the vehicles of this fleet to the
+        zones of a spatial index, up to date with the current vehicles positions.
+
+        Args:
+            -zones_index: the spatial index of the zones
+
+        Returns:
+            -the assignment of the vehicles to the zones
+        """
+        fleet_zones = self._zones.get(id(zones_index))
+        if fleet_zones is None or fleet_zones.zones_index is not zones_index:
+            # Only the assignments to the last indexes used are kept, older indexes
+            # have most likely been replaced
+            while len(self._zones) >= 4:
+                del self._zones[next(iter(self._zones))]
+            fleet_zones = FleetZones(zones_index)
+            self._zones[id(zones_index)] = fleet_zones
+        fleet_zones.update(self.vehicles.values(), prune=True)
+        return fleet_zones
+
     def vehicle_type(self):
         return self._constructor.__name__ if self._constructor is not None else None
 
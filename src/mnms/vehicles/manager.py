@@ -8,55 +8,58 @@ log = create_logger(__name__)
 
 
 class VehicleManager(object):
-
-    # Class attribute (shared by all instances)
-    _vehicles: Dict[str, Vehicle] = dict()                      # id_veh, Vehicle
-    _type_vehicles: Dict[str, Set[str]] = defaultdict(set)
-    _new_vehicles: List[Vehicle] = list()
-
-    def __reduce__(self):
-        """
-        Customize the pickling process by ensuring class attributes are also pickled.
+    def __init__(self):
         """
-        # return a tuple of (constructor, args, state)
-        state = self.__dict__.copy()  # Copy instance attributes
-        state['_vehicles'] = VehicleManager._vehicles  # Add class attribute explicitly
-        state['_type_vehicles'] = VehicleManager._type_vehicles  # Add class attribute explicitly
-        state['_new_vehicles'] = VehicleManager._new_vehicles  # Add class attribute explicitly
-        return (self.__class__, () , state)
-
-    def __setstate__(self, state):
+        Registry of the vehicles of a simulation. It also attributes a unique id to
+        each vehicle it registers. Each simulation owns its own registry, which is
+        shared by the fleets of the mobility services and the flow motor.
         """
-        This method is used during unpickling to restore the object’s state.
-        """
-        self.__dict__.update(state)  # Restore instance attributes
-        VehicleManager._vehicles = state['_vehicles']  # Restore class attribute
-        VehicleManager._type_vehicles = state['_type_vehicles']  # Restore class attribute
-        VehicleManager._new_vehicles = state['_new_vehicles']  # Restore class attribute
+        self._vehicles: Dict[str, Vehicle] = dict()                      # id_veh, Vehicle
+        self._type_vehicles: Dict[str, Set[str]] = defaultdict(set)
+        self._new_vehicles: List[Vehicle] = list()
+        self._counter: int = 0
 
     @property
     def number(self):
         return len(self._vehicles)
 
+    @property
+    def vehicles(self) -> Dict[str, Vehicle]:
+        return self._vehicles
+
+    def next_id(self) -> str:
+        """Method that returns a new vehicle id, unique in this registry.
+
+        Returns:
+            -id: the new vehicle id
+        """
+        while str(self._counter) in self._vehicles:
+            self._counter += 1
+        new_id = str(self._counter)
+        self._counter += 1
+        return new_id
+
     def add_vehicle(self, veh:Vehicle) -> None:
+        if veh._global_id is None or veh._global_id in self._vehicles:
+            veh._global_id = self.next_id()
         self.add_new_vehicle(veh)
-        VehicleManager._vehicles[veh._global_id] = veh
-        VehicleManager._type_vehicles[veh.type].add(veh._global_id)
+        self._vehicles[veh._global_id] = veh
+        self._type_vehicles[veh.type].add(veh._global_id)
 
     def add_new_vehicle(self, veh):
-        VehicleManager._new_vehicles.append(veh)
+        self._new_vehicles.append(veh)
 
     def remove_vehicle(self, veh:Vehicle) -> None:
-        log.info(f"Deleting {veh}")
-        del VehicleManager._vehicles[veh._global_id]
-        VehicleManager._type_vehicles[veh.type].remove(veh._global_id)
+        log.info("Deleting %s", veh)
+        del self._vehicles[veh._global_id]
+        self._type_vehicles[veh.type].remove(veh._global_id)
 
     @property
     def has_new_vehicles(self):
-        return bool(VehicleManager._new_vehicles)
+        return bool(self._new_vehicles)
 
-    @classmethod
-    def empty(cls):
-        VehicleManager._vehicles = dict()
-        VehicleManager._type_vehicles = defaultdict(set)
-        VehicleManager._new_vehicles = list()
+    def empty(self):
+        self._vehicles = dict()
+        self._type_vehicles = defaultdict(set)
+        self._new_vehicles = list()
+        self._counter = 0
@@ -235,7 +235,11 @@ class VehicleActivityServing(VehicleActivity):
 
 
 class Vehicle(TimeDependentSubject):
-    _counter = 0
+    __slots__ = ('_global_id', '_capacity', 'mobility_service', '_is_personal', 'passengers',
+                 '_current_link', '_current_node', '_remaining_link_length', '_position',
+                 '_position_source', '_distance', '_distance_at_last_res_change', '_iter_path',
+                 'speed', '_dt_move', '_achieved_path', '_achieved_path_since_last_notify',
+                 'activities', 'activity')
 
     def __init__(self,
                  node: str,
@@ -253,12 +257,13 @@ class Vehicle(TimeDependentSubject):
             mobility_service: The associated mobility service
             activities: The initial activities of the Vehicle
             is_personal: Boolean specifying if the vehicle is personal or not
+            global_id: The id of the Vehicle, if negative the id is attributed by the
+                       VehicleManager the Vehicle is registered in
         """
         super(Vehicle, self).__init__()
 
         if int(global_id) < 0:
-            self._global_id = str(Vehicle._counter)
-            Vehicle._counter += 1
+            self._global_id = None
         else:
             self._global_id = str(global_id)
 
@@ -272,6 +277,7 @@ class Vehicle(TimeDependentSubject):
         self._current_node = node
         self._remaining_link_length = None
         self._position = None  # current vehicle coordinates
+        self._position_source = None  # function, link and remaining length to compute the coordinates on demand
         self._distance = 0  # travelled distance ( reset to zero if other trip ?)
         self._distance_at_last_res_change = 0  # distance this vehicle has traveled since it enters current reservoir
         self._iter_path = None
@@ -289,22 +295,23 @@ class Vehicle(TimeDependentSubject):
         else:
             self.activity: VehicleActivity = self.default_activity()
 
-    def __getstate__(self):
-
-        state = self.__dict__.copy()
-        state['_counter'] = Vehicle._counter
+    def __repr__(self):
+        return f"{self.__class__.__name__}('{self._global_id}', '{self.activity_type.name if self.activity_type is not None else None}')"
 
+    def __getstate__(self):
+        state = dict(getattr(self, '__dict__', {}))
+        for cls in type(self).__mro__:
+            for k in getattr(cls, '__slots__', ()):
+                if hasattr(self, k):
+                    state[k] = getattr(self, k)
+        # The coordinates are computed before pickling, the function computing them may not be available after
+        state['_position'] = self.position
+        state['_position_source'] = None
         return state
 
     def __setstate__(self, state):
-        """
-        This method is used during unpickling to restore the object’s state.
-        """
-        self.__dict__.update(state)  # Restore instance attributes
-        Vehicle._counter = state['_counter']  # Restore class attribute
-
-    def __repr__(self):
-        return f"{self.__class__.__name__}('{self._global_id}', '{self.activity_type.name if self.activity_type is not None else None}')"
+        for k, v in state.items():
+            setattr(self, k, v)
 
     @property
     def distance(self):
@@ -352,6 +359,10 @@ class Vehicle(TimeDependentSubject):
 
     @property
     def position(self):
+        if self._position_source is not None:
+            f_position, link, remaining_length = self._position_source
+            self._position_source = None
+            self._position = f_position(link, remaining_length)
         return self._position
 
     @property
@@ -433,10 +444,22 @@ class Vehicle(TimeDependentSubject):
             user.update_distance(dist)
 
     def set_position(self, position: np.ndarray):
+        self._position_source = None
         self._position = position
 
+    def set_lazy_position(self, f_position: Callable[[Tuple[str, str], float], np.ndarray], link: Tuple[str, str], remaining_length: float):
+        """Method that sets the position of the vehicle on a link without computing its
+        coordinates, they are computed the first time the position is read.
+
+        Args:
+            -f_position: function computing the coordinates from the link and the remaining length
+            -link: the link where the vehicle is
+            -remaining_length: the remaining length to travel on the link
+        """
+        self._position_source = (f_position, link, remaining_length)
+
     def drop_user(self, tcurrent: Time, user: 'User', drop_pos: np.ndarray):
-        log.info(f"{user} is dropped at {self._current_link[0]}")
+        log.info("%s is dropped at %s", user, self._current_link[0])
         user.remaining_link_length = 0
         upath = user.path.nodes
         unode = self._current_link[0]
@@ -449,18 +472,18 @@ class Vehicle(TimeDependentSubject):
 
     def drop_all_passengers(self, tcurrent: Time):
         for _, user in self.passengers.values():
-            log.info(f"{user} is dropped at {self._current_link[1]}")
+            log.info("%s is dropped at %s", user, self._current_link[1])
             unode = self._current_link[1]
             user.current_node = unode
             user.remaining_link_length = 0
-            user.position = self._position
+            user.position = self.position
             user.notify(tcurrent)
             user.vehicle = None
 
         self.passengers = dict()
 
     def start_user_trip(self, userid, take_node):
-        log.info(f'Passenger {userid} has been taken by {self} at {take_node}')
+        log.info('Passenger %s has been taken by %s at %s', userid, self, take_node)
         take_time, user = self._next_passenger.pop(userid)
         user.vehicle = self.id
         self.passengers[userid] = (take_time, user)
@@ -489,12 +512,10 @@ class Vehicle(TimeDependentSubject):
             path_nodes = [self._current_node]
         return path_nodes
 
-    @classmethod
-    def reset_counter(cls):
-        cls._counter = 0
-
 
 class Car(Vehicle):
+    __slots__ = ('_last_dropped_off_user',)
+
     def __init__(self,
                  node: str,
                  capacity: int,
@@ -515,6 +536,8 @@ class Car(Vehicle):
 
 
 class Bus(Vehicle):
+    __slots__ = ()
+
     def __init__(self,
                  node: str,
                  capacity: int,
@@ -527,6 +550,8 @@ class Bus(Vehicle):
 
 
 class Tram(Vehicle):
+    __slots__ = ()
+
     def __init__(self,
                  node: str,
                  capacity: int,
@@ -538,6 +563,8 @@ class Tram(Vehicle):
 
 
 class Metro(Vehicle):
+    __slots__ = ()
+
     def __init__(self,
                  node: str,
                  capacity: int,
@@ -549,6 +576,8 @@ class Metro(Vehicle):
 
 
 class Bike(Vehicle):
+    __slots__ = ()
+
     def __init__(self,
                  node: str,
                  capacity: int,
@@ -560,6 +589,8 @@ class Bike(Vehicle):
 
 
 class Train(Vehicle):
+    __slots__ = ()
+
     def __init__(self,
                  node: str,
                  capacity: int,
@@ -0,0 +1,82 @@
+import copy
+import pickle
+import unittest
+
+from mnms.demand.manager import BaseDemandManager
+from mnms.demand.user import User, Path
+from mnms.mobility_service.abstract import Request
+from mnms.time import Time, Dt
+from mnms.vehicles.veh_type import Car, Bus
+
+
+class TestCompactObjects(unittest.TestCase):
+    def test_no_instance_dict(self):
+        user = User('U0', 'A', 'B', Time('07:00:00'))
+        path = Path(10., ['A', 'B'])
+        for obj in [user, path, Request(user, 'B', Time('07:00:00')), Car('A', 1, 'PV', True), Bus('A', 10, 'BUS')]:
+            self.assertFalse(hasattr(obj, '__dict__'))
+        with self.assertRaises(AttributeError):
+            user.unknown_attribute = 0
+
+    def test_lazy_fields(self):
+        user = User('U0', 'A', 'B', Time('07:00:00'), pickup_dt=Dt(minutes=3))
+        self.assertIsNone(user._achieved_path)
+        self.assertIsNone(user._parameters)
+        self.assertIsNone(user._pickup_dt)
+
+        self.assertEqual(user.achieved_path, [])
+        user.update_achieved_path_ms('WALK')
+        self.assertEqual(user.achieved_path_ms, ['WALK'])
+        user.parameters['max_detour_ratio'] = 2
+        self.assertEqual(user.max_detour_ratio, 2)
+        self.assertEqual(user.pickup_dt['CAR'], Dt(minutes=3))
+        user.park_personal_vehicle('PV', 'A')
+        self.assertEqual(user.parked_personal_vehicles, {'PV': 'A'})
+
+    def test_copy_and_pickle(self):
+        path = Path(10., ['A', 'B'])
+        path.mobility_services = ['WALK']
+        path_copy = copy.copy(path)
+        self.assertIs(path_copy.nodes, path.nodes)
+        path_deepcopy = copy.deepcopy(path)
+        self.assertEqual(path_deepcopy, path)
+        self.assertIsNot(path_deepcopy.mobility_services, path.mobility_services)
+
+        user = User('U0', 'A', 'B', Time('07:00:00'))
+        user.path = path
+        car = Car('A', 1, 'PV', True)
+        car.last_dropped_off_user = user
+        user.vehicle = car
+        user_copy = pickle.loads(pickle.dumps(user))
+        self.assertEqual(user_copy.path, path)
+        self.assertIs(user_copy.vehicle.last_dropped_off_user, user_copy)
+        self.assertEqual(user_copy.vehicle.mobility_service, 'PV')
+
+
+class TestDemandRelease(unittest.TestCase):
+    def test_release_departed_users(self):
+        users = [User(str(i), 'A', 'B', Time('07:00:00').add_time(Dt(minutes=i))) for i in range(4)]
+        demand = BaseDemandManager(users, keep_users=False)
+        del users
+
+        departed = demand.get_next_departures(Time('07:00:00'), Time('07:02:00'))
+        self.assertEqual([u.id for u in departed], ['0', '1'])
+        self.assertEqual(len(demand._users), 1)
+        departed = demand.get_next_departures(Time('07:02:00'), Time('08:00:00'))
+        self.assertEqual([u.id for u in departed], ['2', '3'])
+        self.assertEqual(len(demand._users), 0)
+        self.assertEqual(demand.nb_users, 4)
+
+    def test_copy_released_demand(self):
+        users = [User(str(i), 'A', 'B', Time('07:00:00').add_time(Dt(minutes=i))) for i in range(3)]
+        demand = BaseDemandManager(users, keep_users=False)
+
+        departed = demand.copy().get_next_departures(Time('07:00:00'), Time('08:00:00'))
+        self.assertEqual([u.id for u in departed], ['0', '1', '2'])
+
+        demand.get_next_departures(Time('07:00:00'), Time('07:01:00'))
+        departed = demand.copy().get_next_departures(Time('07:00:00'), Time('08:00:00'))
+        self.assertEqual([u.id for u in departed], ['1', '2'])
+
+        demand.get_next_departures(Time('07:01:00'), Time('08:00:00'))
+        self.assertEqual(demand._remaining_users(), [])
@@ -17,7 +17,6 @@ from mnms.mobility_service.personal_vehicle import PersonalMobilityService
 from mnms.mobility_service.on_demand import OnDemandMobilityService
 from mnms.mobility_service.public_transport import PublicTransportMobilityService
 from mnms.time import Dt, TimeTable, Time
-from mnms.vehicles.manager import VehicleManager
 from mnms.vehicles.veh_type import Vehicle
 from mnms.tools.observer import CSVVehicleObserver
 from mnms.demand import BaseDemandManager, User
@@ -93,8 +92,6 @@ class TestMFDFlow(unittest.TestCase):
         """Concludes and closes the test.
         """
         self.tempfile.cleanup()
-        VehicleManager.empty()
-        Vehicle._counter = 0
 
     def test_fill(self):
         self.assertIn('res1', self.flow.dict_speeds)
@@ -238,12 +235,9 @@ def test_move_veh_activity_change():
     assert 1 == pytest.approx(user.distance)
     assert 11 == pytest.approx(veh.distance)
 
-    VehicleManager.empty()
-    Vehicle._counter = 0
 
 
 def test_move_veh_res_change():
-    from mnms.vehicles.manager import VehicleManager
 
     roads = generate_line_road([0, 0], [0, 20], 3)
     roads.add_zone(construct_zone_from_sections(roads, "LEFT", ["0_1"]))
@@ -284,5 +278,116 @@ def test_move_veh_res_change():
     assert approx_dist == pytest.approx(user.distance)
     assert approx_dist == pytest.approx(veh.distance)
 
-    VehicleManager.empty()
-    Vehicle._counter = 0
+
+
+def test_locate_vehicles():
+    roads = generate_line_road([0, 0], [0, 500], 6)
+    roads.add_zone(construct_zone_from_sections(roads, "LEFT", ["0_1", "1_2", "3_4"]))
+    roads.add_zone(construct_zone_from_sections(roads, "RIGHT", ["2_3", "4_5"]))
+    roads.register_stop("S0", "0_1", 0)
+    roads.register_stop("S1", "2_3", 0.5)
+    roads.register_stop("S2", "4_5", 1)
+
+    car_layer = generate_layer_from_roads(roads, "CarLayer", mobility_services=[PersonalMobilityService()])
+    bus_layer = BusLayer(roads, services=[PublicTransportMobilityService('Bus')])
+    bus_layer.create_line("L1", ["S0", "S1", "S2"], [["0_1", "1_2", "2_3"], ["2_3", "3_4", "4_5"]],
+                          TimeTable.create_table_freq('07:00:00', '08:00:00', Dt(minutes=10)))
+    mlgraph = MultiLayerGraph([car_layer, bus_layer])
+
+    flow = MFDFlowMotor()
+    flow.set_graph(mlgraph)
+    flow.add_reservoir(Reservoir(roads.zones["LEFT"], ["CAR", "BUS"], lambda x: {k: 10 for k in x}))
+    flow.add_reservoir(Reservoir(roads.zones["RIGHT"], ["CAR", "BUS"], lambda x: {k: 5 for k in x}))
+    flow.set_time(Time('07:00:00'))
+    flow.initialize()
+
+    vehicles = list()
+    for link in [('L1_S0', 'L1_S1'), ('L1_S1', 'L1_S2'), ('CarLayer_2', 'CarLayer_3')]:
+        for remaining in [0, 50, 100, 149.9, 150, 200, 250, 1000]:
+            veh = Vehicle(link[0], 1, 'Bus', False)
+            veh._current_link = link
+            veh._remaining_link_length = remaining
+            veh.set_position(np.array([0, 10]))
+            vehicles.append(veh)
+    veh = Vehicle('CarLayer_2', 1, 'Bus', False)
+    veh._current_link = ('CarLayer_2', 'CarLayer_0')
+    veh._remaining_link_length = 0
+    veh.set_position(np.array([0, 150]))
+    vehicles.append(veh)
+
+    expected = [flow.get_vehicle_zone(veh) for veh in vehicles]
+    assert flow.locate_vehicles(vehicles) == expected
+    assert set(expected) == {'LEFT', 'RIGHT'}
+
+
+def test_lazy_positions():
+    roads = generate_line_road([0, 0], [0, 20], 3)
+    roads.add_zone(construct_zone_from_sections(roads, "RES", ["0_1", "1_2"]))
+
+    personal_car = PersonalMobilityService()
+    car_layer = generate_layer_from_roads(roads, "CarLayer", mobility_services=[personal_car])
+    mlgraph = MultiLayerGraph([car_layer], generate_matching_origin_destination_layer(roads), 1e-3)
+
+    flow = MFDFlowMotor()
+    flow.set_graph(mlgraph)
+    flow.add_reservoir(Reservoir(roads.zones["RES"], ["CAR"], lambda x: {k: 3 for k in x}))
+    flow.set_time(Time('09:00:00'))
+    flow.initialize()
+
+    user = User('U0', '0', '2', Time('09:00:00'))
+    user.set_path(Path(20, ['CarLayer_0', 'CarLayer_1', 'CarLayer_2']))
+    personal_car.add_request(user, 'CarLayer_2', Time('09:00:00'))
+    personal_car.matching(Request(user, "CarLayer_2", Time('09:00:00')), Dt(seconds=1))
+    veh = list(personal_car.fleet.vehicles.values())[0]
+
+    flow.step(Dt(seconds=1))
+    flow.step(Dt(seconds=1))
+    # The coordinates are computed when they are read, and only once
+    assert veh._position_source is not None
+    position = veh.position
+    assert veh._position_source is None
+    np.testing.assert_allclose(position, [0, 6])
+    assert veh.position is position
+    # The passenger reads the position of its vehicle
+    assert user.position is position
+
+    flow.step(Dt(seconds=1))
+    np.testing.assert_allclose(user.position, [0, 9])
+    # Once the user leaves the vehicle, its position does not follow the vehicle anymore
+    veh.passengers.pop(user.id)
+    user.vehicle = None
+    flow.step(Dt(seconds=1))
+    np.testing.assert_allclose(user.position, [0, 9])
+    np.testing.assert_allclose(veh.position, [0, 12])
+
+
+def test_parallel_moves_match_serial():
+    def run(nworkers):
+        roads = generate_line_road([0, 0], [0, 2000], 3)
+        roads.add_zone(construct_zone_from_sections(roads, "LEFT", ["0_1"]))
+        roads.add_zone(construct_zone_from_sections(roads, "RIGHT", ["1_2"]))
+
+        personal_car = PersonalMobilityService()
+        car_layer = CarLayer(roads, services=[personal_car])
+        for i in range(3):
+            car_layer.create_node(f"CAR_{i}", str(i))
+        # A link over both reservoirs, vehicles change of reservoir on it
+        car_layer.create_link("CAR_0_2", "CAR_0", "CAR_2", {}, ["0_1", "1_2"])
+        mlgraph = MultiLayerGraph([car_layer], generate_matching_origin_destination_layer(roads), 1e-3)
+
+        demand = BaseDemandManager([User(f"U{i}", [0, 0], [0, 2000], Time("07:00:00").add_time(Dt(seconds=2*i)))
+                                    for i in range(100)])
+        flow_motor = MFDFlowMotor(nworkers=nworkers)
+        flow_motor.add_reservoir(Reservoir(roads.zones["LEFT"], ["CAR"], lambda x: {"CAR": max(11.5 - 0.1 * x["CAR"], 1)}))
+        flow_motor.add_reservoir(Reservoir(roads.zones["RIGHT"], ["CAR"], lambda x: {"CAR": max(9 - 0.2 * x["CAR"], 1)}))
+        trip_lengths = list()
+        flow_motor.reservoirs["LEFT"].add_trip_length = lambda length, veh_type, t: trip_lengths.append((length, t))
+
+        supervisor = Supervisor(mlgraph, demand, flow_motor, DummyDecisionModel(mlgraph))
+        supervisor.run(Time("07:00:00"), Time("07:08:00"), Dt(seconds=1), 10)
+        return [(u.id, u.arrival_time, u.distance) for u in demand._users], trip_lengths
+
+    serial = run(1)
+    parallel = run(2)
+    assert len(serial[1]) > 0
+    assert serial == parallel
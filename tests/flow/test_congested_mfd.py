@@ -10,11 +10,12 @@ from mnms.graph.road import RoadDescriptor
 from mnms.flow.congested_MFD import CongestedMFDFlowMotor, CongestedReservoir
 from mnms.generation.layers import generate_layer_from_roads, generate_matching_origin_destination_layer
 from mnms.generation.roads import generate_line_road
-from mnms.graph.layers import MultiLayerGraph
+from mnms.graph.layers import MultiLayerGraph, CarLayer
 from mnms.graph.zone import construct_zone_from_sections
 from mnms.mobility_service.abstract import Request
 from mnms.mobility_service.personal_vehicle import PersonalMobilityService
 from mnms.time import Time, Dt
+from mnms.vehicles.veh_type import Car
 from mnms.demand import User, BaseDemandManager
 from mnms.tools.observer import CSVUserObserver, CSVVehicleObserver
 from mnms.travel_decision.dummy import DummyDecisionModel
@@ -120,7 +121,6 @@ class TestCongestedMFD(unittest.TestCase):
         self.assertEqual(df2['IN_QUEUE'].tolist(), ['{}', "{'res1': 1}", "{'res1': 2}", "{'res1': 3}", "{'res1': 3}", "{'res1': 4}", "{'res1': 3}", "{'res1': 3}", "{'res1': 2}", "{'res1': 2}", "{'res1': 1}", "{'res1': 1}", '{}'])
 
 def test_congested_mfd_no_congestion():
-    from mnms.vehicles.manager import VehicleManager
 
     roads = generate_line_road([0, 0], [0, 20], 3)
     roads.add_zone(construct_zone_from_sections(roads, "LEFT", ["0_1"]))
@@ -171,11 +171,9 @@ def test_congested_mfd_no_congestion():
     assert approx_dist == pytest.approx(user.distance)
     assert approx_dist == pytest.approx(veh.distance)
 
-    VehicleManager.empty()
 
 
 def test_congested_mfd_congestion():
-    from mnms.vehicles.manager import VehicleManager
 
     roads = generate_line_road([0, 0], [0, 20], 3)
     roads.add_zone(construct_zone_from_sections(roads, "LEFT", ["0_1"]))
@@ -238,4 +236,86 @@ def test_congested_mfd_congestion():
     approx_dist2 = 10
     assert approx_dist2 == pytest.approx(veh2.distance)
 
-    VehicleManager.empty()
+
+
+def test_reservoir_queue_bookkeeping():
+    roads = generate_line_road([0, 0], [0, 100], 3)
+    roads.add_zone(construct_zone_from_sections(roads, "LEFT", ["0_1"]))
+    res = CongestedReservoir(roads.zones["LEFT"],
+                             ["CAR"],
+                             lambda x, nmax: {k: 20 for k in x},
+                             lambda x, nmax: 0.5,
+                             10)
+
+    # Entries are spaced by 1/f_entry seconds
+    res.compute_time_interval(100.)
+    assert res.next_entry_time == 102.
+    res.compute_time_interval(101.)
+    assert res.next_entry_time == 104.
+    assert res.time_interval.to_seconds() == 104.
+    res.compute_time_interval(200.)
+    assert res.next_entry_time == 202.
+
+    cars = [Car(node, 1, 'PersonalVehicle', True) for node in ['0', '1', '2']]
+    res.enqueue(cars[0], 'RIGHT')
+    res.enqueue(cars[1], None)
+    res.enqueue(cars[2], 'RIGHT')
+    assert res.in_queue_counters() == {'RIGHT': 2, None: 1}
+    assert res.admit().veh is cars[0]
+    assert res.admit().veh is cars[1]
+    assert res.in_queue_counters() == {'RIGHT': 1}
+    assert res.car_queue[0].entrance_time == 202.
+
+
+def run_congested_example(outdir, nworkers):
+    """Runs a shortened version of the congested_mfd example, outputs are written in outdir."""
+    roads = generate_line_road([0, 0], [0, 2000], 3)
+    roads.add_zone(construct_zone_from_sections(roads, "LEFT", ["0_1"]))
+    roads.add_zone(construct_zone_from_sections(roads, "RIGHT", ["1_2"]))
+
+    personal_car = PersonalMobilityService()
+    personal_car.attach_vehicle_observer(CSVVehicleObserver(str(outdir / "car_vehs.csv")))
+    car_layer = CarLayer(roads, services=[personal_car])
+    for i in range(3):
+        car_layer.create_node(f"CAR_{i}", str(i))
+    car_layer.create_link("CAR_0_1", "CAR_0", "CAR_1", {}, ["0_1"])
+    car_layer.create_link("CAR_1_2", "CAR_1", "CAR_2", {}, ["1_2"])
+    odlayer = generate_matching_origin_destination_layer(roads)
+    mlgraph = MultiLayerGraph([car_layer], odlayer, 1e-3)
+
+    demand = BaseDemandManager([User(f"U{i}", [0, 0], [0, 2000], Time("07:00:00").add_time(Dt(seconds=i)))
+                                for i in range(200)])
+    demand.add_user_observer(CSVUserObserver(str(outdir / "users.csv")))
+    decision_model = DummyDecisionModel(mlgraph, outfile=str(outdir / "paths.csv"))
+
+    def speed_MFD(acc, n_car_max):
+        return {"CAR": max(11.5 - acc["CAR"] * 0.15, 0.001)}
+
+    def entry_MFD(acc_car, n_car_max):
+        return 1/max(acc_car, 1e-3)
+
+    flow_motor = CongestedMFDFlowMotor(outfile=str(outdir / "mfd.csv"), nworkers=nworkers)
+    flow_motor.add_reservoir(CongestedReservoir(roads.zones["LEFT"], ['CAR'], speed_MFD, entry_MFD, 80))
+    flow_motor.add_reservoir(CongestedReservoir(roads.zones["RIGHT"], ['CAR'], speed_MFD, entry_MFD, 80))
+
+    supervisor = Supervisor(mlgraph, demand, flow_motor, decision_model, outfile=str(outdir / "costs.csv"))
+    supervisor.run(Time("07:00:00"), Time("07:10:00"), Dt(seconds=1), 10)
+
+
+def test_parallel_moves_match_serial(tmp_path, monkeypatch):
+    applied_moves = []
+    apply_advance = CongestedMFDFlowMotor._apply_advance
+    def counting_apply_advance(self, veh, veh_dt, res_id, veh_type, moves, tcurrent):
+        applied_moves.append(len(moves))
+        return apply_advance(self, veh, veh_dt, res_id, veh_type, moves, tcurrent)
+    monkeypatch.setattr(CongestedMFDFlowMotor, '_apply_advance', counting_apply_advance)
+
+    (tmp_path / "serial").mkdir()
+    (tmp_path / "parallel").mkdir()
+    run_congested_example(tmp_path / "serial", 1)
+    assert applied_moves == []
+    run_congested_example(tmp_path / "parallel", 2)
+    assert sum(applied_moves) > 0
+
+    for filename in ["car_vehs.csv", "users.csv", "paths.csv", "mfd.csv", "costs.csv"]:
+        assert (tmp_path / "serial" / filename).read_text() == (tmp_path / "parallel" / filename).read_text(), filename
@@ -134,7 +134,6 @@ class TestCostsFunctions(unittest.TestCase):
 
         if self.flow.veh_manager is not None:
             self.flow.veh_manager.empty()
-        Vehicle._counter = 0
 
     def test_init(self):
         self.create_supervisor('1')
@@ -0,0 +1,105 @@
+import unittest
+
+import numpy as np
+
+from mnms.flow.MFD import MFDFlowMotor, Reservoir
+from mnms.flow.congested_MFD import CongestedMFDFlowMotor, CongestedReservoir
+from mnms.flow.speed_functions import VectorizedSpeedFunction, TabulatedSpeedFunction
+from mnms.generation.roads import generate_line_road
+from mnms.generation.layers import generate_layer_from_roads
+from mnms.graph.layers import MultiLayerGraph
+from mnms.graph.zone import construct_zone_from_sections
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.time import Dt, Time
+
+
+def mfdspeed(dacc):
+    N = dacc['CAR'] + dacc['BUS']
+    V = max(12 - 0.2 * N, 0.5)
+    return {'CAR': V, 'BUS': V / 2}
+
+
+def mfdspeed_vectorized(dacc):
+    V = np.maximum(12 - 0.2 * (dacc['CAR'] + dacc['BUS']), 0.5)
+    return {'CAR': V, 'BUS': V / 2}
+
+
+def congested_speed(dacc, n_car_max):
+    return {'CAR': max(0.5, 10 * (1 - dacc['CAR'] / n_car_max))}
+
+
+def congested_speed_vectorized(dacc, n_car_max):
+    return {'CAR': np.maximum(0.5, 10 * (1 - dacc['CAR'] / n_car_max))}
+
+
+class TestSpeedFunctions(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        roads = generate_line_road([0, 0], [0, 3000], 4)
+        roads.add_zone(construct_zone_from_sections(roads, "LEFT", ["0_1"]))
+        roads.add_zone(construct_zone_from_sections(roads, "MIDDLE", ["1_2"]))
+        roads.add_zone(construct_zone_from_sections(roads, "RIGHT", ["2_3"]))
+        self.roads = roads
+        car_layer = generate_layer_from_roads(roads, 'CAR', mobility_services=[PersonalMobilityService()])
+        self.mlgraph = MultiLayerGraph([car_layer])
+        self.ghost = {'LEFT': {'CAR': 10, 'BUS': 2}, 'MIDDLE': {'CAR': 30}, 'RIGHT': {'CAR': 80, 'BUS': 5}}
+
+    def run_flow(self, f_speed):
+        flow = MFDFlowMotor()
+        flow.set_graph(self.mlgraph)
+        for zid, ghost in self.ghost.items():
+            res = Reservoir(self.roads.zones[zid], ['CAR', 'BUS'], f_speed)
+            res.set_ghost_accumulation(lambda t, ghost=ghost: ghost)
+            flow.add_reservoir(res)
+        flow.set_time(Time('07:00:00'))
+        flow.initialize()
+        flow.step(Dt(seconds=1))
+        return flow
+
+    def test_vectorized_speed_function(self):
+        expected = self.run_flow(mfdspeed)
+        flow = self.run_flow(VectorizedSpeedFunction(mfdspeed_vectorized))
+
+        np.testing.assert_array_equal(flow.accumulations, expected.accumulations)
+        np.testing.assert_allclose(flow.speeds, expected.speeds)
+        for zid in self.ghost:
+            for mode in ['CAR', 'BUS']:
+                self.assertAlmostEqual(flow.dict_speeds[zid][mode], expected.dict_speeds[zid][mode])
+                self.assertAlmostEqual(flow.reservoir_speed(zid, mode), expected.dict_speeds[zid][mode])
+        self.assertEqual(flow.reservoir_speed(None, 'CAR'), 0)
+
+    def test_tabulated_speed_function(self):
+        f_speed = TabulatedSpeedFunction(mfdspeed, ['CAR', 'BUS'], 50, nb_points=51)
+        expected = self.run_flow(mfdspeed)
+        flow = self.run_flow(f_speed)
+        # The speed function is piecewise linear with integer breakpoints, above 50
+        # vehicles the speed function itself is used
+        np.testing.assert_allclose(flow.speeds, expected.speeds)
+
+        speeds = f_speed.evaluate({'CAR': np.array([0., 10.5, 100.]), 'BUS': np.array([1., 0., 0.])})
+        np.testing.assert_allclose(speeds['CAR'], [11.8, 9.9, 0.5])
+        self.assertAlmostEqual(f_speed({'CAR': 10.5, 'BUS': 0})['BUS'], 4.95)
+
+    def test_congested_vectorized_speed_function(self):
+        speeds = list()
+        for f_speed in [congested_speed, VectorizedSpeedFunction(congested_speed_vectorized)]:
+            flow = CongestedMFDFlowMotor()
+            flow.set_graph(self.mlgraph)
+            for zid, n_car_max in [('LEFT', 100), ('MIDDLE', 50)]:
+                res = CongestedReservoir(self.roads.zones[zid], ['CAR'], f_speed, lambda acc, nmax: 1, n_car_max)
+                res.set_ghost_accumulation(lambda t, ghost=self.ghost[zid]: ghost)
+                flow.add_reservoir(res)
+            flow.set_time(Time('07:00:00'))
+            flow.initialize()
+            flow.step(Dt(seconds=1))
+            speeds.append(flow.speeds)
+        np.testing.assert_allclose(speeds[0], speeds[1])
+        self.assertAlmostEqual(speeds[1][0, 0], 9)
+
+        # Capacity drop due to the cars in outgoing queues
+        res = flow.reservoirs['MIDDLE']
+        res.car_in_outgoing_queues = 10
+        dacc, params = CongestedReservoir.vectorized_speeds_inputs([res], {'CAR': np.array([30.])})
+        self.assertAlmostEqual(dacc['CAR'][0], 37.5)
+        self.assertEqual(params[0].tolist(), [50])
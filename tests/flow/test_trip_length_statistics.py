@@ -0,0 +1,47 @@
+import unittest
+
+from mnms.flow.MFD import Reservoir
+from mnms.flow.statistics import TripLengthStatistics
+from mnms.generation.roads import generate_line_road
+from mnms.graph.zone import construct_zone_from_sections
+
+
+class TestTripLengthStatistics(unittest.TestCase):
+    def test_statistics(self):
+        stats = TripLengthStatistics(window=60, nb_window_buckets=6, bins=[100, 500])
+        self.assertIsNone(stats.mean)
+        for length, time in [(50, 0), (200, 5), (800, 30), (300, 65)]:
+            stats.add(length, time)
+
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(stats.mean, 337.5)
+        self.assertEqual(stats.histogram, [1, 2, 1])
+        # The window covers the buckets of the last 60 seconds
+        self.assertEqual(stats.window_count(65), 2)
+        self.assertEqual(stats.window_mean(65), 550)
+        self.assertEqual(stats.window_count(95), 1)
+        self.assertEqual(stats.window_count(1000), 0)
+        self.assertIsNone(stats.window_mean(1000))
+        self.assertEqual(stats.count, 4)
+
+    def test_reservoir_statistics(self):
+        roads = generate_line_road([0, 0], [0, 100], 2)
+        roads.add_zone(construct_zone_from_sections(roads, "RES", ["0_1"]))
+
+        def mfdspeed(dacc, trip_lengths):
+            return {'CAR': 10 if 'CAR' not in trip_lengths else trip_lengths['CAR'].mean / 10}
+
+        res = Reservoir(roads.zones['RES'], ['CAR'], mfdspeed)
+        res.set_trip_length_statistics(window=60)
+        self.assertEqual(res.dict_speeds['CAR'], 10)
+
+        res.keep_trip_lengths = False
+        res.add_trip_length(100, 'CAR', 10)
+        res.add_trip_length(300, 'CAR', 20)
+        self.assertEqual(res.trip_lengths, {})
+        self.assertEqual(res.trip_length_stats['CAR'].window_count(30), 2)
+        self.assertEqual(res.update_speeds()['CAR'], 20)
+
+        # Functions without trip_lengths argument are called as before
+        res.f_speed = lambda dacc: {'CAR': 5}
+        self.assertEqual(res.update_speeds()['CAR'], 5)
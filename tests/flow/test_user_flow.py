@@ -9,7 +9,6 @@ from mnms.graph.zone import construct_zone_from_sections
 from mnms.mobility_service.personal_vehicle import PersonalMobilityService
 from mnms.mobility_service.public_transport import PublicTransportMobilityService
 from mnms.time import Time, Dt, TimeTable
-from mnms.vehicles.manager import VehicleManager
 
 
 class TestUserFlow(unittest.TestCase):
@@ -69,7 +68,6 @@ class TestUserFlow(unittest.TestCase):
         """Concludes and closes the test.
         """
         self.tempfile.cleanup()
-        VehicleManager.empty()
 
     def test_fill(self):
         self.assertTrue(self.mlgraph is self.user_flow._graph)
@@ -84,3 +82,25 @@ class TestUserFlow(unittest.TestCase):
         self.user_flow.step(Dt(minutes=1), [user])
 
         self.assertIn('U0', self.user_flow.users)
+
+    def test_evict_users(self):
+        user_flow = UserFlow(1.42, evict_deadend_users=True, summary_outfile=self.pathdir + 'summary.csv')
+        user_flow.set_graph(self.mlgraph)
+        user_flow.set_time(Time('00:01:00'))
+
+        user = User('U0', '0', '4', Time('00:01:00'))
+        user._current_node = 'C2'
+        user.set_path(Path(cost=0, nodes=['C2', 'L1_B2']))
+        deadend_user = User('U1', '0', '4', Time('00:01:00'))
+        deadend_user.set_state_deadend(Time('00:01:00'))
+        user_flow.users['U1'] = deadend_user
+
+        user_flow.step(Dt(minutes=1), [user])
+        user_flow.finalize()
+
+        self.assertEqual(user_flow.users, {})
+        self.assertEqual(user_flow.nb_evicted_users, 2)
+        with open(self.pathdir + 'summary.csv') as f:
+            rows = [l.strip().split(';') for l in f]
+        self.assertEqual(rows[0], ['ID', 'STATE', 'DEPARTURE', 'ARRIVAL', 'DISTANCE'])
+        self.assertEqual(sorted((r[0], r[1]) for r in rows[1:]), [('U0', 'ARRIVED'), ('U1', 'DEADEND')])
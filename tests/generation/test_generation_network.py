@@ -0,0 +1,103 @@
+import unittest
+
+import numpy as np
+
+from mnms.generation.layers import generate_layer_from_roads, generate_public_transport_layer
+from mnms.generation.mlgraph import generate_manhattan_multimodal
+from mnms.generation.roads import generate_manhattan_road, generate_manhattan_pt_lines
+from mnms.graph.layers import MultiLayerGraph
+from mnms.graph.road import RoadDescriptor
+from mnms.graph.specific_layers import OriginDestinationLayer
+from mnms.time import TimeTable, Dt
+
+
+class TestNetworkGeneration(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+
+    def tearDown(self):
+        """Concludes and closes the test.
+        """
+
+    def test_register_many(self):
+        roads = RoadDescriptor()
+        roads.register_nodes(["0", "1", "2"], [[0, 0], [3, 4], [3, 0]])
+        roads.register_sections(["0_1", "1_2"], ["0", "1"], ["1", "2"])
+        roads.register_sections(["2_0"], ["2"], ["0"], [10])
+
+        self.assertListEqual([3, 4], roads.nodes["1"].position.tolist())
+        self.assertAlmostEqual(5, roads.sections["0_1"].length)
+        self.assertAlmostEqual(4, roads.sections["1_2"].length)
+        self.assertEqual(10, roads.sections["2_0"].length)
+        with self.assertRaises(AssertionError):
+            roads.register_sections(["0_3"], ["0"], ["3"])
+
+    def test_manhattan(self):
+        roads = generate_manhattan_road(3, 100)
+
+        self.assertEqual(9 + 12, len(roads.nodes))
+        self.assertEqual(24 + 24, len(roads.sections))
+        self.assertListEqual([200, 100], roads.nodes["7"].position.tolist())
+        self.assertListEqual(["4_5", "4_3", "4_7", "4_1"], [lid for lid in roads.sections if lid.startswith("4_")])
+        self.assertEqual("8", roads.sections["NORTH_2_8"].downstream)
+        self.assertListEqual([300, 2 * 100], roads.nodes["EAST_2"].position.tolist())
+        self.assertTrue(all(s.length == 100 for s in roads.sections.values()))
+        self.assertEqual(set(roads.sections), set(roads.zones["RES"].sections))
+
+    def test_manhattan_random_lengths(self):
+        roads = generate_manhattan_road(10, 100, length_noise=0.3, seed=1)
+        lengths = np.array([s.length for s in roads.sections.values()])
+
+        self.assertTrue(np.all(lengths >= 70))
+        self.assertTrue(np.all(lengths <= 130))
+        self.assertGreater(np.std(lengths), 1)
+        for section in roads.sections.values():
+            back = roads.sections[f"{section.downstream}_{section.upstream}"]
+            self.assertEqual(section.length, back.length)
+
+        same_roads = generate_manhattan_road(10, 100, length_noise=0.3, seed=1)
+        self.assertListEqual(lengths.tolist(), [s.length for s in same_roads.sections.values()])
+
+    def test_manhattan_pt_lines(self):
+        roads = generate_manhattan_road(5, 100, length_noise=0.2, seed=0)
+        lines = generate_manhattan_pt_lines(roads, 5, line_spacing=2, stop_spacing=3)
+
+        # Corridors 0, 2 and 4 along both axes, in both directions
+        self.assertEqual(12, len(lines))
+        line = lines[0]
+        self.assertEqual("BUS_X0_FWD", line["id"])
+        self.assertListEqual(["BUS_X0_FWD_S0", "BUS_X0_FWD_S3", "BUS_X0_FWD_S4"], line["stops"])
+        self.assertListEqual([["0_1", "1_2", "2_3", "3_4"], ["3_4"]], line["sections"])
+        self.assertListEqual([0, 400], roads.stops["BUS_X0_FWD_S4"].absolute_position.tolist())
+        self.assertListEqual(["4_3", "3_2", "2_1", "1_0"], sum(lines[1]["sections"], [])[:4])
+
+        bus_layer = generate_public_transport_layer(roads, "BUS", lines,
+                                                    TimeTable.create_table_freq("07:00:00", "08:00:00", Dt(minutes=10)))
+        self.assertEqual(12, len(bus_layer.lines))
+        corridor_length = sum(roads.sections[f"{i}_{i + 1}"].length for i in range(4))
+        line_length = sum(bus_layer.graph.links[lid].length for lid in bus_layer.lines["BUS_X0_FWD"]["links"])
+        self.assertAlmostEqual(corridor_length, line_length)
+
+    def test_manhattan_multimodal(self):
+        mlgraph = generate_manhattan_multimodal(10, 100, length_noise=0.2, zones=(2, 2), bus_line_spacing=3, seed=0)
+
+        self.assertSetEqual({"CAR", "BUS", "RIDEHAILING"}, set(mlgraph.layers))
+        self.assertSetEqual({"RES0-0", "RES0-1", "RES1-0", "RES1-1"}, set(mlgraph.roads.zones))
+        self.assertTrue(all(s.zone is not None for s in mlgraph.roads.sections.values()))
+        self.assertEqual(16, len(mlgraph.layers["BUS"].lines))
+        self.assertIn("ORIGIN_0_CAR_0", mlgraph.graph.links)
+        self.assertIn("BUS_Y3_FWD_BUS_Y3_FWD_S9_DESTINATION_BUS_Y3_FWD_S9", mlgraph.graph.links)
+
+    def test_secure_connection_of_destinations(self):
+        roads = generate_manhattan_road(2, 100, extended=False)
+        car_layer = generate_layer_from_roads(roads, "CAR")
+        odlayer = OriginDestinationLayer()
+        odlayer.create_origin_node("ORIGIN", [0, -50])
+        odlayer.create_destination_node("DESTINATION", [100, 150])
+        mlgraph = MultiLayerGraph([car_layer], odlayer)
+        mlgraph.connect_origindestination_layers(10, secure_connection_distance=60)
+
+        self.assertIn("ORIGIN_CAR_0", mlgraph.graph.links)
+        self.assertIn("CAR_3_DESTINATION", mlgraph.graph.links)
+        self.assertEqual("CAR_3", mlgraph.graph.links["CAR_3_DESTINATION"].upstream)
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from mnms.generation.mlgraph import generate_manhattan_passenger_car
+
+
+def gc_car(gnodes, layer, link, costs, vot=0.003, car_kmcost=0.0005):
+    return vot * costs['PersonalVehicle']['travel_time'] + car_kmcost * link.length
+
+
+def gc_car_vectorized(layer, costs, vot=0.003, car_kmcost=0.0005):
+    return vot * costs['travel_time'] + car_kmcost * costs['length']
+
+
+class TestLinkCostTable(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        self.mlgraph = generate_manhattan_passenger_car(4, 100)
+
+    def test_initialize_costs(self):
+        self.mlgraph.add_cost_function('CAR', 'generalized_cost', gc_car)
+        self.mlgraph.add_cost_function('CAR', 'vectorized_cost', gc_car_vectorized, vectorized=True)
+        self.mlgraph.initialize_costs(1.42)
+
+        table = self.mlgraph.cost_table
+        index = self.mlgraph.index
+        speed = self.mlgraph.layers['CAR'].default_speed
+        for lid, link in self.mlgraph.graph.links.items():
+            if link.label != 'CAR':
+                continue
+            l = index.link_index[lid]
+            costs = link.costs['PersonalVehicle']
+            self.assertEqual(costs['speed'], speed)
+            self.assertEqual(costs['travel_time'], link.length / speed)
+            self.assertAlmostEqual(costs['generalized_cost'], costs['vectorized_cost'])
+            for name in ['speed', 'travel_time', 'length', 'generalized_cost', 'vectorized_cost']:
+                self.assertEqual(table.get('PersonalVehicle', name, np.array([l]))[0], costs[name])
+            self.assertEqual(table.link_services[l], ('PersonalVehicle',))
+
+        # Costs are also updated in the graph of the layer
+        for lid, link in self.mlgraph.layers['CAR'].graph.links.items():
+            self.assertIn('vectorized_cost', link.costs['PersonalVehicle'])
+
+    def test_table_read_from_graph(self):
+        self.mlgraph.initialize_costs(1.42)
+        expected = self.mlgraph.cost_table.get('PersonalVehicle', 'travel_time')
+
+        # A table rebuilt from the graph has the same costs
+        self.mlgraph._cost_table = None
+        np.testing.assert_array_equal(self.mlgraph.cost_table.get('PersonalVehicle', 'travel_time'), expected)
+
+    def test_vectorized_function_on_one_link(self):
+        self.mlgraph.add_cost_function('CAR', 'generalized_cost', gc_car_vectorized, vectorized=True)
+        self.mlgraph.initialize_costs(1.42)
+
+        cost_function = self.mlgraph.layers['CAR']._costs_functions['PersonalVehicle']['generalized_cost']
+        link = next(iter(self.mlgraph.layers['CAR'].graph.links.values()))
+        value = cost_function(self.mlgraph.graph.nodes, self.mlgraph.layers['CAR'], link, link.costs)
+        self.assertAlmostEqual(value, gc_car(None, None, link, link.costs))
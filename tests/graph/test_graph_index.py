@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from mnms.generation.mlgraph import generate_manhattan_passenger_car
+
+
+class TestGraphIndex(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        self.mlgraph = generate_manhattan_passenger_car(4, 100)
+
+    def test_index(self):
+        index = self.mlgraph.index
+        gnodes = self.mlgraph.graph.nodes
+        glinks = self.mlgraph.graph.links
+        self.assertEqual(index.nb_nodes, len(gnodes))
+        self.assertEqual(index.nb_links, len(glinks))
+        self.assertEqual(index.nb_alive_links, len(glinks))
+
+        index.ensure_arrays()
+        for lid, link in glinks.items():
+            i = index.link_index[lid]
+            self.assertEqual(index.node_ids[index.link_upstream[i]], link.upstream)
+            self.assertEqual(index.node_ids[index.link_downstream[i]], link.downstream)
+            self.assertEqual(index.link_lengths[i], link.length)
+            self.assertEqual(index.link_labels[i], link.label)
+            self.assertEqual(index.link_between(link.upstream, link.downstream), i)
+        for nid, node in gnodes.items():
+            i = index.node_index[nid]
+            np.testing.assert_array_equal(index.node_positions[i], node.position)
+            # Adjacency in CSR format
+            succ = [index.node_ids[n] for n in index.adjacency_nodes[index.adjacency_indptr[i]:index.adjacency_indptr[i+1]]]
+            self.assertEqual(sorted(succ), sorted(node.adj.keys()))
+
+        path = ["CAR_0", "CAR_1", "CAR_2", "CAR_6"]
+        expected = [gnodes[u].adj[d].id for u, d in zip(path[:-1], path[1:])]
+        self.assertEqual(index.path_link_ids(path), expected)
+        self.assertEqual([index.link_ids[l] for l in index.path_links(path)], expected)
+        self.assertEqual(index.path_link_ids(["CAR_0", "CAR_5"]), [None])
+        self.assertEqual(index.path_links(["CAR_0", "CAR_5"]).tolist(), [-1])
+        self.assertEqual(index.path_links(["CAR_0"]).tolist(), [])
+
+        costs = index.cost_array('length', {'CAR': 'PersonalVehicle'}, index.path_links(path))
+        np.testing.assert_array_equal(costs, [glinks[lid].length for lid in expected])
+
+    def test_topology_changes(self):
+        index = self.mlgraph.index
+        nb_links = index.nb_links
+
+        self.mlgraph.connect_layers("NEW_LINK", "CAR_0", "CAR_5", 150, {"length": 150})
+        self.assertIs(self.mlgraph.index, index)
+        self.assertEqual(index.path_link_ids(["CAR_0", "CAR_5"]), ["NEW_LINK"])
+        self.assertEqual(index.links_between([index.node_index["CAR_0"]], [index.node_index["CAR_5"]]).tolist(),
+                         [nb_links])
+
+        self.mlgraph.graph.delete_link("NEW_LINK")
+        self.mlgraph.notify_topology_change(deleted_links=["NEW_LINK"])
+        self.assertEqual(index.path_link_ids(["CAR_0", "CAR_5"]), [None])
+        self.assertEqual(index.nb_alive_links, nb_links)
+
+        # Full refresh keeps the indexes of the links
+        self.mlgraph.connect_layers("NEW_LINK", "CAR_0", "CAR_5", 150, {"length": 150})
+        self.mlgraph.notify_topology_change()
+        self.assertEqual(self.mlgraph.index.link_index["NEW_LINK"], nb_links)
+        self.assertEqual(self.mlgraph.index.path_link_ids(["CAR_0", "CAR_5"]), ["NEW_LINK"])
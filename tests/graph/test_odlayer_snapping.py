@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+
+from mnms.demand import User
+from mnms.generation.roads import generate_line_road
+from mnms.generation.layers import generate_matching_origin_destination_layer
+from mnms.graph.layers import MultiLayerGraph, CarLayer
+from mnms.graph.specific_layers import OriginDestinationLayer
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.time import Time
+from mnms.travel_decision.dummy import DummyDecisionModel
+
+
+class TestODLayerSnapping(unittest.TestCase):
+    def test_snap_same_as_argmin(self):
+        rng = np.random.default_rng(0)
+        odlayer = OriginDestinationLayer()
+        # Nodes on a grid so that many positions are at the same distance of several nodes
+        for i in range(10):
+            for j in range(10):
+                odlayer.create_origin_node(f"O_{i}_{j}", np.array([i * 100., j * 100.]))
+                odlayer.create_destination_node(f"D_{j}_{i}", [j * 100., i * 100.])
+        odlayer.build_spatial_index()
+
+        positions = np.vstack([rng.uniform(-100, 1000, size=(500, 2)),
+                               rng.integers(-2, 20, size=(500, 2)) * 50.])
+
+        for nodes, snap in [(odlayer.origins, odlayer.snap_origins),
+                            (odlayer.destinations, odlayer.snap_destinations)]:
+            ids = list(nodes.keys())
+            pos = np.array(list(nodes.values()), dtype=float)
+            expected = [ids[np.argmin(np.linalg.norm(pos - p, axis=1))] for p in positions]
+            self.assertEqual(snap(positions), expected)
+
+        self.assertEqual(odlayer.snap_origins([]), [])
+
+    def test_index_rebuilt_after_node_creation(self):
+        odlayer = OriginDestinationLayer()
+        odlayer.create_origin_node("O0", np.array([0, 0]))
+        odlayer.build_spatial_index()
+        self.assertEqual(odlayer.snap_origins([[90, 0]]), ["O0"])
+
+        odlayer.create_origin_node("O1", np.array([100, 0]))
+        self.assertEqual(odlayer.snap_origins([[90, 0]]), ["O1"])
+
+    def test_users_snapped_once(self):
+        roads = generate_line_road([0, 0], [0, 5000], 6)
+        car_layer = CarLayer(roads, services=[PersonalMobilityService()])
+        for i in range(6):
+            car_layer.create_node(f"CAR_{i}", str(i))
+        odlayer = generate_matching_origin_destination_layer(roads)
+        mlgraph = MultiLayerGraph([car_layer], odlayer, 1e-3)
+        decision_model = DummyDecisionModel(mlgraph)
+
+        users = [User("U0", [0, 10], [0, 4900], Time("07:00:00")),
+                 User("U1", [0, 1900], [0, 3100], Time("07:00:00")),
+                 User("U2", "ORIGIN_2", "DESTINATION_5", Time("07:00:00"))]
+        decision_model.snap_users(users)
+
+        self.assertEqual([u.snapped_origin for u in users], ["ORIGIN_0", "ORIGIN_2", None])
+        self.assertEqual([u.snapped_destination for u in users], ["DESTINATION_5", "DESTINATION_3", None])
+        self.assertEqual([decision_model.get_origin_node(u) for u in users], ["ORIGIN_0", "ORIGIN_2", "ORIGIN_2"])
+        self.assertEqual([decision_model.get_destination_node(u) for u in users], ["DESTINATION_5", "DESTINATION_3", "DESTINATION_5"])
+
+        # The cached node is kept even if the index changes
+        odlayer.create_origin_node("ORIGIN_BIS", np.array([0, 0]))
+        decision_model.snap_users(users)
+        self.assertEqual(users[0].snapped_origin, "ORIGIN_0")
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from mnms.generation.roads import generate_manhattan_road
+from mnms.generation.layers import generate_layer_from_roads
+from mnms.graph.layers import MultiLayerGraph
+from mnms.mobility_service.filters import VehicleFilter, IsIdle, IsNearestFilter, InRadiusFilter
+from mnms.mobility_service.on_demand import OnDemandMobilityService
+from mnms.vehicles.veh_type import VehicleActivityServing
+
+
+class CountingFilter(VehicleFilter):
+    cost = 0
+    pointwise = True
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.nb_evaluated = []
+
+    def get_mask(self, layer, vehicles, position=None, deposits=None):
+        self.nb_evaluated.append(len(vehicles))
+        return [self.keep(veh) for veh in vehicles]
+
+
+class TestCombinedFilters(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        roads = generate_manhattan_road(3, 500, extended=False)
+        self.service = OnDemandMobilityService('RIDEHAILING', 0)
+        self.layer = generate_layer_from_roads(roads, 'RIDEHAILING', mobility_services=[self.service])
+        self.mlgraph = MultiLayerGraph([self.layer])
+        self.vehicles = [self.service.create_waiting_vehicle(f'RIDEHAILING_{n}') for n in range(9)]
+        # The vehicles at nodes 0 and 4 are busy
+        for i in [0, 4]:
+            self.vehicles[i].activities.append(VehicleActivityServing(f'RIDEHAILING_{i}'))
+
+    def naive_mask(self, filters, position):
+        return np.all([f.get_mask(self.layer, self.vehicles, position) for f in filters], axis=0)
+
+    def test_same_result_as_all_filters(self):
+        position = [0, 0]
+        for filters in [[IsIdle(), InRadiusFilter(600)],
+                        [InRadiusFilter(600), IsIdle()],
+                        [IsIdle(), IsNearestFilter()],
+                        [InRadiusFilter(1200), IsNearestFilter(), IsIdle()],
+                        [InRadiusFilter(600), ~IsIdle()]]:
+            combined = filters[0]
+            for f in filters[1:]:
+                combined = combined & f
+            mask = combined.get_mask(self.layer, self.vehicles, position)
+            np.testing.assert_array_equal(mask, self.naive_mask(filters, position))
+            np.testing.assert_array_equal(combined.get_indices(self.layer, self.vehicles, position),
+                                          np.flatnonzero(mask))
+
+        # Not pointwise: the nearest vehicle is busy, no vehicle is kept
+        self.assertEqual((IsIdle() & IsNearestFilter()).get_indices(self.layer, self.vehicles, position).tolist(), [])
+
+    def test_short_circuit(self):
+        cheap = CountingFilter(lambda veh: veh.current_node in ['RIDEHAILING_1', 'RIDEHAILING_2'])
+        expensive = CountingFilter(lambda veh: True)
+        expensive.cost = 100
+        indices = (expensive & IsIdle() & cheap).get_indices(self.layer, self.vehicles, [0, 0])
+        self.assertEqual(indices.tolist(), [1, 2])
+        self.assertEqual(cheap.nb_evaluated, [9])
+        # The expensive filter is evaluated last, only on the remaining vehicles
+        self.assertEqual(expensive.nb_evaluated, [2])
+
+        nothing = CountingFilter(lambda veh: False)
+        other = CountingFilter(lambda veh: True)
+        other.cost = 1
+        self.assertEqual((nothing & other).get_mask(self.layer, self.vehicles, [0, 0]).tolist(), [False] * 9)
+        self.assertEqual(other.nb_evaluated, [])
@@ -13,7 +13,6 @@ from mnms.simulation import Supervisor
 from mnms.time import Time, Dt, TimeTable
 from mnms.tools.observer import CSVUserObserver, CSVVehicleObserver
 from mnms.travel_decision.dummy import DummyDecisionModel
-from mnms.vehicles.manager import VehicleManager
 from mnms.vehicles.veh_type import Bus
 
 
@@ -28,7 +27,6 @@ class TestPublicTransport(unittest.TestCase):
         """Concludes and closes the test.
         """
         self.temp_dir_results.cleanup()
-        VehicleManager.empty()
 
     def create_supervisor(self, sc):
         roads = generate_line_road([0, 0], [0, 3000], 4)
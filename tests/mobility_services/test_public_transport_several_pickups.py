@@ -108,5 +108,7 @@ class TestPublicTransportSeveralPickups(unittest.TestCase):
     def test_buses_arrival(self):
         # Check that buses from id 0 to id 5 have arrived
         for veh in self.supervisor._flow_motor.veh_manager._vehicles.values():
+            if int(veh.id) > 5:
+                continue
             self.assertEqual(veh.activity_type, ActivityType.STOP)
             self.assertEqual(veh._current_node, 'L0_S5')
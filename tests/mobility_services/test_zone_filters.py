@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+
+from mnms.generation.roads import generate_manhattan_road
+from mnms.generation.layers import generate_layer_from_roads
+from mnms.graph.layers import MultiLayerGraph
+from mnms.graph.zone import Zone
+from mnms.mobility_service.filters import InZoneFilter, get_zone, get_vehicles_zones
+from mnms.mobility_service.on_demand import OnDemandMobilityService
+
+
+class TestZoneFilters(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        roads = generate_manhattan_road(3, 500, extended=False)
+        roads.zones = dict()
+        roads.add_zone(Zone('WEST', set(), [[-1, -1], [600, -1], [600, 1001], [-1, 1001]]))
+        roads.add_zone(Zone('EAST', set(), [[400, -1], [1001, -1], [1001, 1001], [400, 1001]]))
+
+        self.service = OnDemandMobilityService('RIDEHAILING', 0)
+        self.layer = generate_layer_from_roads(roads, 'RIDEHAILING', mobility_services=[self.service])
+        self.mlgraph = MultiLayerGraph([self.layer])
+        self.vehicles = [self.service.create_waiting_vehicle(f'RIDEHAILING_{n}') for n in range(9)]
+
+    def test_get_zone(self):
+        roads = self.layer.roads
+        self.assertEqual(get_zone(roads, [100, 100]), 'WEST')
+        # Overlapping zones: the first zone is returned
+        self.assertEqual(get_zone(roads, [500, 100]), 'WEST')
+        self.assertEqual(get_zone(roads, [900, 100]), 'EAST')
+        self.assertEqual(get_zone(roads, [5000, 100]), '')
+        self.assertEqual(roads.locate_zones([[100, 100], [900, 100]]).tolist(), ['WEST', 'EAST'])
+
+    def test_in_zone_filter(self):
+        mask = InZoneFilter().get_mask(self.layer, self.vehicles, position=[900, 900])
+        expected = [self.layer.graph.nodes[v.current_node].position[0] > 600 for v in self.vehicles]
+        self.assertEqual(list(mask), expected)
+
+    def test_fleet_zones_cache(self):
+        fleet_zones = self.service.fleet.zones(self.layer.roads.zones_index)
+        self.assertEqual(fleet_zones.nb_batches, 1)
+        self.assertEqual(fleet_zones.count(self.vehicles).tolist(), [6, 6])
+
+        # No new batch while vehicles do not move
+        get_vehicles_zones(self.layer, self.vehicles)
+        InZoneFilter().get_mask(self.layer, self.vehicles, position=[100, 100])
+        self.assertEqual(fleet_zones.nb_batches, 1)
+
+        # A moved vehicle is located again
+        self.vehicles[0].set_position(np.array([5000., 0.]))
+        self.assertEqual(get_vehicles_zones(self.layer, self.vehicles[:2]).tolist(), ['', 'WEST'])
+        self.assertEqual(fleet_zones.nb_batches, 2)
+
+    def test_fleet_zones_keep_positions_lazy(self):
+        fleet_zones = self.service.fleet.zones(self.layer.roads.zones_index)
+        computed = []
+
+        def link_position(link, remaining_length):
+            computed.append(link)
+            return np.array([900., 100.])
+
+        veh = self.vehicles[0]
+        veh._current_link = ('RIDEHAILING_0', 'RIDEHAILING_3')
+        veh._remaining_link_length = 200
+        veh.set_lazy_position(link_position, veh.current_link, veh.remaining_link_length)
+        self.assertEqual(get_vehicles_zones(self.layer, self.vehicles).tolist()[0], 'EAST')
+        self.assertEqual(len(computed), 1)
+
+        # The vehicles which did not move are not located again, their lazy
+        # coordinates are not computed
+        self.vehicles[1]._current_link = ('RIDEHAILING_1', 'RIDEHAILING_4')
+        self.vehicles[1]._remaining_link_length = 500
+        self.vehicles[1].set_lazy_position(link_position, self.vehicles[1].current_link, 500)
+        get_vehicles_zones(self.layer, self.vehicles[1:])
+        veh.set_lazy_position(link_position, veh.current_link, veh.remaining_link_length)
+        nb_batches = fleet_zones.nb_batches
+        get_vehicles_zones(self.layer, self.vehicles)
+        self.assertEqual(fleet_zones.nb_batches, nb_batches)
+        self.assertEqual(len(computed), 2)
+        self.assertIsNotNone(veh._position_source)
@@ -0,0 +1,40 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from mnms.benchmark import BenchmarkCase, PHASES, run_benchmark, save_baseline, load_baseline, compare_to_baseline
+
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        self.temp_dir_results = tempfile.TemporaryDirectory()
+        self.dir_results = Path(self.temp_dir_results.name)
+
+    def tearDown(self):
+        """Concludes and closes the test.
+        """
+        self.temp_dir_results.cleanup()
+
+    def test_run_benchmark(self):
+        results = run_benchmark([BenchmarkCase('tiny', 4, 10, 2, duration=1200)])
+        self.assertEqual(list(results.keys()), ['tiny'])
+        for phase in ['build'] + PHASES:
+            self.assertGreaterEqual(results['tiny'][phase], 0)
+        self.assertGreater(results['tiny']['run'], 0)
+
+        save_baseline(results, self.dir_results / 'baseline.json')
+        baseline = load_baseline(self.dir_results / 'baseline.json')
+        self.assertEqual(baseline, results)
+
+    def test_compare_to_baseline(self):
+        baseline = {'small': {'run': 1., 'planning': 0.5, 'matching': 0.01}}
+        results = {'small': {'run': 1.1, 'planning': 0.7, 'matching': 0.04},
+                   'new': {'run': 10.}}
+
+        regressions = compare_to_baseline(results, baseline, threshold=0.2)
+        # Matching is too fast in the baseline to be compared
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('small/planning'))
+        self.assertEqual(compare_to_baseline(results, baseline, threshold=0.5), [])
@@ -16,7 +16,6 @@ from mnms.flow.MFD import MFDFlowMotor, Reservoir
 from mnms.simulation import Supervisor
 from mnms.time import Time, Dt, TimeTable
 from mnms.tools.observer import CSVUserObserver, CSVVehicleObserver
-from mnms.vehicles.manager import VehicleManager
 from mnms.vehicles.veh_type import Bus
 
 
@@ -92,7 +91,6 @@ class TestMultiModal(unittest.TestCase):
         """Concludes and closes the test.
         """
         self.temp_dir_results.cleanup()
-        VehicleManager.empty()
 
     def test_run_and_results(self):
         with open(self.dir_results / "user.csv") as f:
@@ -0,0 +1,179 @@
+import ast
+import json
+import shutil
+import unittest
+import tempfile
+import gzip
+from pathlib import Path
+
+from mnms.demand import BaseDemandManager, User
+from mnms.generation.roads import generate_line_road
+from mnms.generation.layers import generate_matching_origin_destination_layer
+from mnms.graph.layers import MultiLayerGraph, CarLayer
+from mnms.travel_decision.dummy import DummyDecisionModel
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.flow.MFD import MFDFlowMotor, Reservoir
+from mnms.flow.user_flow import UserFlow
+from mnms.simulation import Supervisor, load_snaphshot
+from mnms.tools.exceptions import SnapshotMismatchError
+from mnms.tools.observer import CSVUserObserver
+from mnms.time import Time, Dt
+
+
+OUTPUTS = ['costs.csv', 'flow.csv', 'paths.csv', 'user_flow.csv', 'users.csv']
+
+
+def read_rows(filename):
+    """Reads the rows of an output file, costs dicts are read as sorted items as
+    their keys may be ordered differently after a snapshot."""
+    rows = []
+    with open(filename) as f:
+        for line in f:
+            rows.append(tuple(tuple(sorted(ast.literal_eval(v).items())) if v.startswith('{') else v
+                              for v in line.rstrip('\n').split(';')))
+    return rows
+
+
+def build_supervisor(outdir=None):
+    roads = generate_line_road([0, 0], [0, 5000], 6)
+    car_layer = CarLayer(roads, services=[PersonalMobilityService()])
+    for i in range(6):
+        car_layer.create_node(f"CAR_{i}", str(i))
+    for i in range(5):
+        car_layer.create_link(f"CAR_{i}_{i+1}", f"CAR_{i}", f"CAR_{i+1}", {}, [f"{i}_{i+1}"])
+
+    odlayer = generate_matching_origin_destination_layer(roads)
+    mlgraph = MultiLayerGraph([car_layer], odlayer, 1e-3)
+
+    outfiles = dict.fromkeys(OUTPUTS) if outdir is None else {f: str(outdir / f) for f in OUTPUTS}
+
+    demand = BaseDemandManager([User("U0", [0, 0], [0, 5000], Time("07:00:00")),
+                                User("U1", [0, 1000], [0, 5000], Time("07:04:00"))])
+    if outdir is not None:
+        demand.add_user_observer(CSVUserObserver(outfiles['users.csv']))
+    decision_model = DummyDecisionModel(mlgraph, outfile=outfiles['paths.csv'])
+
+    def mfdspeed(dacc):
+        return {'CAR': 10}
+
+    flow_motor = MFDFlowMotor(outfile=outfiles['flow.csv'])
+    flow_motor.add_reservoir(Reservoir(roads.zones["RES"], ['CAR'], mfdspeed))
+
+    return Supervisor(mlgraph, demand, flow_motor, decision_model, user_flow=UserFlow(outfile=outfiles['user_flow.csv']),
+                      outfile=outfiles['costs.csv'])
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        self.temp_dir_results = tempfile.TemporaryDirectory()
+        self.dir_results = Path(self.temp_dir_results.name)
+        self.flow_dt = Dt(seconds=10)
+
+    def tearDown(self):
+        """Concludes and closes the test.
+        """
+        self.temp_dir_results.cleanup()
+
+    def test_checkpoint_files(self):
+        supervisor = build_supervisor()
+        supervisor.run(Time("07:00:00"), Time("07:05:00"), self.flow_dt, 10,
+                       snapshot_folder=str(self.dir_results), checkpoint_every=2)
+
+        # Only the files of the last checkpoint are kept, the manifest points to them
+        self.assertSetEqual({"snapshot.json", "snapshot_2.graph", "snapshot_2.mnms"},
+                            {f.name for f in self.dir_results.iterdir()})
+        with open(self.dir_results / "snapshot.json") as f:
+            self.assertEqual(2, json.load(f)['affectation_step'])
+        # Graph state is compressed
+        with gzip.open(self.dir_results / "snapshot_2.graph", 'rb') as f:
+            f.read(1)
+
+        restored = load_snaphshot(str(self.dir_results / "snapshot"))
+        self.assertEqual(restored.tcurrent, Time("07:03:20"))
+        self.assertEqual(restored._affectation_step, 2)
+        self.assertTrue(restored.from_snapshot)
+        self.assertEqual(set(restored._mlgraph.layers['CAR'].graph.nodes), {f"CAR_{i}" for i in range(6)})
+        self.assertEqual(len(restored._mlgraph.layers['CAR'].graph.links), 5)
+        self.assertEqual(len(restored._mlgraph.graph.links), len(build_supervisor()._mlgraph.graph.links))
+
+    def test_phase_times(self):
+        supervisor = build_supervisor()
+        supervisor.run(Time("07:00:00"), Time("07:05:00"), self.flow_dt, 10,
+                       snapshot_folder=str(self.dir_results), checkpoint_every=2)
+        self.assertGreater(supervisor.phase_times['flow_motor'], 0)
+
+        # A new run does not add its times to the ones of the previous run
+        supervisor.phase_times['flow_motor'] = 1e6
+        supervisor.run(Time("07:00:00"), Time("07:05:00"), self.flow_dt, 10)
+        self.assertLess(supervisor.phase_times['flow_motor'], 1e6)
+
+        # A resumed run goes on from the times of the snapshot
+        snapshot_times = load_snaphshot(str(self.dir_results / "snapshot")).phase_times['flow_motor']
+        resumed = build_supervisor()
+        resumed.run(Time("07:00:00"), Time("07:15:00"), self.flow_dt, 10,
+                    resume_from=str(self.dir_results / "snapshot"))
+        self.assertGreater(resumed.phase_times['flow_motor'], snapshot_times)
+
+    def test_mismatched_snapshot(self):
+        first_dir = self.dir_results / "first"
+        first_dir.mkdir()
+        build_supervisor().run(Time("07:00:00"), Time("07:01:40"), self.flow_dt, 10,
+                               snapshot=True, snapshot_folder=str(first_dir))
+        build_supervisor().run(Time("07:00:00"), Time("07:03:20"), self.flow_dt, 10,
+                               snapshot=True, snapshot_folder=str(self.dir_results))
+
+        # Graph file of another affectation step
+        shutil.copy(first_dir / "snapshot_1.graph", self.dir_results / "snapshot_2.graph")
+
+        with self.assertRaises(SnapshotMismatchError):
+            load_snaphshot(str(self.dir_results / "snapshot"))
+
+    def test_resume_from_checkpoint(self):
+        reference = build_supervisor()
+        reference.run(Time("07:00:00"), Time("07:15:00"), self.flow_dt, 10)
+        expected = {u.id: u.arrival_time for u in reference._demand._users}
+
+        supervisor = build_supervisor()
+        supervisor.run(Time("07:00:00"), Time("07:05:00"), self.flow_dt, 10,
+                       snapshot_folder=str(self.dir_results), checkpoint_every=2)
+
+        resumed = build_supervisor()
+        resumed.run(Time("07:00:00"), Time("07:15:00"), self.flow_dt, 10,
+                    resume_from=str(self.dir_results / "snapshot"))
+
+        self.assertEqual(resumed.tcurrent, Time("07:15:00"))
+        self.assertEqual(resumed._affectation_step, 9)
+        self.assertEqual({u.id: u.arrival_time for u in resumed._demand._users}, expected)
+
+    def test_resume_continues_outputs(self):
+        reference_dir = self.dir_results / "reference"
+        run_dir = self.dir_results / "run"
+        resumed_dir = self.dir_results / "resumed"
+        for folder in (reference_dir, run_dir, resumed_dir):
+            folder.mkdir()
+
+        reference = build_supervisor(reference_dir)
+        reference.run(Time("07:00:00"), Time("07:15:00"), self.flow_dt, 10)
+
+        # The checkpointed run goes on after its last checkpoint before stopping
+        supervisor = build_supervisor(run_dir)
+        supervisor.run(Time("07:00:00"), Time("07:05:00"), self.flow_dt, 10,
+                       snapshot_folder=str(self.dir_results), checkpoint_every=2)
+
+        resumed = build_supervisor(resumed_dir)
+        resumed.run(Time("07:00:00"), Time("07:15:00"), self.flow_dt, 10,
+                    resume_from=str(self.dir_results / "snapshot"))
+
+        for filename in OUTPUTS:
+            expected = read_rows(reference_dir / filename)
+            rows = read_rows(run_dir / filename)
+            # Only one header, and neither missing nor duplicated rows around the checkpoint,
+            # links of the restored graph may be written in another order
+            self.assertEqual(expected[0], rows[0], filename)
+            self.assertListEqual(sorted(expected), sorted(rows), filename)
+            # The files of the resuming supervisor are closed and left with their header
+            with open(resumed_dir / filename) as f:
+                self.assertLessEqual(len(f.readlines()), 1, filename)
+        self.assertTrue(resumed._outfile.closed)
@@ -0,0 +1,55 @@
+import json
+import subprocess
+import sys
+import unittest
+
+
+STARTUP_SCRIPT = """
+import json
+import sys
+import time
+
+tstart = time.perf_counter()
+import mnms
+from mnms.demand import BaseDemandManager, User
+from mnms.flow.MFD import MFDFlowMotor, Reservoir
+from mnms.generation.roads import generate_manhattan_road, generate_one_zone
+from mnms.generation.layers import generate_layer_from_roads, generate_matching_origin_destination_layer
+from mnms.graph.layers import MultiLayerGraph
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.simulation import Supervisor
+from mnms.time import Time
+from mnms.travel_decision.dummy import DummyDecisionModel
+timport = time.perf_counter() - tstart
+
+roads = generate_manhattan_road(5, 100)
+roads.add_zone(generate_one_zone(roads, 'RES'))
+car_layer = generate_layer_from_roads(roads, 'CAR', mobility_services=[PersonalMobilityService()])
+mlgraph = MultiLayerGraph([car_layer], generate_matching_origin_destination_layer(roads), 1e-3)
+demand = BaseDemandManager([User('U0', 'ORIGIN_0', 'DESTINATION_0', Time('07:00:00'))])
+flow_motor = MFDFlowMotor()
+flow_motor.add_reservoir(Reservoir(roads.zones['RES'], ['CAR'], lambda dacc: {'CAR': 10}))
+supervisor = Supervisor(mlgraph, demand, flow_motor, DummyDecisionModel(mlgraph))
+telapsed = time.perf_counter() - tstart
+
+heavy_modules = ['dill', 'jsonpickle', 'matplotlib', 'pandas', 'scipy', 'shapely']
+print(json.dumps({'import': timport,
+                  'elapsed': telapsed,
+                  'loaded': [m for m in heavy_modules if m in sys.modules]}))
+"""
+
+
+class TestStartup(unittest.TestCase):
+    # Generous bound, the startup takes a few tenths of second on a laptop
+    max_startup_time = 5
+
+    def test_startup(self):
+        """Runs the import of mnms and the construction of a Supervisor on a small
+        scenario in a fresh interpreter.
+        """
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], capture_output=True, text=True, check=True)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+
+        # Optional heavy dependencies are only imported when their features are used
+        self.assertEqual(result['loaded'], [])
+        self.assertLess(result['elapsed'], self.max_startup_time)
@@ -0,0 +1,112 @@
+import unittest
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from mnms.demand import BaseDemandManager, User
+from mnms.generation.roads import generate_line_road
+from mnms.generation.layers import generate_matching_origin_destination_layer
+from mnms.graph.layers import MultiLayerGraph, CarLayer
+from mnms.travel_decision.dummy import DummyDecisionModel
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.flow.MFD import MFDFlowMotor, Reservoir
+from mnms.simulation import Supervisor
+from mnms.sweep import Scenario, ScenarioSweep
+from mnms.time import Time, Dt
+from mnms.tools.observer import CSVUserObserver
+
+
+def build_graph():
+    roads = generate_line_road([0, 0], [0, 5000], 6)
+    car_layer = CarLayer(roads, services=[PersonalMobilityService()])
+    for i in range(6):
+        car_layer.create_node(f"CAR_{i}", str(i))
+    for i in range(5):
+        car_layer.create_link(f"CAR_{i}_{i+1}", f"CAR_{i}", f"CAR_{i+1}", {}, [f"{i}_{i+1}"])
+
+    odlayer = generate_matching_origin_destination_layer(roads)
+    return MultiLayerGraph([car_layer], odlayer, 1e-3)
+
+
+def build_supervisor(mlgraph, scenario, folder):
+    if scenario.params['speed'] <= 0:
+        raise ValueError('Speed should be positive')
+
+    demand = BaseDemandManager([User("U0", [0, 0], [0, 5000], Time("07:00:00"))])
+    demand.add_user_observer(CSVUserObserver(folder / 'user.csv'))
+    decision_model = DummyDecisionModel(mlgraph)
+
+    speed = scenario.params['speed']
+    flow_motor = MFDFlowMotor(nworkers=scenario.params.get('nworkers', 1))
+    flow_motor.add_reservoir(Reservoir(mlgraph.roads.zones["RES"], ['CAR'], lambda dacc: {'CAR': speed}))
+
+    return Supervisor(mlgraph, demand, flow_motor, decision_model)
+
+
+def arrival_metrics(supervisor, scenario, folder):
+    return {'ARRIVAL_TIME': str(supervisor._demand._users[0].arrival_time)}
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        self.temp_dir_results = tempfile.TemporaryDirectory()
+        self.dir_results = Path(self.temp_dir_results.name)
+
+    def tearDown(self):
+        """Concludes and closes the test.
+        """
+        self.temp_dir_results.cleanup()
+
+    def test_sweep(self):
+        scenarios = [Scenario('fast', {'speed': 10}),
+                     Scenario('slow', {'speed': 5}),
+                     Scenario('broken', {'speed': 0})]
+        sweep = ScenarioSweep(build_graph, build_supervisor, scenarios, self.dir_results, arrival_metrics)
+        summary = sweep.run(Time("07:00:00"), Time("07:30:00"), Dt(seconds=10), 10, nworkers=2)
+
+        self.assertEqual([r['SCENARIO'] for r in summary], ['fast', 'slow', 'broken'])
+        self.assertEqual([r['STATUS'] for r in summary], ['OK', 'OK', 'FAILED'])
+        self.assertIn('Speed should be positive', summary[2]['ERROR'])
+        self.assertEqual(summary[0]['REMAINING_USERS'], 0)
+        self.assertLess(Time(summary[0]['ARRIVAL_TIME']), Time(summary[1]['ARRIVAL_TIME']))
+
+        # Outputs of each scenario are in its own folder
+        for name in ['fast', 'slow']:
+            df = pd.read_csv(self.dir_results / name / 'user.csv', sep=';')
+            self.assertEqual(df['ID'].unique().tolist(), ['U0'])
+
+        df = pd.read_csv(self.dir_results / 'summary.csv', sep=';', quotechar='|')
+        self.assertEqual(df['SCENARIO'].tolist(), ['fast', 'slow', 'broken'])
+        self.assertEqual(df['STATUS'].tolist(), ['OK', 'OK', 'FAILED'])
+
+    def test_sweep_same_as_single_run(self):
+        mlgraph = build_graph()
+        scenario = Scenario('single', {'speed': 7})
+        supervisor = build_supervisor(mlgraph, scenario, self.dir_results)
+        supervisor.run(Time("07:00:00"), Time("07:30:00"), Dt(seconds=10), 10)
+        expected = arrival_metrics(supervisor, scenario, self.dir_results)['ARRIVAL_TIME']
+
+        sweep = ScenarioSweep(build_graph, build_supervisor,
+                              [Scenario('a', {'speed': 7}), Scenario('b', {'speed': 7})],
+                              self.dir_results / 'sweep', arrival_metrics)
+        summary = sweep.run(Time("07:00:00"), Time("07:30:00"), Dt(seconds=10), 10, nworkers=1)
+
+        self.assertEqual([r['ARRIVAL_TIME'] for r in summary], [expected, expected])
+
+    def test_sweep_with_parallel_flow_motor(self):
+        mlgraph = build_graph()
+        scenario = Scenario('single', {'speed': 7})
+        supervisor = build_supervisor(mlgraph, scenario, self.dir_results)
+        supervisor.run(Time("07:00:00"), Time("07:30:00"), Dt(seconds=10), 10)
+        expected = arrival_metrics(supervisor, scenario, self.dir_results)['ARRIVAL_TIME']
+
+        # Scenarios run in daemonic workers, which cannot fork the workers of the flow motor
+        sweep = ScenarioSweep(build_graph, build_supervisor, [Scenario('parallel', {'speed': 7, 'nworkers': 2})],
+                              self.dir_results / 'sweep', arrival_metrics)
+        summary = sweep.run(Time("07:00:00"), Time("07:30:00"), Dt(seconds=10), 10, nworkers=1)
+
+        self.assertEqual(summary[0]['STATUS'], 'OK', summary[0]['ERROR'])
+        self.assertEqual(summary[0]['ARRIVAL_TIME'], expected)
@@ -0,0 +1,58 @@
+import unittest
+
+from mnms.demand import BaseDemandManager, User
+from mnms.generation.roads import generate_line_road
+from mnms.generation.layers import generate_matching_origin_destination_layer
+from mnms.graph.layers import MultiLayerGraph, CarLayer
+from mnms.travel_decision.dummy import DummyDecisionModel
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.flow.MFD import MFDFlowMotor, Reservoir
+from mnms.simulation import Supervisor
+from mnms.time import Time, Dt
+
+
+class TestUsersStep(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        roads = generate_line_road([0, 0], [0, 5000], 6)
+        car_layer = CarLayer(roads, services=[PersonalMobilityService()])
+        for i in range(6):
+            car_layer.create_node(f"CAR_{i}", str(i))
+        for i in range(5):
+            car_layer.create_link(f"CAR_{i}_{i+1}", f"CAR_{i}", f"CAR_{i+1}", {}, [f"{i}_{i+1}"])
+        odlayer = generate_matching_origin_destination_layer(roads)
+        mlgraph = MultiLayerGraph([car_layer], odlayer, 1e-3)
+
+        self.users = [User(f"U{i}", [0, 0], [0, 5000], Time(t))
+                      for i, t in enumerate(["07:00:00", "07:00:05", "07:00:10", "07:00:10", "07:00:25", "07:01:40"])]
+        demand = BaseDemandManager(self.users)
+
+        flow_motor = MFDFlowMotor()
+        flow_motor.add_reservoir(Reservoir(roads.zones["RES"], ['CAR'], lambda dacc: {'CAR': 10}))
+
+        self.supervisor = Supervisor(mlgraph, demand, flow_motor, DummyDecisionModel(mlgraph))
+
+    def test_get_users_step(self):
+        self.supervisor.tcurrent = Time("07:00:00")
+        users_step, remaining = self.supervisor.get_users_step(self.users, Dt(seconds=10))
+        self.assertEqual([u.id for u in users_step], ["U0", "U1"])
+        self.assertEqual([u.id for u in remaining], ["U2", "U3", "U4", "U5"])
+
+        self.supervisor.tcurrent = Time("07:00:10")
+        users_step, remaining = self.supervisor.get_users_step(remaining, Dt(seconds=10))
+        self.assertEqual([u.id for u in users_step], ["U2", "U3"])
+        self.assertEqual([u.id for u in remaining], ["U4", "U5"])
+
+        self.supervisor.tcurrent = Time("07:00:20")
+        users_step, remaining = self.supervisor.get_users_step(remaining, Dt(seconds=100))
+        self.assertEqual([u.id for u in users_step], ["U4", "U5"])
+        self.assertEqual(remaining, [])
+
+        self.assertEqual(self.supervisor.get_users_step([], Dt(seconds=10)), ([], []))
+
+    def test_run_departures(self):
+        self.supervisor.run(Time("07:00:00"), Time("07:30:00"), Dt(seconds=10), 10)
+        for u in self.users:
+            self.assertIsNotNone(u.arrival_time)
+            self.assertEqual(u.pickup_dt['PersonalVehicle'], User.default_pickup_dt)
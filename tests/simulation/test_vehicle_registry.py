@@ -0,0 +1,89 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from mnms.demand import BaseDemandManager, User
+from mnms.generation.roads import generate_line_road
+from mnms.generation.layers import generate_matching_origin_destination_layer
+from mnms.graph.layers import MultiLayerGraph, CarLayer
+from mnms.travel_decision.dummy import DummyDecisionModel
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.mobility_service.on_demand import OnDemandMobilityService
+from mnms.flow.MFD import MFDFlowMotor, Reservoir
+from mnms.simulation import Supervisor
+from mnms.time import Time, Dt
+from mnms.vehicles.fleet import FleetManager
+from mnms.vehicles.manager import VehicleManager
+from mnms.vehicles.veh_type import Car
+
+
+def build_supervisor(roads, speed):
+    car_layer = CarLayer(roads, services=[PersonalMobilityService()])
+    for i in range(6):
+        car_layer.create_node(f"CAR_{i}", str(i))
+    for i in range(5):
+        car_layer.create_link(f"CAR_{i}_{i+1}", f"CAR_{i}", f"CAR_{i+1}", {}, [f"{i}_{i+1}"])
+
+    odlayer = generate_matching_origin_destination_layer(roads)
+    mlgraph = MultiLayerGraph([car_layer], odlayer, 1e-3)
+
+    demand = BaseDemandManager([User("U0", [0, 0], [0, 5000], Time("07:00:00")),
+                                User("U1", [0, 1000], [0, 5000], Time("07:01:00"))])
+    decision_model = DummyDecisionModel(mlgraph)
+
+    flow_motor = MFDFlowMotor()
+    flow_motor.add_reservoir(Reservoir(roads.zones["RES"], ['CAR'], lambda dacc: {'CAR': speed}))
+
+    return Supervisor(mlgraph, demand, flow_motor, decision_model)
+
+
+class TestVehicleRegistry(unittest.TestCase):
+    def test_registry_ids(self):
+        veh_manager = VehicleManager()
+        fleet = FleetManager(Car, 'SERVICE', False, veh_manager)
+        v0 = fleet.create_waiting_vehicle('0', 1)
+        v1 = fleet.create_waiting_vehicle('0', 1)
+        self.assertEqual(v0.id, '0')
+        self.assertEqual(v1.id, '1')
+        self.assertEqual(veh_manager.number, 2)
+
+        # Fleet created without registry, then moved into the registry of a simulation
+        other_fleet = FleetManager(Car, 'OTHER', False)
+        v2 = other_fleet.create_waiting_vehicle('0', 1)
+        self.assertEqual(v2.id, '0')
+        other_fleet.set_vehicle_manager(veh_manager)
+        self.assertEqual(v2.id, '2')
+        self.assertIn('2', other_fleet.vehicles)
+        self.assertEqual(veh_manager.number, 3)
+
+        fleet.delete_vehicle('0')
+        self.assertEqual(veh_manager.number, 2)
+
+    def test_layer_fleets_share_graph_registry(self):
+        roads = generate_line_road([0, 0], [0, 5000], 6)
+        on_demand = OnDemandMobilityService('UBER', 0)
+        car_layer = CarLayer(roads, services=[on_demand])
+        car_layer.create_node("CAR_0", "0")
+        mlgraph = MultiLayerGraph([car_layer])
+        veh = on_demand.create_waiting_vehicle("CAR_0")
+
+        self.assertIs(on_demand.fleet.veh_manager, mlgraph.veh_manager)
+        self.assertIs(mlgraph.veh_manager.vehicles[veh.id], veh)
+
+    def test_concurrent_supervisors(self):
+        roads = generate_line_road([0, 0], [0, 5000], 6)
+
+        def run(supervisor):
+            supervisor.run(Time("07:00:00"), Time("07:30:00"), Dt(seconds=10), 10)
+            return {u.id: u.arrival_time for u in supervisor._demand._users}
+
+        expected = [run(build_supervisor(roads, 10)), run(build_supervisor(roads, 5))]
+        self.assertNotEqual(expected[0], expected[1])
+
+        supervisors = [build_supervisor(roads, 10), build_supervisor(roads, 5)]
+        self.assertIsNot(supervisors[0].veh_manager, supervisors[1].veh_manager)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(run, supervisors))
+
+        self.assertEqual(results, expected)
+        for supervisor in supervisors:
+            self.assertEqual(sorted(supervisor.veh_manager.vehicles), [])
@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from mnms.generation.roads import generate_manhattan_road
+from mnms.generation.zones import generate_grid_zones
+from mnms.graph.zone import construct_zone_from_contour
+from mnms.tools.geometry import points_in_polygon, PreparedPolygon, ZonesIndex
+
+
+class TestGeometry(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        self.square = [[0, 0], [10, 0], [10, 10], [0, 10]]
+        self.triangle = [[5, 0], [20, 0], [20, 15]]
+
+    def test_points_in_polygon(self):
+        pts = [[5, 5], [0, 0], [10, 5], [11, 5], [-1, -1], [5, 10.5]]
+        expected = [True, True, True, False, False, False]
+        self.assertEqual(points_in_polygon(self.square, pts).tolist(), expected)
+        self.assertEqual(points_in_polygon(self.square, []), [])
+
+        prepared = PreparedPolygon(self.square)
+        self.assertEqual(prepared.in_bbox(np.array(pts, dtype='float32')).tolist(), expected)
+        # Chunks of one point give the same result
+        self.assertEqual(prepared.contains(pts, chunk_size=1).tolist(), expected)
+
+    def test_zones_index(self):
+        index = ZonesIndex([self.square, self.triangle])
+        pts = [[5, 5], [15, 2], [8, 1], [30, 30], [5, 12]]
+        # Overlapping polygons: a point is assigned to the first one containing it
+        self.assertEqual(index.assign(pts).tolist(), [0, 1, 0, -1, -1])
+        self.assertEqual(index.assign([]).tolist(), [])
+        self.assertEqual(ZonesIndex([]).assign(pts).tolist(), [-1] * 5)
+
+    def test_zones_from_contours(self):
+        roads = generate_manhattan_road(5, 100)
+        zones = generate_grid_zones('Z', roads, 2, 2)
+        for zone in zones:
+            expected = construct_zone_from_contour(roads, zone.id, zone.contour)
+            self.assertEqual(sorted(zone.sections), sorted(expected.sections))
+            self.assertIs(zone.prepared.source, zone.contour)
+
+        # The prepared contour is rebuilt when the contour is replaced
+        zone = zones[0]
+        zone.contour = self.square
+        self.assertTrue(zone.is_inside([[5, 5]])[0])
+        self.assertIs(zone.prepared.source, self.square)
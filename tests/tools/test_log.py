@@ -0,0 +1,30 @@
+import unittest
+
+from mnms.log import create_logger, is_enabled, LOGLEVEL
+
+
+class CountingStr(object):
+    def __init__(self):
+        self.nb_str = 0
+
+    def __str__(self):
+        self.nb_str += 1
+        return 'counted'
+
+
+class TestLog(unittest.TestCase):
+    def test_lazy_formatting(self):
+        log = create_logger('mnms.test_log')
+        arg = CountingStr()
+
+        log.setLevel(LOGLEVEL.WARNING)
+        self.assertFalse(is_enabled(log, LOGLEVEL.INFO))
+        log.info('Message %s', arg)
+        self.assertEqual(arg.nb_str, 0)
+
+        log.setLevel(LOGLEVEL.INFO)
+        self.assertTrue(is_enabled(log, LOGLEVEL.INFO))
+        with self.assertLogs(log, LOGLEVEL.INFO) as logs:
+            log.info('Message %s', arg)
+        self.assertEqual(logs.output, ['INFO:mnms.test_log:Message counted'])
+        self.assertEqual(arg.nb_str, 1)
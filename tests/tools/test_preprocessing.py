@@ -0,0 +1,93 @@
+import unittest
+import pickle
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from mnms.generation.roads import generate_manhattan_road
+from mnms.generation.layers import generate_layer_from_roads
+from mnms.mobility_service.on_demand import OnDemandMobilityService
+from mnms.tools.preprocessing import compute_all_shortest_paths, compute_all_shortest_paths_floyd_warshall, \
+    compute_all_shortest_paths_naive, convert_shortest_paths_file, decode_shortest_path_tree, decode_shortest_paths, \
+    ShortestPathsStore
+
+
+class TestShortestPathsStore(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        self.temp_dir_results = tempfile.TemporaryDirectory()
+        self.dir_results = Path(self.temp_dir_results.name)
+
+        roads = generate_manhattan_road(4, 100)
+        self.layer = generate_layer_from_roads(roads, 'CAR', mobility_services=[OnDemandMobilityService('UBER', 0)])
+        self.nodes = list(self.layer.graph.nodes.keys())
+
+    def tearDown(self):
+        """Concludes and closes the test.
+        """
+        self.temp_dir_results.cleanup()
+
+    def test_same_paths_as_json(self):
+        json_file = self.dir_results / 'sp.json'
+        npy_file = self.dir_results / 'sp.npy'
+        compute_all_shortest_paths(self.layer.graph, {'CAR': 'UBER'}, 'CAR', json_file)
+        compute_all_shortest_paths(self.layer.graph, {'CAR': 'UBER'}, 'CAR', npy_file)
+
+        self.layer.load_shortest_paths(json_file)
+        spts = self.layer.shortest_paths
+        self.layer.load_shortest_paths(npy_file)
+        store = self.layer.shortest_paths
+        self.assertIsInstance(store, ShortestPathsStore)
+        self.assertIsInstance(store.predecessors, np.memmap)
+        self.assertEqual(store.predecessors.dtype, np.int16)
+
+        origins = [o for o in self.nodes for d in self.nodes]
+        destinations = [d for o in self.nodes for d in self.nodes]
+        expected = [decode_shortest_path_tree(spts, o, d) for o, d in zip(origins, destinations)]
+        self.assertEqual(decode_shortest_paths(store, origins, destinations), expected)
+        self.assertEqual(decode_shortest_path_tree(store, 'CAR_0', 'CAR_15'),
+                         decode_shortest_path_tree(spts, 'CAR_0', 'CAR_15'))
+        self.assertEqual(store.decode('CAR_0', 'CAR_0'), ['CAR_0'])
+
+        # Conversion of an existing JSON file
+        converted_file = self.dir_results / 'converted.npy'
+        convert_shortest_paths_file(json_file, converted_file)
+        converted = ShortestPathsStore.load(converted_file, mmap=False)
+        self.assertEqual(converted.decode_many(origins, destinations), expected)
+
+        # The memory mapped matrix is read back from its file after pickling
+        unpickled = pickle.loads(pickle.dumps(store))
+        self.assertIsNone(pickle.loads(pickle.dumps(store)).__getstate__()['predecessors'])
+        self.assertEqual(unpickled.decode_many(origins, destinations), expected)
+
+    def test_other_algorithms(self):
+        fw_file = self.dir_results / 'fw.npy'
+        naive_file = self.dir_results / 'naive.npy'
+        dijkstra_file = self.dir_results / 'dijkstra.npy'
+        compute_all_shortest_paths_floyd_warshall(self.layer.graph, {'CAR': 'UBER'}, 'CAR', fw_file)
+        compute_all_shortest_paths_naive(self.layer.graph, {'CAR': 'UBER'}, 'CAR', naive_file)
+        compute_all_shortest_paths(self.layer.graph, {'CAR': 'UBER'}, 'CAR', dijkstra_file)
+
+        stores = [ShortestPathsStore.load(f) for f in [fw_file, naive_file, dijkstra_file]]
+        glinks = self.layer.graph.links
+        gnodes = self.layer.graph.nodes
+        for o in self.nodes:
+            for d in self.nodes:
+                lengths = []
+                for store in stores:
+                    path = store.decode(o, d)
+                    lengths.append(sum(gnodes[u].adj[v].length for u, v in zip(path[:-1], path[1:])) if path else None)
+                self.assertEqual(len(set(lengths)), 1, f'{o}->{d}: {lengths}')
+
+    def test_unreachable_nodes(self):
+        spts = {'A': {'A': '', 'B': 'A', 'C': 'B'},
+                'B': {'A': '', 'B': '', 'C': 'B'},
+                'C': {'A': '', 'B': '', 'C': ''}}
+        store = ShortestPathsStore.from_trees(spts)
+        origins = ['A', 'A', 'B', 'C', 'C']
+        destinations = ['C', 'A', 'A', 'B', 'C']
+        expected = [decode_shortest_path_tree(spts, o, d) for o, d in zip(origins, destinations)]
+        self.assertEqual(expected, [['A', 'B', 'C'], ['A'], [], [], ['C']])
+        self.assertEqual(store.decode_many(origins, destinations), expected)
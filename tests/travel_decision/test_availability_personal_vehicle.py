@@ -18,7 +18,6 @@ from mnms.tools.observer import CSVUserObserver
 from mnms.travel_decision.dummy import DummyDecisionModel
 from mnms.flow.MFD import MFDFlowMotor, Reservoir
 from mnms.simulation import Supervisor
-from mnms.vehicles.manager import VehicleManager
 from mnms.log import set_all_mnms_logger_level, LOGLEVEL
 from mnms.vehicles.veh_type import Car
 
@@ -33,7 +32,6 @@ class TestAvailabilityPersonalVehicle(unittest.TestCase):
         """Concludes and closes the test.
         """
         self.temp_dir_results.cleanup()
-        VehicleManager.empty()
 
     def create_supervisor(self, personal_mob_service_park_radius):
         """Create supervisor common to the different tests of this class.
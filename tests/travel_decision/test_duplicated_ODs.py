@@ -9,7 +9,6 @@ from mnms.generation.roads import generate_manhattan_road, RoadDescriptor
 from mnms.generation.layers import generate_layer_from_roads, generate_matching_origin_destination_layer
 from mnms.demand.user import Path
 from mnms.graph.layers import MultiLayerGraph
-from mnms.vehicles.manager import VehicleManager
 from mnms.travel_decision.dummy import DummyDecisionModel
 from hipop.shortest_path import parallel_k_shortest_path, parallel_k_intermodal_shortest_path, parallel_dijkstra
 
@@ -56,7 +55,6 @@ class TestDuplicatedODs(unittest.TestCase):
         """Concludes and closes the test.
         """
         self.temp_dir_results.cleanup()
-        VehicleManager.empty()
 
     def test_duplicatedODs_ksp(self):
         """Check that the k shortest paths are correctly computed when several users
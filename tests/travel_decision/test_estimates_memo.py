@@ -0,0 +1,81 @@
+import unittest
+
+from mnms.demand import BaseDemandManager, User
+from mnms.generation.roads import generate_line_road
+from mnms.generation.layers import generate_matching_origin_destination_layer
+from mnms.graph.layers import MultiLayerGraph, CarLayer
+from mnms.mobility_service.on_demand import OnDemandMobilityService
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.flow.MFD import MFDFlowMotor, Reservoir
+from mnms.simulation import Supervisor
+from mnms.time import Time, Dt
+from mnms.travel_decision.abstract import PlanningEstimatesMemo
+from mnms.travel_decision.dummy import DummyDecisionModel
+
+
+class TestEstimatesMemo(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        self.roads = generate_line_road([0, 0], [0, 5000], 6)
+
+    def test_memo(self):
+        service = OnDemandMobilityService('UBER', 0, default_waiting_time=60)
+        car_layer = CarLayer(self.roads, services=[service])
+        for i in range(6):
+            car_layer.create_node(f"CAR_{i}", str(i))
+        for i in range(5):
+            car_layer.create_link(f"CAR_{i}_{i+1}", f"CAR_{i}", f"CAR_{i+1}", {}, [f"{i}_{i+1}"])
+
+        calls = []
+        estimate = service.estimate_pickup_time_for_planning
+        def counting_estimate(node):
+            calls.append(node)
+            return estimate(node)
+        service.estimate_pickup_time_for_planning = counting_estimate
+
+        memo = PlanningEstimatesMemo()
+        self.assertEqual(memo.pickup_time('CAR', service, 'CAR_0'), 60)
+        self.assertEqual(memo.pickup_time('CAR', service, 'CAR_0'), 60)
+        self.assertEqual(memo.pickup_time('CAR', service, 'CAR_1'), 60)
+        self.assertEqual(calls, ['CAR_0', 'CAR_1'])
+
+        # Service updates its estimates
+        service._estimated_pickup_times['default'] = 30
+        service.notify_estimates_update()
+        self.assertEqual(memo.pickup_time('CAR', service, 'CAR_0'), 30)
+        self.assertEqual(calls, ['CAR_0', 'CAR_1', 'CAR_0'])
+
+        costs = memo.service_level_costs('CAR', service, ['CAR_0', 'CAR_1'])
+        self.assertIs(memo.service_level_costs('CAR', service, ('CAR_0', 'CAR_1')), costs)
+
+        self.assertEqual(memo.stats(), {'HITS': 2, 'MISSES': 4, 'HIT_RATE': 2 / 6})
+
+        memo.clear()
+        memo.pickup_time('CAR', service, 'CAR_0')
+        self.assertEqual(len(calls), 4)
+
+    def test_memo_during_simulation(self):
+        car_layer = CarLayer(self.roads, services=[PersonalMobilityService()])
+        for i in range(6):
+            car_layer.create_node(f"CAR_{i}", str(i))
+        for i in range(5):
+            car_layer.create_link(f"CAR_{i}_{i+1}", f"CAR_{i}", f"CAR_{i+1}", {}, [f"{i}_{i+1}"])
+        odlayer = generate_matching_origin_destination_layer(self.roads)
+        mlgraph = MultiLayerGraph([car_layer], odlayer, 1e-3)
+
+        users = [User(f"U{i}", [0, 0], [0, 5000], Time("07:00:00")) for i in range(3)]
+        demand = BaseDemandManager(users)
+        decision_model = DummyDecisionModel(mlgraph)
+        flow_motor = MFDFlowMotor()
+        flow_motor.add_reservoir(Reservoir(self.roads.zones["RES"], ['CAR'], lambda dacc: {'CAR': 10}))
+
+        supervisor = Supervisor(mlgraph, demand, flow_motor, decision_model)
+        supervisor.run(Time("07:00:00"), Time("07:30:00"), Dt(seconds=10), 10)
+
+        for u in users:
+            self.assertIsNotNone(u.arrival_time)
+            self.assertEqual(u.path.service_costs, users[0].path.service_costs)
+        stats = decision_model.estimates_memo_stats
+        self.assertEqual(stats['MISSES'], 2)
+        self.assertEqual(stats['HITS'], 4)
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from mnms.demand.user import Path
+from mnms.generation.roads import generate_line_road
+from mnms.generation.layers import generate_layer_from_roads, generate_matching_origin_destination_layer
+from mnms.graph.layers import MultiLayerGraph
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.travel_decision.logit import logit_choice, LogitDecisionModel
+
+
+class TestLogitChoice(unittest.TestCase):
+    def test_probabilities(self):
+        rng = np.random.default_rng(42)
+        theta = 0.01
+        costs = [100., 200., 150.]
+        n = 200000
+        selected = logit_choice([costs] * n, theta, rng)
+        freq = np.bincount(selected, minlength=3) / n
+        expected = np.exp(-theta * np.array(costs))
+        expected /= expected.sum()
+        np.testing.assert_allclose(freq, expected, atol=5e-3)
+
+    def test_ragged_groups(self):
+        rng = np.random.default_rng(1)
+        costs = [[10.], [1., 1e9], [1e9, 1.], [5., 5., 5., 1.]]
+        selected = logit_choice(costs, 1., rng)
+        self.assertEqual(selected.tolist()[:3], [0, 0, 1])
+        self.assertIn(selected[3], [0, 1, 2, 3])
+
+    def test_large_costs_are_stable(self):
+        rng = np.random.default_rng(3)
+        # exp(-theta*cost) underflows for all paths, probabilities must still be the logit ones
+        costs = [[1e6, 1e6 + 100]] * 100000
+        selected = logit_choice(costs, 0.01, rng)
+        self.assertAlmostEqual(np.mean(selected == 0), 1 / (1 + np.exp(-1)), delta=5e-3)
+
+        # No finite utility at all, uniform choice
+        selected = logit_choice([[float('inf'), float('inf')]] * 1000, 0.01, rng)
+        self.assertTrue(set(selected.tolist()) <= {0, 1})
+
+    def test_reproducibility(self):
+        costs = [list(np.random.default_rng(0).uniform(0, 500, 5)) for _ in range(1000)]
+        s1 = logit_choice(costs, 0.01, np.random.default_rng(7))
+        s2 = logit_choice(costs, 0.01, np.random.default_rng(7))
+        s3 = logit_choice(costs, 0.01, np.random.default_rng(8))
+        np.testing.assert_array_equal(s1, s2)
+        self.assertFalse(np.array_equal(s1, s3))
+
+    def test_decision_model_paths_choice(self):
+        roads = generate_line_road([0, 0], [0, 5000], 2)
+        car_layer = generate_layer_from_roads(roads, 'CAR', mobility_services=[PersonalMobilityService()])
+        mlgraph = MultiLayerGraph([car_layer], generate_matching_origin_destination_layer(roads), 1e-3)
+        model = LogitDecisionModel(mlgraph, theta=0.01)
+        model.set_random_seed(10)
+
+        users_paths = [[Path(100, ['A', 'B']), Path(300, ['A', 'C', 'B'])] for _ in range(50)]
+        chosen = model.paths_choice(users_paths)
+        self.assertEqual(len(chosen), 50)
+        for paths, p in zip(users_paths, chosen):
+            self.assertIn(p, paths)
+
+        model.set_random_seed(10)
+        self.assertEqual([paths.index(p) for paths, p in zip(users_paths, model.paths_choice(users_paths))],
+                         [paths.index(p) for paths, p in zip(users_paths, chosen)])
+        self.assertEqual(model.paths_choice([]), [])
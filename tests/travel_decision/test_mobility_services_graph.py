@@ -14,7 +14,6 @@ from mnms.tools.observer import CSVUserObserver
 from mnms.travel_decision.dummy import DummyDecisionModel
 from mnms.flow.MFD import MFDFlowMotor, Reservoir
 from mnms.simulation import Supervisor
-from mnms.vehicles.manager import VehicleManager
 from mnms.log import set_all_mnms_logger_level, LOGLEVEL
 
 class TestMobilityServicesGraph(unittest.TestCase):
@@ -34,7 +33,6 @@ class TestMobilityServicesGraph(unittest.TestCase):
         """
         self.temp_dir_results1.cleanup()
         self.temp_dir_results2.cleanup()
-        VehicleManager.empty()
 
     def create_supervisor(self, graph_file, dir_results):
         """Create supervisor common to the different tests.
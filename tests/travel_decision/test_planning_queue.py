@@ -0,0 +1,63 @@
+import unittest
+
+from mnms.demand import User
+from mnms.generation.roads import generate_line_road
+from mnms.generation.layers import generate_matching_origin_destination_layer
+from mnms.graph.layers import MultiLayerGraph, CarLayer
+from mnms.mobility_service.personal_vehicle import PersonalMobilityService
+from mnms.time import Time
+from mnms.travel_decision.abstract import Event, PlanningQueue
+from mnms.travel_decision.dummy import DummyDecisionModel
+
+
+class TestPlanningQueue(unittest.TestCase):
+    def setUp(self):
+        """Initiates the test.
+        """
+        self.users = [User(f"U{i}", [0, 0], [0, 5000], Time("07:00:00")) for i in range(4)]
+
+    def test_queue(self):
+        queue = PlanningQueue()
+        self.assertTrue(queue.add(self.users[2], Event.DEPARTURE))
+        self.assertTrue(queue.add(self.users[0], Event.MATCH_FAILURE))
+        self.assertTrue(queue.add(self.users[1], Event.INTERRUPTION))
+        # First event is kept by default
+        self.assertFalse(queue.add(self.users[0], Event.INTERRUPTION))
+
+        self.assertEqual(len(queue), 3)
+        self.assertIn(self.users[0], queue)
+        self.assertNotIn(self.users[3], queue)
+        self.assertEqual([(u.id, e) for u, e in queue],
+                         [("U2", Event.DEPARTURE), ("U0", Event.MATCH_FAILURE), ("U1", Event.INTERRUPTION)])
+
+        # Removal while iterating
+        for u, e in queue:
+            if e != Event.DEPARTURE:
+                queue.remove(u)
+        self.assertEqual([u.id for u, _ in queue], ["U2"])
+
+        self.assertEqual(queue.stats(), {'QUEUE_SIZE': 1, 'DEPARTURE': 1, 'MATCH_FAILURE': 1,
+                                         'INTERRUPTION': 1, 'DUPLICATE': 1})
+
+    def test_event_priority(self):
+        queue = PlanningQueue({Event.INTERRUPTION: 1})
+        queue.add(self.users[0], Event.MATCH_FAILURE)
+        self.assertTrue(queue.add(self.users[0], Event.INTERRUPTION))
+        self.assertFalse(queue.add(self.users[0], Event.MATCH_FAILURE))
+        self.assertEqual(queue.event(self.users[0]), Event.INTERRUPTION)
+        self.assertEqual(len(queue), 1)
+
+    def test_decision_model_queue(self):
+        roads = generate_line_road([0, 0], [0, 5000], 2)
+        car_layer = CarLayer(roads, services=[PersonalMobilityService()])
+        car_layer.create_node("CAR_0", "0")
+        mlgraph = MultiLayerGraph([car_layer], generate_matching_origin_destination_layer(roads), 1e-3)
+        decision_model = DummyDecisionModel(mlgraph)
+
+        decision_model.add_users_for_planning(self.users[:3], [Event.DEPARTURE]*3)
+        decision_model.add_users_for_planning(self.users[1:], [Event.MATCH_FAILURE]*3)
+        stats = decision_model.planning_stats
+        self.assertEqual(stats['QUEUE_SIZE'], 4)
+        self.assertEqual(stats['DEPARTURE'], 3)
+        self.assertEqual(stats['MATCH_FAILURE'], 1)
+        self.assertEqual(stats['DUPLICATE'], 2)
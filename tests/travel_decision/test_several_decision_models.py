@@ -18,7 +18,6 @@ from mnms.travel_decision.dummy import DummyDecisionModel
 from mnms.travel_decision.logit import LogitDecisionModel, ModeCentricLogitDecisionModel
 from mnms.flow.MFD import MFDFlowMotor, Reservoir
 from mnms.simulation import Supervisor
-from mnms.vehicles.manager import VehicleManager
 from mnms.log import set_all_mnms_logger_level, LOGLEVEL
 from mnms.vehicles.veh_type import Bus
 
@@ -53,7 +52,6 @@ class TestMobilityServicesGraph(unittest.TestCase):
         """Concludes and closes the test.
         """
         self.temp_dir_results.cleanup()
-        VehicleManager.empty()
 
     def create_supervisor(self, model):
         """Create supervisor common to the two tests in this file.